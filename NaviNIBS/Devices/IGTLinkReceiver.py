@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import attrs
+import logging
+import pyigtl
+import time
+import typing as tp
+
+from NaviNIBS.util import exceptionToStr
+from NaviNIBS.util.Signaler import Signal
+
+
+logger = logging.getLogger(__name__)
+
+
+_headerSize = pyigtl.MessageBase.IGTL_HEADER_SIZE
+
+
+@attrs.define
+class IGTLinkReceiver:
+    """
+    Receives OpenIGTLink messages on the asyncio event loop.
+
+    Rather than polling for new messages, this waits for data to be available on the socket, and passes each message
+    to `onMessage` as soon as it has been read, along with the time it was received (seconds since epoch, as from
+    `time.time()`). Messages that are already buffered (e.g. the rest of a burst of transforms sent together for one
+    tracker frame) are handled without yielding to the event loop in between, as long as `onMessage` doesn't yield.
+
+    Reconnects whenever the connection is lost. Exceptions raised by `onMessage` are logged, and receiving continues
+    with the next message.
+    """
+    _onMessage: tp.Callable[[pyigtl.MessageBase, float], tp.Awaitable[None]]
+    _host: str = '127.0.0.1'
+    _port: int = 18944
+    _reconnectPeriod: float = 0.5
+
+    _isConnected: bool = attrs.field(init=False, default=False)
+    _numMessagesReceived: int = attrs.field(init=False, default=0)
+
+    sigIsConnectedChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
+
+    @property
+    def isConnected(self):
+        return self._isConnected
+
+    @property
+    def numMessagesReceived(self):
+        return self._numMessagesReceived
+
+    def _setIsConnected(self, isConnected: bool):
+        if isConnected != self._isConnected:
+            self._isConnected = isConnected
+            self.sigIsConnectedChanged.emit()
+
+    async def run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+            except OSError as e:
+                logger.debug(f'Could not connect to IGTLink server at {self._host}:{self._port}: {e}')
+                await asyncio.sleep(self._reconnectPeriod)
+                continue
+
+            logger.info(f'Connected to IGTLink server at {self._host}:{self._port}')
+            self._setIsConnected(True)
+            try:
+                await self._receiveMessages(reader)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logger.warning(f'Lost connection to IGTLink server: {e}')
+            finally:
+                self._setIsConnected(False)
+                writer.close()
+            await asyncio.sleep(self._reconnectPeriod)
+
+    async def _receiveMessages(self, reader: asyncio.StreamReader):
+        while True:
+            header = await reader.readexactly(_headerSize)
+            headerFields = pyigtl.MessageBase.parse_header(header)
+            body = await reader.readexactly(headerFields['body_size'])
+            receiveTime = time.time()
+            self._numMessagesReceived += 1
+
+            msg = pyigtl.MessageBase.create_message(headerFields['message_type'])
+            if msg is None:
+                logger.debug(f'Ignoring IGTLink message of unknown type {headerFields["message_type"]}')
+                continue
+            msg.unpack(headerFields, body)
+            try:
+                await self._onMessage(msg, receiveTime)
+            except Exception as e:
+                # don't let one bad message stop receiving
+                logger.error(f'Error handling IGTLink {msg.message_type} message:\n {exceptionToStr(e)}')
@@ -1,4 +1,3 @@
-import asyncio
 import attrs
 import logging
 import numpy as np
@@ -6,6 +5,7 @@ import pyigtl
 import typing as tp
 from typing import ClassVar
 
+from NaviNIBS.Devices.IGTLinkReceiver import IGTLinkReceiver
 from NaviNIBS.Devices.ToolPositionsServer import ToolPositionsServer, TimestampedToolPosition
 
 
@@ -20,55 +20,60 @@ class IGTLinkToolPositionsServer(ToolPositionsServer):
 
     It actually acts as a client connecting to a running Plus Server that is itself streaming tool positions.
     But this provides other clients a connection-agnostic async interface for receiving updates.
+
+    Each TRANSFORM message is recorded as soon as it is received (see IGTLinkReceiver), rather than polled for.
     """
 
     _type: ClassVar[str] = 'IGTLink'
 
     _igtlHostname: str = '127.0.0.1'
     _igtlPort: int = 18944
-    _igtlClient: pyigtl.OpenIGTLinkClient = attrs.field(init=False)
-    _igtlPollPeriod: float = 0.01
+    _timestampSource: str = 'receive'
+    """
+    'receive' to stamp positions with the time each message was received by this server, or 'sender' to use the
+    timestamp in the message (in the sender's clock).
+    """
+    _igtlReceiver: IGTLinkReceiver = attrs.field(init=False)
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
 
-        logger.info('Initializing IGTLink client')
-        self._igtlClient = pyigtl.OpenIGTLinkClient(host=self._igtlHostname, port=self._igtlPort, start_now=False)
+        if self._timestampSource not in ('receive', 'sender'):
+            raise ValueError(f'Unsupported timestamp source: {self._timestampSource}')
+
+        logger.info('Initializing IGTLink receiver')
+        self._igtlReceiver = IGTLinkReceiver(onMessage=self._onIGTLinkMessage,
+                                             host=self._igtlHostname,
+                                             port=self._igtlPort)
+
+    @property
+    def igtlReceiver(self):
+        return self._igtlReceiver
 
     async def run(self):
-        logger.info('Starting IGTLink client')
-        self._igtlClient.start()
-        await asyncio.sleep(1.)  # give some time for client to connect
-        logger.info('Starting IGTLink polling')
-        while True:
-            msgs = self._igtlClient.get_latest_messages()
-            if len(msgs) == 0:
-                logger.debug('No new IGTLink messages')
-                await asyncio.sleep(self._igtlPollPeriod)
-            else:
-                logger.debug('{} new IGTLink messages'.format(len(msgs)))
-                async with self._publishingLatestLock:  # delay publishing until after handling all these messages
-                    for msg in msgs:
-                        if msg.message_type == 'TRANSFORM':
-                            transf = msg.matrix
-                            if np.allclose(transf, np.eye(4)):
-                                # plus sends identity when transforms are invalid
-                                logger.debug('Transform for {} is invalid'.format(msg.device_name))
-                                transf = None
-
-                            position = TimestampedToolPosition(time=msg.timestamp,
-                                                               transf=transf)
-                            key = msg.device_name
-                            if key.endswith('ToTracker'):
-                                # strip 'ToTracker' suffix from device_name, assuming plus config is set to only send *ToTracker transforms
-                                key = key[:-len('ToTracker')]
-
-                            logger.debug(f'Transform for key {key}')
-                            await self.recordNewPosition(key=key, position=position)
-                        else:
-                            logger.error('Unexpected message type: {}'.format(msg.message_type))
-                            raise NotImplementedError()
-                await asyncio.sleep(0)
+        logger.info('Starting IGTLink receiver')
+        await self._igtlReceiver.run()
+
+    async def _onIGTLinkMessage(self, msg: pyigtl.MessageBase, receiveTime: float):
+        if msg.message_type == 'TRANSFORM':
+            transf = msg.matrix
+            if np.allclose(transf, np.eye(4)):
+                # plus sends identity when transforms are invalid
+                logger.debug('Transform for {} is invalid'.format(msg.device_name))
+                transf = None
+
+            position = TimestampedToolPosition(time=receiveTime if self._timestampSource == 'receive' else msg.timestamp,
+                                               transf=transf)
+            key = msg.device_name
+            if key.endswith('ToTracker'):
+                # strip 'ToTracker' suffix from device_name, assuming plus config is set to only send *ToTracker transforms
+                key = key[:-len('ToTracker')]
+
+            logger.debug(f'Transform for key {key}')
+            await self.recordNewPosition(key=key, position=position)
+        else:
+            # e.g. STATUS or STRING messages that Plus may also send
+            logger.debug(f'Ignoring IGTLink message of unsupported type {msg.message_type}')
 
 
 if __name__ == '__main__':
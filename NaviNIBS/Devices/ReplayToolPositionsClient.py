@@ -0,0 +1,82 @@
+import asyncio
+import attrs
+import logging
+import typing as tp
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsRecording import ToolPositionsRecording, ToolPositionsReplayer
+from NaviNIBS.Navigator.Model.Triggering import TriggerEvent
+from NaviNIBS.util.Asyncio import asyncCreateTask
+from NaviNIBS.util.Signaler import Signal
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class ReplayToolPositionsClient(SimulatedToolPositionsClient):
+    """
+    Replays positions from a recording (see ToolPositionsRecording) directly in-process, without a server, e.g. for
+    headless tests of navigation with recorded tracking data.
+
+    Every recorded positions message is applied and signaled in order, so replay at max speed is deterministic.
+    Recorded triggers are emitted by `sigTriggered`, which can be connected to e.g. `TriggerSource.trigger`.
+    """
+    _recordingPath: str | None = None
+    _speed: float | None = 1.
+    """
+    Replay speed relative to real time, or None to replay as fast as possible.
+    """
+    _shiftTimestamps: bool = False
+    """
+    If False, positions are replayed with their exact recorded timestamps. If True, timestamps are shifted to the
+    time of replay.
+    """
+    _autostart: bool = True
+
+    _recording: ToolPositionsRecording = attrs.field(init=False, repr=False)
+    _replayer: ToolPositionsReplayer = attrs.field(init=False, repr=False)
+    _replayTask: asyncio.Task | None = attrs.field(init=False, default=None, repr=False)
+
+    sigTriggered: Signal = attrs.field(init=False, factory=lambda: Signal((TriggerEvent,)), repr=False)
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+
+        if self._recordingPath is None:
+            raise ValueError('recordingPath must be specified')
+
+        self._recording = ToolPositionsRecording.load(self._recordingPath)
+        self._replayer = ToolPositionsReplayer(recording=self._recording,
+                                               onPositions=self._onReplayedPositions,
+                                               onTrigger=self._onReplayedTrigger,
+                                               speed=self._speed,
+                                               shiftTimestamps=self._shiftTimestamps)
+        if self._autostart:
+            self.startReplay()
+
+    @property
+    def recording(self):
+        return self._recording
+
+    @property
+    def replayer(self):
+        return self._replayer
+
+    def startReplay(self):
+        if self._replayTask is not None and not self._replayTask.done():
+            raise RuntimeError('Replay already in progress')
+        self._replayTask = asyncCreateTask(self._replayer.run)
+
+    async def waitForReplayToFinish(self):
+        if self._replayTask is None:
+            raise RuntimeError('Replay has not been started')
+        await self._replayTask
+
+    async def _onReplayedPositions(self, positions: dict[str, TimestampedToolPosition | None]):
+        self._setPositionsLocally(positions)
+
+    async def _onReplayedTrigger(self, event: TriggerEvent):
+        logger.debug(f'Replaying trigger {event}')
+        self.sigTriggered.emit(event)
@@ -0,0 +1,80 @@
+import asyncio
+import attrs
+import logging
+import typing as tp
+from typing import ClassVar
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsRecording import ToolPositionsRecording, ToolPositionsReplayer
+from NaviNIBS.Devices.ToolPositionsServer import ToolPositionsServer
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@attrs.define
+class ReplayToolPositionsServer(ToolPositionsServer):
+    """
+    Publishes tool positions from a recording (see ToolPositionsRecording) instead of from tracking hardware, e.g.
+    to reproduce tracking-dependent behavior of the navigator.
+
+    Published positions are still limited to `publishRateLimit`. When replaying faster than this, positions from
+    multiple records are merged into each published message, as for a live tracker faster than the publish rate.
+
+    Recorded triggers are not published; see ReplayToolPositionsClient for replaying triggers in-process.
+    """
+
+    _type: ClassVar[str] = 'Replay'
+
+    _recordingPath: str | None = None
+    _speed: float | None = 1.
+    """
+    Replay speed relative to real time, or None to replay as fast as possible.
+    """
+    _shiftTimestamps: bool = False
+    """
+    If False, positions are published with their exact recorded timestamps. If True, timestamps are shifted to the
+    time of replay.
+    """
+    _autostart: bool = True
+    """
+    If False, replay doesn't start until `startReplay` is called (e.g. by a client over the command connection
+    after it has connected, so that no positions are missed).
+    """
+
+    _recording: ToolPositionsRecording = attrs.field(init=False, repr=False)
+    _replayer: ToolPositionsReplayer = attrs.field(init=False, repr=False)
+    _startReplayEvent: asyncio.Event = attrs.field(init=False, factory=asyncio.Event, repr=False)
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+
+        if self._recordingPath is None:
+            raise ValueError('recordingPath must be specified')
+
+        logger.info(f'Loading recording from {self._recordingPath}')
+        self._recording = ToolPositionsRecording.load(self._recordingPath)
+        self._replayer = ToolPositionsReplayer(recording=self._recording,
+                                               onPositions=self._onReplayedPositions,
+                                               speed=self._speed,
+                                               shiftTimestamps=self._shiftTimestamps)
+        if self._autostart:
+            self._startReplayEvent.set()
+
+    def startReplay(self):
+        self._startReplayEvent.set()
+
+    def getReplayProgress(self) -> dict[str, tp.Any]:
+        return dict(numRecordsReplayed=self._replayer.numRecordsReplayed,
+                    numRecords=len(self._recording.records),
+                    isFinished=self._replayer.isFinished)
+
+    async def run(self):
+        await self._startReplayEvent.wait()
+        await self._replayer.run()
+
+    async def _onReplayedPositions(self, positions: dict[str, TimestampedToolPosition | None]):
+        async with self._publishingLatestLock:
+            self._latestPositions.update(positions)
+            self._publishPending.set()
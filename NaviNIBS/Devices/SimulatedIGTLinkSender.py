@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import attrs
+import logging
+import numpy as np
+import pyigtl
+import time
+import typing as tp
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class SimulatedIGTLinkSender:
+    """
+    Minimal OpenIGTLink server that sends TRANSFORM messages to all connected clients, standing in for a Plus Server
+    streaming tool positions (e.g. for tests and benchmarks of IGTLinkToolPositionsServer).
+
+    Each message is stamped with the time it is packed for sending, so receivers can measure latency.
+    """
+    _host: str = '127.0.0.1'
+    _port: int = 18944
+    """
+    If 0, an available port is chosen when started; see `port`.
+    """
+
+    _server: asyncio.Server | None = attrs.field(init=False, default=None)
+    _writers: list[asyncio.StreamWriter] = attrs.field(init=False, factory=list)
+    _clientConnected: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
+
+    @property
+    def port(self) -> int:
+        if self._server is not None:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    @property
+    def numClients(self) -> int:
+        return len(self._writers)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._onClientConnected, self._host, self._port)
+        logger.info(f'Simulated IGTLink sender listening on {self._host}:{self.port}')
+
+    async def stop(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+        self._clientConnected.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def waitForClient(self):
+        await self._clientConnected.wait()
+
+    async def _onClientConnected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        logger.info('IGTLink client connected')
+        self._writers.append(writer)
+        self._clientConnected.set()
+
+    @staticmethod
+    def packTransform(deviceName: str, transf: np.ndarray | None, timestamp: float | None = None) -> bytes:
+        """
+        Pack a TRANSFORM message. Like Plus, an invalid (None) transform is sent as identity.
+        """
+        return pyigtl.TransformMessage(matrix=transf if transf is not None else np.eye(4),
+                                       timestamp=timestamp if timestamp is not None else time.time(),
+                                       device_name=deviceName).pack()
+
+    async def sendTransforms(self, transfs: tp.Mapping[str, np.ndarray | None]):
+        """
+        Send one TRANSFORM message per device (e.g. one tracker frame) to all connected clients.
+        """
+        await self._send(b''.join(self.packTransform(deviceName, transf) for deviceName, transf in transfs.items()))
+
+    async def sendMessages(self, msgs: tp.Iterable[pyigtl.MessageBase]):
+        """
+        Send arbitrary messages (e.g. STATUS or STRING messages, as Plus may also send) to all connected clients.
+        """
+        await self._send(b''.join(msg.pack() for msg in msgs))
+
+    async def _send(self, data: bytes):
+        for writer in list(self._writers):
+            if writer.is_closing():
+                self._writers.remove(writer)
+                continue
+            writer.write(data)
+        await asyncio.gather(*(writer.drain() for writer in self._writers), return_exceptions=True)
+
+    async def sendAtRate(self, getTransfs: tp.Callable[[int], tp.Mapping[str, np.ndarray | None]],
+                         rate: float, numFrames: int):
+        """
+        Send `numFrames` frames at a fixed rate, with transforms for frame i given by `getTransfs(i)`.
+        """
+        t0 = time.monotonic()
+        for iFrame in range(numFrames):
+            await asyncio.sleep(max(0., t0 + iFrame / rate - time.monotonic()))
+            await self.sendTransforms(getTransfs(iFrame))
@@ -25,7 +25,11 @@ class SimulatedToolPositionsClient(ToolPositionsClientBase):
         self._setPositionLocally(key, position)
 
     def _setPositionLocally(self, key: str, position: tp.Optional[TimestampedToolPosition]):
+        self._setPositionsLocally({key: position})
+
+    def _setPositionsLocally(self, positions: dict[str, tp.Optional[TimestampedToolPosition]]):
         if self._latestPositions is None:
             self._latestPositions = {}
-        self._latestPositions[key] = position
+        self._onPositionsReceived(positions)
+        self._latestPositions.update(positions)
         self.sigLatestPositionsChanged.emit()
@@ -10,7 +10,10 @@ import zmq.asyncio as azmq
 from NaviNIBS.Devices import positionsServerHostname, positionsServerPubPort, positionsServerCmdPort, TimestampedToolPosition
 from NaviNIBS.util import ZMQAsyncioFix
 from NaviNIBS.util.Asyncio import asyncCreateTask
-from NaviNIBS.util.ZMQConnector import ZMQConnectorClient, logger as logger_ZMQConnector
+from NaviNIBS.Devices.ToolPositionsHistory import ToolPositionsHistory
+from NaviNIBS.Devices.ToolPositionsWireFormat import decodeToolPositions, wireFormatBinary, wireFormatJSON
+from NaviNIBS.util.LatencyTracing import LatencyTracer, getLatencyTracer, stageServerPublish
+from NaviNIBS.util.ZMQConnector import ZMQConnectorClient, RemoteError, logger as logger_ZMQConnector
 from NaviNIBS.util.numpy import array_equalish
 from NaviNIBS.util.Signaler import Signal
 from NaviNIBS.util.Transforms import concatenateTransforms
@@ -27,13 +30,25 @@ _novalue = object()
 
 @attrs.define
 class ToolPositionsClientBase:
+    _positionsHistoryCapacity: int = 1024
+    """
+    Number of past positions to keep per tool for `getTransfAtTime`.
+    """
+
     _latestPositions: dict[str, tp.Optional[TimestampedToolPosition]] | None = attrs.field(init=False, default=None, repr=False)
+    _positionsHistory: ToolPositionsHistory = attrs.field(init=False, repr=False)
 
     sigLatestPositionsChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
+    sigPositionsReceived: Signal = attrs.field(init=False, factory=lambda: Signal((dict,)), repr=False)
+    """
+    Emitted with the positions in every message received, before they are merged into latest positions. A message
+    may contain only some tools (e.g. binary deltas), and several messages may be received for each emission of
+    `sigLatestPositionsChanged`. Used e.g. by `ToolPositionsRecorder` to record the raw stream.
+    """
     sigIsConnectedChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
 
     def __attrs_post_init__(self):
-        pass
+        self._positionsHistory = ToolPositionsHistory(capacity=self._positionsHistoryCapacity)
 
     @property
     def latestPositions(self):
@@ -67,13 +82,74 @@ class ToolPositionsClientBase:
                 return concatenateTransforms((tsPos.transf, otherTransf))
         return tsPos.transf
 
+    def _onPositionsReceived(self, positions: dict[str, tp.Optional[TimestampedToolPosition]],
+                             publishTime: float | None = None):
+        tracer = getLatencyTracer()
+        if tracer.isEnabled:
+            self._traceReceivedPositions(tracer, positions, publishTime)
+        self._positionsHistory.recordPositions(positions)
+        self.sigPositionsReceived.emit(positions)
+
+    @staticmethod
+    def _traceReceivedPositions(tracer: LatencyTracer, positions: dict[str, tp.Optional[TimestampedToolPosition]],
+                                publishTime: float | None):
+        trackerTimes = [pos.time for pos in positions.values() if pos is not None and pos.transf is not None]
+        if len(trackerTimes) == 0:
+            return
+        tracer.startTrace(max(trackerTimes),
+                          stageTimes=((stageServerPublish, publishTime),) if publishTime is not None else (),
+                          now=time.time())
+
+    @property
+    def positionsHistory(self) -> ToolPositionsHistory:
+        return self._positionsHistory
+
+    def getTransfAtTime(self, key: str, time: float, default: tp.Any = _novalue) -> tp.Optional[np.ndarray]:
+        """
+        Like `getLatestTransf`, but interpolated from recent positions to get the transf at the given time (seconds
+        since epoch, as in `TimestampedToolPosition.time`), e.g. to get the coil position when a pulse was delivered.
+
+        Times after the most recent position for a tool return that position. If the time is before the oldest
+        available position, or the tool (or the tool it is relative to) was not tracked at that time, raises KeyError
+        unless a default value is provided.
+        """
+        transf = self._positionsHistory.getTransfAtTime(key, time)
+        if transf is None:
+            if default is _novalue:
+                raise KeyError('No matching, valid transf found')
+            else:
+                return default
+        relativeTo = self._positionsHistory.getRelativeTo(key)
+        if relativeTo != 'world':
+            otherTransf = self.getTransfAtTime(key=relativeTo, time=time, default=None)
+            if otherTransf is None:
+                if default is _novalue:
+                    raise KeyError(f'No matching, valid transf found for {relativeTo} (which {key} is relative to)')
+                return default
+            else:
+                return concatenateTransforms((transf, otherTransf))
+        return transf
+
 
 @attrs.define
 class ToolPositionsClient(ToolPositionsClientBase):
     _serverHostname: str = positionsServerHostname
     _serverPubPort: int = positionsServerPubPort
     _serverCmdPort: int = positionsServerCmdPort
-
+    _preferredWireFormats: tuple[str, ...] = (wireFormatBinary, wireFormatJSON)
+    """
+    Formats to request from the server for published positions, in order of preference. Positions are received as
+    JSON until a format is negotiated, and if negotiation fails (e.g. with an older server).
+    """
+
+    _wireFormat: str = attrs.field(init=False, default=wireFormatJSON)
+    _lastSeq: int | None = attrs.field(init=False, default=None, repr=False)
+    """
+    Sequence number of last binary message received, to detect missed deltas
+    """
+    _keyframeRequested: bool = attrs.field(init=False, default=False, repr=False)
+
+    _ctx: azmq.Context = attrs.field(init=False, repr=False)
     _subSocket: azmq.Socket = attrs.field(init=False)
     _connector: ZMQConnectorClient = attrs.field(init=False, repr=False)
 
@@ -88,12 +164,8 @@ class ToolPositionsClient(ToolPositionsClientBase):
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         
-        ctx = azmq.Context()
-        self._subSocket = ctx.socket(zmq.SUB)
-        logger.debug('Connecting {}:{}'.format(self._serverHostname, self._serverPubPort))
-        self._subSocket.setsockopt(zmq.CONFLATE, 1)
-        self._subSocket.connect('tcp://{}:{}'.format(self._serverHostname, self._serverPubPort))
-        self._subSocket.setsockopt(zmq.SUBSCRIBE, b'')
+        self._ctx = azmq.Context()
+        self._subSocket = self._createSubSocket(self._serverPubPort)
 
         self._connector = ZMQConnectorClient(reqRepPort=self._serverCmdPort,
                                              connAddr=self._serverHostname,
@@ -105,6 +177,22 @@ class ToolPositionsClient(ToolPositionsClientBase):
 
         self._monitorTask = asyncCreateTask(self._monitorServerStatus)
 
+    @property
+    def wireFormat(self) -> str:
+        """
+        Format of positions currently being received from the server
+        """
+        return self._wireFormat
+
+    def _createSubSocket(self, port: int, conflate: bool = True) -> azmq.Socket:
+        subSocket = self._ctx.socket(zmq.SUB)
+        logger.debug('Connecting {}:{}'.format(self._serverHostname, port))
+        if conflate:
+            subSocket.setsockopt(zmq.CONFLATE, 1)
+        subSocket.connect('tcp://{}:{}'.format(self._serverHostname, port))
+        subSocket.setsockopt(zmq.SUBSCRIBE, b'')
+        return subSocket
+
     def getServerType(self) -> str:
         return self._connector.get('type')
 
@@ -126,8 +214,48 @@ class ToolPositionsClient(ToolPositionsClientBase):
             await connectedChangedEvent.wait()
             connectedChangedEvent.clear()
             if self.isConnected:
+                await self._negotiateWireFormat()
                 self.requestLatestPositions()
 
+    async def _negotiateWireFormat(self):
+        if self._wireFormat == wireFormatJSON and tuple(self._preferredWireFormats) == (wireFormatJSON,):
+            return
+        try:
+            # call_async has no timeout of its own, so don't wait forever if server went away since last ping
+            resp = await asyncio.wait_for(
+                self._connector.call_async('negotiateWireFormat', supportedFormats=list(self._preferredWireFormats)),
+                self._serverStatusTimeout / 2)
+        except RemoteError as e:
+            # e.g. server that predates format negotiation
+            logger.info(f'Could not negotiate positions wire format, falling back to JSON: {exceptionToStr(e)}')
+            resp = dict(format=wireFormatJSON, pubPort=self._serverPubPort)
+        except TimeoutError:
+            # server stopped responding, so consider it offline until next successful ping; format is negotiated
+            #  again on reconnect
+            logger.info('Timed out negotiating positions wire format, falling back to JSON')
+            self._timeLastHeardFromServer = None
+            self._updateIsConnected()
+            resp = dict(format=wireFormatJSON, pubPort=self._serverPubPort)
+
+        if resp['format'] == self._wireFormat:
+            return
+
+        logger.info(f'Switching to {resp["format"]} positions wire format')
+        wasReceiving = self._pollTask is not None
+        if wasReceiving:
+            self._pollTask.cancel()
+            try:
+                await self._pollTask
+            except asyncio.CancelledError:
+                pass
+        self._subSocket.close(linger=0)
+        # binary messages may be deltas that each need to be received, so can't conflate
+        self._subSocket = self._createSubSocket(resp['pubPort'], conflate=resp['format'] == wireFormatJSON)
+        self._wireFormat = resp['format']
+        self._lastSeq = None
+        if wasReceiving:
+            self._pollTask = asyncCreateTask(self._receiveLatestPositionsLoop)
+
     async def recordNewPosition_async(self, key: str, position: TimestampedToolPosition):
         """
         This should only be used to record positions of tools that are not tracked by the camera
@@ -154,48 +282,31 @@ class ToolPositionsClient(ToolPositionsClientBase):
         while True:
             socks = dict(await poller.poll())
             if self._subSocket in socks:
-                hasPendingMessages = True
-                msg = None
-                while hasPendingMessages:
+                if self._wireFormat == wireFormatBinary:
+                    # apply all pending messages in order, but only signal once afterwards
+                    msgs = [await self._subSocket.recv()]
+                    while True:
+                        try:
+                            msgs.append(await self._subSocket.recv(zmq.NOBLOCK))
+                        except zmq.Again:
+                            break
+                else:
                     msg = await self._subSocket.recv_json()
-                    logger.debug('Received published message')
-                    #hasPendingMessages = (await self._subSocket.poll(timeout=0.)) > 0
-                    hasPendingMessages = False
+                logger.debug('Received published message')
 
                 self._timeLastHeardFromServer = time.time()
                 self._updateIsConnected()
 
-                newPositions = {key: (TimestampedToolPosition.fromDict(val) if val is not None else None) for key, val in msg.items()}
-
-                # only notify if tool position (not time) changed
-                positionsChanged = False
-                if self._latestPositions is None:
-                    # latest positions had never been set, so send out an update
-                    # even if empty
-                    positionsChanged = True
+                if self._wireFormat == wireFormatBinary:
+                    positionsChanged, newPositions = self._processBinaryMessages(msgs)
                 else:
-                    for key, newPos in newPositions.items():
-                        try:
-                            oldPos = self._latestPositions[key]
-                        except KeyError:
-                            positionsChanged = True
-                            break
-                        else:
-                            if not array_equalish(oldPos.transf, newPos.transf) or oldPos.relativeTo != newPos.relativeTo:
-                                positionsChanged = True
-                                break
-
-                if not positionsChanged:
-                    for key, val in self._latestPositions.items():
-                        if key not in newPositions:
-                            positionsChanged = True
-                            break
+                    positionsChanged, newPositions = self._processJSONMessage(msg)
 
                 if not positionsChanged:
                     logger.debug('Positions not changed during update, not signaling.')
                     continue
 
-                self._latestPositions = {key: (TimestampedToolPosition.fromDict(val) if val is not None else None) for key, val in msg.items()}
+                self._latestPositions = newPositions
                 logger.debug('Signaling change in latest positions')
                 try:
                     self.sigLatestPositionsChanged.emit()  # only emit for latest in series of updates to avoid falling behind
@@ -203,6 +314,80 @@ class ToolPositionsClient(ToolPositionsClientBase):
                     logger.error('Exception during position update:\n {}'.format(exceptionToStr(e)))
                     raise e
 
+    @staticmethod
+    def _havePositionsChanged(oldPositions: dict[str, tp.Optional[TimestampedToolPosition]] | None,
+                              newPositions: dict[str, tp.Optional[TimestampedToolPosition]]) -> bool:
+        """
+        Whether any tool position (not time) changed
+        """
+        if oldPositions is None:
+            # latest positions had never been set, so send out an update
+            # even if empty
+            return True
+
+        for key, newPos in newPositions.items():
+            try:
+                oldPos = oldPositions[key]
+            except KeyError:
+                return True
+            else:
+                if (oldPos is None) != (newPos is None):
+                    return True
+                if newPos is None:
+                    continue
+                if not array_equalish(oldPos.transf, newPos.transf) or oldPos.relativeTo != newPos.relativeTo:
+                    return True
+
+        for key in oldPositions.keys():
+            if key not in newPositions:
+                return True
+
+        return False
+
+    def _processJSONMessage(self, msg: dict[str, tp.Any]) \
+            -> tuple[bool, dict[str, tp.Optional[TimestampedToolPosition]] | None]:
+        newPositions = {key: (TimestampedToolPosition.fromDict(val) if val is not None else None) for key, val in msg.items()}
+        self._onPositionsReceived(newPositions)
+        if not self._havePositionsChanged(self._latestPositions, newPositions):
+            return False, None
+        return True, newPositions
+
+    def _processBinaryMessages(self, msgs: list[bytes]) \
+            -> tuple[bool, dict[str, tp.Optional[TimestampedToolPosition]] | None]:
+        positions = self._latestPositions
+        positionsChanged = False
+        for msg in msgs:
+            decoded = decodeToolPositions(msg)
+            decodedPositions = decoded.toTimestampedToolPositions()
+            self._onPositionsReceived(decodedPositions, publishTime=decoded.publishTime)
+            if decoded.isDelta:
+                if self._lastSeq is None or decoded.seq != self._lastSeq + 1:
+                    # missed earlier messages (e.g. just subscribed), so other tools' positions may be out of date
+                    self._requestKeyframe()
+                # server only includes tools whose positions changed in deltas
+                if positions is self._latestPositions:
+                    positions = dict(positions) if positions is not None else dict()
+                positions.update(decodedPositions)
+                positionsChanged = True
+            else:
+                self._keyframeRequested = False
+                newPositions = decodedPositions
+                if self._havePositionsChanged(positions, newPositions):
+                    positions = newPositions
+                    positionsChanged = True
+            self._lastSeq = decoded.seq
+
+        if not positionsChanged:
+            return False, None
+        return True, positions
+
+    def _requestKeyframe(self):
+        if self._keyframeRequested:
+            return
+        logger.debug('Requesting keyframe')
+        self._keyframeRequested = True
+        asyncCreateTask(self._connector.call_async, 'publishLatestPositions')
+
     async def _monitorServerStatus(self):
         while True:
             if self._timeLastHeardFromServer is None or (time.time() - self._timeLastHeardFromServer) > self._serverStatusTimeout / 2:
@@ -213,6 +398,10 @@ class ToolPositionsClient(ToolPositionsClientBase):
                      logger.debug('Ping to tool positions server timed out.')
                 else:
                     self._timeLastHeardFromServer = time.time()
+                    if self._wireFormat != wireFormatJSON:
+                        # haven't heard published positions recently, so server may have restarted and forgotten
+                        #  negotiated format
+                        await self._negotiateWireFormat()
                 self._updateIsConnected()
             await asyncio.sleep(self._serverStatusTimeout / 4)
 
@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import attrs
+import logging
+import math
+import numpy as np
+import typing as tp
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.util.numpy import array_equalish
+
+
+logger = logging.getLogger(__name__)
+
+
+def _quaternionsFromMatrices(R: np.ndarray) -> np.ndarray:
+    """
+    Convert (N, 3, 3) rotation matrices to (N, 4) unit quaternions in (x, y, z, w) order, choosing the most
+    numerically stable formulation per matrix (as in scipy's Rotation.from_matrix, without its per-call overhead).
+    """
+    N = R.shape[0]
+    diag = np.stack((R[:, 0, 0], R[:, 1, 1], R[:, 2, 2]), axis=1)
+    trace = diag.sum(axis=1)
+    choice = np.argmax(np.concatenate((diag, trace[:, np.newaxis]), axis=1), axis=1)
+    quats = np.empty((N, 4))
+
+    n = np.flatnonzero(choice != 3)
+    if len(n) > 0:
+        i = choice[n]
+        j = (i + 1) % 3
+        k = (j + 1) % 3
+        quats[n, i] = 1 - trace[n] + 2 * R[n, i, i]
+        quats[n, j] = R[n, j, i] + R[n, i, j]
+        quats[n, k] = R[n, k, i] + R[n, i, k]
+        quats[n, 3] = R[n, k, j] - R[n, j, k]
+
+    n = np.flatnonzero(choice == 3)
+    if len(n) > 0:
+        quats[n, 0] = R[n, 2, 1] - R[n, 1, 2]
+        quats[n, 1] = R[n, 0, 2] - R[n, 2, 0]
+        quats[n, 2] = R[n, 1, 0] - R[n, 0, 1]
+        quats[n, 3] = 1 + trace[n]
+
+    quats /= np.linalg.norm(quats, axis=1, keepdims=True)
+    return quats
+
+
+def _matricesFromQuaternions(quats: np.ndarray) -> np.ndarray:
+    """
+    Convert (N, 4) unit quaternions in (x, y, z, w) order to (N, 3, 3) rotation matrices.
+    """
+    x, y, z, w = quats.T
+    R = np.empty((quats.shape[0], 3, 3))
+    R[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    R[:, 0, 1] = 2 * (x * y - z * w)
+    R[:, 0, 2] = 2 * (x * z + y * w)
+    R[:, 1, 0] = 2 * (x * y + z * w)
+    R[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    R[:, 1, 2] = 2 * (y * z - x * w)
+    R[:, 2, 0] = 2 * (x * z - y * w)
+    R[:, 2, 1] = 2 * (y * z + x * w)
+    R[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return R
+
+
+def _slerpQuaternions(quatsA: np.ndarray, quatsB: np.ndarray, fractions: np.ndarray) -> np.ndarray:
+    dots = np.einsum('ij,ij->i', quatsA, quatsB)
+    # q and -q are the same rotation; flip to interpolate along the shorter arc
+    quatsB = np.where(dots[:, np.newaxis] < 0, -quatsB, quatsB)
+    dots = np.minimum(np.abs(dots), 1.)
+    angles = np.arccos(dots)
+    sinAngles = np.sin(angles)
+    isSmall = sinAngles < 1e-6
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weightsA = np.where(isSmall, 1 - fractions, np.sin((1 - fractions) * angles) / sinAngles)
+        weightsB = np.where(isSmall, fractions, np.sin(fractions * angles) / sinAngles)
+    quats = weightsA[:, np.newaxis] * quatsA + weightsB[:, np.newaxis] * quatsB
+    quats /= np.linalg.norm(quats, axis=1, keepdims=True)
+    return quats
+
+
+def interpolateTransforms(transfsA: np.ndarray, transfsB: np.ndarray, fractions: np.ndarray) -> np.ndarray:
+    """
+    Interpolate between rigid transforms, with spherical linear interpolation (SLERP) of rotation and linear
+    interpolation of translation.
+
+    :param transfsA: (N, 4, 4) transforms at fraction 0
+    :param transfsB: (N, 4, 4) transforms at fraction 1
+    :param fractions: (N,) interpolation fractions, typically in [0, 1]
+    :return: (N, 4, 4) interpolated transforms
+    """
+    fractions = np.asarray(fractions, dtype=np.float64)
+    quats = _slerpQuaternions(_quaternionsFromMatrices(transfsA[:, :3, :3]),
+                              _quaternionsFromMatrices(transfsB[:, :3, :3]),
+                              fractions)
+    transfs = np.zeros((len(fractions), 4, 4))
+    transfs[:, :3, :3] = _matricesFromQuaternions(quats)
+    transfs[:, :3, 3] = transfsA[:, :3, 3] + (transfsB[:, :3, 3] - transfsA[:, :3, 3]) * fractions[:, np.newaxis]
+    transfs[:, 3, 3] = 1.
+    return transfs
+
+
+def _quaternionFromMatrix(R: list[list[float]]) -> tuple[float, float, float, float]:
+    """
+    Scalar version of `_quaternionsFromMatrices`, avoiding numpy overhead for single transforms.
+    """
+    trace = R[0][0] + R[1][1] + R[2][2]
+    diag = (R[0][0], R[1][1], R[2][2])
+    i = max(range(3), key=diag.__getitem__)
+    if trace >= diag[i]:
+        q = [R[2][1] - R[1][2], R[0][2] - R[2][0], R[1][0] - R[0][1], 1 + trace]
+    else:
+        j = (i + 1) % 3
+        k = (j + 1) % 3
+        q = [0., 0., 0., R[k][j] - R[j][k]]
+        q[i] = 1 - trace + 2 * R[i][i]
+        q[j] = R[j][i] + R[i][j]
+        q[k] = R[k][i] + R[i][k]
+    norm = math.sqrt(q[0] * q[0] + q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    return q[0] / norm, q[1] / norm, q[2] / norm, q[3] / norm
+
+
+def interpolateTransform(transfA: np.ndarray, transfB: np.ndarray, fraction: float) -> np.ndarray:
+    """
+    Single-transform version of `interpolateTransforms`, several times faster for one transform.
+    """
+    A = transfA.tolist()
+    B = transfB.tolist()
+    qA = _quaternionFromMatrix(A)
+    qB = _quaternionFromMatrix(B)
+    dot = qA[0] * qB[0] + qA[1] * qB[1] + qA[2] * qB[2] + qA[3] * qB[3]
+    if dot < 0:
+        qB = (-qB[0], -qB[1], -qB[2], -qB[3])
+        dot = -dot
+    angle = math.acos(min(dot, 1.))
+    sinAngle = math.sin(angle)
+    if sinAngle < 1e-6:
+        wA, wB = 1 - fraction, fraction
+    else:
+        wA = math.sin((1 - fraction) * angle) / sinAngle
+        wB = math.sin(fraction * angle) / sinAngle
+    x, y, z, w = (wA * a + wB * b for a, b in zip(qA, qB))
+    norm = math.sqrt(x * x + y * y + z * z + w * w)
+    x, y, z, w = x / norm, y / norm, z / norm, w / norm
+    return np.asarray([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w),
+         A[0][3] + (B[0][3] - A[0][3]) * fraction],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w),
+         A[1][3] + (B[1][3] - A[1][3]) * fraction],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y),
+         A[2][3] + (B[2][3] - A[2][3]) * fraction],
+        [0., 0., 0., 1.]])
+
+
+@attrs.define
+class ToolPoseRingBuffer:
+    """
+    Fixed-capacity history of timestamped poses for a single tool, supporting interpolation at arbitrary times.
+
+    Samples are written twice (at i and i + capacity) so that the most recent samples are always available as one
+    contiguous, time-ordered slice without copying, keeping both appends and time lookups cheap.
+    """
+    _capacity: int = 1024
+
+    _times: np.ndarray = attrs.field(init=False, repr=False)
+    _transfs: np.ndarray = attrs.field(init=False, repr=False)
+    _isValid: np.ndarray = attrs.field(init=False, repr=False)
+    _iNext: int = attrs.field(init=False, default=0)
+    _count: int = attrs.field(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        if self._capacity < 2:
+            raise ValueError('Capacity must be at least 2')
+        self._times = np.zeros((2 * self._capacity,))
+        self._transfs = np.zeros((2 * self._capacity, 4, 4))
+        self._isValid = np.zeros((2 * self._capacity,), dtype=bool)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def _window(self) -> slice:
+        end = self._iNext + self._capacity
+        return slice(end - self._count, end)
+
+    @property
+    def times(self) -> np.ndarray:
+        """
+        Times of buffered samples, oldest first. Returns a view that is only valid until the next append.
+        """
+        return self._times[self._window]
+
+    @property
+    def oldestTime(self) -> float | None:
+        return self._times[self._iNext + self._capacity - self._count] if self._count > 0 else None
+
+    @property
+    def newestTime(self) -> float | None:
+        return self._times[self._iNext + self._capacity - 1] if self._count > 0 else None
+
+    def clear(self):
+        self._iNext = 0
+        self._count = 0
+
+    def append(self, time: float, transf: np.ndarray | None) -> bool:
+        """
+        Add a sample. `transf` of None indicates the tool was not tracked at this time.
+
+        Samples are expected in time order. A sample at the same time as the newest replaces it, and older samples
+        are ignored.
+
+        :return: whether the sample was added
+        """
+        if self._count > 0:
+            iNewest = self._iNext + self._capacity - 1
+            newestTime = self._times[iNewest]
+            if time < newestTime:
+                logger.debug(f'Ignoring out-of-order sample at {time} (newest is {newestTime})')
+                return False
+            if time == newestTime:
+                if transf is None:
+                    if not self._isValid[iNewest]:
+                        return False
+                elif self._isValid[iNewest] and array_equalish(self._transfs[iNewest], transf):
+                    # e.g. unchanged position republished in a keyframe
+                    return False
+                self._iNext = (self._iNext - 1) % self._capacity
+                self._count -= 1
+
+        for i in (self._iNext, self._iNext + self._capacity):
+            self._times[i] = time
+            if transf is None:
+                self._isValid[i] = False
+            else:
+                self._isValid[i] = True
+                self._transfs[i] = transf
+        self._iNext = (self._iNext + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+        return True
+
+    def getTransfAtTime(self, time: float) -> np.ndarray | None:
+        """
+        Get the pose at the given time, interpolated between the neighboring samples.
+
+        Times after the newest sample return the newest pose (as with latest positions, a pose is current until
+        replaced). Returns None if the time is before the oldest buffered sample or if either neighboring sample is
+        invalid.
+        """
+        if self._count == 0:
+            return None
+        window = self._window
+        bufTimes = self._times[window]
+        iAfter = int(np.searchsorted(bufTimes, time, side='right'))
+        if iAfter == self._count:
+            # at or after newest sample: hold newest
+            iNewest = window.stop - 1
+            return self._transfs[iNewest].copy() if self._isValid[iNewest] else None
+        if iAfter == 0:
+            return None
+        iBefore = window.start + iAfter - 1
+        iAfter = window.start + iAfter
+        if not self._isValid[iBefore]:
+            return None
+        fraction = (time - self._times[iBefore]) / (self._times[iAfter] - self._times[iBefore])
+        if fraction == 0:
+            return self._transfs[iBefore].copy()
+        if not self._isValid[iAfter]:
+            return None
+        return interpolateTransform(self._transfs[iBefore], self._transfs[iAfter], fraction)
+
+    def getTransfsAtTimes(self, times: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of `getTransfAtTime`.
+
+        :param times: (N,) query times
+        :return: (N, 4, 4) transforms, with NaN for queries where no valid pose is available
+        """
+        times = np.asarray(times, dtype=np.float64)
+        transfs = np.full((len(times), 4, 4), np.nan)
+        if self._count == 0:
+            return transfs
+
+        window = self._window
+        bufTimes = self._times[window]
+        bufTransfs = self._transfs[window]
+        bufIsValid = self._isValid[window]
+
+        iAfter = np.searchsorted(bufTimes, times, side='right')
+        iBefore = iAfter - 1
+
+        # at or after newest sample: hold newest
+        isAfterNewest = iAfter == self._count
+        doHold = isAfterNewest & bufIsValid[-1]
+        transfs[doHold] = bufTransfs[-1]
+
+        isBetween = (iBefore >= 0) & ~isAfterNewest
+        if not np.any(isBetween):
+            return transfs
+        iBefore = iBefore[isBetween]
+        iAfter = iAfter[isBetween]
+        fractions = (times[isBetween] - bufTimes[iBefore]) / (bufTimes[iAfter] - bufTimes[iBefore])
+        # exactly at a sample only requires that sample to be valid
+        isValid = bufIsValid[iBefore] & (bufIsValid[iAfter] | (fractions == 0))
+        if not np.any(isValid):
+            return transfs
+        iBefore, iAfter, fractions = iBefore[isValid], iAfter[isValid], fractions[isValid]
+        # don't interpolate towards invalid (possibly uninitialized) transforms when exactly at a valid sample
+        transfsAfter = bufTransfs[iAfter]
+        transfsAfter[fractions == 0] = bufTransfs[iBefore][fractions == 0]
+        iQueries = np.flatnonzero(isBetween)[isValid]
+        transfs[iQueries] = interpolateTransforms(bufTransfs[iBefore], transfsAfter, fractions)
+        # return exact samples rather than re-orthonormalized versions when not interpolating
+        isAtSample = fractions == 0
+        transfs[iQueries[isAtSample]] = bufTransfs[iBefore[isAtSample]]
+        return transfs
+
+
+@attrs.define
+class ToolPositionsHistory:
+    """
+    Recent positions of all tools, to allow getting the positions at a time in the past (e.g. when a TMS pulse was
+    delivered), rather than only the latest positions.
+    """
+    _capacity: int = 1024
+    """
+    Number of samples to keep per tool. At a tracker rate of 60 Hz, the default covers the last ~17 s.
+    """
+
+    _buffers: dict[str, ToolPoseRingBuffer] = attrs.field(init=False, factory=dict, repr=False)
+    _relativeTo: dict[str, str] = attrs.field(init=False, factory=dict, repr=False)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def keys(self):
+        return self._buffers.keys()
+
+    def __getitem__(self, key: str) -> ToolPoseRingBuffer:
+        return self._buffers[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._buffers
+
+    def clear(self):
+        self._buffers.clear()
+        self._relativeTo.clear()
+
+    def recordPosition(self, key: str, position: TimestampedToolPosition | None):
+        if position is None:
+            # no time available, so nothing to record
+            return
+        try:
+            buffer = self._buffers[key]
+        except KeyError:
+            buffer = ToolPoseRingBuffer(capacity=self._capacity)
+            self._buffers[key] = buffer
+        if self._relativeTo.get(key, position.relativeTo) != position.relativeTo:
+            # poses relative to a different tool can't be interpolated with earlier poses
+            buffer.clear()
+        self._relativeTo[key] = position.relativeTo
+        buffer.append(position.time, position.transf)
+
+    def recordPositions(self, positions: tp.Mapping[str, TimestampedToolPosition | None]):
+        for key, position in positions.items():
+            self.recordPosition(key, position)
+
+    def getRelativeTo(self, key: str) -> str:
+        return self._relativeTo[key]
+
+    def getTransfAtTime(self, key: str, time: float) -> np.ndarray | None:
+        """
+        Note that returned transf is relative to `getRelativeTo(key)`, which is not necessarily world.
+
+        Returns None if no valid pose is available for the tool at this time.
+        """
+        try:
+            buffer = self._buffers[key]
+        except KeyError:
+            return None
+        return buffer.getTransfAtTime(time)
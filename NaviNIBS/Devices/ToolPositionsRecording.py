@@ -0,0 +1,358 @@
+"""
+Recording and replay of tool positions streams (and triggers), to allow reproducing tracking-dependent behavior
+without tracking hardware.
+
+A recording file is little-endian binary, containing a file header (see `_fileHeader`: magic, format version,
+reserved flags, recording start time) followed by a sequence of records. Each record has a header (see
+`_recordHeader`: record type, receive time, payload length) followed by its payload:
+
+- `recordTypePositions`: positions received in one message, encoded with `ToolPositionsWireFormat`. The first
+  positions record is a keyframe with all tools known when recording started; later records contain only the tools
+  in each received message, and are applied on top of earlier positions.
+- `recordTypeTrigger`: UTF-8 JSON with trigger event `type`, `time` (seconds since epoch), and `metadata`.
+
+Records are appended as they are received, so a recording that was not closed cleanly (e.g. after a crash) can
+still be read up to the last complete record.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import attrs
+import json
+import logging
+import math
+import os
+import pandas as pd
+import struct
+import time
+import typing as tp
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClientBase, ToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsWireFormat import encodeToolPositions, decodeToolPositions
+from NaviNIBS.Navigator.Model.Triggering import TriggerEvent, TriggerSource
+from NaviNIBS.util.Signaler import Signal
+
+
+logger = logging.getLogger(__name__)
+
+
+recordingMagic = b'NNTR'
+recordingVersion = 1
+
+_fileHeader = struct.Struct('<4sHHd')
+"""
+magic, format version, reserved flags, recording start time (seconds since epoch)
+"""
+
+_recordHeader = struct.Struct('<BdI')
+"""
+record type, receive time (seconds since epoch), payload length
+"""
+
+recordTypePositions = 1
+recordTypeTrigger = 2
+
+
+class RecordingFormatError(ValueError):
+    pass
+
+
+def _triggerTimeToEpoch(timestamp: pd.Timestamp) -> float:
+    # naive timestamps are local time, as from pd.Timestamp.now()
+    return timestamp.to_pydatetime().timestamp()
+
+
+def _epochToTriggerTime(t: float) -> pd.Timestamp:
+    return pd.Timestamp.fromtimestamp(t)
+
+
+@attrs.define(frozen=True)
+class RecordedPositions:
+    receiveTime: float
+    positions: dict[str, TimestampedToolPosition | None]
+
+
+@attrs.define(frozen=True)
+class RecordedTrigger:
+    receiveTime: float
+    event: TriggerEvent
+
+
+Record = RecordedPositions | RecordedTrigger
+
+
+@attrs.define
+class ToolPositionsRecorder:
+    """
+    Records every positions message received by a tool positions client (see
+    `ToolPositionsClientBase.sigPositionsReceived`), plus any triggers from connected trigger sources, to a
+    recording file.
+
+    Writes are buffered, and flushed to disk at most every `flushInterval` seconds and when stopped.
+    """
+    _filepath: str
+    _positionsClient: ToolPositionsClientBase | None = None
+    _flushInterval: float = 1.
+
+    _file: tp.BinaryIO | None = attrs.field(init=False, default=None, repr=False)
+    _numRecords: int = attrs.field(init=False, default=0)
+    _timeLastFlushed: float = attrs.field(init=False, default=-math.inf, repr=False)
+    _triggerSources: list[TriggerSource] = attrs.field(init=False, factory=list, repr=False)
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    @property
+    def isRecording(self) -> bool:
+        return self._file is not None
+
+    @property
+    def numRecords(self):
+        return self._numRecords
+
+    def start(self):
+        if self._file is not None:
+            raise RuntimeError('Already recording')
+        logger.info(f'Starting recording to {self._filepath}')
+        self._file = open(self._filepath, 'wb')
+        self._file.write(_fileHeader.pack(recordingMagic, recordingVersion, 0, time.time()))
+        self._numRecords = 0
+        if self._positionsClient is not None:
+            # start with all currently known positions, so replay doesn't depend on positions from before recording
+            self.recordPositions(self._positionsClient.latestPositions)
+            self._positionsClient.sigPositionsReceived.connect(self.recordPositions)
+        for source in self._triggerSources:
+            source.sigTriggered.connect(self.recordTrigger)
+
+    def stop(self):
+        if self._file is None:
+            return
+        if self._positionsClient is not None:
+            self._positionsClient.sigPositionsReceived.disconnect(self.recordPositions)
+        for source in self._triggerSources:
+            source.sigTriggered.disconnect(self.recordTrigger)
+        self._file.close()
+        self._file = None
+        logger.info(f'Stopped recording to {self._filepath} after {self._numRecords} records')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def connectToTriggerSource(self, source: TriggerSource):
+        self._triggerSources.append(source)
+        if self.isRecording:
+            source.sigTriggered.connect(self.recordTrigger)
+
+    def disconnectFromTriggerSource(self, source: TriggerSource):
+        self._triggerSources.remove(source)
+        if self.isRecording:
+            source.sigTriggered.disconnect(self.recordTrigger)
+
+    def recordPositions(self, positions: tp.Mapping[str, TimestampedToolPosition | None],
+                        receiveTime: float | None = None):
+        if receiveTime is None:
+            receiveTime = time.time()
+        payload = encodeToolPositions(positions, seq=self._numRecords, publishTime=receiveTime,
+                                      isDelta=self._numRecords > 0)
+        self._writeRecord(recordTypePositions, receiveTime, payload)
+
+    def recordTrigger(self, event: TriggerEvent, receiveTime: float | None = None):
+        if receiveTime is None:
+            receiveTime = time.time()
+        payload = json.dumps(dict(type=event.type,
+                                  time=_triggerTimeToEpoch(event.time),
+                                  metadata=event.metadata),
+                             default=str).encode('utf-8')
+        self._writeRecord(recordTypeTrigger, receiveTime, payload)
+
+    def _writeRecord(self, recordType: int, receiveTime: float, payload: bytes):
+        if self._file is None:
+            raise RuntimeError('Not recording')
+        self._file.write(_recordHeader.pack(recordType, receiveTime, len(payload)))
+        self._file.write(payload)
+        self._numRecords += 1
+        now = time.monotonic()
+        if now - self._timeLastFlushed >= self._flushInterval:
+            self._file.flush()
+            self._timeLastFlushed = now
+
+    @classmethod
+    async def createAndRun_async(cls, filepath: str, **clientKwargs):
+        client = ToolPositionsClient(**clientKwargs)
+        with cls(filepath=filepath, positionsClient=client):
+            while True:
+                await asyncio.sleep(1.)
+
+    @classmethod
+    def createAndRun(cls, *args, **kwargs):
+        from NaviNIBS.util.Asyncio import asyncioRunAndHandleExceptions
+        asyncioRunAndHandleExceptions(cls.createAndRun_async, *args, **kwargs)
+
+
+@attrs.define
+class ToolPositionsRecording:
+    """
+    A recording loaded into memory, with records in the order they were recorded.
+    """
+    _startTime: float
+    _records: list[Record]
+
+    @property
+    def startTime(self):
+        return self._startTime
+
+    @property
+    def records(self):
+        return self._records
+
+    @property
+    def duration(self) -> float:
+        """
+        Time from start of recording to last record
+        """
+        if len(self._records) == 0:
+            return 0.
+        return self._records[-1].receiveTime - self._startTime
+
+    @property
+    def numPositionsRecords(self) -> int:
+        return sum(isinstance(record, RecordedPositions) for record in self._records)
+
+    @property
+    def triggers(self) -> list[RecordedTrigger]:
+        return [record for record in self._records if isinstance(record, RecordedTrigger)]
+
+    def getFinalPositions(self) -> dict[str, TimestampedToolPosition | None]:
+        """
+        Positions after applying all records, i.e. latest positions at the end of the recording
+        """
+        positions = dict()
+        for record in self._records:
+            if isinstance(record, RecordedPositions):
+                positions.update(record.positions)
+        return positions
+
+    @classmethod
+    def load(cls, filepath: str | os.PathLike) -> ToolPositionsRecording:
+        with open(filepath, 'rb') as f:
+            buf = f.read()
+
+        if len(buf) < _fileHeader.size:
+            raise RecordingFormatError('File too short for recording header')
+        magic, version, _, startTime = _fileHeader.unpack_from(buf, 0)
+        if magic != recordingMagic:
+            raise RecordingFormatError(f'Unexpected magic {magic!r}, not a tool positions recording')
+        if version > recordingVersion:
+            raise RecordingFormatError(f'Unsupported recording version {version} (max supported {recordingVersion})')
+
+        records = []
+        offset = _fileHeader.size
+        while offset < len(buf):
+            if offset + _recordHeader.size > len(buf):
+                logger.warning(f'Ignoring truncated record at end of {filepath}')
+                break
+            recordType, receiveTime, payloadLength = _recordHeader.unpack_from(buf, offset)
+            offset += _recordHeader.size
+            if offset + payloadLength > len(buf):
+                logger.warning(f'Ignoring truncated record at end of {filepath}')
+                break
+            payload = buf[offset:offset + payloadLength]
+            offset += payloadLength
+
+            if recordType == recordTypePositions:
+                records.append(RecordedPositions(
+                    receiveTime=receiveTime,
+                    positions=decodeToolPositions(payload).toTimestampedToolPositions()))
+            elif recordType == recordTypeTrigger:
+                d = json.loads(payload)
+                records.append(RecordedTrigger(
+                    receiveTime=receiveTime,
+                    event=TriggerEvent(type=d['type'], time=_epochToTriggerTime(d['time']), metadata=d['metadata'])))
+            else:
+                logger.debug(f'Ignoring record of unknown type {recordType}')
+
+        return cls(startTime=startTime, records=records)
+
+
+@attrs.define
+class ToolPositionsReplayer:
+    """
+    Plays back the records of a recording to callbacks, paced according to the recorded receive times.
+
+    With `speed=1`, records are replayed in real time; with other values, proportionally faster or slower. With
+    `speed=None`, records are replayed as fast as possible, yielding to the event loop between records.
+
+    By default, positions and triggers are replayed with their exact recorded timestamps. If `shiftTimestamps` is
+    True, timestamps are instead mapped to the replay's wall-clock time (accounting for speed, or offset without
+    scaling for max speed), e.g. for consumers that compare position times to the current time.
+    """
+    _recording: ToolPositionsRecording
+    _onPositions: tp.Callable[[dict[str, TimestampedToolPosition | None]], tp.Awaitable[None]]
+    _onTrigger: tp.Callable[[TriggerEvent], tp.Awaitable[None]] | None = None
+    _speed: float | None = 1.
+    _shiftTimestamps: bool = False
+
+    _numRecordsReplayed: int = attrs.field(init=False, default=0)
+    _replayStartTime: float | None = attrs.field(init=False, default=None)
+
+    sigFinished: Signal = attrs.field(init=False, factory=Signal, repr=False)
+
+    def __attrs_post_init__(self):
+        if self._speed is not None and self._speed <= 0:
+            raise ValueError('Speed must be positive, or None for max speed')
+
+    @property
+    def numRecordsReplayed(self):
+        return self._numRecordsReplayed
+
+    @property
+    def isFinished(self) -> bool:
+        return self._numRecordsReplayed == len(self._recording.records)
+
+    def _mapTime(self, t: float) -> float:
+        if not self._shiftTimestamps:
+            return t
+        speed = self._speed if self._speed is not None else 1.
+        return self._replayStartTime + (t - self._recording.startTime) / speed
+
+    async def run(self):
+        self._numRecordsReplayed = 0
+        self._replayStartTime = time.time()
+        t0 = time.monotonic()
+        logger.info(f'Replaying {len(self._recording.records)} records at '
+                    f'{"max" if self._speed is None else f"{self._speed}x"} speed')
+        for record in self._recording.records:
+            if self._speed is None:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(max(0., t0 + (record.receiveTime - self._recording.startTime) / self._speed
+                                        - time.monotonic()))
+
+            if isinstance(record, RecordedPositions):
+                positions = record.positions
+                if self._shiftTimestamps:
+                    positions = {key: (attrs.evolve(pos, time=self._mapTime(pos.time)) if pos is not None else None)
+                                 for key, pos in positions.items()}
+                await self._onPositions(positions)
+            elif self._onTrigger is not None:
+                event = record.event
+                if self._shiftTimestamps:
+                    event = attrs.evolve(event, time=_epochToTriggerTime(
+                        self._mapTime(_triggerTimeToEpoch(event.time))))
+                await self._onTrigger(event)
+            self._numRecordsReplayed += 1
+
+        logger.info('Finished replay')
+        self.sigFinished.emit()
+
+
+if __name__ == '__main__':
+    import sys
+    ToolPositionsRecorder.createAndRun(filepath=sys.argv[1])
@@ -1,13 +1,17 @@
 import asyncio
 import attrs
 import logging
+import math
 import numpy as np
+import time
 import typing as tp
 from typing import ClassVar
 import zmq
 import zmq.asyncio as azmq
 
-from NaviNIBS.Devices import positionsServerHostname, positionsServerPubPort, positionsServerCmdPort, TimestampedToolPosition
+from NaviNIBS.Devices import positionsServerHostname, positionsServerPubPort, positionsServerCmdPort, \
+    positionsServerBinaryPubPort, TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsWireFormat import encodeToolPositions, wireFormatBinary, wireFormatJSON
 from NaviNIBS.util import ZMQAsyncioFix
 from NaviNIBS.util.Asyncio import asyncCreateTask
 from NaviNIBS.util.logging import createLogFileHandler
@@ -28,15 +32,50 @@ class ToolPositionsServer:
     _hostname: str = positionsServerHostname
     _pubPort: int = positionsServerPubPort
     _cmdPort: int = positionsServerCmdPort
+    _binaryPubPort: int = positionsServerBinaryPubPort
+    """
+    Port for publishing positions in binary wire format (see ToolPositionsWireFormat) to clients that negotiated it.
+    JSON positions are always published on `_pubPort` for clients that don't negotiate a format.
+    """
 
     _logFilepath: str | None = None
 
     _latestPositions: tp.Dict[str, tp.Optional[TimestampedToolPosition]] = attrs.field(init=False, factory=dict)
     _publishingLatestLock: asyncio.Condition = attrs.field(init=False, factory=asyncio.Condition)
     _publishPending: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
-    _publishRateLimit: float = 10.  # in Hz
+    _publishRateLimit: float = 10.
+    """
+    Max rate (in Hz) at which positions are published. Can be increased up to the tracker's native rate (e.g.
+    60-400 Hz) for lower latency.
+    """
+    _keyframeInterval: float = 1.
+    """
+    Binary publishing sends only tools whose positions changed (deltas), plus all tools (a keyframe) at least this
+    often (in s) while positions are updating, and whenever `publishLatestPositions` is called.
+    """
+    _deltaTolerance: float = 1.e-6
+    """
+    Tools are included in a delta if any element of their transform changed by more than this since it was last
+    published, or if their validity or `relativeTo` changed. Times of tools not included in deltas are only updated
+    for binary subscribers by keyframes.
+    """
+    _binarySendHighWaterMark: int = 100
+    """
+    Max number of binary messages queued for any subscriber. When reached, further messages to that subscriber are
+    dropped (without affecting other subscribers); it detects the gap in sequence numbers once it catches up and
+    requests a keyframe.
+    """
+
+    _publishSeq: int = attrs.field(init=False, default=0)
+    _doPublishBinary: bool = attrs.field(init=False, default=False)
+    _lastPublishedPositions: dict[str, TimestampedToolPosition | None] = attrs.field(init=False, factory=dict)
+    _keyframePending: bool = attrs.field(init=False, default=True)
+    _timeLastKeyframe: float = attrs.field(init=False, default=-math.inf)
+    _publishStats: dict[str, int] = attrs.field(init=False, factory=lambda: dict(
+        numPublished=0, numKeyframes=0, numDeltas=0))
 
     _pubSocket: azmq.Socket = attrs.field(init=False)
+    _binaryPubSocket: azmq.Socket = attrs.field(init=False)
     _connector: ZMQConnectorServer = attrs.field(init=False)
     _logFileHandler: logging.FileHandler = attrs.field(init=False)
 
@@ -47,6 +86,18 @@ class ToolPositionsServer:
         self._pubSocket.bind('tcp://{}:{}'.format(self._hostname, self._pubPort))
         self._pubSocket.linger = 0  # TODO: determine if necessary
 
+        # XPUB reports each new subscription, so that a keyframe can be sent once a new subscriber is actually
+        #  connected.
+        # Note: not using XPUB_NODROP, since then a single stalled subscriber would block sending to all subscribers.
+        #  Instead a subscriber that falls behind by more than the high water mark misses messages, and recovers by
+        #  requesting a keyframe.
+        self._binaryPubSocket = ctx.socket(zmq.XPUB)
+        self._binaryPubSocket.setsockopt(zmq.XPUB_VERBOSE, 1)
+        self._binaryPubSocket.setsockopt(zmq.SNDHWM, self._binarySendHighWaterMark)
+        logger.debug('Binding {}:{} for binary pub socket'.format(self._hostname, self._binaryPubPort))
+        self._binaryPubSocket.bind('tcp://{}:{}'.format(self._hostname, self._binaryPubPort))
+        self._binaryPubSocket.linger = 0
+
         self._connector = ZMQConnectorServer(
             obj=self,
             reqRepPort=self._cmdPort,
@@ -58,22 +109,108 @@ class ToolPositionsServer:
             logging.getLogger('').addHandler(self._logFileHandler)
 
         asyncCreateTask(self._publishLatestPositionsLoop)
+        asyncCreateTask(self._receiveBinarySubscriptionsLoop)
 
     @property
     def type(self):
         return self._type
 
+    @property
+    def publishRateLimit(self):
+        return self._publishRateLimit
+
+    @publishRateLimit.setter
+    def publishRateLimit(self, rate: float):
+        if rate <= 0:
+            raise ValueError('Publish rate must be positive')
+        self._publishRateLimit = rate
+
+    @property
+    def publishStats(self) -> dict[str, int]:
+        """
+        Counts of messages published (JSON and binary publishing together count once), and binary keyframes and
+        deltas.
+        """
+        return self._publishStats.copy()
+
+    def negotiateWireFormat(self, supportedFormats: list[str]) -> dict[str, tp.Any]:
+        """
+        Called by clients to choose a format for published positions. Returns dict with the chosen `format` (the
+        first of the client's `supportedFormats` that the server also supports) and the `pubPort` to subscribe to
+        for that format.
+        """
+        for wireFormat in supportedFormats:
+            if wireFormat == wireFormatBinary:
+                if not self._doPublishBinary:
+                    logger.info('Client requested binary positions, starting binary publishing')
+                    self._doPublishBinary = True
+                return dict(format=wireFormat, pubPort=self._binaryPubPort)
+            elif wireFormat == wireFormatJSON:
+                return dict(format=wireFormat, pubPort=self._pubPort)
+        raise ValueError(f'None of requested wire formats {supportedFormats} are supported')
+
     async def run(self):
         raise NotImplementedError()  # should be implemented by subclass
 
     async def _publishLatestPositionsLoop(self):
+        timeLastPublished = -math.inf
         while True:
             await self._publishPending.wait()
-            await asyncio.sleep(1/self._publishRateLimit)  # rate limit
+            timeToWait = timeLastPublished + 1 / self._publishRateLimit - time.monotonic()
+            if timeToWait > 0:
+                await asyncio.sleep(timeToWait)  # rate limit
             async with self._publishingLatestLock:
                 logger.debug('Publishing latest positions')
                 self._publishPending.clear()
+                timeLastPublished = time.monotonic()
+                if self._doPublishBinary:
+                    await self._publishBinary(now=timeLastPublished)
                 self._pubSocket.send_json({key: (val.asDict() if val is not None else None) for key, val in self._latestPositions.items()})
+                self._publishStats['numPublished'] += 1
+
+    async def _receiveBinarySubscriptionsLoop(self):
+        while True:
+            msg = await self._binaryPubSocket.recv()
+            if msg[:1] == b'\x01':
+                logger.debug('New binary subscriber')
+                if self._doPublishBinary:
+                    self.publishLatestPositions()
+
+    async def _publishBinary(self, now: float):
+        isKeyframe = self._keyframePending or now - self._timeLastKeyframe >= self._keyframeInterval
+        if isKeyframe:
+            toPublish = self._latestPositions
+        else:
+            toPublish = {key: pos for key, pos in self._latestPositions.items()
+                         if self._hasChangedSincePublished(key, pos)}
+            if len(toPublish) == 0:
+                return
+
+        msg = encodeToolPositions(toPublish, seq=self._publishSeq + 1, isDelta=not isKeyframe)
+        # without XPUB_NODROP, this doesn't block; messages to any subscriber at its high water mark are dropped
+        await self._binaryPubSocket.send(msg, zmq.NOBLOCK)
+
+        self._publishSeq += 1
+        self._lastPublishedPositions.update(toPublish)
+        if isKeyframe:
+            self._keyframePending = False
+            self._timeLastKeyframe = now
+            self._publishStats['numKeyframes'] += 1
+        else:
+            self._publishStats['numDeltas'] += 1
+
+    def _hasChangedSincePublished(self, key: str, position: TimestampedToolPosition | None) -> bool:
+        try:
+            prev = self._lastPublishedPositions[key]
+        except KeyError:
+            return True
+        if prev is None or position is None:
+            return prev is not position
+        if prev.relativeTo != position.relativeTo:
+            return True
+        if prev.transf is None or position.transf is None:
+            return prev.transf is not position.transf
+        return np.abs(position.transf - prev.transf).max() > self._deltaTolerance
 
     async def recordNewPosition(self, key: str, position: TimestampedToolPosition | dict):
         if isinstance(position, dict):
@@ -86,6 +223,11 @@ class ToolPositionsServer:
         self._publishPending.set()
 
     def publishLatestPositions(self):
+        """
+        Publish all latest positions (including a binary keyframe) at the next opportunity, e.g. for newly
+        connected clients.
+        """
+        self._keyframePending = True
         self._publishPending.set()
 
     @classmethod
@@ -0,0 +1,210 @@
+"""
+Binary wire format for publishing tool positions from a `ToolPositionsServer` to `ToolPositionsClient`s.
+
+Each message is a single little-endian frame, containing:
+
+- a fixed header (see `_header`): magic, format version, message flags (see `messageFlagDelta`), number of tools,
+  length of the string table, message sequence number, and server publish time
+- a string table: UTF-8 strings separated by null bytes. The first `numTools` strings are tool keys, followed by
+  any `relativeTo` keys that are not themselves tool keys. Padded with null bytes to a multiple of 8 bytes.
+- times: float64[numTools], NaN for tools without a position
+- transfs: float64[numTools, 4, 4], NaN for tools without a valid transform
+- relativeTo: int32[numTools], index into the string table, or -1 for 'world'
+- flags: uint8[numTools], see `toolFlagHasPosition` and `toolFlagHasTransf`
+
+Decoding reads the arrays directly from the message buffer, without building per-tool dicts.
+
+A message is either a keyframe, containing all tools known to the server, or a delta, containing only tools whose
+position changed since the previous message (see `ToolPositionsServer`). Deltas can only be applied in sequence
+on top of the latest keyframe; a receiver that detects a gap in sequence numbers should request a new keyframe.
+
+Readers should reject messages with a newer major format version than they support. Fields may only be added in
+a backward-compatible way by appending them after the arrays above and incrementing `wireFormatVersion`.
+"""
+
+from __future__ import annotations
+
+import attrs
+import numpy as np
+import struct
+import time
+import typing as tp
+
+from NaviNIBS.Devices import TimestampedToolPosition
+
+
+wireFormatBinary = 'binary-v1'
+wireFormatJSON = 'json'
+
+wireFormatMagic = b'NNTP'
+wireFormatVersion = 1
+
+_header = struct.Struct('<4sHHIIQd')
+"""
+magic, format version, message flags, number of tools, string table length (before padding), sequence number,
+publish time (seconds since epoch)
+"""
+
+messageFlagDelta = 0x0001
+_knownMessageFlags = messageFlagDelta
+
+toolFlagHasPosition = 0x01
+toolFlagHasTransf = 0x02
+
+_worldIndex = -1
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def _padTo8(length: int) -> int:
+    return (length + 7) & ~7
+
+
+@attrs.define(frozen=True)
+class DecodedToolPositions:
+    """
+    Positions of tools in one message, as arrays indexed by tool.
+    """
+    seq: int
+    publishTime: float
+    isDelta: bool
+    keys: list[str]
+    times: np.ndarray
+    """
+    float64[N], NaN where `hasPosition` is False
+    """
+    transfs: np.ndarray
+    """
+    float64[N, 4, 4], NaN where `hasTransf` is False
+    """
+    relativeToIndices: np.ndarray
+    """
+    int32[N], indices into `strings`, or -1 for 'world'
+    """
+    strings: list[str]
+    flags: np.ndarray
+
+    @property
+    def numTools(self) -> int:
+        return len(self.keys)
+
+    @property
+    def hasPosition(self) -> np.ndarray:
+        return (self.flags & toolFlagHasPosition) != 0
+
+    @property
+    def hasTransf(self) -> np.ndarray:
+        return (self.flags & toolFlagHasTransf) != 0
+
+    def getRelativeTo(self, index: int) -> str:
+        iStr = self.relativeToIndices[index]
+        return 'world' if iStr == _worldIndex else self.strings[iStr]
+
+    def toTimestampedToolPositions(self) -> dict[str, TimestampedToolPosition | None]:
+        """
+        Convert to the same structure as published in JSON format. Transforms are views into `transfs`.
+        """
+        positions = dict()
+        hasPosition = self.hasPosition.tolist()
+        hasTransf = self.hasTransf.tolist()
+        times = self.times.tolist()
+        for i, key in enumerate(self.keys):
+            if not hasPosition[i]:
+                positions[key] = None
+            else:
+                positions[key] = TimestampedToolPosition(
+                    time=times[i],
+                    transf=self.transfs[i] if hasTransf[i] else None,
+                    relativeTo=self.getRelativeTo(i))
+        return positions
+
+
+def encodeToolPositions(positions: tp.Mapping[str, TimestampedToolPosition | None],
+                        seq: int = 0,
+                        publishTime: float | None = None,
+                        isDelta: bool = False) -> bytes:
+    if publishTime is None:
+        publishTime = time.time()
+
+    numTools = len(positions)
+    strings = list(positions.keys())
+    stringIndices = {key: i for i, key in enumerate(strings)}
+
+    times = np.full(numTools, np.nan)
+    transfs = np.full((numTools, 4, 4), np.nan)
+    relativeTo = np.full(numTools, _worldIndex, dtype='<i4')
+    flags = np.zeros(numTools, dtype=np.uint8)
+
+    for i, pos in enumerate(positions.values()):
+        if pos is None:
+            continue
+        flags[i] = toolFlagHasPosition
+        times[i] = pos.time
+        if pos.transf is not None:
+            flags[i] |= toolFlagHasTransf
+            transfs[i] = pos.transf
+        if pos.relativeTo != 'world':
+            iStr = stringIndices.get(pos.relativeTo, None)
+            if iStr is None:
+                iStr = len(strings)
+                strings.append(pos.relativeTo)
+                stringIndices[pos.relativeTo] = iStr
+            relativeTo[i] = iStr
+
+    stringTable = '\0'.join(strings).encode('utf-8')
+    return b''.join((
+        _header.pack(wireFormatMagic, wireFormatVersion, messageFlagDelta if isDelta else 0, numTools,
+                     len(stringTable), seq, publishTime),
+        stringTable,
+        bytes(_padTo8(len(stringTable)) - len(stringTable)),
+        times.astype('<f8', copy=False).tobytes(),
+        transfs.astype('<f8', copy=False).tobytes(),
+        relativeTo.tobytes(),
+        flags.tobytes()))
+
+
+def decodeToolPositions(buf: bytes | memoryview, copy: bool = True) -> DecodedToolPositions:
+    """
+    Decode a message encoded with `encodeToolPositions`.
+
+    If `copy` is False, returned arrays are read-only views into `buf`.
+    """
+    if len(buf) < _header.size:
+        raise WireFormatError('Message too short for header')
+    magic, version, messageFlags, numTools, stringTableLength, seq, publishTime = _header.unpack_from(buf, 0)
+    if magic != wireFormatMagic:
+        raise WireFormatError('Unexpected magic in tool positions message')
+    if version > wireFormatVersion:
+        raise WireFormatError(f'Unsupported tool positions wire format version {version}')
+    if messageFlags & ~_knownMessageFlags:
+        raise WireFormatError(f'Unsupported tool positions message flags {messageFlags:#x}')
+
+    offset = _header.size
+    stringTableEnd = offset + stringTableLength
+    arraysOffset = offset + _padTo8(stringTableLength)
+    expectedLength = arraysOffset + numTools * (8 + 16 * 8 + 4 + 1)
+    if len(buf) < expectedLength:
+        raise WireFormatError(f'Message length {len(buf)} is shorter than expected {expectedLength}')
+
+    stringTable = bytes(buf[offset:stringTableEnd]).decode('utf-8')
+    strings = stringTable.split('\0') if numTools > 0 or stringTableLength > 0 else []
+    if len(strings) < numTools:
+        raise WireFormatError('String table has fewer entries than tools')
+
+    offset = arraysOffset
+    times = np.frombuffer(buf, dtype='<f8', count=numTools, offset=offset)
+    offset += times.nbytes
+    transfs = np.frombuffer(buf, dtype='<f8', count=numTools * 16, offset=offset).reshape(numTools, 4, 4)
+    offset += transfs.nbytes
+    relativeTo = np.frombuffer(buf, dtype='<i4', count=numTools, offset=offset)
+    offset += relativeTo.nbytes
+    flags = np.frombuffer(buf, dtype=np.uint8, count=numTools, offset=offset)
+
+    if copy:
+        times, transfs, relativeTo, flags = times.copy(), transfs.copy(), relativeTo.copy(), flags.copy()
+
+    return DecodedToolPositions(seq=seq, publishTime=publishTime, isDelta=bool(messageFlags & messageFlagDelta),
+                                keys=strings[:numTools], times=times,
+                                transfs=transfs, relativeToIndices=relativeTo, strings=strings, flags=flags)
@@ -7,6 +7,7 @@ from NaviNIBS.util.numpy import attrsWithNumpyAsDict, attrsWithNumpyFromDict
 positionsServerHostname = '127.0.0.1'
 positionsServerPubPort = 18950
 positionsServerCmdPort = 18951
+positionsServerBinaryPubPort = 18952
 
 
 @attrs.define
@@ -0,0 +1,56 @@
+import asyncio
+import socket
+import threading
+import typing as tp
+
+import pytest
+
+from NaviNIBS.Devices.ToolPositionsServer import ToolPositionsServer
+from NaviNIBS.util.Asyncio import asyncCreateTask
+
+
+@pytest.fixture
+def serverPorts() -> dict[str, int]:
+    """
+    Free ports for a ToolPositionsServer, as kwargs for the server
+    """
+    socks = [socket.socket() for _ in range(3)]
+    try:
+        for sock in socks:
+            sock.bind(('127.0.0.1', 0))
+        ports = [sock.getsockname()[1] for sock in socks]
+    finally:
+        for sock in socks:
+            sock.close()
+    return dict(pubPort=ports[0], cmdPort=ports[1], binaryPubPort=ports[2])
+
+
+@pytest.fixture
+def startServerThread() -> tp.Generator[tp.Callable[..., ToolPositionsServer], None, None]:
+    """
+    Returns function to create a ToolPositionsServer (or subclass) running on its own event loop in another thread,
+    since clients make some blocking calls to the server. If the server has a `run` implementation, it is started.
+    """
+    loops = []
+    threads = []
+
+    def start(serverCls: type[ToolPositionsServer] = ToolPositionsServer, **kwargs) -> ToolPositionsServer:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        loops.append(loop)
+        threads.append(thread)
+
+        async def create():
+            server = serverCls(**kwargs)
+            if serverCls.run is not ToolPositionsServer.run:
+                asyncCreateTask(server.run)
+            return server
+
+        return asyncio.run_coroutine_threadsafe(create(), loop).result(timeout=10.)
+
+    yield start
+
+    for loop, thread in zip(loops, threads):
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10.)
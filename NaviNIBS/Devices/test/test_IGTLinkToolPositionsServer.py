@@ -0,0 +1,136 @@
+import asyncio
+
+import numpy as np
+import pyigtl
+import pytest
+
+from NaviNIBS.Devices.IGTLinkReceiver import IGTLinkReceiver
+from NaviNIBS.Devices.IGTLinkToolPositionsServer import IGTLinkToolPositionsServer
+from NaviNIBS.Devices.SimulatedIGTLinkSender import SimulatedIGTLinkSender
+from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient
+
+
+def _getTransf(i: int) -> np.ndarray:
+    transf = np.eye(4)
+    transf[:3, 3] = (i, 2 * i, 0.5)
+    return transf
+
+
+@pytest.mark.asyncio
+async def test_receiver():
+    sender = SimulatedIGTLinkSender(port=0)
+    await sender.start()
+
+    received = []
+
+    async def onMessage(msg, receiveTime):
+        received.append((msg, receiveTime))
+
+    receiver = IGTLinkReceiver(onMessage=onMessage, port=sender.port, reconnectPeriod=0.05)
+    receiverTask = asyncio.create_task(receiver.run())
+    try:
+        async with asyncio.timeout(5.):
+            await sender.waitForClient()
+            while not receiver.isConnected:
+                await asyncio.sleep(0.01)
+
+        # every message should be forwarded in order, including multiple for the same device within a frame
+        numFrames = 50
+        await sender.sendAtRate(lambda i: {'CoilToTracker': _getTransf(i), 'PointerToTracker': None},
+                                rate=500., numFrames=numFrames)
+        async with asyncio.timeout(5.):
+            while len(received) < numFrames * 2:
+                await asyncio.sleep(0.01)
+
+        assert [msg.device_name for msg, _ in received] == ['CoilToTracker', 'PointerToTracker'] * numFrames
+        for iFrame in range(numFrames):
+            msg, receiveTime = received[iFrame * 2]
+            assert np.allclose(msg.matrix, _getTransf(iFrame))
+            assert 0 <= receiveTime - msg.timestamp < 0.1
+
+        # should reconnect if sender restarts
+        port = sender.port
+        await sender.stop()
+        async with asyncio.timeout(5.):
+            while receiver.isConnected:
+                await asyncio.sleep(0.01)
+        sender = SimulatedIGTLinkSender(port=port)
+        await sender.start()
+        async with asyncio.timeout(5.):
+            await sender.waitForClient()
+        await sender.sendTransforms({'CoilToTracker': _getTransf(100)})
+        async with asyncio.timeout(5.):
+            while len(received) < numFrames * 2 + 1:
+                await asyncio.sleep(0.01)
+        assert np.allclose(received[-1][0].matrix, _getTransf(100))
+    finally:
+        receiverTask.cancel()
+        await sender.stop()
+
+
+@pytest.mark.asyncio
+async def test_receiverContinuesAfterHandlerError():
+    sender = SimulatedIGTLinkSender(port=0)
+    await sender.start()
+
+    received = []
+
+    async def onMessage(msg, receiveTime):
+        if msg.device_name == 'Bad':
+            raise ValueError('Bad message')
+        received.append(msg.device_name)
+
+    receiver = IGTLinkReceiver(onMessage=onMessage, port=sender.port, reconnectPeriod=0.05)
+    receiverTask = asyncio.create_task(receiver.run())
+    try:
+        async with asyncio.timeout(5.):
+            await sender.waitForClient()
+            while not receiver.isConnected:
+                await asyncio.sleep(0.01)
+
+        await sender.sendTransforms({'Bad': _getTransf(0), 'CoilToTracker': _getTransf(1)})
+        async with asyncio.timeout(5.):
+            while len(received) < 1:
+                await asyncio.sleep(0.01)
+        assert received == ['CoilToTracker']
+        assert receiver.isConnected
+        assert not receiverTask.done()
+    finally:
+        receiverTask.cancel()
+        await sender.stop()
+
+
+@pytest.mark.asyncio
+async def test_serverForwardsTransforms(serverPorts, startServerThread):
+    sender = SimulatedIGTLinkSender(port=0)
+    await sender.start()
+    try:
+        server = startServerThread(IGTLinkToolPositionsServer, **serverPorts, igtlPort=sender.port,
+                                   publishRateLimit=100.)
+        client = ToolPositionsClient(serverPubPort=serverPorts['pubPort'], serverCmdPort=serverPorts['cmdPort'])
+
+        async with asyncio.timeout(10.):
+            await sender.waitForClient()
+            while not client.isConnected:
+                await asyncio.sleep(0.01)
+
+        for i in range(5):
+            await sender.sendTransforms({'CoilToTracker': _getTransf(i), 'PointerToTracker': None})
+            async with asyncio.timeout(5.):
+                while 'Coil' not in client.latestPositions or \
+                        not np.allclose(client.latestPositions['Coil'].transf, _getTransf(i)):
+                    await asyncio.sleep(0.005)
+            assert client.latestPositions['Pointer'].transf is None  # identity from Plus indicates invalid
+
+        assert server.igtlReceiver.numMessagesReceived == 10
+
+        # other message types (e.g. STRING from Plus) should be ignored without interrupting transforms
+        await sender.sendMessages([pyigtl.StringMessage('Some status', device_name='Status')])
+        await sender.sendTransforms({'CoilToTracker': _getTransf(10)})
+        async with asyncio.timeout(5.):
+            while not np.allclose(client.latestPositions['Coil'].transf, _getTransf(10)):
+                await asyncio.sleep(0.005)
+        assert server.igtlReceiver.numMessagesReceived == 12
+        assert server.igtlReceiver.isConnected
+    finally:
+        await sender.stop()
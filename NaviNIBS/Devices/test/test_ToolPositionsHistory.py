@@ -0,0 +1,212 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsHistory import ToolPoseRingBuffer, interpolateTransform, interpolateTransforms
+from NaviNIBS.util.Transforms import concatenateTransforms
+
+
+def _composeTransf(rotvec: np.ndarray, translation: np.ndarray) -> np.ndarray:
+    transf = np.eye(4)
+    transf[:3, :3] = Rotation.from_rotvec(rotvec).as_matrix()
+    transf[:3, 3] = translation
+    return transf
+
+
+def _constantVelocityTrajectory(t: float) -> np.ndarray:
+    # constant angular velocity about a fixed axis, constant linear velocity
+    axis = np.asarray([1., 2., 3.]) / np.linalg.norm([1., 2., 3.])
+    return _composeTransf(axis * (0.3 + 2. * t), np.asarray([10., -5., 2.]) + np.asarray([30., 20., -10.]) * t)
+
+
+def _headMotionTrajectory(t: float) -> np.ndarray:
+    # smooth, non-constant motion similar in magnitude to fast head / coil movement
+    rotvec = np.asarray([0.2 * np.sin(2 * np.pi * 0.7 * t), 0.1 * np.cos(2 * np.pi * 1.3 * t), 0.05 * t])
+    translation = np.asarray([20 * np.sin(2 * np.pi * 0.5 * t), 10 * np.sin(2 * np.pi * 1.1 * t), 5 * t])
+    return _composeTransf(rotvec, translation)
+
+
+def _poseErrors(transfA: np.ndarray, transfB: np.ndarray) -> tuple[float, float]:
+    """
+    :return: (translation error in mm, rotation error in deg)
+    """
+    distErr = np.linalg.norm(transfA[:3, 3] - transfB[:3, 3])
+    angleErr = np.rad2deg(Rotation.from_matrix(transfA[:3, :3].T @ transfB[:3, :3]).magnitude())
+    return distErr, angleErr
+
+
+def _fillBuffer(trajectory, rate: float, duration: float, capacity: int = 4096) -> ToolPoseRingBuffer:
+    buffer = ToolPoseRingBuffer(capacity=capacity)
+    for t in np.arange(0, duration, 1 / rate):
+        buffer.append(t, trajectory(t))
+    return buffer
+
+
+def test_interpolateShortestArc():
+    transfA = _composeTransf(np.asarray([0, 0, np.deg2rad(170)]), np.zeros(3))
+    transfB = _composeTransf(np.asarray([0, 0, np.deg2rad(-170)]), np.asarray([2., 0, 0]))
+    expected = _composeTransf(np.asarray([0, 0, np.pi]), np.asarray([1., 0, 0]))
+    for transf in (interpolateTransforms(transfA[np.newaxis], transfB[np.newaxis], np.asarray([0.5]))[0],
+                   interpolateTransform(transfA, transfB, 0.5)):
+        distErr, angleErr = _poseErrors(transf, expected)
+        assert distErr < 1e-12
+        assert angleErr < 1e-6
+
+
+def test_interpolateSingleMatchesBatch():
+    rng = np.random.default_rng(2)
+    N = 200
+    transfsA = np.tile(np.eye(4), (N, 1, 1))
+    transfsB = transfsA.copy()
+    transfsA[:, :3, :3] = Rotation.random(N, random_state=rng).as_matrix()
+    transfsB[:, :3, :3] = Rotation.random(N, random_state=rng).as_matrix()
+    transfsA[:, :3, 3] = rng.normal(size=(N, 3))
+    transfsB[:, :3, 3] = rng.normal(size=(N, 3))
+    fractions = rng.uniform(size=N)
+
+    transfs = interpolateTransforms(transfsA, transfsB, fractions)
+    for i in range(N):
+        assert np.allclose(interpolateTransform(transfsA[i], transfsB[i], fractions[i]), transfs[i])
+        # compare against scipy's implementation of SLERP
+        rotA = Rotation.from_matrix(transfsA[i, :3, :3])
+        rotB = Rotation.from_matrix(transfsB[i, :3, :3])
+        expectedRot = rotA * Rotation.from_rotvec((rotA.inv() * rotB).as_rotvec() * fractions[i])
+        assert np.allclose(transfs[i, :3, :3], expectedRot.as_matrix())
+
+
+def test_constantVelocityExact():
+    rate = 60.
+    buffer = _fillBuffer(_constantVelocityTrajectory, rate=rate, duration=2.)
+    rng = np.random.default_rng(0)
+    queryTimes = rng.uniform(0, buffer.newestTime, size=200)
+
+    transfs = buffer.getTransfsAtTimes(queryTimes)
+    for t, transf in zip(queryTimes, transfs):
+        distErr, angleErr = _poseErrors(transf, _constantVelocityTrajectory(t))
+        assert distErr < 1e-9
+        assert angleErr < 1e-6
+        # single queries should match batch queries
+        assert np.allclose(buffer.getTransfAtTime(t), transf)
+
+
+@pytest.mark.parametrize('rate,maxDistErr,maxAngleErr', [
+    (60., 0.1, 0.05),
+    (250., 0.01, 0.005),
+])
+def test_headMotionAccuracy(rate, maxDistErr, maxAngleErr):
+    buffer = _fillBuffer(_headMotionTrajectory, rate=rate, duration=3.)
+    rng = np.random.default_rng(1)
+    queryTimes = rng.uniform(0, buffer.newestTime, size=500)
+
+    transfs = buffer.getTransfsAtTimes(queryTimes)
+    errs = np.asarray([_poseErrors(transf, _headMotionTrajectory(t)) for t, transf in zip(queryTimes, transfs)])
+
+    # interpolation should be much better than using the latest sample preceding each query
+    iPrevious = np.floor(queryTimes * rate + 1e-9) / rate
+    prevErrs = np.asarray([_poseErrors(_headMotionTrajectory(tPrev), _headMotionTrajectory(t))
+                           for tPrev, t in zip(iPrevious, queryTimes)])
+
+    assert errs[:, 0].max() < maxDistErr
+    assert errs[:, 1].max() < maxAngleErr
+    assert errs[:, 0].mean() < prevErrs[:, 0].mean() / 10
+
+
+def test_ringBufferWraparound():
+    buffer = ToolPoseRingBuffer(capacity=8)
+    for i in range(20):
+        buffer.append(float(i), _constantVelocityTrajectory(i))
+
+    assert len(buffer) == 8
+    assert buffer.times.tolist() == [float(i) for i in range(12, 20)]
+    assert buffer.oldestTime == 12.
+    assert buffer.newestTime == 19.
+
+    assert buffer.getTransfAtTime(11.9) is None  # before oldest
+    assert np.allclose(buffer.getTransfAtTime(12.), _constantVelocityTrajectory(12))
+    assert np.allclose(buffer.getTransfAtTime(15.5), _constantVelocityTrajectory(15.5))
+    # after newest, hold newest
+    assert np.allclose(buffer.getTransfAtTime(25.), _constantVelocityTrajectory(19))
+
+
+def test_invalidSamples():
+    buffer = ToolPoseRingBuffer(capacity=16)
+    buffer.append(0., _constantVelocityTrajectory(0))
+    buffer.append(1., _constantVelocityTrajectory(1))
+    buffer.append(2., None)
+    buffer.append(3., _constantVelocityTrajectory(3))
+
+    assert np.allclose(buffer.getTransfAtTime(0.5), _constantVelocityTrajectory(0.5))
+    assert np.allclose(buffer.getTransfAtTime(1.), _constantVelocityTrajectory(1))
+    assert buffer.getTransfAtTime(1.5) is None
+    assert buffer.getTransfAtTime(2.) is None
+    assert buffer.getTransfAtTime(2.5) is None
+    assert np.allclose(buffer.getTransfAtTime(3.5), _constantVelocityTrajectory(3))
+
+    buffer.append(4., None)
+    assert buffer.getTransfAtTime(5.) is None
+
+    transfs = buffer.getTransfsAtTimes(np.asarray([-1., 0.5, 1.5]))
+    assert np.isnan(transfs[0]).all()
+    assert np.allclose(transfs[1], _constantVelocityTrajectory(0.5))
+    assert np.isnan(transfs[2]).all()
+
+
+def test_repeatedAndOutOfOrderSamples():
+    buffer = ToolPoseRingBuffer(capacity=16)
+    assert buffer.append(0., _constantVelocityTrajectory(0))
+    assert buffer.append(1., _constantVelocityTrajectory(1))
+    # same position republished (e.g. in a keyframe) is not duplicated
+    assert not buffer.append(1., _constantVelocityTrajectory(1))
+    assert len(buffer) == 2
+    # different position at same time replaces newest
+    assert buffer.append(1., _constantVelocityTrajectory(2))
+    assert len(buffer) == 2
+    assert np.allclose(buffer.getTransfAtTime(1.), _constantVelocityTrajectory(2))
+    # older samples are ignored
+    assert not buffer.append(0.5, _constantVelocityTrajectory(5))
+    assert buffer.times.tolist() == [0., 1.]
+
+
+def test_clientGetTransfAtTime():
+    client = SimulatedToolPositionsClient(positionsHistoryCapacity=64)
+    subjectToWorld = _composeTransf(np.asarray([0., 0.1, 0.]), np.asarray([100., 0., 0.]))
+    for i in range(10):
+        t = 1000. + i * 0.1
+        client.recordNewPosition_sync('Subject', TimestampedToolPosition(time=t, transf=subjectToWorld))
+        client.recordNewPosition_sync('Coil', TimestampedToolPosition(
+            time=t, transf=_constantVelocityTrajectory(i * 0.1), relativeTo='Subject'))
+
+    t = 1000.35
+    assert np.allclose(client.getTransfAtTime('Coil', t),
+                       concatenateTransforms((_constantVelocityTrajectory(0.35), subjectToWorld)))
+    assert np.allclose(client.getTransfAtTime('Coil', 2000.), client.getLatestTransf('Coil'))
+
+    with pytest.raises(KeyError):
+        client.getTransfAtTime('Coil', 999.)
+    assert client.getTransfAtTime('Coil', 999., None) is None
+    assert client.getTransfAtTime('Pointer', t, None) is None
+
+
+def test_clientGetTransfAtTimeMissingRelativeTo():
+    client = SimulatedToolPositionsClient(positionsHistoryCapacity=64)
+    for i in range(10):
+        t = 1000. + i * 0.1
+        client.recordNewPosition_sync('Coil', TimestampedToolPosition(
+            time=t, transf=_constantVelocityTrajectory(i * 0.1), relativeTo='Subject'))
+    # subject only tracked for later part of coil history
+    for i in range(5, 10):
+        client.recordNewPosition_sync('Subject', TimestampedToolPosition(time=1000. + i * 0.1, transf=np.eye(4)))
+
+    assert np.allclose(client.getTransfAtTime('Coil', 1000.75), _constantVelocityTrajectory(0.75))
+    with pytest.raises(KeyError):
+        client.getTransfAtTime('Coil', 1000.15)
+    assert client.getTransfAtTime('Coil', 1000.15, None) is None
+
+    # relative to a tool that was never tracked
+    client.recordNewPosition_sync('Pointer', TimestampedToolPosition(time=1000., transf=np.eye(4),
+                                                                     relativeTo='Untracked'))
+    with pytest.raises(KeyError):
+        client.getTransfAtTime('Pointer', 1000.)
+    assert client.getTransfAtTime('Pointer', 1000., None) is None
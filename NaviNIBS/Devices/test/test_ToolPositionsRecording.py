@@ -0,0 +1,256 @@
+import asyncio
+import time
+import types
+import typing as tp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices import ToolPositionsRecording as ToolPositionsRecordingModule
+from NaviNIBS.Devices.ReplayToolPositionsClient import ReplayToolPositionsClient
+from NaviNIBS.Devices.ReplayToolPositionsServer import ReplayToolPositionsServer
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsRecording import ToolPositionsRecorder, ToolPositionsRecording, \
+    RecordedPositions, RecordedTrigger, RecordingFormatError
+from NaviNIBS.Navigator.Model.Triggering import TriggerEvent, TriggerSource
+from NaviNIBS.util.ZMQConnector import ZMQConnectorClient
+
+
+def _getTransf(iTool: int, iFrame: int) -> np.ndarray:
+    transf = np.eye(4)
+    transf[:3, 3] = (iTool, iFrame * 0.1, np.sin(iFrame / 10))
+    return transf
+
+
+def _getFramePositions(iFrame: int, t: float) -> dict[str, TimestampedToolPosition | None]:
+    return dict(
+        Coil=TimestampedToolPosition(time=t, transf=_getTransf(0, iFrame)),
+        Subject=TimestampedToolPosition(time=t, transf=_getTransf(1, iFrame) if iFrame % 7 != 3 else None),
+        Pointer=TimestampedToolPosition(time=t, transf=_getTransf(2, iFrame), relativeTo='Subject')
+        if iFrame % 2 == 0 else None,
+    )
+
+
+def _writeSyntheticRecording(filepath, numFrames: int = 40, rate: float = 100.,
+                             iTriggerFrames: tuple[int, ...] = (10, 25)) -> list[tuple[float, tp.Any]]:
+    """
+    Write a recording with exactly spaced receive times, returning the (receiveTime, positions or trigger event)
+    that were recorded.
+    """
+    recorder = ToolPositionsRecorder(filepath=str(filepath))
+    recorded = []
+    with recorder:
+        t0 = time.time()
+        for iFrame in range(numFrames):
+            t = t0 + (iFrame + 1) / rate
+            positions = _getFramePositions(iFrame, t - 0.002)
+            recorder.recordPositions(positions, receiveTime=t)
+            recorded.append((t, positions))
+            if iFrame in iTriggerFrames:
+                event = TriggerEvent(type='sample', time=pd.Timestamp.fromtimestamp(t - 0.001),
+                                     metadata=dict(epochID=iFrame))
+                recorder.recordTrigger(event, receiveTime=t)
+                recorded.append((t, event))
+    return recorded
+
+
+def _assertPositionsEqual(positionsA: dict[str, TimestampedToolPosition | None],
+                          positionsB: dict[str, TimestampedToolPosition | None]):
+    assert list(positionsA.keys()) == list(positionsB.keys())
+    for key, posA in positionsA.items():
+        posB = positionsB[key]
+        if posA is None or posB is None:
+            assert posA is posB is None
+            continue
+        assert posA.time == posB.time
+        assert posA.relativeTo == posB.relativeTo
+        if posA.transf is None or posB.transf is None:
+            assert posA.transf is posB.transf is None
+        else:
+            assert np.array_equal(posA.transf, posB.transf)
+
+
+class _FakeClock:
+    """
+    Stand-in for the `time` module (and `asyncio.sleep`) that only advances when slept, to check scheduling
+    deterministically.
+    """
+    def __init__(self, startTime: float = 1.7e9):
+        self._elapsed = 0.
+        self._startTime = startTime
+
+    def time(self) -> float:
+        return self._startTime + self._elapsed
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    async def sleep(self, delay: float):
+        self._elapsed += max(0., delay)
+        await asyncio.sleep(0)
+
+
+def test_recordFromClient(tmp_path):
+    filepath = tmp_path / 'recording.nntr'
+    client = SimulatedToolPositionsClient()
+    client.recordNewPosition_sync('Coil', TimestampedToolPosition(time=1., transf=_getTransf(0, 0)))
+
+    triggerSource = TriggerSource(key='test')
+    recorder = ToolPositionsRecorder(filepath=str(filepath), positionsClient=client)
+    recorder.connectToTriggerSource(triggerSource)
+    with recorder:
+        for iFrame in range(1, 5):
+            for key, pos in _getFramePositions(iFrame, float(iFrame + 1)).items():
+                client.recordNewPosition_sync(key, pos)
+        triggerSource.trigger(TriggerEvent(type='sample', metadata=dict(epochID=7)))
+    # not recorded after stopping
+    client.recordNewPosition_sync('Coil', TimestampedToolPosition(time=10., transf=None))
+    triggerSource.trigger(TriggerEvent(type='sample'))
+
+    recording = ToolPositionsRecording.load(filepath)
+    assert recorder.numRecords == len(recording.records) == 1 + 4 * 3 + 1
+    # first record has positions known when recording started
+    _assertPositionsEqual(recording.records[0].positions, dict(
+        Coil=TimestampedToolPosition(time=1., transf=_getTransf(0, 0))))
+    assert all(len(record.positions) == 1 for record in recording.records[1:-1])
+
+    trigger = recording.records[-1]
+    assert isinstance(trigger, RecordedTrigger)
+    assert trigger.event.metadata == dict(epochID=7, source='TriggerSource')
+
+    _assertPositionsEqual(recording.getFinalPositions(), _getFramePositions(4, 5.))
+
+
+def test_roundTrip(tmp_path):
+    filepath = tmp_path / 'recording.nntr'
+    recorded = _writeSyntheticRecording(filepath)
+
+    recording = ToolPositionsRecording.load(filepath)
+    assert len(recording.records) == len(recorded)
+    for record, (receiveTime, expected) in zip(recording.records, recorded):
+        assert record.receiveTime == receiveTime
+        if isinstance(expected, TriggerEvent):
+            assert isinstance(record, RecordedTrigger)
+            assert record.event.type == expected.type
+            assert abs((record.event.time - expected.time).total_seconds()) < 1e-5
+            assert record.event.metadata == expected.metadata
+        else:
+            assert isinstance(record, RecordedPositions)
+            _assertPositionsEqual(record.positions, expected)
+    assert len(recording.triggers) == 2
+    assert recording.duration == pytest.approx(0.4, abs=0.05)
+
+
+def test_loadTruncatedAndInvalid(tmp_path):
+    filepath = tmp_path / 'recording.nntr'
+    recorded = _writeSyntheticRecording(filepath, iTriggerFrames=())
+    buf = filepath.read_bytes()
+
+    # e.g. after a crash while recording
+    truncatedPath = tmp_path / 'truncated.nntr'
+    truncatedPath.write_bytes(buf[:-10])
+    recording = ToolPositionsRecording.load(truncatedPath)
+    assert len(recording.records) == len(recorded) - 1
+
+    invalidPath = tmp_path / 'invalid.nntr'
+    invalidPath.write_bytes(b'XXXX' + buf[4:])
+    with pytest.raises(RecordingFormatError):
+        ToolPositionsRecording.load(invalidPath)
+
+
+@pytest.mark.asyncio
+async def test_replayClientMaxSpeed(tmp_path):
+    filepath = tmp_path / 'recording.nntr'
+    recorded = _writeSyntheticRecording(filepath)
+
+    # replay twice to check that replay is deterministic
+    replayed = [[], []]
+    for iReplay in range(2):
+        client = ReplayToolPositionsClient(recordingPath=str(filepath), speed=None)
+        client.sigPositionsReceived.connect(lambda positions: replayed[iReplay].append(positions))
+        client.sigTriggered.connect(lambda event: replayed[iReplay].append(event))
+        async with asyncio.timeout(5.):
+            await client.waitForReplayToFinish()
+        assert client.replayer.isFinished
+
+    assert len(replayed[0]) == len(replayed[1]) == len(recorded)
+    for replayedA, replayedB, (_, expected) in zip(*replayed, recorded):
+        if isinstance(expected, TriggerEvent):
+            assert replayedA.time == replayedB.time
+            assert abs((replayedA.time - expected.time).total_seconds()) < 1e-5
+        else:
+            _assertPositionsEqual(replayedA, expected)
+            _assertPositionsEqual(replayedB, expected)
+
+    _assertPositionsEqual(client.latestPositions, client.recording.getFinalPositions())
+
+    # positions history should have exact recorded poses
+    t, positions = recorded[5]
+    assert np.array_equal(client.getTransfAtTime('Coil', positions['Coil'].time), positions['Coil'].transf)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('speed', [1., 4.])
+async def test_replayClientSpeed(tmp_path, monkeypatch, speed):
+    filepath = tmp_path / 'recording.nntr'
+    recorded = _writeSyntheticRecording(filepath, numFrames=40, rate=100.)
+    recording = ToolPositionsRecording.load(filepath)
+
+    # replace the replayer's clock, so that the replay schedule can be checked exactly without depending on timing
+    clock = _FakeClock()
+    monkeypatch.setattr(ToolPositionsRecordingModule, 'time', clock)
+    monkeypatch.setattr(ToolPositionsRecordingModule, 'asyncio', types.SimpleNamespace(sleep=clock.sleep))
+
+    receiveTimes = []
+    client = ReplayToolPositionsClient(recordingPath=str(filepath), speed=speed, shiftTimestamps=True,
+                                       autostart=False)
+    client.sigPositionsReceived.connect(lambda positions: receiveTimes.append(clock.monotonic()))
+    replayStartMonotonic = clock.monotonic()
+    replayStart = clock.time()
+    client.startReplay()
+    async with asyncio.timeout(5.):
+        await client.waitForReplayToFinish()
+
+    # positions should be replayed at their recorded receive times, scaled by speed
+    expectedReceiveTimes = [replayStartMonotonic + (record.receiveTime - recording.startTime) / speed
+                            for record in recording.records if isinstance(record, RecordedPositions)]
+    assert receiveTimes == pytest.approx(expectedReceiveTimes)
+    assert receiveTimes[-1] - replayStartMonotonic == pytest.approx(recording.duration / speed)
+
+    # shifted timestamps should be relative to the replay start, scaled by speed
+    recordedTime = recorded[-1][1]['Coil'].time
+    expectedTime = replayStart + (recordedTime - recording.startTime) / speed
+    assert client.latestPositions['Coil'].time == pytest.approx(expectedTime)
+
+
+@pytest.mark.asyncio
+async def test_replayServer(tmp_path, serverPorts, startServerThread):
+    filepath = tmp_path / 'recording.nntr'
+    _writeSyntheticRecording(filepath)
+    recording = ToolPositionsRecording.load(filepath)
+
+    startServerThread(ReplayToolPositionsServer, **serverPorts, recordingPath=str(filepath), speed=2.,
+                      autostart=False, publishRateLimit=200.)
+    client = ToolPositionsClient(serverPubPort=serverPorts['pubPort'], serverCmdPort=serverPorts['cmdPort'])
+    async with asyncio.timeout(10.):
+        while not client.isConnected:
+            await asyncio.sleep(0.01)
+
+    connector = ZMQConnectorClient(reqRepPort=serverPorts['cmdPort'], connAddr='127.0.0.1')
+    assert connector.get('type') == 'Replay'
+    connector.call('startReplay')
+
+    async with asyncio.timeout(10.):
+        while not connector.call('getReplayProgress')['isFinished']:
+            await asyncio.sleep(0.05)
+        finalPositions = recording.getFinalPositions()
+        while client.latestPositions.keys() != finalPositions.keys():
+            await asyncio.sleep(0.01)
+        # exact recorded timestamps should be published
+        while client.latestPositions['Coil'].time != finalPositions['Coil'].time:
+            await asyncio.sleep(0.01)
+
+    _assertPositionsEqual(client.latestPositions, finalPositions)
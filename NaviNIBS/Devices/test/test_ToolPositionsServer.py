@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import attrs
+import numpy as np
+import pytest
+import zmq
+import zmq.asyncio as azmq
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsServer import ToolPositionsServer
+from NaviNIBS.Devices.ToolPositionsWireFormat import decodeToolPositions, wireFormatBinary
+
+
+@attrs.define
+class _SimulatedTrackerServer(ToolPositionsServer):
+    """
+    Records positions at a fixed tracker rate (similar to positions recorded by SimulatedToolPositionsClient, but at
+    the tracker's native rate), with some tools static and others moving. Starts once binary publishing is requested.
+    """
+    _trackerRate: float = 400.
+    _numTrackerSamples: int | None = None  # if None, run until stopped
+    _numStaticTools: int = 2
+    _numMovingTools: int = 1
+
+    _finalPositions: dict[str, TimestampedToolPosition] | None = attrs.field(init=False, default=None)
+
+    @staticmethod
+    def getTransf(iTool: int, iSample: int) -> np.ndarray:
+        transf = np.eye(4)
+        transf[:3, 3] = (iTool, iSample * 0.1, np.sin(iSample / 10))
+        return transf
+
+    async def run(self):
+        while not self._doPublishBinary:
+            await asyncio.sleep(0.01)
+
+        t0 = time.monotonic()
+        iSample = 0
+        while self._numTrackerSamples is None or iSample < self._numTrackerSamples:
+            await asyncio.sleep(max(0., t0 + iSample / self._trackerRate - time.monotonic()))
+            async with self._publishingLatestLock:
+                for iTool in range(self._numStaticTools):
+                    await self.recordNewPosition(f'Static{iTool}', TimestampedToolPosition(
+                        time=time.time(), transf=self.getTransf(iTool, 0)))
+                for iTool in range(self._numMovingTools):
+                    await self.recordNewPosition(f'Moving{iTool}', TimestampedToolPosition(
+                        time=time.time(), transf=self.getTransf(iTool, iSample)))
+            iSample += 1
+        self._finalPositions = dict(self._latestPositions)
+
+
+@attrs.define
+class _KeyframeFloodServer(ToolPositionsServer):
+    """
+    Records positions for many tools once, then publishes keyframes as fast as the publish rate limit allows, to fill
+    the queues of any subscribers that aren't reading. Starts once binary publishing is requested.
+    """
+    _numTools: int = 100
+    _numKeyframesToPublish: int = 1000
+
+    async def run(self):
+        while not self._doPublishBinary:
+            await asyncio.sleep(0.01)
+
+        for iTool in range(self._numTools):
+            await self.recordNewPosition(f'Tool{iTool}', TimestampedToolPosition(
+                time=time.time(), transf=_SimulatedTrackerServer.getTransf(iTool, 0)))
+        while self._publishStats['numKeyframes'] < self._numKeyframesToPublish:
+            self.publishLatestPositions()
+            await asyncio.sleep(0.)
+
+
+def _connectSubSocket(port: int, rcvHWM: int = 1000) -> azmq.Socket:
+    sock = azmq.Context.instance().socket(zmq.SUB)
+    sock.setsockopt(zmq.RCVHWM, rcvHWM)
+    sock.connect(f'tcp://127.0.0.1:{port}')
+    sock.setsockopt(zmq.SUBSCRIBE, b'')
+    return sock
+
+
+@pytest.mark.asyncio
+async def test_highRatePublishing(serverPorts, startServerThread):
+    publishRate = 200.
+    keyframeInterval = 0.25
+    server = startServerThread(_SimulatedTrackerServer, **serverPorts, publishRateLimit=publishRate,
+                               keyframeInterval=keyframeInterval, trackerRate=400., numTrackerSamples=800)
+
+    rawSubSocket = _connectSubSocket(serverPorts['binaryPubPort'])
+    await asyncio.sleep(0.1)
+    client = ToolPositionsClient(serverPubPort=serverPorts['pubPort'], serverCmdPort=serverPorts['cmdPort'])
+
+    msgs = []
+    async with asyncio.timeout(20.):
+        while server._finalPositions is None or await rawSubSocket.poll(200) != 0:
+            if await rawSubSocket.poll(100) != 0:
+                msgs.append(decodeToolPositions(await rawSubSocket.recv()))
+    rawSubSocket.close(linger=0)
+    assert client.wireFormat == wireFormatBinary
+
+    # check message contents
+    assert len(msgs) > 10
+    assert [msg.seq for msg in msgs] == list(range(msgs[0].seq, msgs[0].seq + len(msgs)))
+    allKeys = ['Static0', 'Static1', 'Moving0']
+    keyframes = [msg for msg in msgs if not msg.isDelta]
+    deltas = [msg for msg in msgs if msg.isDelta]
+    for msg in keyframes:
+        assert msg.keys in ([], allKeys)  # may be empty if requested by client before tracking started
+    # first message after tracking starts should include all new tools, later deltas only the moving tool
+    firstWithTools = next(msg for msg in msgs if msg.numTools > 0)
+    assert firstWithTools.keys == allKeys
+    for msg in deltas:
+        if msg is not firstWithTools:
+            assert msg.keys == ['Moving0']
+
+    # check rate limit (not a lower bound on achieved rate, which depends on machine load)
+    duration = msgs[-1].publishTime - msgs[0].publishTime
+    achievedRate = (len(msgs) - 1) / duration
+    assert achievedRate <= publishRate * 1.1
+    assert len(keyframes) <= duration / keyframeInterval + 2
+
+    # check client converged on final positions
+    final = server._finalPositions
+    async with asyncio.timeout(5.):
+        while not all(key in client.latestPositions and
+                      np.array_equal(client.latestPositions[key].transf, final[key].transf) for key in allKeys):
+            await asyncio.sleep(0.01)
+
+    stats = server.publishStats
+    assert stats['numDeltas'] > stats['numKeyframes']
+
+
+@pytest.mark.asyncio
+async def test_stalledSubscriberDoesNotBlockOthers(serverPorts, startServerThread):
+    numKeyframes = 1000
+    server = startServerThread(_KeyframeFloodServer, **serverPorts, publishRateLimit=1000., binarySendHighWaterMark=2,
+                               numKeyframesToPublish=numKeyframes)
+
+    # subscriber that never reads, with small buffers so that its queue fills quickly
+    stalledSubSocket = azmq.Context.instance().socket(zmq.SUB)
+    stalledSubSocket.setsockopt(zmq.RCVHWM, 2)
+    stalledSubSocket.setsockopt(zmq.RCVBUF, 4096)
+    stalledSubSocket.connect(f'tcp://127.0.0.1:{serverPorts["binaryPubPort"]}')
+    stalledSubSocket.setsockopt(zmq.SUBSCRIBE, b'')
+    readerSubSocket = _connectSubSocket(serverPorts['binaryPubPort'])
+    await asyncio.sleep(0.1)
+    server.negotiateWireFormat([wireFormatBinary])
+
+    seqs = []
+    async with asyncio.timeout(30.):
+        while await readerSubSocket.poll(1000) != 0:
+            seqs.append(decodeToolPositions(await readerSubSocket.recv()).seq)
+    stalledSubSocket.close(linger=0)
+    readerSubSocket.close(linger=0)
+
+    # publishing should continue, and subscriber that keeps reading should keep receiving, despite stalled subscriber
+    assert server.publishStats['numKeyframes'] >= numKeyframes
+    assert seqs == sorted(seqs)
+    assert len(seqs) > numKeyframes * 0.9
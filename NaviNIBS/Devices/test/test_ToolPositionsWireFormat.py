@@ -0,0 +1,157 @@
+import asyncio
+import struct
+
+import numpy as np
+import pytest
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsWireFormat import encodeToolPositions, decodeToolPositions, WireFormatError, \
+    wireFormatBinary, wireFormatJSON
+from NaviNIBS.util.Transforms import concatenateTransforms
+
+
+def _randomTransf(rng: np.random.Generator) -> np.ndarray:
+    transf = np.eye(4)
+    q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    transf[:3, :3] = q
+    transf[:3, 3] = rng.normal(scale=50, size=3)
+    return transf
+
+
+def _makePositions() -> dict[str, TimestampedToolPosition | None]:
+    rng = np.random.default_rng(0)
+    return dict(
+        Subject=TimestampedToolPosition(time=1.5, transf=_randomTransf(rng)),
+        Pointer=TimestampedToolPosition(time=2.5, transf=_randomTransf(rng), relativeTo='Subject'),
+        Coil=TimestampedToolPosition(time=3.5, transf=None),
+        Untracked=None,
+        Électrode=TimestampedToolPosition(time=4.5, transf=_randomTransf(rng), relativeTo='ExternalReference'),
+    )
+
+
+def _assertPositionsEqual(a: dict[str, TimestampedToolPosition | None],
+                          b: dict[str, TimestampedToolPosition | None]):
+    assert list(a.keys()) == list(b.keys())
+    for key, posA in a.items():
+        posB = b[key]
+        if posA is None:
+            assert posB is None
+            continue
+        assert posA.time == posB.time
+        assert posA.relativeTo == posB.relativeTo
+        if posA.transf is None:
+            assert posB.transf is None
+        else:
+            assert np.array_equal(posA.transf, posB.transf)
+
+
+def test_roundTrip():
+    positions = _makePositions()
+    msg = encodeToolPositions(positions, seq=7, publishTime=123.25)
+    decoded = decodeToolPositions(msg)
+    assert decoded.seq == 7
+    assert decoded.publishTime == 123.25
+    assert decoded.numTools == len(positions)
+    assert decoded.transfs.shape == (len(positions), 4, 4)
+    assert decoded.hasPosition.tolist() == [True, True, True, False, True]
+    assert decoded.hasTransf.tolist() == [True, True, False, False, True]
+    _assertPositionsEqual(decoded.toTimestampedToolPositions(), positions)
+
+    # decoded arrays are independent of the message buffer by default
+    decoded.transfs[0, 0, 0] = 100.
+    assert decodeToolPositions(msg).transfs[0, 0, 0] != 100.
+
+    view = decodeToolPositions(msg, copy=False)
+    assert not view.transfs.flags.writeable
+
+
+def test_roundTripEmpty():
+    decoded = decodeToolPositions(encodeToolPositions({}))
+    assert decoded.numTools == 0
+    assert decoded.toTimestampedToolPositions() == {}
+
+
+def test_decodeInvalid():
+    msg = encodeToolPositions(_makePositions())
+    with pytest.raises(WireFormatError):
+        decodeToolPositions(b'XXXX' + msg[4:])
+    with pytest.raises(WireFormatError):
+        decodeToolPositions(msg[:4] + struct.pack('<H', 2) + msg[6:])
+    for length in (0, 10, len(msg) - 1):
+        with pytest.raises(WireFormatError):
+            decodeToolPositions(msg[:length])
+
+
+async def _waitFor(condition, timeout: float = 10.):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('preferredWireFormats,expectedWireFormat', [
+    ((wireFormatBinary, wireFormatJSON), wireFormatBinary),
+    ((wireFormatJSON,), wireFormatJSON),
+    (('unsupported-format',), wireFormatJSON),  # negotiation fails, so should fall back to JSON
+])
+async def test_serverClientLoopback(serverPorts, startServerThread, preferredWireFormats, expectedWireFormat):
+    startServerThread(**serverPorts)
+    client = ToolPositionsClient(serverPubPort=serverPorts['pubPort'], serverCmdPort=serverPorts['cmdPort'],
+                                 preferredWireFormats=preferredWireFormats)
+
+    await _waitFor(lambda: client.isConnected)
+    await _waitFor(lambda: client.wireFormat == expectedWireFormat)
+
+    # binary deltas only include tools whose transforms changed, so move every tool
+    positions = {key: pos for key, pos in _makePositions().items() if pos is not None and pos.transf is not None}
+    for iUpdate in range(3):
+        for key, pos in positions.items():
+            pos.time += 1
+            pos.transf[:3, 3] += 1
+            await client.recordNewPosition_async(key, pos)
+        await _waitFor(lambda: len(client.latestPositions) == len(positions) and all(
+            client.latestPositions[key].time == pos.time for key, pos in positions.items()))
+        _assertPositionsEqual(client.latestPositions, positions)
+
+    assert np.allclose(client.getLatestTransf('Pointer'),
+                       concatenateTransforms((positions['Pointer'].transf, positions['Subject'].transf)))
+
+
+@pytest.mark.asyncio
+async def test_negotiationTimeout(serverPorts, startServerThread):
+    startServerThread(**serverPorts)
+    # timeout (and therefore ping and negotiation timeouts of half this) with plenty of margin for a local server
+    serverStatusTimeout = 4.
+    client = ToolPositionsClient(serverPubPort=serverPorts['pubPort'], serverCmdPort=serverPorts['cmdPort'],
+                                 preferredWireFormats=(wireFormatBinary, wireFormatJSON),
+                                 serverStatusTimeout=serverStatusTimeout)
+
+    # connect normally first, so that server startup doesn't race with the simulated outage below
+    await _waitFor(lambda: client.isConnected and client.wireFormat == wireFormatBinary, timeout=20.)
+
+    # simulate server going away between a successful ping and negotiation; with no positions published, the
+    #  monitor pings and renegotiates once it hasn't heard from the server for half the status timeout
+    callAsync = client._connector.call_async
+    serverIsResponsive = asyncio.Event()
+    numStalledCalls = 0
+
+    async def unresponsiveCallAsync(method: str, *args, **kwargs):
+        nonlocal numStalledCalls
+        if method == 'negotiateWireFormat':
+            numStalledCalls += 1
+            await serverIsResponsive.wait()
+        return await callAsync(method, *args, **kwargs)
+
+    client._connector.call_async = unresponsiveCallAsync
+    connectedStates = []
+    client.sigIsConnectedChanged.connect(lambda: connectedStates.append(client.isConnected))
+
+    await _waitFor(lambda: connectedStates[:1] == [False], timeout=4 * serverStatusTimeout)
+    assert numStalledCalls >= 1
+    await _waitFor(lambda: client.wireFormat == wireFormatJSON)
+
+    # monitor should keep retrying, and negotiate once server responds again
+    serverIsResponsive.set()
+    await _waitFor(lambda: client.isConnected and client.wireFormat == wireFormatBinary,
+                   timeout=4 * serverStatusTimeout)
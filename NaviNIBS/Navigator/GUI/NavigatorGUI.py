@@ -18,6 +18,7 @@ from NaviNIBS.util.Asyncio import asyncCreateTask
 from NaviNIBS.util.GUI.QAppWithAsyncioLoop import RunnableAsApp
 from NaviNIBS.util.GUI.Dock import DockArea
 from NaviNIBS.util.GUI.ErrorDialog import asyncTryAndRaiseDialogOnError
+from NaviNIBS.util.LatencyTracing import getLatencyTracer
 from NaviNIBS.util.logging import getLogFilepath, createLogFileHandler
 from NaviNIBS.Navigator.Model.Session import Session
 from NaviNIBS.Navigator.Model.DockWidgetLayouts import DockWidgetLayout
@@ -49,6 +50,11 @@ class NavigatorGUI(RunnableAsApp):
     _sesFilepath: tp.Optional[str] = None  # only used to load session on startup
     _inProgressBaseDir: tp.Optional[str] = None
     _offerAutosaveRestore: bool = True
+    _latencyTraceFilepath: tp.Optional[str] = None
+    """
+    If set, enable tracking-to-redraw latency tracing, and save latency statistics to this path on exit or when
+    the dump shortcut (Ctrl+Shift+L) is pressed.
+    """
 
     _session: tp.Optional[Session] = None
 
@@ -63,6 +69,7 @@ class NavigatorGUI(RunnableAsApp):
     """
 
     _restoringLayoutLock: asyncio.Lock = attrs.field(init=False, factory=asyncio.Lock)
+    _dumpLatencyTracesShortcut: QtWidgets.QShortcut | None = attrs.field(init=False, default=None)
 
     def __attrs_post_init__(self):
         logger.info('Initializing {}'.format(self.__class__.__name__))
@@ -128,6 +135,12 @@ class NavigatorGUI(RunnableAsApp):
         self._activateView('Manage session')
         #self._activateView('Navigate')  # TODO: debug, delete
 
+        if self._latencyTraceFilepath is not None:
+            getLatencyTracer().isEnabled = True
+            self._dumpLatencyTracesShortcut = QtWidgets.QShortcut(QtGui.QKeySequence('Ctrl+Shift+L'), self._win, None,
+                                                                  None, QtCore.Qt.ApplicationShortcut)
+            self._dumpLatencyTracesShortcut.activated.connect(self.dumpLatencyTraces)
+
         if self._sesFilepath is not None:
             asyncio.create_task(asyncTryAndRaiseDialogOnError(
                 self._loadAfterSetup, filepath=self._sesFilepath),
@@ -264,8 +277,19 @@ class NavigatorGUI(RunnableAsApp):
                 # restore root layout again
                 await self._restoreRootLayout(needsLock=False)
 
+    def dumpLatencyTraces(self, filepath: str | None = None):
+        if filepath is None:
+            filepath = self._latencyTraceFilepath
+        tracer = getLatencyTracer()
+        logger.info(f'Tracking latency since tracker sample:\n{tracer.formatStats()}')
+        tracer.dumpToFile(filepath)
+
     def _onAppAboutToQuit(self):
         logger.info(f'App about to quit for {self.__class__.__name__}')
+        if self._latencyTraceFilepath is not None:
+            self.dumpLatencyTraces()
+        if self._session is not None:
+            self._session.close()
         super()._onAppAboutToQuit()
 
         # close each non-visible panel first to prevent them from initializing right before closing
@@ -415,6 +439,7 @@ class NavigatorGUI(RunnableAsApp):
 
     def _onSessionClosed(self, prevSession: Session):
         logger.info('Closed session {}'.format(prevSession.filepath))
+        prevSession.close()
         self._session = None
         for pane in self._mainViewPanels.values():
             pane.session = None
@@ -521,6 +546,8 @@ def main():
     parser.add_argument('--createShortcut', action='store_true', help='Create a desktop shortcut to NaviNIBS Navigator GUI and exit')
     parser.add_argument('--noAutosaveRestore', action='store_false', dest='offerAutosaveRestore',
                         help='Disable offer to restore from autosave on session load')
+    parser.add_argument('--latencyTraceFile', type=str, default=None, dest='latencyTraceFilepath',
+                        help='Enable tracking latency tracing, saving statistics to this JSON file on exit or on Ctrl+Shift+L')
     args = parser.parse_args()
 
     if args.createShortcut:
@@ -531,7 +558,8 @@ def main():
 
         return
 
-    kwargs = dict(offerAutosaveRestore=args.offerAutosaveRestore)
+    kwargs = dict(offerAutosaveRestore=args.offerAutosaveRestore,
+                  latencyTraceFilepath=args.latencyTraceFilepath)
 
     if args.sesFilepath is None:
         if False:  # TODO: debug, delete or set to False
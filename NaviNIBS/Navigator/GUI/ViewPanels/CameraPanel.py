@@ -13,6 +13,7 @@ import typing as tp
 from NaviNIBS.Devices.ToolPositionsServer import ToolPositionsServer
 from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient
 from NaviNIBS.Devices.IGTLinkToolPositionsServer import IGTLinkToolPositionsServer
+from NaviNIBS.Devices.ReplayToolPositionsServer import ReplayToolPositionsServer
 from NaviNIBS.Navigator.Model.Session import Session, SubjectTracker
 from NaviNIBS.Navigator.GUI import headMeshDefaultKwargs, toolMeshDefaultKwargs
 from NaviNIBS.Navigator.GUI.ViewPanels.MainViewPanelWithDockWidgets import MainViewPanelWithDockWidgets
@@ -337,7 +338,7 @@ class CameraPanel(MainViewPanelWithDockWidgets):
         container.layout().addWidget(subContainer)
 
         self._serverTypeComboBox = QtWidgets.QComboBox()
-        self._serverTypeComboBox.addItems(['IGTLink', 'Generic'])
+        self._serverTypeComboBox.addItems(['IGTLink', 'Generic', 'Replay'])
         formLayout.addRow('Server type', self._serverTypeComboBox)
 
         self._serverAddressEdit = QtWidgets.QLineEdit()
@@ -421,6 +422,9 @@ class CameraPanel(MainViewPanelWithDockWidgets):
                 Server = IGTLinkToolPositionsServer
             case 'Generic':
                 Server = ToolPositionsServer
+            case 'Replay':
+                # recording to replay should be specified in initKwargs (e.g. `{'recordingPath': '...'}`)
+                Server = ReplayToolPositionsServer
             case _:
                 raise NotImplementedError(f'Unexpected positionsServerInfo type: {self.session.tools.positionsServerInfo.type}')
 
@@ -22,7 +22,7 @@ from NaviNIBS.Navigator.Model.Tools import CalibrationPlate, Pointer
 from NaviNIBS.Navigator.Model.Triggering import TriggerReceiver, TriggerEvent
 from NaviNIBS.Navigator.Model.Samples import Sample
 from NaviNIBS.util.Asyncio import asyncCreateTask
-from NaviNIBS.util.CoilOrientations import PoseMetricCalculator
+from NaviNIBS.util.CoilOrientations import PoseMetricCalculator, BatchPoseMetricCalculator
 from NaviNIBS.util.GUI.Dock import Dock
 from NaviNIBS.util.GUI.Icons import getIcon
 from NaviNIBS.util.GUI.QScrollContainer import QScrollContainer
@@ -124,7 +124,9 @@ class BackgroundSamplePoseMetadataSetter:
     _session: Session | None = attrs.field(init=False, default=None, repr=False)
     _pendingSampleKeys: list[str] = attrs.field(init=False, factory=list)
     _needsUpdateEvent: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
-    _calculator: PoseMetricCalculator | None = attrs.field(init=False, default=None)
+    _maxSamplesPerUpdate: int = 100
+    _calculator: BatchPoseMetricCalculator | None = attrs.field(init=False, default=None)
+    _metricLabels: list[str] = attrs.field(init=False, factory=list)
 
     def __attrs_post_init__(self):
         asyncCreateTask(self._loop_keepUpdated)
@@ -139,30 +141,31 @@ class BackgroundSamplePoseMetadataSetter:
             if len(self._pendingSampleKeys) == 0:
                 continue
 
-            sampleKey = self._pendingSampleKeys.pop(0)
+            sampleKeys = self._pendingSampleKeys[:self._maxSamplesPerUpdate]
+            del self._pendingSampleKeys[:len(sampleKeys)]
 
             if len(self._pendingSampleKeys) > 0:
                 self._needsUpdateEvent.set()
 
-            if sampleKey not in self.session.samples:
-                # sample was presumably deleted while pending
+            # ignore samples that were presumably deleted while pending
+            samples = [self.session.samples[sampleKey] for sampleKey in sampleKeys if sampleKey in self.session.samples]
+            if len(samples) == 0:
                 continue
 
-            sample = self.session.samples[sampleKey]
-
             if self._calculator is None:
-                self._calculator = PoseMetricCalculator(
-                    session=self.session,
-                    sample=sample
-                )
-            else:
-                self._calculator.sample = sample
+                self._calculator = BatchPoseMetricCalculator(session=self.session)
+                self._metricLabels = [metric.label for metric in
+                                      PoseMetricCalculator(session=self.session, sample=None).supportedMetrics
+                                      if metric.doShowByDefault]
+
+            metricValues = self._calculator.calculateForSamples(samples, labels=self._metricLabels)
+
+            for iSample, sample in enumerate(samples):
+                with sample.changingMetadata():
+                    for label, values in metricValues.items():
+                        sample.metadata[label] = values[iSample].item()
 
-            with sample.changingMetadata():
-                for metric in self._calculator.supportedMetrics:
-                    if not metric.doShowByDefault:
-                        continue
-                    sample.metadata[metric.label] = self._calculator.getValueForMetric(metric.label)
+            await asyncio.sleep(0.)  # yield between batches
 
     @property
     def session(self):
@@ -463,7 +466,12 @@ class NavigatePanel(MainViewPanelWithDockWidgets):
 
     def _recordSample(self, timestamp: tp.Optional[pd.Timestamp], metadata: tp.Optional[dict[str, tp.Any]] = None):
         sampleKey = self.session.samples.getUniqueSampleKey(timestamp=timestamp)
-        coilToMRITransf = self._coordinator.currentCoilToMRITransform  # may be None if missing a tracker, etc.
+        # use pose at time of trigger rather than time this is handled
+        # (naive timestamps are local time, as from pd.Timestamp.now())
+        coilToMRITransf = self._coordinator.getCoilToMRITransformAtTime(timestamp.to_pydatetime().timestamp())
+        if coilToMRITransf is None:
+            # e.g. tracker positions at that time are no longer available
+            coilToMRITransf = self._coordinator.currentCoilToMRITransform  # may be None if missing a tracker, etc.
 
         if abs(timestamp - pd.Timestamp.now()).total_seconds() > 10:
             # We are getting "old" triggers or lagging for other reasons. Mark orientation as invalid
@@ -9,8 +9,9 @@ import typing as tp
 from typing import ClassVar
 
 from . import PlotViewLayer
+from NaviNIBS.Navigator.TargetingCoordinator import MRIFrame, worldFrame, toolFrame, trackerFrame
+from NaviNIBS.util.numpy import array_equalish
 from NaviNIBS.util.pyvista import setActorUserTransform, concatenateLineSegments
-from NaviNIBS.util.Transforms import concatenateTransforms, invertTransform
 from NaviNIBS.Navigator.GUI import headMeshDefaultKwargs, toolMeshDefaultKwargs
 
 
@@ -35,6 +36,11 @@ class ToolMeshSurfaceLayer(PlotViewLayer):
     If None, will use tool's defined opacity
     """
 
+    _drawnTransfVersions: dict[str, tuple[int, Transform]] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    Transform graph version and STL transform last drawn for each actor, to skip redundant renders
+    """
+
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
 
@@ -81,6 +87,7 @@ class ToolMeshSurfaceLayer(PlotViewLayer):
                 if actorKey in self._actors:
                     with self._plotter.allowNonblockingCalls():
                         self._plotter.remove_actor(self._actors.pop(actorKey))
+                    self._drawnTransfVersions.pop(actorKey, None)
 
                 color = self._color
                 if color is None:
@@ -131,58 +138,43 @@ class ToolMeshSurfaceLayer(PlotViewLayer):
 
                 match toolOrTracker:
                     case 'tool':
-                        toolOrTrackerStlToTrackerTransf = tool.toolToTrackerTransf @ tool.toolStlToToolTransf
+                        stlToFrameTransf = tool.toolStlToToolTransf
+                        fromFrame = toolFrame(self._toolKey)
                     case 'tracker':
-                        toolOrTrackerStlToTrackerTransf = tool.trackerStlToTrackerTransf
+                        stlToFrameTransf = tool.trackerStlToTrackerTransf
+                        fromFrame = trackerFrame(tool.trackerKey)
                     case _:
                         raise NotImplementedError
 
-                doHide = True
-
                 match self._plotInSpace:
                     case 'MRI':
-                        trackerToWorldTransf = self._coordinator.positionsClient.getLatestTransf(key=tool.trackerKey, default=None)
-                        if trackerToWorldTransf is not None:
-                            subjectTrackerToWorldTransf = self._coordinator.positionsClient.getLatestTransf(self._coordinator.session.tools.subjectTracker.trackerKey, None)
-                            if subjectTrackerToWorldTransf is not None:
-                                subjectTrackerToMRITransf = self._coordinator.session.subjectRegistration.trackerToMRITransf
-                                if subjectTrackerToMRITransf is not None:
-                                    # we have enough info to assemble valid transf
-                                    doHide = False
-
-                                    surfToMRITransf = concatenateTransforms([
-                                        toolOrTrackerStlToTrackerTransf,
-                                        trackerToWorldTransf,
-                                        invertTransform(subjectTrackerToWorldTransf),
-                                        subjectTrackerToMRITransf,
-                                    ])
-
-                                    with self._plotter.allowNonblockingCalls():
-                                        setActorUserTransform(actor, surfToMRITransf)
-                                        if not actor.GetVisibility():
-                                            actor.SetVisibility(True)
-                                        self._plotter.render()
-
+                        toFrame = MRIFrame
                     case 'World':
-                        trackerToWorldTransf = self._coordinator.positionsClient.getLatestTransf(key=tool.trackerKey, default=None)
-                        if trackerToWorldTransf is not None:
-                            doHide = False
-
-                            surfToWorldTransf = concatenateTransforms([
-                                toolOrTrackerStlToTrackerTransf,
-                                trackerToWorldTransf,
-                            ])
-
-                            with self._plotter.allowNonblockingCalls():
-                                setActorUserTransform(actor, surfToWorldTransf)
-                                if not actor.GetVisibility():
-                                    actor.SetVisibility(True)
-                                self._plotter.render()
-
+                        toFrame = worldFrame
                     case _:
                         raise NotImplementedError
 
-                if doHide:
+                transformGraph = self._coordinator.transformGraph
+                frameToSpaceTransf = transformGraph.getTransform(fromFrame, toFrame)
+
+                if frameToSpaceTransf is not None:
+                    # we have enough info to assemble valid transf
+                    transfVersion = transformGraph.getVersion(fromFrame, toFrame)
+                    prevVersion, prevStlToFrameTransf = self._drawnTransfVersions.get(actorKey, (None, None))
+                    if transfVersion == prevVersion and actor.GetVisibility() \
+                            and array_equalish(stlToFrameTransf, prevStlToFrameTransf):
+                        # position unchanged (e.g. only another tool moved), no need to re-render
+                        continue
+                    self._drawnTransfVersions[actorKey] = (transfVersion, stlToFrameTransf)
+
+                    with self._plotter.allowNonblockingCalls():
+                        setActorUserTransform(actor, frameToSpaceTransf @ stlToFrameTransf)
+                        if not actor.GetVisibility():
+                            actor.SetVisibility(True)
+                        self._plotter.render()
+
+                else:
+                    self._drawnTransfVersions.pop(actorKey, None)
                     with self._plotter.allowNonblockingCalls():
                         if actor.GetVisibility():
                             actor.SetVisibility(False)
@@ -245,26 +237,16 @@ class HeadMeshSurfaceLayer(PlotViewLayer):
 
                     actor = self._actors[actorKey]
 
-                    doHide = True
-                    subjectTrackerToWorldTransf = self._coordinator.positionsClient.getLatestTransf(self._coordinator.session.tools.subjectTracker.trackerKey, None)
-                    if subjectTrackerToWorldTransf is not None:
-                        subjectTrackerToMRITransf = self._coordinator.session.subjectRegistration.trackerToMRITransf
-                        if subjectTrackerToMRITransf is not None:
-                            # we have enough info to assemble valid transf
-                            doHide = False
-
-                            surfToWorldTransf = concatenateTransforms([
-                                invertTransform(subjectTrackerToMRITransf),
-                                subjectTrackerToWorldTransf,
-                            ])
-
-                            with self._plotter.allowNonblockingCalls():
-                                setActorUserTransform(actor, surfToWorldTransf)
-                                if not actor.GetVisibility():
-                                    actor.SetVisibility(True)
-                                self._plotter.render()
+                    surfToWorldTransf = self._coordinator.currentMRIToWorldTransform
+                    if surfToWorldTransf is not None:
+                        # we have enough info to assemble valid transf
+                        with self._plotter.allowNonblockingCalls():
+                            setActorUserTransform(actor, surfToWorldTransf)
+                            if not actor.GetVisibility():
+                                actor.SetVisibility(True)
+                            self._plotter.render()
 
-                    if doHide:
+                    else:
                         with self._plotter.allowNonblockingCalls():
                             if actor.GetVisibility():
                                 actor.SetVisibility(False)
@@ -11,6 +11,7 @@ from typing import ClassVar
 
 from . import PlotViewLayer
 from NaviNIBS.util.pyvista import setActorUserTransform, concatenateLineSegments
+from NaviNIBS.Navigator.TargetingCoordinator import toolFrame, worldFrame
 from NaviNIBS.util.Transforms import concatenateTransforms
 
 
@@ -135,9 +136,8 @@ class TargetingCrosshairsLayer(PlotViewLayer):
                             currentCoilToMRITransform = self._coordinator.currentCoilToMRITransform
                             setActorUserTransform(actor, currentCoilToMRITransform)
                         case 'World':
-                            coilToTrackerTransf = self._coordinator.activeCoilTool.toolToTrackerTransf
-                            coilTrackerToCameraTransf = self._coordinator.positionsClient.getLatestTransf(self._coordinator.activeCoilKey, None)
-                            currentCoilToWorldTransform = concatenateTransforms([coilToTrackerTransf, coilTrackerToCameraTransf])
+                            currentCoilToWorldTransform = self._coordinator.transformGraph.getTransform(
+                                toolFrame(self._coordinator.activeCoilKey), worldFrame)
                             setActorUserTransform(actor, currentCoilToWorldTransform)
                         case _:
                             raise NotImplementedError
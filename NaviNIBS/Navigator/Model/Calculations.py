@@ -11,20 +11,28 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from NaviNIBS.Navigator.Model.Session import Session
+    from NaviNIBS.util.pyvista.IncrementalClosestPointQuery import IncrementalClosestPointQuery
 from NaviNIBS.util.Transforms import applyTransform, composeTransform, invertTransform, estimateAligningTransform, \
     concatenateTransforms, applyDirectionTransform, calculateRotationMatrixFromTwoVectors
 
 logger = logging.getLogger(__name__)
 
 
-def getClosestPointToPointOnMesh(session: Session, whichMesh: str, point_MRISpace: np.ndarray) -> tp.Optional[np.ndarray]:
+def getClosestPointToPointOnMesh(session: Session, whichMesh: str, point_MRISpace: np.ndarray,
+                                 query: IncrementalClosestPointQuery | None = None) -> tp.Optional[np.ndarray]:
+    """
+    :param query: optional query engine to warm-start from the result for a previous nearby point (e.g. the previous
+        pose of a moving coil). Ignored if it was created for a different surface than the current mesh.
+    """
     surf = getattr(session.headModel, whichMesh)
     if surf is None:
         return None
 
     assert isinstance(surf, pv.PolyData)
 
-    if False:
+    if query is not None and query.surf is surf:
+        _, closestPt = query.findClosestPoint(point_MRISpace)
+    elif False:
         # find closest point on surf, restricting to existing vertices
         from NaviNIBS.util.pyvista.dataset import find_closest_point
         closestPtIndex = find_closest_point(surf, point_MRISpace)
@@ -37,21 +45,13 @@ def getClosestPointToPointOnMesh(session: Session, whichMesh: str, point_MRISpac
     return closestPt
 
 
-def calculateMidlineRefDirectionsFromCoilToMRITransf(session: Session, coilToMRITransf: np.ndarray | None) -> tuple[np.ndarray, np.ndarray] | tuple[None, None]:
+def _getMRIToMidlineAlignedTransf(session: Session) -> np.ndarray | None:
     """
-    Calculate the reference directions for angle=0 and angle=+90 degrees from midline, in the MRI space.
-
-    Note that these directions are dependent on the coilToMRITransf, since the definition of "midline" can differ when on top of the head vs. extreme left/right vs. extreme anterior/posterior.
+    Transform from MRI space to an approximately standard-aligned space (x: left to right, y: posterior to anterior,
+    z: inferior to superior) used to define the midline reference directions.
 
-    :return
-        refDir1: handle angle (i.e. coil's -y axis) corresponding to 0 degrees from midline
-        refDir2: handle angle (i.e. coil's -y axis) corresponding to +90 degrees from midline
-        May return (None, None) if coilToMRITransf is None.
+    :return: 4x4 transform, or None if not enough information is available (e.g. missing fiducials)
     """
-
-    if coilToMRITransf is None:
-        return None, None
-
     if 'MNI_SimNIBS12DoF' in session.coordinateSystems:
         # if an affine MNI transform is available, use that to define aligned coordinate space
         coordSys = session.coordinateSystems['MNI_SimNIBS12DoF']
@@ -93,10 +93,10 @@ def calculateMidlineRefDirectionsFromCoilToMRITransf(session: Session, coilToMRI
         nas = session.subjectRegistration.fiducials.get('NAS', None)
         lpa = session.subjectRegistration.fiducials.get('LPA', None)
         rpa = session.subjectRegistration.fiducials.get('RPA', None)
-        nas, lpa, rpa = tuple(fid.plannedCoord for fid in (nas, lpa, rpa))
+        nas, lpa, rpa = tuple(None if fid is None else fid.plannedCoord for fid in (nas, lpa, rpa))
         if any(coord is None for coord in (nas, lpa, rpa)):
             logger.debug('Missing fiducial(s), cannot find midline axis')
-            return None, None
+            return None
 
         centerPt = (lpa + rpa) / 2
         dirPA = nas - centerPt
@@ -107,6 +107,28 @@ def calculateMidlineRefDirectionsFromCoilToMRITransf(session: Session, coilToMRI
         MRIToStdTransf = estimateAligningTransform(np.asarray([centerPt, centerPt + dirDU, centerPt + dirLR]),
                                                    np.asarray([[0, 0, 0], [0, 0, 1], [1, 0, 0]]))
 
+    return MRIToStdTransf
+
+
+def calculateMidlineRefDirectionsFromCoilToMRITransf(session: Session, coilToMRITransf: np.ndarray | None) -> tuple[np.ndarray, np.ndarray] | tuple[None, None]:
+    """
+    Calculate the reference directions for angle=0 and angle=+90 degrees from midline, in the MRI space.
+
+    Note that these directions are dependent on the coilToMRITransf, since the definition of "midline" can differ when on top of the head vs. extreme left/right vs. extreme anterior/posterior.
+
+    :return
+        refDir1: handle angle (i.e. coil's -y axis) corresponding to 0 degrees from midline
+        refDir2: handle angle (i.e. coil's -y axis) corresponding to +90 degrees from midline
+        May return (None, None) if coilToMRITransf is None.
+    """
+
+    if coilToMRITransf is None:
+        return None, None
+
+    MRIToStdTransf = _getMRIToMidlineAlignedTransf(session)
+    if MRIToStdTransf is None:
+        return None, None
+
     coilLoc_stdSpace = applyTransform([coilToMRITransf, MRIToStdTransf], np.asarray([0, 0, 0]), doCheck=False)
 
     if False:
@@ -193,6 +215,74 @@ def calculateAngleFromMidlineFromCoilToMRITransf(session: Session, coilToMRITran
     return np.rad2deg(angle).item()
 
 
+def _getMidlineRefQuaternions() -> np.ndarray:
+    """
+    Quaternions of reference rotations used by `calculateMidlineRefDirectionsFromCoilToMRITransf`, for each
+    (left/right, anterior/posterior, superior/inferior) axis and sign of coil location along that axis.
+
+    :return: 3x2x4 array, indexed by [axis, 0 if sign < 0 else 1, :]
+    """
+    quats = np.zeros((3, 2, 4))
+    for iSign, sign in enumerate((-1, 1)):
+        refDirs = (
+            (np.asarray([0, -1, 0]), np.asarray([0, 0, -sign])),  # left/right
+            (np.asarray([0, 0, sign]), np.asarray([1, 0, 0])),  # anterior/posterior
+            (np.asarray([0, -sign, 0]), np.asarray([1, 0, 0])),  # superior/inferior
+        )
+        for iAxis, (refDir1, refDir2) in enumerate(refDirs):
+            quats[iAxis, iSign, :] = ptr.quaternion_from_matrix(calculateRotationMatrixFromTwoVectors(refDir1, refDir2))
+    return quats
+
+
+def calculateAnglesFromMidlineFromCoilToMRITransfs(session: Session, coilToMRITransfs: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of `calculateAngleFromMidlineFromCoilToMRITransf` for many transforms.
+
+    :param coilToMRITransfs: Nx4x4 transforms. Rows containing NaN give NaN angles.
+    :return: N angles in degrees, all NaN if midline reference cannot be determined (e.g. missing fiducials)
+    """
+    coilToMRITransfs = np.asarray(coilToMRITransfs, dtype=np.float64)
+    N = coilToMRITransfs.shape[0]
+
+    MRIToStdTransf = _getMRIToMidlineAlignedTransf(session)
+    if MRIToStdTransf is None:
+        return np.full((N,), np.nan)
+
+    coilLoc_stdSpace = coilToMRITransfs[:, :3, 3] @ MRIToStdTransf[:3, :3].T + MRIToStdTransf[:3, 3]
+
+    # weighted average of per-axis reference rotations, as in calculateMidlineRefDirectionsFromCoilToMRITransf
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = np.abs(coilLoc_stdSpace)
+        weights /= np.linalg.norm(weights, axis=1, keepdims=True)
+
+    iSigns = (coilLoc_stdSpace >= 0).astype(np.intp)  # (sign of zero is treated as positive)
+    refQuats = _getMidlineRefQuaternions()[np.arange(3), iSigns, :]  # Nx3x4
+
+    refQuats[:, 1, :] *= np.where(np.einsum('ij,ij->i', refQuats[:, 0, :], refQuats[:, 1, :]) < 0, -1, 1)[:, np.newaxis]
+    combinedQuats = weights[:, 0:1] * refQuats[:, 0, :] + weights[:, 1:2] * refQuats[:, 1, :]
+    refQuats[:, 2, :] *= np.where(np.einsum('ij,ij->i', combinedQuats, refQuats[:, 2, :]) < 0, -1, 1)[:, np.newaxis]
+    combinedQuats += weights[:, 2:3] * refQuats[:, 2, :]
+
+    # columns 0 and 1 of rotation matrices from (normalized) quaternions
+    with np.errstate(invalid='ignore', divide='ignore'):
+        combinedQuats /= np.linalg.norm(combinedQuats, axis=1, keepdims=True)
+    w, x, y, z = combinedQuats.T
+    refDirs1 = np.column_stack((1 - 2 * (y * y + z * z), 2 * (x * y + w * z), 2 * (x * z - w * y)))
+    refDirs2 = np.column_stack((2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x)))
+
+    # convert refDirs to MRI space
+    stdToMRIRot = invertTransform(MRIToStdTransf)[:3, :3]
+    refDirs1_MRI = refDirs1 @ stdToMRIRot.T
+    refDirs2_MRI = refDirs2 @ stdToMRIRot.T
+
+    handleDirs_MRI = -coilToMRITransfs[:, :3, 1]  # coil's -y axis
+
+    handleComps1 = np.einsum('ij,ij->i', handleDirs_MRI, refDirs1_MRI)
+    handleComps2 = np.einsum('ij,ij->i', handleDirs_MRI, refDirs2_MRI)
+
+    return np.rad2deg(np.arctan2(handleComps2, handleComps1))
+
+
 def calculateCoilToMRITransfFromTargetEntryAngle(session: Session | None,
                                                  targetCoord: np.ndarray | None,
                                                  entryCoord: np.ndarray | None,
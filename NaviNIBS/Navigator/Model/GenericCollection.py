@@ -3,6 +3,7 @@ from __future__ import annotations
 import collections
 
 import attrs
+import contextlib
 from abc import ABC
 from collections.abc import Sequence, Mapping, Iterable
 import functools
@@ -11,6 +12,7 @@ import typing as tp
 
 from NaviNIBS.util.attrs import attrsAsDict
 from NaviNIBS.util.numpy import array_equalish
+from NaviNIBS.util.OrderedIndex import OrderedIndex, asOrderedIndex
 from NaviNIBS.util.Signaler import Signal
 
 logger = logging.getLogger(__name__)
@@ -138,13 +140,41 @@ def listItemAttrSetter(
 CI = tp.TypeVar('CI', bound=GenericCollectionDictItem)  # collection item type
 
 
+@attrs.define
+class _ItemChangeBatch(tp.Generic[K]):
+    """
+    State for an open GenericCollection.batchedChanges() context
+    """
+    declaredKeys: list[K] | None
+    declaredAttribKeys: list[str] | None
+    depth: int = 1
+    aboutToChangeEmitted: bool = False
+    changedKeys: dict[K, None] = attrs.field(factory=dict)
+    """
+    Used as an ordered set
+    """
+    changedAttribKeys: dict[str, None] | None = attrs.field(factory=dict)
+    """
+    Used as an ordered set; None if any change did not specify attributes (i.e. all attributes may have changed)
+    """
+
+    def addAttribKeys(self, attribKeys: tp.Iterable[str] | None):
+        if attribKeys is None:
+            self.changedAttribKeys = None
+        elif self.changedAttribKeys is not None:
+            self.changedAttribKeys.update(dict.fromkeys(attribKeys))
+
+
 @attrs.define(slots=False)
 class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be helpful to specify CI[K] here but python syntax doesn't yet allow for this)
     """
     Base class to implement collection behavior and signaling for various session model components
     """
 
-    _items: dict[K, CI] = attrs.field(factory=dict)
+    _items: OrderedIndex[K, CI] = attrs.field(factory=OrderedIndex, converter=asOrderedIndex)
+    """
+    Supports renaming an item's key in place without rebuilding the whole mapping.
+    """
 
     sigItemsAboutToChange: Signal[list[K], list[str] | None] = attrs.field(init=False, eq=False, factory=Signal, repr=False)
     """
@@ -167,13 +197,30 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
     This is because when a key does change, everything else about a item may have changed, so these other signals don't include a list of attributes indicating the source of the change.
     """
 
+    _pendingChangeBatch: _ItemChangeBatch[K] | None = attrs.field(init=False, default=None, eq=False, repr=False)
+
     def __attrs_post_init__(self):
         for key, item in self._items.items():
             assert item.key == key
-            item.sigItemAboutToChange.connect(self._onItemAboutToChange)
-            item.sigItemChanged.connect(self._onItemChanged)
-            item.sigKeyAboutToChange.connect(self._onItemKeyAboutToChange)
-            item.sigKeyChanged.connect(self._onItemKeyChanged)
+            self._connectItem(item)
+
+    def _connectItem(self, item: CI):
+        """
+        Called when an item becomes part of this collection. Subclasses may extend, e.g. to take ownership of item data.
+        """
+        item.sigItemAboutToChange.connect(self._onItemAboutToChange)
+        item.sigItemChanged.connect(self._onItemChanged)
+        item.sigKeyAboutToChange.connect(self._onItemKeyAboutToChange)
+        item.sigKeyChanged.connect(self._onItemKeyChanged)
+
+    def _disconnectItem(self, item: CI):
+        """
+        Called when an item is removed from this collection. Should undo anything done in _connectItem.
+        """
+        item.sigItemAboutToChange.disconnect(self._onItemAboutToChange)
+        item.sigKeyAboutToChange.disconnect(self._onItemKeyAboutToChange)
+        item.sigKeyChanged.disconnect(self._onItemKeyChanged)
+        item.sigItemChanged.disconnect(self._onItemChanged)
 
     def addItem(self, item: CI):
         assert item.key not in self._items
@@ -189,11 +236,7 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
         self.sigItemsAboutToChange.emit(keys, None)
         try:
             for key in keys:
-                self._items[key].sigItemAboutToChange.disconnect(self._onItemAboutToChange)
-                self._items[key].sigKeyAboutToChange.disconnect(self._onItemKeyAboutToChange)
-                self._items[key].sigKeyChanged.disconnect(self._onItemKeyChanged)
-                self._items[key].sigItemChanged.disconnect(self._onItemChanged)
-
+                self._disconnectItem(self._items[key])
                 del self._items[key]
         finally:
             # always emit to balance sigItemsAboutToChange, even on partial failure
@@ -203,16 +246,9 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
         self.sigItemsAboutToChange.emit([item.key], None)
         try:
             if item.key in self._items:
-                self._items[item.key].sigItemAboutToChange.disconnect(self._onItemAboutToChange)
-                self._items[item.key].sigKeyAboutToChange.disconnect(self._onItemKeyAboutToChange)
-                self._items[item.key].sigKeyChanged.disconnect(self._onItemKeyChanged)
-                self._items[item.key].sigItemChanged.disconnect(self._onItemChanged)
+                self._disconnectItem(self._items[item.key])
             self._items[item.key] = item
-
-            item.sigItemAboutToChange.connect(self._onItemAboutToChange)
-            item.sigKeyAboutToChange.connect(self._onItemKeyAboutToChange)
-            item.sigKeyChanged.connect(self._onItemKeyChanged)
-            item.sigItemChanged.connect(self._onItemChanged)
+            self._connectItem(item)
         finally:
             # always emit to balance sigItemsAboutToChange, even on partial failure
             self.sigItemsChanged.emit([item.key], None)
@@ -226,16 +262,10 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
         self.sigItemsAboutToChange.emit(combinedKeys, None)
         try:
             for key in oldKeys:
-                self._items[key].sigItemAboutToChange.disconnect(self._onItemAboutToChange)
-                self._items[key].sigKeyAboutToChange.disconnect(self._onItemKeyAboutToChange)
-                self._items[key].sigKeyChanged.disconnect(self._onItemKeyChanged)
-                self._items[key].sigItemChanged.disconnect(self._onItemChanged)
-            self._items = {item.key: item for item in items}
-            for key, item in self._items.items():
-                self._items[key].sigItemAboutToChange.connect(self._onItemAboutToChange)
-                self._items[key].sigKeyAboutToChange.connect(self._onItemKeyAboutToChange)
-                self._items[key].sigKeyChanged.connect(self._onItemKeyChanged)
-                self._items[key].sigItemChanged.connect(self._onItemChanged)
+                self._disconnectItem(self._items[key])
+            self._items = OrderedIndex((item.key, item) for item in items)
+            for item in self._items.values():
+                self._connectItem(item)
         finally:
             # always emit to balance sigItemsAboutToChange, even on partial failure
             self.sigItemsChanged.emit(combinedKeys, None)
@@ -278,7 +308,83 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
             # always emit to balance sigItemsAboutToChange, even on partial failure
             self.sigItemsChanged.emit(changingKeys, list(changingAttribsAndValues.keys()))
 
+    @contextlib.contextmanager
+    def batchedChanges(self, keys: Sequence[K] | None = None, attribKeys: Sequence[str] | None = None):
+        """
+        Coalesce per-item change signals into a single sigItemsAboutToChange / sigItemsChanged pair.
+
+        Can be used like:
+                with samples.batchedChanges():
+                    for sample in samples.values():
+                        sample.isVisible = False
+
+        While open, per-item sigItemAboutToChange / sigItemChanged emissions are recorded rather than
+        forwarded. If ``keys`` are specified, sigItemsAboutToChange is emitted on entry with these keys;
+        otherwise it is emitted (with all current keys) just before the first item changes. On exit, if
+        anything was signaled as about to change, a single sigItemsChanged is emitted with the union of
+        declared and actually changed keys and attributes.
+
+        Collection-level changes made while open (adding, deleting, or re-keying items) are still
+        signaled immediately, nested within the batch's about-to-change/changed pair.
+
+        Nested calls join the outermost batch.
+        """
+        if self._pendingChangeBatch is not None:
+            batch = self._pendingChangeBatch
+            batch.depth += 1
+            if keys is not None:
+                if batch.aboutToChangeEmitted:
+                    batch.changedKeys.update(dict.fromkeys(keys))
+                    batch.addAttribKeys(attribKeys)
+                elif batch.declaredKeys is not None:
+                    batch.declaredKeys.extend(key for key in keys if key not in batch.declaredKeys)
+                    if batch.declaredAttribKeys is not None:
+                        if attribKeys is None:
+                            batch.declaredAttribKeys = None
+                        else:
+                            batch.declaredAttribKeys.extend(
+                                attribKey for attribKey in attribKeys if attribKey not in batch.declaredAttribKeys)
+            try:
+                yield None
+            finally:
+                batch.depth -= 1
+            return
+
+        batch = _ItemChangeBatch(
+            declaredKeys=list(keys) if keys is not None else None,
+            declaredAttribKeys=list(attribKeys) if attribKeys is not None else None)
+        self._pendingChangeBatch = batch
+        try:
+            if batch.declaredKeys is not None:
+                self._emitBatchAboutToChange(batch)
+            yield None
+        finally:
+            self._pendingChangeBatch = None
+            if batch.aboutToChangeEmitted:
+                # always emit to balance sigItemsAboutToChange, even on partial failure
+                changedKeys = dict.fromkeys(batch.declaredKeys)
+                changedKeys.update(batch.changedKeys)
+                if batch.declaredAttribKeys is None:
+                    changedAttribKeys = None
+                else:
+                    batch.addAttribKeys(batch.declaredAttribKeys)
+                    changedAttribKeys = batch.changedAttribKeys
+                self.sigItemsChanged.emit(list(changedKeys),
+                                          list(changedAttribKeys) if changedAttribKeys is not None else None)
+
+    def _emitBatchAboutToChange(self, batch: _ItemChangeBatch[K]):
+        if batch.declaredKeys is None:
+            batch.declaredKeys = list(self._items.keys())
+        batch.aboutToChangeEmitted = True
+        self.sigItemsAboutToChange.emit(batch.declaredKeys.copy(),
+                                        batch.declaredAttribKeys.copy() if batch.declaredAttribKeys is not None else None)
+
     def _onItemAboutToChange(self, key: str, attribKeys: tp.Optional[list[str]] = None):
+        batch = self._pendingChangeBatch
+        if batch is not None:
+            if not batch.aboutToChangeEmitted:
+                self._emitBatchAboutToChange(batch)
+            return
         self.sigItemsAboutToChange.emit([key], attribKeys)
 
     def _onItemKeyAboutToChange(self, fromKey: str, toKey: str):
@@ -288,11 +394,16 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
 
     def _onItemKeyChanged(self, fromKey: str, toKey: str):
         assert toKey not in self._items
-        self._items = {(toKey if key == fromKey else key): val for key, val in self._items.items()}
+        self._items.renameKey(fromKey, toKey)
         self.sigItemKeyChanged.emit(fromKey, toKey)
         self.sigItemsChanged.emit([fromKey, toKey], None)
 
     def _onItemChanged(self, key: str, attribKeys: tp.Optional[list[str]] = None):
+        batch = self._pendingChangeBatch
+        if batch is not None:
+            batch.changedKeys[key] = None
+            batch.addAttribKeys(attribKeys)
+            return
         self.sigItemsChanged.emit([key], attribKeys)
 
     def __getitem__(self, key):
@@ -317,6 +428,12 @@ class GenericCollection(ABC, tp.Generic[K, CI]): # (minor note: it would be help
     def get(self, *args, **kwargs):
         return self._items.get(*args, **kwargs)
 
+    def positionOf(self, key: K) -> int:
+        """
+        Position of item with given key in collection order.
+        """
+        return self._items.positionOf(key)
+
     def values(self):
         return self._items.values()
 
@@ -355,7 +472,7 @@ C = tp.TypeVar('C', bound=GenericCollection)  # collection type
 class GenericListItem(ABC):
     """
     List item that does not track its index. When signalling changes, the item should emit itself
-    as the first argument so collections can determine the current index (via list.index(item)).
+    as the first argument so collections can determine the current index (via GenericList.index(item)).
     """
     sigItemAboutToChange: Signal[tp.Self, list[str] | None] = attrs.field(init=False, repr=False, eq=False, factory=Signal)
     """
@@ -389,6 +506,12 @@ class GenericList(ABC, tp.Generic[LI]):
     """
     _items: list[LI] = attrs.field(factory=list)
 
+    _itemIndices: dict[int, int] = attrs.field(init=False, factory=dict, eq=False, repr=False)
+    """
+    Mapping from id(item) -> index in _items, for O(1) membership / index lookups when items signal changes.
+    Rebuilt on operations that shift indices.
+    """
+
     sigItemsAboutToChange: Signal[set[LI], list[str] | None] = attrs.field(init=False, eq=False, factory=Signal, repr=False)
     sigItemsChanged: Signal[set[LI], list[str] | None] = attrs.field(init=False, eq=False, factory=Signal, repr=False)
     """
@@ -406,29 +529,35 @@ class GenericList(ABC, tp.Generic[LI]):
     """
 
     def __attrs_post_init__(self):
+        self._rebuildItemIndices()
         for item in self._items:
             item.sigItemAboutToChange.connect(self._onItemAboutToChange)
             item.sigItemChanged.connect(self._onItemChanged)
 
+    def _rebuildItemIndices(self):
+        self._itemIndices = {id(item): index for index, item in enumerate(self._items)}
+
     def append(self, item: LI):
-        assert item not in self._items, 'Item already present in list'
+        assert id(item) not in self._itemIndices, 'Item already present in list'
         newIndex = len(self._items)
         self.sigItemIndicesAboutToChange.emit({item})
         self.sigItemsAboutToChange.emit({item}, None)
         self._items.append(item)
+        self._itemIndices[id(item)] = newIndex
         item.sigItemAboutToChange.connect(self._onItemAboutToChange)
         item.sigItemChanged.connect(self._onItemChanged)
         self.sigItemsChanged.emit({item}, None)
         self.sigItemIndicesChanged.emit({item})
 
     def insert(self, index: int, item: LI):
-        assert item not in self._items, 'Item already present in list'
+        assert id(item) not in self._itemIndices, 'Item already present in list'
         assert 0 <= index <= len(self._items)
         laterIndices = [idx for idx in range(len(self._items)) if idx >= index]
         itemsChangingIndex = {self._items[idx] for idx in laterIndices} | {item}
         self.sigItemIndicesAboutToChange.emit(itemsChangingIndex)
         self.sigItemsAboutToChange.emit({item}, None)
         self._items.insert(index, item)
+        self._rebuildItemIndices()
         item.sigItemAboutToChange.connect(self._onItemAboutToChange)
         item.sigItemChanged.connect(self._onItemChanged)
         self.sigItemsChanged.emit({item}, None)
@@ -452,6 +581,7 @@ class GenericList(ABC, tp.Generic[LI]):
             item.sigItemAboutToChange.disconnect(self._onItemAboutToChange)
             item.sigItemChanged.disconnect(self._onItemChanged)
             del self._items[idx]
+        self._rebuildItemIndices()
         # update nothing on items themselves (they don't track index)
         self.sigItemsChanged.emit(itemsDeleting, None)
         self.sigItemIndicesChanged.emit(itemsChangingIndex)
@@ -465,11 +595,8 @@ class GenericList(ABC, tp.Generic[LI]):
             return
         assert 0 <= index < len(self._items)
         oldItem = self._items[index]
-        try:
-            prevIndex = self._items.index(item)
-        except ValueError:
-            prevIndex = None
-        else:
+        prevIndex = self._itemIndices.get(id(item), None)
+        if prevIndex is not None:
             if prevIndex != index:
                 raise ValueError('Item already present in list at different index')
             else:
@@ -482,6 +609,8 @@ class GenericList(ABC, tp.Generic[LI]):
         old.sigItemAboutToChange.disconnect(self._onItemAboutToChange)
         old.sigItemChanged.disconnect(self._onItemChanged)
         self._items[index] = item
+        del self._itemIndices[id(old)]
+        self._itemIndices[id(item)] = index
         item.sigItemAboutToChange.connect(self._onItemAboutToChange)
         item.sigItemChanged.connect(self._onItemChanged)
         self.sigItemsChanged.emit(itemsChanging, None)
@@ -495,6 +624,7 @@ class GenericList(ABC, tp.Generic[LI]):
             itm.sigItemAboutToChange.disconnect(self._onItemAboutToChange)
             itm.sigItemChanged.disconnect(self._onItemChanged)
         self._items = items
+        self._rebuildItemIndices()
         for itm in self._items:
             itm.sigItemAboutToChange.connect(self._onItemAboutToChange)
             itm.sigItemChanged.connect(self._onItemChanged)
@@ -529,18 +659,13 @@ class GenericList(ABC, tp.Generic[LI]):
         self.sigItemsChanged.emit(itemsChanging, list(changingAttribsAndValues.keys()))
 
     def _onItemAboutToChange(self, item: LI, attribKeys: tp.Optional[list[str]] = None):
-        # resolve current index of the item and emit collection-level signal
-        try:
-            idx = self._items.index(item)
-        except ValueError:
+        if id(item) not in self._itemIndices:
             # item no longer present
             return
         self.sigItemsAboutToChange.emit({item}, attribKeys)
 
     def _onItemChanged(self, item: LI, attribKeys: tp.Optional[list[str]] = None):
-        try:
-            idx = self._items.index(item)
-        except ValueError:
+        if id(item) not in self._itemIndices:
             return
         self.sigItemsChanged.emit({item}, attribKeys)
 
@@ -563,8 +688,14 @@ class GenericList(ABC, tp.Generic[LI]):
     def __len__(self):
         return len(self._items)
 
+    def __contains__(self, item: LI) -> bool:
+        return id(item) in self._itemIndices
+
     def index(self, item: LI) -> int:
-        return self._items.index(item)
+        try:
+            return self._itemIndices[id(item)]
+        except KeyError:
+            raise ValueError(f'{item} is not in list')
 
     def asList(self) -> list[dict[str, tp.Any]]:
         return [item.asDict() for item in self._items]
@@ -21,6 +21,7 @@ from typing import ClassVar
 from NaviNIBS.util.attrs import attrsAsDict
 from NaviNIBS.util.Signaler import Signal
 from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict
+from NaviNIBS.util.pyvista.SignedDistanceField import SignedDistanceField
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -105,6 +106,10 @@ class HeadModel:
     _eegPositions: tp.Optional[pd.DataFrame] = attrs.field(init=False, default=None)
     _mshVersion: tp.Optional[MshVersion] = attrs.field(init=False, default=None)
     _freesurferTempDir: tempfile.TemporaryDirectory | None = attrs.field(init=False, default=None)
+    _distanceFields: dict[str, SignedDistanceField] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    Signed distance fields of surfaces, keyed by surface key and field parameters. See `getDistanceField`.
+    """
 
     sigFilepathChanged: Signal = attrs.field(init=False, factory=Signal)
     """
@@ -476,6 +481,8 @@ class HeadModel:
 
         if which in ('skinSurf', 'csfSurf', 'gmSurf', 'gmFSSurf', 'gmSimpleSurf', 'skinSimpleSurf',
                      'skinConvexSurf', 'skinDefacedSurf', 'skinSimpleDefacedSurf', 'eegPositions', 'mshVersion'):
+            for key in [key for key in self._distanceFields if key.split(':')[0] == which]:
+                del self._distanceFields[key]
             if getattr(self, '_' + which) is None:
                 return
             setattr(self, '_' + which, None)
@@ -692,6 +699,26 @@ class HeadModel:
             self.loadCache(which='skinDefacedSurf')
         return self._skinDefacedSurf
 
+    def getDistanceField(self, which: str, **kwargs) -> SignedDistanceField | None:
+        """
+        Signed distance field of a surface, for fast approximate distance and closest point queries (see
+        `SignedDistanceField`). Built (or loaded from disk cache) on first request, which can take several seconds for
+        a dense surface.
+
+        :param which: surface key, e.g. 'skinSurf' or 'gmSurf'
+        :param kwargs: passed to `SignedDistanceField`, e.g. resolution
+        :return: distance field, or None if surface is not available
+        """
+        surf = getattr(self, which)
+        if surf is None:
+            return None
+        key = f'{which}:{kwargs}'
+        field = self._distanceFields.get(key, None)
+        if field is None or field.surf is not surf:
+            field = SignedDistanceField(surf, **kwargs)
+            self._distanceFields[key] = field
+        return field
+
     @property
     def eegPositions(self):
         if self._filepath is not None and self._eegPositions is None:
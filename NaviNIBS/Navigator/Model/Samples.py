@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import attrs
+from collections.abc import MutableMapping
 import contextlib
 import datetime
 import logging
@@ -9,7 +10,7 @@ import pandas as pd
 from pprint import pformat
 import typing as tp
 
-from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict
+from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict, ndarrayAsSerializable
 
 from NaviNIBS.Navigator.Model.GenericCollection import GenericCollection, GenericCollectionDictItem
 
@@ -20,12 +21,221 @@ logger = logging.getLogger(__name__)
 Timestamp = pd.Timestamp
 
 
+_missing = object()
+
+
+class SampleColumnStore:
+    """
+    Columnar backing storage for samples owned by a Samples collection.
+
+    Fixed-size per-sample values (transform, timestamp, flags) are kept in a single structured array;
+    string-valued attributes and metadata are kept as per-column lists. Rows of removed samples are reused.
+    """
+
+    rowDtype: tp.ClassVar[np.dtype] = np.dtype([
+        ('coilToMRITransf', np.float64, (4, 4)),
+        ('timestamp', np.int64),  # ns since epoch
+        ('hasTransf', np.bool_),
+        ('isVisible', np.bool_),
+        ('isSelected', np.bool_),
+    ])
+
+    objectColumnNames: tp.ClassVar[tuple[str, ...]] = ('targetKey', 'coilKey', 'color')
+
+    def __init__(self, capacity: int = 64):
+        self._rows = np.zeros((capacity,), dtype=self.rowDtype)
+        self._objectColumns: dict[str, list[tp.Any]] = {key: [None] * capacity for key in self.objectColumnNames}
+        self._metadataColumns: dict[str, list[tp.Any]] = {}
+        self._timestampTzs: dict[int, datetime.tzinfo] = {}
+        """
+        Timezones of any tz-aware timestamps, by row (most timestamps are naive)
+        """
+        self._numUsedRows: int = 0
+        self._freeRows: list[int] = []
+
+    @property
+    def rows(self) -> np.ndarray:
+        """
+        Structured array of all allocated rows (including free rows). Index with row numbers from Sample._row.
+        """
+        return self._rows
+
+    @property
+    def capacity(self) -> int:
+        return len(self._rows)
+
+    def allocateRow(self) -> int:
+        if len(self._freeRows) > 0:
+            return self._freeRows.pop()
+        if self._numUsedRows == self.capacity:
+            self._grow(max(64, self.capacity * 2))
+        row = self._numUsedRows
+        self._numUsedRows += 1
+        return row
+
+    def freeRow(self, row: int) -> None:
+        self._rows[row] = np.zeros((), dtype=self.rowDtype)
+        for column in self._objectColumns.values():
+            column[row] = None
+        for column in self._metadataColumns.values():
+            column[row] = _missing
+        self._timestampTzs.pop(row, None)
+        self._freeRows.append(row)
+
+    def _grow(self, newCapacity: int) -> None:
+        numNew = newCapacity - self.capacity
+        rows = np.zeros((newCapacity,), dtype=self.rowDtype)
+        rows[:self.capacity] = self._rows
+        self._rows = rows
+        for column in self._objectColumns.values():
+            column.extend([None] * numNew)
+        for column in self._metadataColumns.values():
+            column.extend([_missing] * numNew)
+
+    def getTimestamp(self, row: int) -> Timestamp:
+        timestamp = Timestamp(int(self._rows['timestamp'][row]))
+        tz = self._timestampTzs.get(row, None)
+        if tz is not None:
+            timestamp = timestamp.tz_localize('UTC').tz_convert(tz)
+        return timestamp
+
+    def setTimestamp(self, row: int, timestamp: Timestamp) -> None:
+        timestamp = Timestamp(timestamp)
+        self._rows['timestamp'][row] = timestamp.value
+        if timestamp.tzinfo is not None:
+            self._timestampTzs[row] = timestamp.tzinfo
+        else:
+            self._timestampTzs.pop(row, None)
+
+    def getCoilToMRITransf(self, row: int) -> np.ndarray | None:
+        if not self._rows['hasTransf'][row]:
+            return None
+        return self._rows['coilToMRITransf'][row].copy()
+
+    def setCoilToMRITransf(self, row: int, transf: np.ndarray | None) -> None:
+        if transf is None:
+            self._rows['hasTransf'][row] = False
+            self._rows['coilToMRITransf'][row] = 0
+        else:
+            self._rows['hasTransf'][row] = True
+            self._rows['coilToMRITransf'][row] = transf
+
+    def getFlag(self, row: int, key: str) -> bool:
+        return bool(self._rows[key][row])
+
+    def setFlag(self, row: int, key: str, value: bool) -> None:
+        self._rows[key][row] = value
+
+    def getObject(self, row: int, key: str) -> tp.Any:
+        return self._objectColumns[key][row]
+
+    def setObject(self, row: int, key: str, value: tp.Any) -> None:
+        self._objectColumns[key][row] = value
+
+    def getMetadata(self, row: int) -> dict[str, tp.Any]:
+        return {key: column[row] for key, column in self._metadataColumns.items() if column[row] is not _missing}
+
+    def setMetadata(self, row: int, metadata: dict[str, tp.Any]) -> None:
+        for key, column in self._metadataColumns.items():
+            column[row] = metadata.get(key, _missing)
+        for key, value in metadata.items():
+            if key not in self._metadataColumns:
+                column = [_missing] * self.capacity
+                column[row] = value
+                self._metadataColumns[key] = column
+
+    def getMetadataValue(self, row: int, key: str) -> tp.Any:
+        """
+        Raises KeyError if row has no value for key.
+        """
+        value = self._metadataColumns[key][row]
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def setMetadataValue(self, row: int, key: str, value: tp.Any) -> None:
+        column = self._metadataColumns.get(key, None)
+        if column is None:
+            column = [_missing] * self.capacity
+            self._metadataColumns[key] = column
+        column[row] = value
+
+    def deleteMetadataValue(self, row: int, key: str) -> None:
+        self.getMetadataValue(row, key)  # raise KeyError if missing
+        self._metadataColumns[key][row] = _missing
+
+    def getMetadataKeys(self, row: int) -> list[str]:
+        return [key for key, column in self._metadataColumns.items() if column[row] is not _missing]
+
+    def getMetadataColumn(self, rows: np.ndarray, key: str, default: tp.Any = None) -> list[tp.Any]:
+        column = self._metadataColumns.get(key, None)
+        if column is None:
+            return [default] * len(rows)
+        return [default if column[row] is _missing else column[row] for row in rows]
+
+
+class _SampleMetadataView(MutableMapping):
+    """
+    Mapping view onto the metadata of a store-backed sample. Writes go directly to the store, and
+    (unless made within `Sample.changingMetadata`) signal a metadata change on the sample.
+
+    If the sample is removed from its collection, the view continues to refer to the sample's own metadata.
+    """
+    __slots__ = ('_sample',)
+
+    def __init__(self, sample: Sample):
+        self._sample = sample
+
+    def __getitem__(self, key: str) -> tp.Any:
+        sample = self._sample
+        if sample._store is None:
+            return sample._metadata[key]
+        return sample._store.getMetadataValue(sample._row, key)
+
+    def __setitem__(self, key: str, value: tp.Any) -> None:
+        with self._sample.changingMetadata():
+            sample = self._sample
+            if sample._store is None:
+                sample._metadata[key] = value
+            else:
+                sample._store.setMetadataValue(sample._row, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        with self._sample.changingMetadata():
+            sample = self._sample
+            if sample._store is None:
+                del sample._metadata[key]
+            else:
+                sample._store.deleteMetadataValue(sample._row, key)
+
+    def __iter__(self) -> tp.Iterator[str]:
+        sample = self._sample
+        if sample._store is None:
+            return iter(list(sample._metadata))
+        return iter(sample._store.getMetadataKeys(sample._row))
+
+    def __len__(self) -> int:
+        sample = self._sample
+        if sample._store is None:
+            return len(sample._metadata)
+        return len(sample._store.getMetadataKeys(sample._row))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 @attrs.define
 class Sample(GenericCollectionDictItem[str]):
     """
     Represents a single recorded sample
+
+    While part of a Samples collection, the sample's values are stored in the collection's SampleColumnStore
+    and the sample acts as a view onto its row; access values through public properties (or asDict()) rather
+    than private fields.
     """
-    _timestamp: Timestamp
+    _timestamp: Timestamp | None
     _coilToMRITransf: tp.Optional[np.ndarray] = None
     _targetKey: tp.Optional[str] = None
     """
@@ -42,116 +252,234 @@ class Sample(GenericCollectionDictItem[str]):
     _isSelected: bool = False
     _color: tp.Optional[str] = None
 
-    _metadata: dict[str, tp.Any] = attrs.field(factory=dict)
+    _metadata: dict[str, tp.Any] | None = attrs.field(factory=dict)
     """
     For storing misc metadata, such as information about the trigger event that initiated this sample.
     
     Values should be JSON-serializable.
     """
 
+    _store: SampleColumnStore | None = attrs.field(init=False, default=None, repr=False, eq=False)
+    _row: int = attrs.field(init=False, default=-1, repr=False, eq=False)
+    _metadataChangeDepth: int = attrs.field(init=False, default=0, repr=False, eq=False)
+    """
+    Nesting depth of changingMetadata() contexts, so that nested / per-key changes signal only once
+    """
+
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
 
+    def _attachToStore(self, store: SampleColumnStore):
+        assert self._store is None, 'Sample already belongs to a collection'
+        row = store.allocateRow()
+        store.setTimestamp(row, self._timestamp)
+        store.setCoilToMRITransf(row, self._coilToMRITransf)
+        for key in SampleColumnStore.objectColumnNames:
+            store.setObject(row, key, getattr(self, '_' + key))
+        store.setFlag(row, 'isVisible', self._isVisible)
+        store.setFlag(row, 'isSelected', self._isSelected)
+        store.setMetadata(row, self._metadata)
+        self._store = store
+        self._row = row
+        # drop per-sample copies now owned by the store
+        self._timestamp = None
+        self._coilToMRITransf = None
+        self._metadata = None
+
+    def _detachFromStore(self):
+        store, row = self._store, self._row
+        assert store is not None
+        self._timestamp = store.getTimestamp(row)
+        self._coilToMRITransf = store.getCoilToMRITransf(row)
+        for key in SampleColumnStore.objectColumnNames:
+            setattr(self, '_' + key, store.getObject(row, key))
+        self._isVisible = store.getFlag(row, 'isVisible')
+        self._isSelected = store.getFlag(row, 'isSelected')
+        self._metadata = store.getMetadata(row)
+        self._store = None
+        self._row = -1
+        store.freeRow(row)
+
+    def _getObject(self, key: str) -> tp.Any:
+        if self._store is not None:
+            return self._store.getObject(self._row, key)
+        return getattr(self, '_' + key)
+
+    def _setObject(self, key: str, value: tp.Any):
+        if self._store is not None:
+            self._store.setObject(self._row, key, value)
+        else:
+            setattr(self, '_' + key, value)
+
+    def _getFlag(self, key: str) -> bool:
+        if self._store is not None:
+            return self._store.getFlag(self._row, key)
+        return getattr(self, '_' + key)
+
+    def _setFlag(self, key: str, value: bool):
+        if self._store is not None:
+            self._store.setFlag(self._row, key, value)
+        else:
+            setattr(self, '_' + key, value)
+
     @property
-    def timestamp(self):
+    def timestamp(self) -> Timestamp:
+        if self._store is not None:
+            return self._store.getTimestamp(self._row)
         return self._timestamp
 
     @timestamp.setter
     def timestamp(self, newTimestamp: Timestamp):
-        if self._timestamp == newTimestamp:
+        if self.timestamp == newTimestamp:
             return
         self.sigItemAboutToChange.emit(self.key, ['timestamp'])
-        self._timestamp = newTimestamp
+        if self._store is not None:
+            self._store.setTimestamp(self._row, newTimestamp)
+        else:
+            self._timestamp = newTimestamp
         self.sigItemChanged.emit(self.key, ['timestamp'])
 
     @property
-    def coilToMRITransf(self):
+    def coilToMRITransf(self) -> np.ndarray | None:
+        if self._store is not None:
+            return self._store.getCoilToMRITransf(self._row)
         return self._coilToMRITransf
 
     @coilToMRITransf.setter
     def coilToMRITransf(self, newTransf: tp.Optional[np.ndarray]):
-        if array_equalish(self._coilToMRITransf, newTransf):
+        if array_equalish(self.coilToMRITransf, newTransf):
             return
         self.sigItemAboutToChange.emit(self.key, ['coilToMRITransf'])
-        self._coilToMRITransf = newTransf
+        if self._store is not None:
+            self._store.setCoilToMRITransf(self._row, newTransf)
+        else:
+            self._coilToMRITransf = newTransf
         self.sigItemChanged.emit(self.key, ['coilToMRITransf'])
 
     @property
     def hasTransf(self):
+        if self._store is not None:
+            return self._store.getFlag(self._row, 'hasTransf')
         return self._coilToMRITransf is not None
 
     @property
     def targetKey(self):
-        return self._targetKey
+        return self._getObject('targetKey')
 
     @targetKey.setter
     def targetKey(self, newKey: tp.Optional[str]):
-        if self._targetKey == newKey:
+        if self.targetKey == newKey:
             return
         self.sigItemAboutToChange.emit(self.key, ['targetKey'])
-        self._targetKey = newKey
+        self._setObject('targetKey', newKey)
         self.sigItemChanged.emit(self.key, ['targetKey'])
 
     @property
     def coilKey(self):
-        return self._coilKey
+        return self._getObject('coilKey')
 
     @coilKey.setter
     def coilKey(self, newKey: tp.Optional[str]):
-        if self._coilKey == newKey:
+        if self.coilKey == newKey:
             return
         self.sigItemAboutToChange.emit(self.key, ['coilKey'])
-        self._coilKey = newKey
+        self._setObject('coilKey', newKey)
         self.sigItemChanged.emit(self.key, ['coilKey'])
 
     @property
     def isVisible(self):
-        return self._isVisible
+        return self._getFlag('isVisible')
 
     @isVisible.setter
     def isVisible(self, isVisible: bool):
-        if self._isVisible == isVisible:
+        if self.isVisible == isVisible:
             return
         self.sigItemAboutToChange.emit(self.key, ['isVisible'])
-        self._isVisible = isVisible
+        self._setFlag('isVisible', isVisible)
         self.sigItemChanged.emit(self.key, ['isVisible'])
 
     @property
     def isSelected(self):
-        return self._isSelected
+        return self._getFlag('isSelected')
 
     @isSelected.setter
     def isSelected(self, isSelected: bool):
-        if self._isSelected == isSelected:
+        if self.isSelected == isSelected:
             return
         self.sigItemAboutToChange.emit(self.key, ['isSelected'])
-        self._isSelected = isSelected
+        self._setFlag('isSelected', isSelected)
         self.sigItemChanged.emit(self.key, ['isSelected'])
 
     @property
     def color(self):
-        return self._color
+        return self._getObject('color')
 
     @property
-    def metadata(self):
+    def metadata(self) -> MutableMapping[str, tp.Any]:
         """
-        Note: if needing to modify the result, make sure to do within the `changingMetadata` context manager, like:
+        Note: if needing to modify multiple values, do so within the `changingMetadata` context manager
+        to signal the change only once, like:
                 with sample.changingMetadata() as metadata:
                     metadata['foo'] = 'bar'
+                    metadata['baz'] = 1
+
+        For a sample in a collection, this is a view onto the collection's storage; single-key writes outside
+        of `changingMetadata` are kept and signaled.
         """
+        if self._store is not None:
+            return _SampleMetadataView(self)
         return self._metadata
 
     @contextlib.contextmanager
     def changingMetadata(self):
-        self.sigItemAboutToChange.emit(self.key, ['metadata'])
-        yield self._metadata
-        self.sigItemChanged.emit(self.key, ['metadata'])
+        isOutermost = self._metadataChangeDepth == 0
+        if isOutermost:
+            self.sigItemAboutToChange.emit(self.key, ['metadata'])
+        self._metadataChangeDepth += 1
+        try:
+            yield self.metadata
+        finally:
+            self._metadataChangeDepth -= 1
+        if isOutermost:
+            self.sigItemChanged.emit(self.key, ['metadata'])
 
     def __str__(self):
         return pformat(self.asDict())
 
+    def __repr__(self):
+        # generated repr would show private fields, which are stale for store-backed samples
+        return f'{self.__class__.__name__}({", ".join(f"{key}={val!r}" for key, val in self.asDict().items())})'
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.key == other.key \
+            and self.timestamp == other.timestamp \
+            and array_equalish(self.coilToMRITransf, other.coilToMRITransf) \
+            and self.targetKey == other.targetKey \
+            and self.coilKey == other.coilKey \
+            and self.isVisible == other.isVisible \
+            and self.isSelected == other.isSelected \
+            and self.color == other.color \
+            and self.metadata == other.metadata
+
     def asDict(self) -> tp.Dict[str, tp.Any]:
-        d = attrsWithNumpyAsDict(self, npFields=('coilToMRITransf',))
+        if self._store is None:
+            d = attrsWithNumpyAsDict(self, npFields=('coilToMRITransf',))
+        else:
+            # match attrsAsDict output: omit values equal to defaults
+            d = dict(key=self.key, timestamp=self.timestamp)
+            coilToMRITransf = self.coilToMRITransf
+            if coilToMRITransf is not None:
+                d['coilToMRITransf'] = ndarrayAsSerializable(coilToMRITransf)
+            for key, default in (('targetKey', None), ('coilKey', None), ('isVisible', True),
+                                 ('isSelected', False), ('color', None)):
+                val = getattr(self, key)
+                if val != default:
+                    d[key] = val
+            metadata = self._store.getMetadata(self._row)
+            if len(metadata) > 0:
+                d['metadata'] = metadata
 
         d['timestamp'] = d['timestamp'].isoformat(timespec='microseconds')  # default may include nanoseconds, which can break when calling with fromisoformat on later import
 
@@ -168,9 +496,66 @@ class Sample(GenericCollectionDictItem[str]):
 
 @attrs.define
 class Samples(GenericCollection[str, Sample]):
+    """
+    Sample values are kept in a columnar SampleColumnStore owned by the collection. Vectorized accessors
+    (e.g. getCoilToMRITransfs) return values for many samples at once without going through Sample objects.
+    """
+    _store: SampleColumnStore = attrs.field(init=False, factory=SampleColumnStore, repr=False, eq=False)
+    _cachedRowsInOrder: np.ndarray | None = attrs.field(init=False, default=None, repr=False, eq=False)
+
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
 
+    def _connectItem(self, item: Sample):
+        item._attachToStore(self._store)
+        self._cachedRowsInOrder = None
+        super()._connectItem(item)
+
+    def _disconnectItem(self, item: Sample):
+        super()._disconnectItem(item)
+        item._detachFromStore()
+        self._cachedRowsInOrder = None
+
+    def _getRows(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        if keys is None:
+            if self._cachedRowsInOrder is None or len(self._cachedRowsInOrder) != len(self._items):
+                self._cachedRowsInOrder = np.fromiter((item._row for item in self._items.values()),
+                                                      dtype=np.intp, count=len(self._items))
+            return self._cachedRowsInOrder
+        return np.asarray([self._items[key]._row for key in keys], dtype=np.intp)
+
+    def getCoilToMRITransfs(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        """
+        Get transforms of specified samples (or all samples, in collection order) as an (N, 4, 4) array.
+        Samples without a transform are filled with NaN.
+        """
+        rows = self._store.rows[self._getRows(keys)]
+        transfs = rows['coilToMRITransf']
+        transfs[~rows['hasTransf']] = np.nan
+        return transfs
+
+    def getHasTransfs(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        return self._store.rows['hasTransf'][self._getRows(keys)]
+
+    def getTimestamps(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        """
+        Get timestamps of specified samples as an array of datetime64[ns]. Timezone info (if any) is not included.
+        """
+        return self._store.rows['timestamp'][self._getRows(keys)].view('datetime64[ns]')
+
+    def getIsVisible(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        return self._store.rows['isVisible'][self._getRows(keys)]
+
+    def getIsSelected(self, keys: tp.Iterable[str] | None = None) -> np.ndarray:
+        return self._store.rows['isSelected'][self._getRows(keys)]
+
+    def getMetadataColumn(self, metadataKey: str, keys: tp.Iterable[str] | None = None,
+                          default: tp.Any = None) -> list[tp.Any]:
+        """
+        Get value of a single metadata field for specified samples, with `default` for samples missing that field.
+        """
+        return self._store.getMetadataColumn(self._getRows(keys), metadataKey, default=default)
+
     def getUniqueSampleKey(self,
                            baseStr: str = 'Sample ',
                            startAtIndex: tp.Optional[int] = None,
@@ -211,9 +596,11 @@ class Samples(GenericCollection[str, Sample]):
             return self.getUniqueSampleKey(baseStr=key, startAtIndex=startAtIndex)
 
     def setWhichSamplesVisible(self, visibleKeys: list[str]):
+        visibleKeys = set(visibleKeys)
         self.setAttribForItems(self.keys(), dict(isVisible=[key in visibleKeys for key in self.keys()]))
 
     def setWhichSamplesSelected(self, selectedKeys: tp.List[str]):
+        selectedKeys = set(selectedKeys)
         self.setAttribForItems(self.keys(), dict(isSelected=[key in selectedKeys for key in self.keys()]))
 
     @classmethod
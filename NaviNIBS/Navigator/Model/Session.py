@@ -6,7 +6,8 @@ import shutil
 import attrs
 from copy import deepcopy
 from datetime import datetime
-import jsbeautifier
+import functools
+import io
 import json
 import logging
 import os
@@ -31,8 +32,12 @@ from NaviNIBS.Navigator.Model.Triggering import TriggerSources, TriggerSource
 from NaviNIBS.Navigator.Model.DigitizedLocations import DigitizedLocations, DigitizedLocation
 from NaviNIBS.Navigator.Model.DockWidgetLayouts import DockWidgetLayouts
 from NaviNIBS.Navigator.Model.Addons import Addons, Addon
+from NaviNIBS.util.AutosaveJournal import AutosaveJournal, AutosaveJournalWriter, parseJournalRef, readJournalRef
+from NaviNIBS.util.binarySidecar import dumpSidecar, loadSidecar, isSidecarPath, sidecarExtension
+from NaviNIBS.util.IncrementalZipArchive import IncrementalZipArchiveWriter
+from NaviNIBS.util.json import JSONSerializer, compactJSONSerializer, prettyJSONSerializer
 from NaviNIBS.util.Signaler import Signal
-from NaviNIBS.util.numpy import array_equalish
+from NaviNIBS.util.numpy import array_equalish, numpyFieldsAsArrays
 
 
 logger = logging.getLogger(__name__)
@@ -72,18 +77,52 @@ class Session:
     _compressedFileIsDirty: bool = True
 
     _sessionConfigFilename: ClassVar[str] = 'SessionConfig'
-    _lastAutosaveFilenamePrefix: tp.Optional[str] = None
-    _latestConfigFormatVersion: ClassVar[str] = '0.0.2'
+    _autosaveDirname: ClassVar[str] = 'autosaved'
+    _autosaveWriter: AutosaveJournalWriter | None = attrs.field(init=False, default=None, repr=False)
+    _latestConfigFormatVersion: ClassVar[str] = '0.0.3'
     """
     Config format version history:
     - 0.0.1: Initial format, went through a number of iterations
     - 0.0.2:
         - Switched from dict to list of trigger sources
         - Switched fiducial format
+    - 0.0.3:
+        - Sections in _binarySidecarKeys saved as binary sidecar files instead of JSON
     """
+    _supportedConfigFormatVersions: ClassVar[tuple[str, ...]] = ('0.0.2', '0.0.3')
+    """
+    Config format versions that can be loaded. Sessions in older supported versions are upgraded on next save.
+    """
+    _binarySidecarKeys: ClassVar[frozenset[str]] = frozenset({'subjectRegistration', 'samples', 'tools'})
+    """
+    Config parts dominated by numeric data (transforms, head points, histories) that are saved in binary sidecar
+    files (see util/binarySidecar.py) rather than as JSON, starting with config format version 0.0.3.
+    """
+    _binarySidecarMinConfigFormatVersion: ClassVar[str] = '0.0.3'
+    _sectionKeys: ClassVar[tuple[str, ...]] = ('miscSettings', 'MRI', 'headModel', 'coordinateSystems', 'ROIs',
+                                               'digitizedLocations', 'subjectRegistration', 'targets', 'targetGrids',
+                                               'samples', 'tools', 'triggerSources', 'dockWidgetLayouts')
+    _sectionsWithSessionRef: ClassVar[tuple[str, ...]] = ('coordinateSystems', 'targets', 'targetGrids', 'ROIs',
+                                                          'headModel')
     _unpackedSessionDir: tp.Optional[tp.Union[tempfile.TemporaryDirectory, str]] = attrs.field(default=None)
+    _lazySectionLoaders: dict[str, tp.Callable[[str], tp.Any]] = attrs.field(factory=dict, repr=False)
+    """
+    Loaders for sections that have not been parsed yet, keyed by section name (see `loadFromUnpackedDir(lazy=True)`).
+    Each takes the unpacked session dir and returns the parsed section. The corresponding section field is None until
+    first accessed through its property.
+    """
 
-    _beautifier: jsbeautifier.Beautifier | None = attrs.field(init=False, default=None)
+    _jsonSerializer: JSONSerializer = attrs.field(default=compactJSONSerializer, repr=False)
+    """
+    Serializer for section files saved as JSON. Pass e.g. `JSONSerializer(pretty=True)` for human-readable output.
+    The main session config is always pretty-printed, since it is small and most likely to be inspected by hand.
+    """
+
+    _archiveWriter: IncrementalZipArchiveWriter | None = attrs.field(init=False, default=None, repr=False)
+    """
+    Writer for compressed session file, which keeps track of what is already in the archive so that saves only
+    need to write changed files.
+    """
 
     sigInfoChanged: Signal = attrs.field(init=False, factory=lambda: Signal((tp.Optional[list[str]])))
     """
@@ -99,41 +138,68 @@ class Session:
             logger.debug('Creating dir for unpacking session at {}'.format(self.unpackedSessionDir))
             os.makedirs(self.unpackedSessionDir)
 
-        if self._tools is None:
+        if self._tools is None and 'tools' not in self._lazySectionLoaders:
             self._tools = Tools(sessionPath=self._filepath)
 
         self.sigInfoChanged.connect(lambda *args: self.flagKeyAsDirty('info'))
-        self.miscSettings.sigAttribsChanged.connect(lambda *args: self.flagKeyAsDirty('miscSettings'))
-        self.MRI.sigFilepathChanged.connect(lambda: self.flagKeyAsDirty('MRI'))
-        self.MRI.sigManualClimChanged.connect(lambda *args: self.flagKeyAsDirty('MRI'))
-        self.headModel.sigFilepathChanged.connect(lambda: self.flagKeyAsDirty('headModel'))
-        self.headModel.sigTransformChanged.connect(lambda: self.flagKeyAsDirty('headModel'))
-        self.ROIs.sigItemsChanged.connect(self._onROIsChanged)
-        self.subjectRegistration.fiducials.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
-        self.subjectRegistration.sampledHeadPoints.sigHeadpointsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
-        self.subjectRegistration.sampledHeadPoints.sigAttribsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
-        self.subjectRegistration.sigTrackerToMRITransfChanged.connect(lambda: self.flagKeyAsDirty('subjectRegistration'))
-        self.targets.sigItemsChanged.connect(lambda targetKeys, attribKeys: self.flagKeyAsDirty('targets'))
-        self.targetGrids.sigItemsChanged.connect(lambda targetGridKeys, attribKeys: self.flagKeyAsDirty('targetGrids'))
-        self.samples.sigItemsChanged.connect(lambda sampleTimestamps, attribKeys: self.flagKeyAsDirty('samples'))
-        self.tools.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('tools'))
-        self.tools.sigPositionsServerInfoChanged.connect(lambda *args: self.flagKeyAsDirty('tools'))
-        self.triggerSources.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('triggerSources'))
-        self._dockWidgetLayouts.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('dockWidgetLayouts'))
+
+        for key in self._sectionKeys:
+            if key not in self._lazySectionLoaders:
+                self._connectToSection(key)
         self.addons.sigItemsAboutToChange.connect(self._onAddonsAboutToChange)
         self.addons.sigItemsChanged.connect(self._onAddonsChanged)
-        self.targets.sigItemKeyChanged.connect(self._updateSamplesForNewTargetKey)
-        self.targets.sigItemsAboutToChange.connect(self._onTargetsAboutToChange, priority=1)  # use higher priority to make sure we handle adding historical samples before notifying GUIs of this change
-        self.targets.sigItemsChanged.connect(self._onTargetsChanged)
-        self.samples.sigItemsChanged.connect(self._onSamplesChanged)
-        self.coordinateSystems.sigItemsChanged.connect(self._onCoordinateSystemsChanged)
-        self.digitizedLocations.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('digitizedLocations'))
-
-        self.coordinateSystems.session = self
-        self.targets.session = self
-        self.targetGrids.session = self
-        self.ROIs.session = self
-        self.headModel.session = self
+
+        for key in self._sectionsWithSessionRef:
+            if key not in self._lazySectionLoaders:
+                getattr(self, key).session = self
+
+    def _connectToSection(self, key: str):
+        if key == 'miscSettings':
+            self.miscSettings.sigAttribsChanged.connect(lambda *args: self.flagKeyAsDirty('miscSettings'))
+        elif key == 'MRI':
+            self.MRI.sigFilepathChanged.connect(lambda: self.flagKeyAsDirty('MRI'))
+            self.MRI.sigManualClimChanged.connect(lambda *args: self.flagKeyAsDirty('MRI'))
+        elif key == 'headModel':
+            self.headModel.sigFilepathChanged.connect(lambda: self.flagKeyAsDirty('headModel'))
+            self.headModel.sigTransformChanged.connect(lambda: self.flagKeyAsDirty('headModel'))
+        elif key == 'coordinateSystems':
+            self.coordinateSystems.sigItemsChanged.connect(self._onCoordinateSystemsChanged)
+        elif key == 'ROIs':
+            self.ROIs.sigItemsChanged.connect(self._onROIsChanged)
+        elif key == 'digitizedLocations':
+            self.digitizedLocations.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('digitizedLocations'))
+        elif key == 'subjectRegistration':
+            self.subjectRegistration.fiducials.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
+            self.subjectRegistration.sampledHeadPoints.sigHeadpointsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
+            self.subjectRegistration.sampledHeadPoints.sigAttribsChanged.connect(lambda *args: self.flagKeyAsDirty('subjectRegistration'))
+            self.subjectRegistration.sigTrackerToMRITransfChanged.connect(lambda: self.flagKeyAsDirty('subjectRegistration'))
+        elif key == 'targets':
+            self.targets.sigItemsChanged.connect(lambda targetKeys, attribKeys: self.flagKeyAsDirty('targets'))
+            self.targets.sigItemKeyChanged.connect(self._updateSamplesForNewTargetKey)
+            self.targets.sigItemsAboutToChange.connect(self._onTargetsAboutToChange, priority=1)  # use higher priority to make sure we handle adding historical samples before notifying GUIs of this change
+            self.targets.sigItemsChanged.connect(self._onTargetsChanged)
+        elif key == 'targetGrids':
+            self.targetGrids.sigItemsChanged.connect(lambda targetGridKeys, attribKeys: self.flagKeyAsDirty('targetGrids'))
+        elif key == 'samples':
+            self.samples.sigItemsChanged.connect(lambda sampleTimestamps, attribKeys: self.flagKeyAsDirty('samples'))
+            self.samples.sigItemsChanged.connect(self._onSamplesChanged)
+        elif key == 'tools':
+            self.tools.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('tools'))
+            self.tools.sigPositionsServerInfoChanged.connect(lambda *args: self.flagKeyAsDirty('tools'))
+        elif key == 'triggerSources':
+            self.triggerSources.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('triggerSources'))
+        elif key == 'dockWidgetLayouts':
+            self.dockWidgetLayouts.sigItemsChanged.connect(lambda *args: self.flagKeyAsDirty('dockWidgetLayouts'))
+        else:
+            raise KeyError(key)
+
+    def _loadLazySection(self, key: str):
+        loader = self._lazySectionLoaders.pop(key)
+        logger.debug(f'Loading {key} on first access')
+        setattr(self, '_' + key, loader(self.unpackedSessionDir))
+        self._connectToSection(key)
+        if key in self._sectionsWithSessionRef:
+            getattr(self, '_' + key).session = self
 
         # TODO
 
@@ -170,46 +236,68 @@ class Session:
 
     @property
     def miscSettings(self):
+        if self._miscSettings is None:
+            self._loadLazySection('miscSettings')
         return self._miscSettings
 
     @property
     def MRI(self):
+        if self._MRI is None:
+            self._loadLazySection('MRI')
         return self._MRI
 
     @property
     def headModel(self):
+        if self._headModel is None:
+            self._loadLazySection('headModel')
         return self._headModel
 
     @property
     def coordinateSystems(self):
+        if self._coordinateSystems is None:
+            self._loadLazySection('coordinateSystems')
         return self._coordinateSystems
 
     @property
     def ROIs(self):
+        if self._ROIs is None:
+            self._loadLazySection('ROIs')
         return self._ROIs
 
     @property
     def digitizedLocations(self):
+        if self._digitizedLocations is None:
+            self._loadLazySection('digitizedLocations')
         return self._digitizedLocations
 
     @property
     def subjectRegistration(self):
+        if self._subjectRegistration is None:
+            self._loadLazySection('subjectRegistration')
         return self._subjectRegistration
 
     @property
     def targets(self):
+        if self._targets is None:
+            self._loadLazySection('targets')
         return self._targets
 
     @property
     def targetGrids(self):
+        if self._targetGrids is None:
+            self._loadLazySection('targetGrids')
         return self._targetGrids
 
     @property
     def samples(self):
+        if self._samples is None:
+            self._loadLazySection('samples')
         return self._samples
 
     @property
     def tools(self):
+        if self._tools is None:
+            self._loadLazySection('tools')
         return self._tools
 
     @property
@@ -218,6 +306,8 @@ class Session:
 
     @property
     def dockWidgetLayouts(self):
+        if self._dockWidgetLayouts is None:
+            self._loadLazySection('dockWidgetLayouts')
         return self._dockWidgetLayouts
 
     @property
@@ -251,17 +341,18 @@ class Session:
         self._unpackedSessionDir = newUnpackedSessionDir
 
     @property
-    def beautifier(self):
-        """
-        Cached instance of json beautifier. This saves some time compared to initializing with each dumps call.
-        """
-
-        if self._beautifier is None:
-            opts = jsbeautifier.default_options()
-            opts.indent_size = 2
-            self._beautifier = jsbeautifier.Beautifier(opts)
+    def jsonSerializer(self):
+        return self._jsonSerializer
 
-        return self._beautifier
+    @jsonSerializer.setter
+    def jsonSerializer(self, newSerializer: JSONSerializer):
+        if newSerializer == self._jsonSerializer:
+            return
+        self._jsonSerializer = newSerializer
+        # rewrite existing JSON sections in new format on next save
+        for key in self._sectionKeys:
+            if key not in self._binarySidecarKeys:
+                self.flagKeyAsDirty(key)
 
     def flagKeyAsDirty(self, key: str):
         #logger.debug(f'Flagging session config "{key}" as dirty')
@@ -282,19 +373,23 @@ class Session:
             keysToSave = self._dirtyKeys_autosave.copy()
             self._dirtyKeys_autosave.clear()
 
-            autosaveFilenamePrefix = 'autosaved-' + datetime.today().strftime('%y%m%d%H%M%S.%f') + '_'
-            if True:
-                # put autosaved files in an "autosaved" subdirectory to avoid cluttering session root
-                autosaveFilenamePrefix = os.path.join('autosaved', autosaveFilenamePrefix)
-                if not os.path.isdir(os.path.join(self.unpackedSessionDir, 'autosaved')):
-                    os.mkdir(os.path.join(self.unpackedSessionDir, 'autosaved'))
+            # include any sections from previous autosaves that failed to write in the background
+            keysToSave |= self.autosaveWriter.popFailedKeys()
+
+            autosaveTime = datetime.today()
+            # addons write their own config files; put these in an "autosaved" subdirectory to avoid cluttering
+            #  session root
+            autosaveFilenamePrefix = os.path.join(self._autosaveDirname,
+                                                  'autosaved-' + autosaveTime.strftime('%y%m%d%H%M%S.%f') + '_')
         else:
             keysToSave = self._dirtyKeys.copy()
             self._dirtyKeys.clear()
             self._dirtyKeys_autosave.clear()
             self.sigDirtyKeysChanged.emit()
-            self._lastAutosaveFilenamePrefix = None
             autosaveFilenamePrefix = ''
+            if self._autosaveWriter is not None:
+                # make sure an in-progress autosave doesn't overlap with writing main files
+                self._autosaveWriter.waitUntilIdle()
 
         if saveDirtyOnly and len(keysToSave) == 0:
             logger.debug('Nothing to save')
@@ -302,44 +397,66 @@ class Session:
 
         self._compressedFileIsDirty = True
 
-        if asAutosave:
-            configPath = os.path.join(self.unpackedSessionDir, autosaveFilenamePrefix + self._sessionConfigFilename + '.json')
-            if self._lastAutosaveFilenamePrefix is not None:
-                prevConfigPath = os.path.join(self.unpackedSessionDir, self._lastAutosaveFilenamePrefix + self._sessionConfigFilename + '.json')
-            else:
-                prevConfigPath = os.path.join(self.unpackedSessionDir, self._sessionConfigFilename + '.json')
-            self._lastAutosaveFilenamePrefix = autosaveFilenamePrefix
-        else:
-            configPath = os.path.join(self.unpackedSessionDir, self._sessionConfigFilename + '.json')
-            prevConfigPath = configPath
+        configPath = os.path.join(self.unpackedSessionDir, self._sessionConfigFilename + '.json')
 
-        if os.path.exists(prevConfigPath):
-            with open(prevConfigPath, 'r') as f:
-                config = json.load(f)
-            assert config['formatVersion'] == self._latestConfigFormatVersion
+        if asAutosave:
+            # Autosaves are written by a background thread to an append-only journal (see util/AutosaveJournal.py).
+            #  Here we only snapshot changed sections; `config` holds updates to the previous autosave's config.
+            config = dict()
+            configRemovals = set()
+            journalSections: dict[str, tuple[str, tp.Callable[[], bytes]]] = dict()
+            dirtyKeysSnapshot = keysToSave.copy()
+        elif os.path.exists(configPath):
+            config = JSONSerializer.load(configPath)
+            self._checkConfigFormatVersion(config)
+            # any sections saved in an older format were flagged as dirty on load, so are rewritten below
         else:
-            config = dict(formatVersion=self._latestConfigFormatVersion)
+            config = dict()
+        config['formatVersion'] = self._latestConfigFormatVersion
 
         config['softwareVersion'] = NaviNIBS.__version__
 
+        def removeFromConfig(key: str):
+            config.pop(key, None)
+            if asAutosave:
+                configRemovals.add(key)
+
         def saveConfigPartToFileIfNeeded(key: str, getWhatToDump: tp.Callable[[], tp.Any]):
             if key in keysToSave or not saveDirtyOnly:
                 logger.debug(f'Writing {key} info')
+                useSidecar = key in self._binarySidecarKeys
+                if asAutosave:
+                    toDump = getWhatToDump()
+                    if len(toDump) == 0:
+                        removeFromConfig(key)
+                    elif useSidecar:
+                        journalSections[key] = (sidecarExtension, functools.partial(self._encodeSidecar, toDump))
+                    else:
+                        journalSections[key] = ('.json', functools.partial(self._encodeCompactJSON, toDump))
+                    keysToSave.discard(key)
+                    return
                 upperKey = key[0].upper() + key[1:]
-                configFilename_part = autosaveFilenamePrefix + self._sessionConfigFilename + '_' + upperKey + '.json'
+                configFilenameStem_part = self._sessionConfigFilename + '_' + upperKey
+                configFilename_part = configFilenameStem_part + (sidecarExtension if useSidecar else '.json')
+                altConfigFilename_part = configFilenameStem_part + ('.json' if useSidecar else sidecarExtension)
                 outputPath = os.path.join(self.unpackedSessionDir, configFilename_part)
-                toDump = getWhatToDump()
+                altOutputPath = os.path.join(self.unpackedSessionDir, altConfigFilename_part)
+                with numpyFieldsAsArrays():
+                    toDump = getWhatToDump()
                 if len(toDump) == 0:
                     # delete output if it already exists
                     if os.path.exists(outputPath):
                         os.remove(outputPath)
-                    if key in config:
-                        del config[key]
+                    removeFromConfig(key)
                 else:
                     config[key] = configFilename_part
-                    toWrite = self._prettyJSONDumps(toDump)
-                    with open(outputPath, 'w') as f:
-                        f.write(toWrite)
+                    if useSidecar:
+                        dumpSidecar(toDump, outputPath)
+                    else:
+                        self._jsonSerializer.dump(toDump, outputPath)
+                if os.path.exists(altOutputPath):
+                    # remove part saved in other format (e.g. by an older version) so it isn't archived as stale data
+                    os.remove(altOutputPath)
                 keysToSave.discard(key)
 
         if 'info' in keysToSave or not saveDirtyOnly:
@@ -364,7 +481,6 @@ class Session:
         saveConfigPartToFileIfNeeded('digitizedLocations', lambda: self.digitizedLocations.asList())
 
         saveConfigPartToFileIfNeeded('subjectRegistration', lambda: self.subjectRegistration.asDict())
-        # TODO: maybe save contents of potentially larger *History fields to separate file(s)
 
         saveConfigPartToFileIfNeeded('targets', lambda: self.targets.asList())
 
@@ -379,7 +495,7 @@ class Session:
             logger.debug(f'Writing {thisKey} info')
             config[thisKey] = self.triggerSources.asList()
             if len(config[thisKey]) == 0:
-                 del config[thisKey]
+                removeFromConfig(thisKey)
             keysToSave.discard(thisKey)
 
         saveConfigPartToFileIfNeeded('dockWidgetLayouts', lambda: self.dockWidgetLayouts.asList())
@@ -387,13 +503,17 @@ class Session:
         # TODO: loop through any addons to give them a chance to save to config as needed
 
         thisKey = 'addons'
-        if thisKey in keysToSave or not saveDirtyOnly:
+        if thisKey in keysToSave or not saveDirtyOnly or \
+                (asAutosave and any(key.startswith('addon.') for key in keysToSave)):
+            # note: autosave config only holds updates, so write full addons list if any addon changed
             logger.debug(f'Writing {thisKey} info')
+            if asAutosave:
+                os.makedirs(os.path.join(self.unpackedSessionDir, self._autosaveDirname), exist_ok=True)
             config[thisKey] = self.addons.asList(
                 unpackedSessionDir=self.unpackedSessionDir,
                 filenamePrefix=autosaveFilenamePrefix + self._sessionConfigFilename + '_')
             if len(config[thisKey]) == 0:
-                 del config[thisKey]
+                removeFromConfig(thisKey)
             keysToDiscard = {thisKey}
             for key in keysToSave:
                 if key.startswith('addon.'):
@@ -428,12 +548,65 @@ class Session:
         # TODO: save other fields
         assert len(keysToSave) == 0
 
-        with open(configPath, 'w') as f:
-            if False:
-                json.dump(config, f)
-            else:
-                f.write(self._prettyJSONDumps(config))
-            logger.debug('Wrote updated session config')
+        if asAutosave:
+            self.autosaveWriter.submit(time=autosaveTime, sections=journalSections, configUpdates=config,
+                                       configRemovals=configRemovals, dirtyKeys=dirtyKeysSnapshot)
+            logger.debug('Queued autosave')
+            return
+
+        prettyJSONSerializer.dump(config, configPath)
+        logger.debug('Wrote updated session config')
+
+        # later autosaves build on this saved config, so previous autosaves are no longer needed
+        #  (if never autosaved, there is no journal to rotate, and rotation does nothing if journal is empty)
+        autosaveDir = os.path.join(self.unpackedSessionDir, self._autosaveDirname)
+        if self._autosaveWriter is not None or os.path.exists(AutosaveJournal.getIndexPath(autosaveDir)):
+            self.autosaveWriter.rotate()
+
+    @property
+    def autosaveWriter(self) -> AutosaveJournalWriter:
+        autosaveDir = os.path.join(self.unpackedSessionDir, self._autosaveDirname)
+        if self._autosaveWriter is None or self._autosaveWriter.autosaveDir != autosaveDir:
+            if self._autosaveWriter is not None:
+                self._autosaveWriter.waitUntilIdle()
+            self._autosaveWriter = AutosaveJournalWriter(
+                autosaveDir=autosaveDir,
+                refRelTo=self.unpackedSessionDir,
+                getBaseConfig=functools.partial(self._readMainConfig, self.unpackedSessionDir))
+        return self._autosaveWriter
+
+    @classmethod
+    def _checkConfigFormatVersion(cls, config: dict[str, tp.Any]):
+        assert config['formatVersion'] in cls._supportedConfigFormatVersions, \
+            f'Unsupported session config format version {config["formatVersion"]}'
+
+    @classmethod
+    def _isSidecarSection(cls, key: str, formatVersion: str) -> bool:
+        """
+        Whether section `key` is stored as a binary sidecar (rather than JSON) in the given config format version.
+        """
+        def asTuple(version: str) -> tuple[int, ...]:
+            return tuple(int(part) for part in version.split('.'))
+
+        return key in cls._binarySidecarKeys \
+            and asTuple(formatVersion) >= asTuple(cls._binarySidecarMinConfigFormatVersion)
+
+    @classmethod
+    def _readMainConfig(cls, unpackedSessionDir: str) -> dict[str, tp.Any]:
+        configPath = os.path.join(unpackedSessionDir, cls._sessionConfigFilename + '.json')
+        if not os.path.exists(configPath):
+            return dict(formatVersion=cls._latestConfigFormatVersion)
+        return JSONSerializer.load(configPath)
+
+    @staticmethod
+    def _encodeSidecar(toDump: tp.Any) -> bytes:
+        f = io.BytesIO()
+        dumpSidecar(toDump, f)
+        return f.getvalue()
+
+    @staticmethod
+    def _encodeCompactJSON(toDump: tp.Any) -> bytes:
+        return compactJSONSerializer.dumpsBytes(toDump)
 
     def _updateSamplesForNewTargetKey(self, fromKey: str, toKey: str):
         # update any referenced target IDs in samples to use the new key
@@ -449,11 +622,11 @@ class Session:
 
     def _onTargetsAboutToChange(self, keys: list[str], changingAttrs: tp.Optional[list[str]] = None):
         for targetKey in keys:
-            if targetKey not in self._targets:
+            if targetKey not in self.targets:
                 # probably a completely new target
                 continue
 
-            target = self._targets[targetKey]
+            target = self.targets[targetKey]
             if not target.mayBeADependency:
                 continue
             if changingAttrs is None or any(x in changingAttrs for x in ('targetCoord',
@@ -469,7 +642,7 @@ class Session:
                 historicalTarget.isHistorical = True
                 historicalTarget.isVisible = False
                 target.mayBeADependency = False
-                self._targets.addItem(historicalTarget)
+                self.targets.addItem(historicalTarget)
                 self._updateSamplesForNewTargetKey(fromKey=target.key, toKey=historicalTarget.key)
 
     def _onTargetsChanged(self, keys: list[str], changedAttrs: tp.Optional[list[str]] = None):
@@ -485,9 +658,9 @@ class Session:
                     continue
 
                 targetKey = sample.targetKey
-                if targetKey is not None and targetKey in self._targets:
+                if targetKey is not None and targetKey in self.targets:
                     # mark that if there are future changes in the target, a copy may need to be kept (or this sample may need to be notified)
-                    self._targets[targetKey].mayBeADependency = True
+                    self.targets[targetKey].mayBeADependency = True
 
     def _onCoordinateSystemsChanged(self, keys: list[str], changedAttrs: tp.Optional[list[str]] = None):
         # Changes to autogenerated coord systems' internal state (transforms, file
@@ -542,7 +715,19 @@ class Session:
             self.flagKeyAsDirty(f'addon.{addonKey}')
 
     def _prettyJSONDumps(self, obj):
-        return self.beautifier.beautify(json.dumps(obj))
+        return prettyJSONSerializer.dumps(obj)
+
+    @property
+    def archiveWriter(self) -> IncrementalZipArchiveWriter:
+        if self._archiveWriter is None \
+                or self._archiveWriter.archivePath != self._filepath \
+                or self._archiveWriter.rootDir != self.unpackedSessionDir:
+            if self._archiveWriter is not None:
+                self._archiveWriter.close()
+            self._archiveWriter = IncrementalZipArchiveWriter(
+                archivePath=self._filepath,
+                rootDir=self.unpackedSessionDir)
+        return self._archiveWriter
 
     def saveToFile(self, updateDirtyOnly: bool = True):
         self.saveToUnpackedDir(saveDirtyOnly=updateDirtyOnly)
@@ -555,18 +740,29 @@ class Session:
             logger.warning('Nothing to save')
             return
 
-        logger.debug('Making archive')
-        shutil.make_archive(
-            base_name=self._filepath,
-            format='zip',
-            root_dir=self.unpackedSessionDir,
-            base_dir='.',
-        )
-        shutil.move(self._filepath + '.zip', self._filepath)
-        logger.debug('Done saving')
+        if self._autosaveWriter is not None:
+            # don't archive autosave files while they are being written (e.g. rotation queued by the save above)
+            self._autosaveWriter.waitUntilIdle()
+
+        logger.debug('Updating archive')
+        saveStats = self.archiveWriter.save()
+        logger.debug(f'Done saving: {saveStats}')
 
         self._compressedFileIsDirty = False
 
+    def close(self):
+        """
+        Finish any background file writes for this session. Does not save unsaved changes.
+
+        Should be called when done with the session (e.g. when closing it in the GUI, or before exit).
+        """
+        if self._autosaveWriter is not None:
+            # don't lose queued autosaves when the (daemon) writer thread is killed at exit
+            self._autosaveWriter.close()
+        if self._archiveWriter is not None:
+            # compact so that the session file has no shadowed duplicate members for other readers to trip over
+            self._archiveWriter.close()
+
     def mergeFromFile(self, filepath: str, sections: tp.Optional[tp.List[str]] = None):
         """
         Import session elements from another file. Specify `sections` to only read a subset of elements from the file to merge, e.g. `sections=['targets']` to ignore everything but the targets section in the loaded file.
@@ -629,15 +825,18 @@ class Session:
         return self
 
     @classmethod
-    def loadFromFile(cls, filepath: str, unpackedSessionDir: tp.Optional[str] = None):
+    def loadFromFile(cls, filepath: str, unpackedSessionDir: tp.Optional[str] = None, lazy: bool = False):
         if unpackedSessionDir is None:
             unpackedSessionDir = cls.getTempUnpackDir()
         logger.debug('Unpacking archive from {}\nto {}'.format(filepath, unpackedSessionDir))
         assert os.path.exists(filepath)
+        IncrementalZipArchiveWriter.recoverInterruptedAppend(filepath)
         shutil.unpack_archive(filepath, unpackedSessionDir, 'zip')
         logger.debug('Done unpacking')
-        return cls.loadFromUnpackedDir(unpackedSessionDir=unpackedSessionDir, filepath=filepath,
-                                       compressedFileIsDirty=False)
+        self = cls.loadFromUnpackedDir(unpackedSessionDir=unpackedSessionDir, filepath=filepath,
+                                       compressedFileIsDirty=False, lazy=lazy)
+        self.archiveWriter.primeFromArchive()
+        return self
 
     @classmethod
     def loadFromFolder(cls, folderpath: str, **kwargs):
@@ -645,19 +844,23 @@ class Session:
 
     @classmethod
     def loadFromUnpackedDir(cls, unpackedSessionDir: str, filepath: tp.Optional[str] = None,
-                            configPath: tp.Optional[str] = None, **kwargs):
+                            configPath: tp.Optional[str] = None, lazy: bool = False, **kwargs):
         """
         configPath: Optional path to the SessionConfig JSON to load from. Defaults to
             {unpackedSessionDir}/SessionConfig.json. Primarily used for autosave restoration:
             pass an autosave config path (e.g. from findAutosaves()) to reload from that
             specific timepoint.
+        lazy: If True, sections stored in separate files (samples, targets, etc.) are not parsed
+            until first accessed through the corresponding Session property. This makes opening a large
+            session faster when only some sections are needed. Note that a full save
+            (`saveDirtyOnly=False`) accesses, and therefore loads, every section.
         """
         if configPath is None:
             configPath = os.path.join(unpackedSessionDir, cls._sessionConfigFilename + '.json')
-        with open(configPath, 'r') as f:
-            config = json.load(f)
+        config = cls._readConfigPart(unpackedSessionDir, configPath)
         # TODO: validate against schema
-        assert config['formatVersion'] == cls._latestConfigFormatVersion
+        cls._checkConfigFormatVersion(config)
+        formatVersion = config['formatVersion']
 
         kwargs['unpackedSessionDir'] = unpackedSessionDir
         kwargs['filepath'] = filepath if filepath is not None else config['filepath']
@@ -666,77 +869,79 @@ class Session:
 
         otherPathsRelTo = kwargs['filepath']
 
-        if 'miscSettings' in config:
-            configFilename_miscSettings = config['miscSettings']
-            with open(os.path.join(unpackedSessionDir, configFilename_miscSettings), 'r') as f:
-                kwargs['miscSettings'] = MiscSettings.fromDict(json.load(f))
-
-        if 'MRI' in config:
-            configFilename_MRI = config['MRI']
-            with open(os.path.join(unpackedSessionDir, configFilename_MRI), 'r') as f:
-                kwargs['MRI'] = MRI.fromDict(json.load(f), filepathRelTo=otherPathsRelTo)
-
-        if 'headModel' in config:
-            configFilename_headModel = config['headModel']
-            with open(os.path.join(unpackedSessionDir, configFilename_headModel), 'r') as f:
-                kwargs['headModel'] = HeadModel.fromDict(json.load(f), filepathRelTo=otherPathsRelTo)
-
-        if 'coordinateSystems' in config:
-            configFilename_coordinateSystems = config['coordinateSystems']
-            with open(os.path.join(unpackedSessionDir, configFilename_coordinateSystems), 'r') as f:
-                kwargs['coordinateSystems'] = CoordinateSystems.fromList(json.load(f))
-
-        if 'ROIs' in config:
-            configFilename_ROIs = config['ROIs']
-            with open(os.path.join(unpackedSessionDir, configFilename_ROIs), 'r') as f:
-                kwargs['ROIs'] = ROIs.fromList(json.load(f))
-
-        if 'digitizedLocations' in config:
-            configFilename_digitizedLocations = config['digitizedLocations']
-            with open(os.path.join(unpackedSessionDir, configFilename_digitizedLocations), 'r') as f:
-                kwargs['digitizedLocations'] = DigitizedLocations.fromList(json.load(f))
-
-        if 'subjectRegistration' in config:
-            configFilename_subjectReg = config['subjectRegistration']
-            with open(os.path.join(unpackedSessionDir, configFilename_subjectReg), 'r') as f:
-                kwargs['subjectRegistration'] = SubjectRegistration.fromDict(json.load(f))
-
-        if 'targets' in config:
-            configFilename_targets = config['targets']
-            with open(os.path.join(unpackedSessionDir, configFilename_targets), 'r') as f:
-                kwargs['targets'] = Targets.fromList(json.load(f))
-
-        if 'targetGrids' in config:
-            configFilename_targetGrids = config['targetGrids']
-            with open(os.path.join(unpackedSessionDir, configFilename_targetGrids), 'r') as f:
-                kwargs['targetGrids'] = TargetGrids.fromList(json.load(f))
-
-        if 'samples' in config:
-            configFilename_samples = config['samples']
-            with open(os.path.join(unpackedSessionDir, configFilename_samples), 'r') as f:
-                kwargs['samples'] = Samples.fromList(json.load(f))
-
-        if 'tools' in config:
-            configFilename_tools = config['tools']
-            with open(os.path.join(unpackedSessionDir, configFilename_tools), 'r') as f:
-                kwargs['tools'] = Tools.fromList(json.load(f), sessionPath=otherPathsRelTo)
+        sectionParsers: dict[str, tp.Callable[[tp.Any], tp.Any]] = dict(
+            miscSettings=MiscSettings.fromDict,
+            MRI=lambda d: MRI.fromDict(d, filepathRelTo=otherPathsRelTo),
+            headModel=lambda d: HeadModel.fromDict(d, filepathRelTo=otherPathsRelTo),
+            coordinateSystems=CoordinateSystems.fromList,
+            ROIs=ROIs.fromList,
+            digitizedLocations=DigitizedLocations.fromList,
+            subjectRegistration=SubjectRegistration.fromDict,
+            targets=Targets.fromList,
+            targetGrids=TargetGrids.fromList,
+            samples=Samples.fromList,
+            tools=lambda d: Tools.fromList(d, sessionPath=otherPathsRelTo),
+            dockWidgetLayouts=DockWidgetLayouts.fromList,
+        )
+
+        lazySectionLoaders = dict()
+        for key, parser in sectionParsers.items():
+            if key not in config:
+                continue
+            asSidecar = cls._isSidecarSection(key, formatVersion)
+            if lazy:
+                lazySectionLoaders[key] = functools.partial(cls._parseConfigPart, parser=parser,
+                                                            configFilename_part=config[key], asSidecar=asSidecar)
+                kwargs[key] = None
+            else:
+                kwargs[key] = cls._parseConfigPart(unpackedSessionDir, parser=parser,
+                                                   configFilename_part=config[key], asSidecar=asSidecar)
+        if len(lazySectionLoaders) > 0:
+            kwargs['lazySectionLoaders'] = lazySectionLoaders
 
         if 'triggerSources' in config:
             kwargs['triggerSources'] = TriggerSources.fromList(config['triggerSources'])
 
-        if 'dockWidgetLayouts' in config:
-            configFilename_docWidgetLayouts = config['dockWidgetLayouts']
-            with open(os.path.join(unpackedSessionDir, configFilename_docWidgetLayouts), 'r') as f:
-                kwargs['dockWidgetLayouts'] = DockWidgetLayouts.fromList(json.load(f))
-
         if 'addons' in config:
             kwargs['addons'] = Addons.fromList(config['addons'], unpackedSessionDir=unpackedSessionDir)
 
         # TODO: load other available fields
 
-        logger.debug('Loaded from unpacked dir:\n{}'.format(kwargs))
+        # note: only log keys, since formatting full contents of large sections (e.g. samples) is slow
+        logger.debug('Loaded {} from unpacked dir{}'.format(
+            list(kwargs.keys()),
+            '' if len(lazySectionLoaders) == 0 else f' (deferred {list(lazySectionLoaders.keys())})'))
+
+        self = cls(**kwargs)
 
-        return cls(**kwargs)
+        if formatVersion != cls._latestConfigFormatVersion:
+            logger.info(f'Session config format version {formatVersion} will be upgraded to '
+                        f'{cls._latestConfigFormatVersion} on next save')
+            for key in cls._binarySidecarKeys:
+                if key in config and not cls._isSidecarSection(key, formatVersion):
+                    self.flagKeyAsDirty(key)
+
+        return self
+
+    @staticmethod
+    def _readConfigPart(unpackedSessionDir: str, configFilename_part: str, asSidecar: bool = False) -> tp.Any:
+        path = os.path.join(unpackedSessionDir, configFilename_part)
+        if asSidecar != isSidecarPath(path):
+            raise ValueError(f'Expected {"binary sidecar" if asSidecar else "JSON"} file for session config part '
+                             f'{configFilename_part} based on config format version')
+        if parseJournalRef(path) is not None:
+            data = readJournalRef(path)
+            if asSidecar:
+                return loadSidecar(io.BytesIO(data))
+            return JSONSerializer.loads(data)
+        if asSidecar:
+            return loadSidecar(path)
+        return JSONSerializer.load(path)
+
+    @classmethod
+    def _parseConfigPart(cls, unpackedSessionDir: str, parser: tp.Callable[[tp.Any], tp.Any],
+                         configFilename_part: str, asSidecar: bool = False) -> tp.Any:
+        return parser(cls._readConfigPart(unpackedSessionDir, configFilename_part, asSidecar=asSidecar))
 
     @classmethod
     def getTempUnpackDir(cls):
@@ -747,16 +952,27 @@ class Session:
         """
         Returns a list of (autosave_datetime, autosave_config_path) for all autosave configs
         that are newer than the main SessionConfig.json, sorted newest-first.
+
+        Config paths may be references into an autosave journal rather than plain file paths; either can be passed
+        as `configPath` to `loadFromUnpackedDir`.
         """
         mainConfigPath = os.path.join(unpackedSessionDir, cls._sessionConfigFilename + '.json')
         if not os.path.exists(mainConfigPath):
             return []
         mainConfigMtime = datetime.fromtimestamp(os.path.getmtime(mainConfigPath))
 
-        autosaveDir = os.path.join(unpackedSessionDir, 'autosaved')
+        autosaveDir = os.path.join(unpackedSessionDir, cls._autosaveDirname)
         if not os.path.isdir(autosaveDir):
             return []
 
+        checkpoints = AutosaveJournal.readCheckpoints(autosaveDir)
+        if checkpoints is not None:
+            results = [(checkpoint.time, checkpoint.configRef) for checkpoint in checkpoints
+                       if checkpoint.time > mainConfigMtime]
+            results.sort(key=lambda x: x[0], reverse=True)  # newest first
+            return results
+
+        # fall back to autosaves written by older versions as separate files
         prefix = 'autosaved-'
         suffix = '_' + cls._sessionConfigFilename + '.json'
 
@@ -780,14 +996,13 @@ class Session:
         Returns a list of human-readable section names that changed in the given autosave
         relative to the main SessionConfig.json.
         """
-        mainConfigPath = os.path.join(unpackedSessionDir, cls._sessionConfigFilename + '.json')
-        with open(mainConfigPath, 'r') as f:
-            mainConfig = json.load(f)
-        with open(autosaveConfigPath, 'r') as f:
-            autosaveConfig = json.load(f)
+        mainConfig = cls._readMainConfig(unpackedSessionDir)
+        autosaveConfig = cls._readConfigPart(unpackedSessionDir, autosaveConfigPath)
 
         changed = []
         for key in set(mainConfig) | set(autosaveConfig):
+            if key == 'formatVersion':
+                continue  # an autosave of a session loaded from an older format is in the latest format
             if autosaveConfig.get(key) != mainConfig.get(key):
                 # convert camelCase keys to nicer labels
                 changed.append(re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', key).lower())
@@ -17,7 +17,8 @@ from typing import ClassVar
 
 from NaviNIBS.util.attrs import attrsAsDict
 from NaviNIBS.util.Signaler import Signal
-from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict, attrsOptionalNDArrayField
+from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict, attrsOptionalNDArrayField, \
+    ndarrayAsSerializable
 
 from NaviNIBS.Navigator.Model.GenericCollection import GenericCollection, GenericCollectionDictItem
 if tp.TYPE_CHECKING:
@@ -389,7 +390,7 @@ class HeadPoints:
         return self._headPoints
 
     def asList(self):
-        return [headPt.tolist() for headPt in self._headPoints]
+        return ndarrayAsSerializable(np.asarray(self._headPoints))
 
     @classmethod
     def fromList(cls, l: list[tuple[float, float, float]]):
@@ -530,12 +531,12 @@ class SubjectRegistration:
                 del d[key]  # don't include in output if it's empty anyways
 
         if self._sampledHeadPoints.alignmentWeights is not None:
-            d['headPointAlignmentWeights'] = self._sampledHeadPoints.alignmentWeights.tolist()
+            d['headPointAlignmentWeights'] = ndarrayAsSerializable(self._sampledHeadPoints.alignmentWeights)
 
         if self._trackerToMRITransf is not None:
-            d['trackerToMRITransf'] = self._trackerToMRITransf.tolist()
+            d['trackerToMRITransf'] = ndarrayAsSerializable(self._trackerToMRITransf)
         if len(self._trackerToMRITransfHistory) > 0:
-            d['trackerToMRITransfHistory'] = [dict(time=key, trackerToMRITransf=val.tolist() if val is not None else None) for key, val in self._trackerToMRITransfHistory.items()]
+            d['trackerToMRITransfHistory'] = [dict(time=key, trackerToMRITransf=ndarrayAsSerializable(val)) for key, val in self._trackerToMRITransfHistory.items()]
 
         return d
 
@@ -393,10 +393,12 @@ class Targets(GenericCollection[str, Target]):
         self.sigItemsChanged.connect(self._setSessionOnItemsChanged)
 
     def setWhichTargetsVisible(self, visibleKeys: tp.List[str]):
+        visibleKeys = set(visibleKeys)
         self.setAttribForItems(self.keys(), dict(isVisible=[key in visibleKeys for key in self.keys()]))
 
     def setWhichTargetsSelected(self, selectedKeys: tp.List[str]):
         logger.debug(f'setWhichTargetsSelected: {selectedKeys}')
+        selectedKeys = set(selectedKeys)
         self.setAttribForItems(self.keys(), dict(isSelected=[key in selectedKeys for key in self.keys()]))
 
     def _setSessionOnItemsChanged(self, keys: list[str], attribNames: list[str] | None = None):
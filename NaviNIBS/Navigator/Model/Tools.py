@@ -19,7 +19,7 @@ from typing import ClassVar
 from NaviNIBS.Devices import positionsServerHostname, positionsServerPubPort, positionsServerCmdPort
 from NaviNIBS.Navigator.Model.GenericCollection import GenericCollection, GenericCollectionDictItem
 from NaviNIBS.util.attrs import attrsAsDict
-from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict
+from NaviNIBS.util.numpy import array_equalish, attrsWithNumpyAsDict, attrsWithNumpyFromDict, ndarrayAsSerializable
 from NaviNIBS.util.Signaler import Signal
 
 
@@ -451,7 +451,7 @@ class Tool(GenericCollectionDictItem[str]):
 
         if 'toolToTrackerTransfHistory' in d:
             d['toolToTrackerTransfHistory'] = [dict(time=key,
-                                                    toolToTrackerTransf=val.tolist() if val is not None else None)
+                                                    toolToTrackerTransf=ndarrayAsSerializable(val))
                                                for key, val in d['toolToTrackerTransfHistory'].items()]
 
         for key in ('installPath', 'sessionPath'):
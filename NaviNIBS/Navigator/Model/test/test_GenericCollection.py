@@ -0,0 +1,146 @@
+import attrs
+import pytest
+
+from NaviNIBS.Navigator.Model.GenericCollection import GenericList, GenericListItem, listItemAttrSetter
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample, getSampleTimestampNow
+
+
+@pytest.fixture
+def samples():
+    return Samples(items={f'Sample {i}': Sample(key=f'Sample {i}', timestamp=getSampleTimestampNow())
+                          for i in range(5)})
+
+
+@pytest.fixture
+def signalLog(samples):
+    log = []
+    samples.sigItemsAboutToChange.connect(lambda keys, attribKeys: log.append(('about', keys, attribKeys)))
+    samples.sigItemsChanged.connect(lambda keys, attribKeys: log.append(('changed', keys, attribKeys)))
+    return log
+
+
+def test_batchedChanges_coalesces(samples, signalLog):
+    with samples.batchedChanges():
+        for sample in samples.values():
+            sample.isVisible = False
+        samples['Sample 0'].isSelected = True
+        assert len(signalLog) == 1
+        assert signalLog[0] == ('about', list(samples.keys()), None)
+
+    assert len(signalLog) == 2
+    assert signalLog[1] == ('changed', list(samples.keys()), None)
+    assert not any(sample.isVisible for sample in samples.values())
+
+
+def test_batchedChanges_declaredKeys(samples, signalLog):
+    keys = ['Sample 1', 'Sample 3']
+    with samples.batchedChanges(keys=keys, attribKeys=['isVisible']):
+        assert signalLog == [('about', keys, ['isVisible'])]
+        for key in keys:
+            samples[key].isVisible = False
+            # nested batches join the outer batch
+            with samples.batchedChanges():
+                samples[key].isSelected = True
+
+    assert signalLog == [('about', keys, ['isVisible']),
+                         ('changed', keys, ['isVisible', 'isSelected'])]
+
+
+def test_batchedChanges_noChanges(samples, signalLog):
+    with samples.batchedChanges():
+        samples['Sample 0'].isVisible = True  # already visible, so no change signaled
+    assert signalLog == []
+
+
+def test_batchedChanges_balancedOnError(samples, signalLog):
+    with pytest.raises(RuntimeError):
+        with samples.batchedChanges():
+            samples['Sample 2'].isVisible = False
+            raise RuntimeError()
+    assert [entry[0] for entry in signalLog] == ['about', 'changed']
+
+    # per-item forwarding resumes after the batch closes
+    signalLog.clear()
+    samples['Sample 2'].isVisible = True
+    assert signalLog == [('about', ['Sample 2'], ['isVisible']), ('changed', ['Sample 2'], ['isVisible'])]
+
+
+@attrs.define(eq=False)
+class _ListItem(GenericListItem):
+    _value: int = 0
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    @listItemAttrSetter()
+    def value(self, newValue: int):
+        pass
+
+
+@attrs.define
+class _List(GenericList[_ListItem]):
+    pass
+
+
+def test_renamePreservesOrder(samples):
+    samples['Sample 2'].key = 'Renamed'
+    assert list(samples.keys()) == ['Sample 0', 'Sample 1', 'Renamed', 'Sample 3', 'Sample 4']
+    assert samples.positionOf('Renamed') == 2
+    assert samples['Renamed'].key == 'Renamed'
+
+
+def test_listIndexTracking():
+    items = [_ListItem(value=i) for i in range(5)]
+    lst = _List(items=items.copy())
+    newItem = _ListItem(value=10)
+    lst.insert(1, newItem)
+    assert lst.index(newItem) == 1
+    assert lst.index(items[1]) == 2
+    lst.deleteItems([0, 3])
+    assert [item.value for item in lst] == [10, 1, 3, 4]
+    assert items[0] not in lst
+    assert lst.index(items[4]) == 3
+    with pytest.raises(ValueError):
+        lst.index(items[0])
+
+    changed = []
+    lst.sigItemsChanged.connect(lambda changedItems, attribKeys: changed.append(changedItems))
+    items[0].value = 100  # no longer in list, so should not be signaled
+    items[3].value = 100
+    assert changed == [{items[3]}]
+
+
+@pytest.mark.parametrize('numItems', [1_000, 10_000, 100_000])
+def test_collectionScaling(numItems, monkeypatch):
+    numListRebuilds = 0
+    origRebuild = GenericList._rebuildItemIndices
+
+    def countingRebuild(self):
+        nonlocal numListRebuilds
+        numListRebuilds += 1
+        origRebuild(self)
+
+    monkeypatch.setattr(GenericList, '_rebuildItemIndices', countingRebuild)
+
+    timestamp = getSampleTimestampNow()
+    samples = Samples(items={f'Sample {i}': Sample(key=f'Sample {i}', timestamp=timestamp) for i in range(numItems)})
+    lst = _List(items=[_ListItem(value=i) for i in range(numItems)])
+    numListRebuilds = 0
+
+    itemsIndex = samples._items
+    slotKeys = itemsIndex._slotKeys
+    numOps = 100
+    step = numItems // numOps
+    for i in range(0, numItems, step):
+        samples[f'Sample {i}'].key = f'Renamed {i}'
+        lst[i].value = -i
+        assert lst.index(lst[i]) == i
+
+    # renames update the key index in place rather than rebuilding it, and item changes don't rebuild list indices
+    assert samples._items is itemsIndex and itemsIndex._slotKeys is slotKeys
+    assert numListRebuilds == 0
+    assert samples.positionOf(f'Renamed {step}') == step
+    assert next(iter(samples.keys())) == 'Renamed 0'
+    assert lst[step].value == -step
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample, getSampleTimestampNow
+from NaviNIBS.util.numpy import array_equalish
+
+
+def test_samplesColumnStore():
+    timestamp = getSampleTimestampNow()
+    transf = np.eye(4)
+    transf[:3, 3] = [1, 2, 3]
+    sampleDicts = [
+        Sample(key='a', timestamp=timestamp, coilToMRITransf=transf, targetKey='t', metadata=dict(x=1)).asDict(),
+        Sample(key='b', timestamp=timestamp, isVisible=False).asDict(),
+    ]
+    samples = Samples.fromList(sampleDicts)
+
+    # store-backed samples serialize identically to detached samples
+    assert samples.asList() == sampleDicts
+    assert samples['a'] == Sample.fromDict(sampleDicts[0])
+
+    tzTimestamp = pd.Timestamp('2024-01-02 03:04:05.123456', tz='US/Pacific')
+    samples.addItem(Sample(key='tz', timestamp=tzTimestamp))
+    assert samples['tz'].timestamp == tzTimestamp
+    samples.deleteItem('tz')
+
+    transfs = samples.getCoilToMRITransfs()
+    assert transfs.shape == (2, 4, 4)
+    assert array_equalish(transfs[0], transf)
+    assert np.isnan(transfs[1]).all()
+    assert samples.getIsVisible().tolist() == [True, False]
+    assert samples.getMetadataColumn('x') == [1, None]
+
+    with samples['b'].changingMetadata():
+        samples['b'].metadata['x'] = 2
+    assert samples.getMetadataColumn('x', keys=['b']) == [2]
+
+    samples['a'].coilToMRITransf = None
+    assert not samples['a'].hasTransf
+    assert samples.getHasTransfs().tolist() == [False, False]
+
+    # removed samples keep their values
+    sampleB = samples['b']
+    samples.deleteItem('b')
+    assert sampleB.metadata == dict(x=2)
+    assert not sampleB.isVisible
+    samples.addItem(Sample(key='c', timestamp=timestamp))
+    assert list(samples.getIsVisible()) == [True, True]
+
+
+@pytest.fixture
+def samples():
+    return Samples(items={f'Sample {i}': Sample(key=f'Sample {i}', timestamp=getSampleTimestampNow(),
+                                                metadata=dict(x=i))
+                          for i in range(3)})
+
+
+def test_metadataWritesPersist(samples):
+    signalLog = []
+    samples.sigItemsAboutToChange.connect(lambda keys, attribKeys: signalLog.append(('about', keys, attribKeys)))
+    samples.sigItemsChanged.connect(lambda keys, attribKeys: signalLog.append(('changed', keys, attribKeys)))
+
+    sample = samples['Sample 1']
+    sample.metadata['y'] = 'foo'
+    assert sample.metadata == dict(x=1, y='foo')
+    assert samples.getMetadataColumn('y') == [None, 'foo', None]
+    assert signalLog == [('about', ['Sample 1'], ['metadata']), ('changed', ['Sample 1'], ['metadata'])]
+
+    signalLog.clear()
+    del sample.metadata['x']
+    assert 'x' not in sample.metadata
+    with pytest.raises(KeyError):
+        del sample.metadata['x']
+    assert samples.getMetadataColumn('x') == [0, None, 2]
+    assert len(signalLog) == 2
+
+    # multiple writes within changingMetadata signal once
+    signalLog.clear()
+    with sample.changingMetadata() as metadata:
+        metadata['a'] = 1
+        sample.metadata['b'] = 2
+        metadata.update(c=3)
+    assert signalLog == [('about', ['Sample 1'], ['metadata']), ('changed', ['Sample 1'], ['metadata'])]
+    assert dict(sample.metadata) == dict(y='foo', a=1, b=2, c=3)
+    assert sample.asDict()['metadata'] == dict(y='foo', a=1, b=2, c=3)
+
+    # a view obtained before removal keeps referring to the (now detached) sample's own metadata
+    metadata = sample.metadata
+    samples.deleteItem('Sample 1')
+    metadata['d'] = 4
+    assert sample.metadata == dict(y='foo', a=1, b=2, c=3, d=4)
+    assert samples.getMetadataColumn('d') == [None, None]
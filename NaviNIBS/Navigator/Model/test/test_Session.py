@@ -0,0 +1,230 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.SubjectRegistration import Fiducial
+from NaviNIBS.Navigator.Model.Tools import CoilTool
+from NaviNIBS.util.json import JSONSerializer
+
+
+def _makeSession(tmp_path) -> Session:
+    rng = np.random.default_rng(0)
+    session = Session.createNew(filepath=str(tmp_path / 'session.navinibs'),
+                                unpackedSessionDir=str(tmp_path / 'unpacked'))
+    for i in range(200):
+        session.samples.addItem(Sample(key=f'Sample {i}',
+                                       coilToMRITransf=None if i % 10 == 0 else rng.normal(size=(4, 4)),
+                                       timestamp=pd.Timestamp.now(),
+                                       targetKey='T1' if i % 2 else None))
+    reg = session.subjectRegistration
+    for key in ('LPA', 'NAS', 'RPA'):
+        reg.fiducials[key] = Fiducial(key=key, plannedCoord=rng.normal(size=3))
+        reg.fiducials[key].sampledCoords = rng.normal(size=(5, 3))
+    reg.sampledHeadPoints.extend(rng.normal(size=(500, 3)))
+    for i in range(5):
+        reg.trackerToMRITransf = rng.normal(size=(4, 4))
+    session.tools.addItem(CoilTool(key='Coil1', toolToTrackerTransf=rng.normal(size=(4, 4))))
+    return session
+
+
+def _sectionsAsDicts(session: Session) -> dict:
+    return dict(samples=session.samples.asList(),
+                subjectRegistration=session.subjectRegistration.asDict(),
+                tools=session.tools.asList())
+
+
+def test_sidecarRoundTrip(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+
+    filenames = os.listdir(session.unpackedSessionDir)
+    for name in ('Samples', 'SubjectRegistration', 'Tools'):
+        assert f'SessionConfig_{name}.npz' in filenames
+        assert f'SessionConfig_{name}.json' not in filenames
+
+    reloaded = Session.loadFromFile(session.filepath, unpackedSessionDir=str(tmp_path / 'reloaded'))
+    assert _sectionsAsDicts(reloaded) == _sectionsAsDicts(session)
+
+
+def _saveInPreviousFormat(session: Session, monkeypatch):
+    """
+    Save session as the previous config format version (without binary sidecars) would have
+    """
+    with monkeypatch.context() as m:
+        m.setattr(Session, '_binarySidecarKeys', frozenset())
+        m.setattr(Session, '_latestConfigFormatVersion', '0.0.2')
+        session.saveToUnpackedDir(saveDirtyOnly=False)
+    config = JSONSerializer.load(os.path.join(session.unpackedSessionDir, 'SessionConfig.json'))
+    assert config['formatVersion'] == '0.0.2'
+    assert 'SessionConfig_Samples.json' in os.listdir(session.unpackedSessionDir)
+
+
+def test_readsAndUpgradesJSONSections(tmp_path, monkeypatch):
+    session = _makeSession(tmp_path)
+    _saveInPreviousFormat(session, monkeypatch)
+
+    reloaded = Session.loadFromFolder(session.unpackedSessionDir)
+    assert _sectionsAsDicts(reloaded) == _sectionsAsDicts(session)
+
+    reloaded.saveToUnpackedDir(saveDirtyOnly=False)
+    filenames = os.listdir(session.unpackedSessionDir)
+    assert 'SessionConfig_Samples.npz' in filenames
+    assert 'SessionConfig_Samples.json' not in filenames
+    config = JSONSerializer.load(os.path.join(session.unpackedSessionDir, 'SessionConfig.json'))
+    assert config['formatVersion'] == Session._latestConfigFormatVersion
+    reloadedAgain = Session.loadFromFolder(session.unpackedSessionDir)
+    assert _sectionsAsDicts(reloadedAgain) == _sectionsAsDicts(session)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_upgradesOnDirtyOnlySave(tmp_path, monkeypatch, lazy):
+    session = _makeSession(tmp_path)
+    _saveInPreviousFormat(session, monkeypatch)
+
+    # sections saved in the previous format are rewritten by the next save, even if otherwise unchanged
+    reloaded = Session.loadFromFolder(session.unpackedSessionDir, lazy=lazy)
+    assert reloaded.dirtyKeys == {'samples', 'subjectRegistration', 'tools'}
+    reloaded.saveToUnpackedDir()
+    filenames = os.listdir(session.unpackedSessionDir)
+    for name in ('Samples', 'SubjectRegistration', 'Tools'):
+        assert f'SessionConfig_{name}.npz' in filenames
+        assert f'SessionConfig_{name}.json' not in filenames
+    reloadedAgain = Session.loadFromFolder(session.unpackedSessionDir)
+    assert reloadedAgain.dirtyKeys == set()
+    assert _sectionsAsDicts(reloadedAgain) == _sectionsAsDicts(session)
+
+
+def test_rejectsMismatchedOrUnsupportedFormat(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToUnpackedDir(saveDirtyOnly=False)
+    configPath = os.path.join(session.unpackedSessionDir, 'SessionConfig.json')
+    config = JSONSerializer.load(configPath)
+
+    # binary sidecars in a session claiming the previous format version, which older versions can't read
+    JSONSerializer(pretty=True).dump(dict(config, formatVersion='0.0.2'), configPath)
+    with pytest.raises(ValueError):
+        Session.loadFromFolder(session.unpackedSessionDir)
+
+    JSONSerializer(pretty=True).dump(dict(config, formatVersion='0.0.1'), configPath)
+    with pytest.raises(AssertionError):
+        Session.loadFromFolder(session.unpackedSessionDir)
+
+
+def test_lazyLoading(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+
+    reloaded = Session.loadFromFile(session.filepath, unpackedSessionDir=str(tmp_path / 'reloaded'), lazy=True)
+    assert {'samples', 'tools'} <= set(reloaded._lazySectionLoaders)
+
+    # changing one section should load and save only that section
+    newTransf = np.random.default_rng(1).normal(size=(4, 4))
+    reloaded.subjectRegistration.trackerToMRITransf = newTransf
+    assert reloaded.dirtyKeys == {'subjectRegistration'}
+    reloaded.saveToFile()
+    assert 'samples' in reloaded._lazySectionLoaders
+    assert 'subjectRegistration' not in reloaded._lazySectionLoaders
+
+    # changes to a lazily loaded section are tracked once loaded
+    reloaded.samples['Sample 1'].isVisible = False
+    assert reloaded.dirtyKeys == {'samples'}
+    reloaded.saveToFile()
+
+    reloadedAgain = Session.loadFromFile(session.filepath, unpackedSessionDir=str(tmp_path / 'reloadedAgain'))
+    assert _sectionsAsDicts(reloadedAgain) == _sectionsAsDicts(reloaded)
+    assert np.array_equal(reloadedAgain.subjectRegistration.trackerToMRITransf, newTransf)
+    assert not reloadedAgain.samples['Sample 1'].isVisible
+    assert reloadedAgain.tools.asList() == session.tools.asList()
+
+
+def test_closeCompactsArchive(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+    session.samples['Sample 1'].isVisible = False
+    session.saveToFile()
+    with zipfile.ZipFile(session.filepath) as zf:
+        names = zf.namelist()
+    assert len(names) > len(set(names))  # incremental save appended shadowing members
+
+    session.close()
+    with zipfile.ZipFile(session.filepath) as zf:
+        names = zf.namelist()
+    assert len(names) == len(set(names))
+    reloaded = Session.loadFromFile(session.filepath, unpackedSessionDir=str(tmp_path / 'reloaded'))
+    assert not reloaded.samples['Sample 1'].isVisible
+
+
+def test_saveWithoutAutosavesLeavesNoJournal(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+    session.samples['Sample 1'].isVisible = False
+    session.saveToFile()
+    assert not os.path.exists(os.path.join(session.unpackedSessionDir, 'autosaved'))
+
+    # once autosaved, a full save starts a new journal
+    session.samples['Sample 2'].isVisible = False
+    session.saveToUnpackedDir(asAutosave=True)
+    session.autosaveWriter.waitUntilIdle()
+    assert len(Session.findAutosaves(session.unpackedSessionDir)) == 1
+    session.saveToFile()
+    session.autosaveWriter.waitUntilIdle()
+    assert Session.findAutosaves(session.unpackedSessionDir) == []
+
+
+def test_closeFlushesAutosaves(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+    for i in range(5):
+        session.samples[f'Sample {i}'].isVisible = False
+        session.saveToUnpackedDir(asAutosave=True)
+    session.close()
+    assert not session.autosaveWriter._thread
+    assert len(Session.findAutosaves(session.unpackedSessionDir)) == 5
+
+
+def test_autosaveAndRestore(tmp_path):
+    session = _makeSession(tmp_path)
+    session.saveToFile()
+    assert Session.findAutosaves(session.unpackedSessionDir) == []
+
+    session.samples['Sample 1'].isVisible = False
+    session.saveToUnpackedDir(asAutosave=True)
+    session.tools.addItem(CoilTool(key='Coil2'))
+    session.subjectID = 'changedSubject'
+    session.saveToUnpackedDir(asAutosave=True)
+    session.autosaveWriter.waitUntilIdle()
+
+    autosaveDir = os.path.join(session.unpackedSessionDir, 'autosaved')
+    assert {filename.split('_')[0] for filename in os.listdir(autosaveDir)} == {'autosaveIndex.json',
+                                                                                'autosaveJournal'}
+
+    autosaves = Session.findAutosaves(session.unpackedSessionDir)
+    assert len(autosaves) == 2
+    assert autosaves[0][0] > autosaves[1][0]
+    assert set(Session.getAutosaveChangeSummary(session.unpackedSessionDir, autosaves[1][1])) == {
+        'samples'}
+    assert set(Session.getAutosaveChangeSummary(session.unpackedSessionDir, autosaves[0][1])) == {
+        'samples', 'tools', 'subject id'}
+
+    # main files are unchanged by autosaves
+    assert Session.loadFromFolder(session.unpackedSessionDir).samples['Sample 1'].isVisible
+
+    olderRestored = Session.loadFromUnpackedDir(session.unpackedSessionDir, configPath=autosaves[1][1])
+    assert not olderRestored.samples['Sample 1'].isVisible
+    assert 'Coil2' not in olderRestored.tools
+
+    restored = Session.loadFromUnpackedDir(session.unpackedSessionDir, filepath=session.filepath,
+                                           configPath=autosaves[0][1])
+    assert _sectionsAsDicts(restored) == _sectionsAsDicts(session)
+    assert restored.subjectID == 'changedSubject'
+
+    restored.saveToUnpackedDir(saveDirtyOnly=False)
+    restored.autosaveWriter.waitUntilIdle()
+    assert Session.findAutosaves(session.unpackedSessionDir) == []
+    reloaded = Session.loadFromFolder(session.unpackedSessionDir)
+    assert _sectionsAsDicts(reloaded) == _sectionsAsDicts(session)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import attrs
+import logging
+import numpy as np
+
+from NaviNIBS.util.CoilOrientations import OnTargetErrorKernel
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class OnTargetMonitor:
+    """
+    Determines whether the coil is on target from a stream of timestamped coil poses, with hysteresis (separate
+    thresholds for becoming on target and for becoming off target) and minimum dwell times before reporting a change.
+
+    Meant to be updated with every new coil pose. Only the errors in `OnTargetErrorKernel.errorLabels` are evaluated,
+    with all thresholds checked at once as margins to lower and upper bounds (positive when within bounds).
+
+    Times of changes are estimated more precisely than the interval between poses: the time at which errors crossed a
+    threshold is linearly interpolated between the previous and current pose, and a change is reported as occurring
+    exactly when the dwell time after that crossing elapsed. Times are in the same timebase as the poses (e.g.
+    `TimestampedToolPosition.time`).
+    """
+    _onTargetBounds: np.ndarray
+    """
+    2x4 lower and upper bounds of errors (in order of `OnTargetErrorKernel.errorLabels`) within which to become on
+    target
+    """
+    _offTargetBounds: np.ndarray
+    """
+    2x4 lower and upper bounds of errors outside of which to become off target
+    """
+    _onTargetMinTime: float = 0.
+    """
+    In sec, don't report being on target until after staying on target for at least this long
+    """
+    _offTargetMinTime: float = 0.
+    """
+    In sec, don't report being off target until after staying off target for at least this long
+    """
+
+    _kernel: OnTargetErrorKernel = attrs.field(init=False, factory=OnTargetErrorKernel, repr=False)
+    _isOnTarget: bool = attrs.field(init=False, default=False)
+    _changedAtTime: float | None = attrs.field(init=False, default=None)
+    _pendingChangeSince: float | None = attrs.field(init=False, default=None)
+    """
+    Time at which errors crossed the threshold for changing state, if they have stayed across since then but not yet
+    for the minimum dwell time
+    """
+    _margins: np.ndarray = attrs.field(init=False, factory=lambda: np.full((2, 8), np.nan), repr=False)
+    """
+    Margins of latest pose to [on target bounds, off target bounds], with lower bound margins followed by upper
+    bound margins
+    """
+    _prevMargins: np.ndarray = attrs.field(init=False, factory=lambda: np.full((2, 8), np.nan), repr=False)
+    _poseTime: float | None = attrs.field(init=False, default=None)
+    _prevPoseTime: float | None = attrs.field(init=False, default=None)
+    _additionalChecksPassed: bool = attrs.field(init=False, default=True)
+    _prevAdditionalChecksPassed: bool = attrs.field(init=False, default=True)
+
+    def __attrs_post_init__(self):
+        self._onTargetBounds = np.asarray(self._onTargetBounds, dtype=np.float64)
+        self._offTargetBounds = np.asarray(self._offTargetBounds, dtype=np.float64)
+        if self._onTargetBounds.shape != (2, 4) or self._offTargetBounds.shape != (2, 4):
+            raise ValueError('Bounds should be of shape 2x4')
+
+    @property
+    def isOnTarget(self) -> bool:
+        return self._isOnTarget
+
+    @property
+    def changedAtTime(self) -> float | None:
+        """
+        Time of the most recent change in `isOnTarget`, or None if not changed since last reset.
+        """
+        return self._changedAtTime
+
+    @property
+    def pendingChangeDeadline(self) -> float | None:
+        """
+        Time at which a pending change will take effect if errors stay across thresholds until then, or None if no
+        change is pending.
+        """
+        if self._pendingChangeSince is None:
+            return None
+        return self._pendingChangeSince + self._currentMinTime
+
+    @property
+    def hasPose(self) -> bool:
+        """
+        Whether a pose has been evaluated since the target was last set or state was reset
+        """
+        return self._poseTime is not None
+
+    @property
+    def latestErrors(self) -> np.ndarray:
+        """
+        Errors of the latest pose, in order of `OnTargetErrorKernel.errorLabels`
+        """
+        return self._margins[0, :4] + self._onTargetBounds[0]
+
+    @property
+    def _currentMinTime(self) -> float:
+        return self._offTargetMinTime if self._isOnTarget else self._onTargetMinTime
+
+    def setTarget(self, targetCoilToMRITransf: np.ndarray | None):
+        """
+        Set target to evaluate errors relative to. Note that this does not reset `isOnTarget`, but previous poses
+        are no longer used for interpolating threshold crossings.
+        """
+        self._kernel.setTarget(targetCoilToMRITransf)
+        self._margins.fill(np.nan)
+        self._poseTime = None
+
+    def reset(self):
+        """
+        Reset to off target, e.g. to restart the on-target dwell timer after a change in target.
+        """
+        self._isOnTarget = False
+        self._changedAtTime = None
+        self._pendingChangeSince = None
+        self._margins.fill(np.nan)
+        self._poseTime = None
+
+    def update(self, poseTime: float, coilToMRITransf: np.ndarray | None,
+               additionalChecksPassed: bool = True) -> list[tuple[bool, float]]:
+        """
+        Evaluate a new coil pose.
+
+        :param poseTime: time at which pose was measured
+        :param coilToMRITransf: coil pose, or None if not currently tracked
+        :param additionalChecksPassed: if False, coil is considered off target regardless of errors
+        :return: list of (isOnTarget, time of change) for any changes in state, in order
+        """
+        self._prevMargins[:] = self._margins
+        self._prevPoseTime = self._poseTime
+        self._prevAdditionalChecksPassed = self._additionalChecksPassed
+
+        if coilToMRITransf is None:
+            self._margins.fill(np.nan)
+        else:
+            errors = self._kernel.calculate(coilToMRITransf)[0]
+            for iBounds, bounds in enumerate((self._onTargetBounds, self._offTargetBounds)):
+                np.subtract(errors, bounds[0], out=self._margins[iBounds, :4])
+                np.subtract(bounds[1], errors, out=self._margins[iBounds, 4:])
+        self._poseTime = poseTime
+        self._additionalChecksPassed = additionalChecksPassed
+
+        return self._advance(poseTime)
+
+    def updateTime(self, currentTime: float, additionalChecksPassed: bool | None = None) -> list[tuple[bool, float]]:
+        """
+        Advance time without a new pose, e.g. so that a pending change takes effect after its dwell time even if
+        the coil (and its tracked pose) is stationary.
+
+        :param currentTime: current time, in the same timebase as pose times
+        :param additionalChecksPassed: if not None, result of additional checks as of `currentTime`
+        :return: see `update`
+        """
+        if self._poseTime is None:
+            return []
+
+        transitions = []
+        if additionalChecksPassed is not None and additionalChecksPassed != self._additionalChecksPassed:
+            # treat as a new pose identical to the last one
+            self._prevMargins[:] = self._margins
+            self._prevPoseTime = self._poseTime
+            self._prevAdditionalChecksPassed = self._additionalChecksPassed
+            self._poseTime = max(currentTime, self._poseTime)
+            self._additionalChecksPassed = additionalChecksPassed
+            transitions.extend(self._advance(self._poseTime))
+
+        deadline = self.pendingChangeDeadline
+        if deadline is not None and currentTime >= deadline:
+            transitions.append(self._changeState(deadline))
+
+        return transitions
+
+    def _wantsChange(self, margins: np.ndarray, additionalChecksPassed: bool, isOnTarget: bool) -> bool:
+        if isOnTarget:
+            return not (additionalChecksPassed and bool(np.all(margins[1] >= 0)))
+        else:
+            return additionalChecksPassed and bool(np.all(margins[0] >= 0))
+
+    def _getCrossingTime(self, iBounds: int, isLeaving: bool) -> float:
+        """
+        Estimate when errors left (or entered) the given bounds between the previous and latest pose, by linearly
+        interpolating margins.
+
+        :param iBounds: 0 for on target bounds, 1 for off target bounds
+        """
+        t1 = self._poseTime
+        t0 = self._prevPoseTime
+        if t0 is None or t1 <= t0 or self._additionalChecksPassed != self._prevAdditionalChecksPassed:
+            return t1
+
+        m0 = self._prevMargins[iBounds]
+        m1 = self._margins[iBounds]
+        if not (np.all(np.isfinite(m0)) and np.all(np.isfinite(m1))):
+            return t1
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fracs = m0 / (m0 - m1)  # fraction of interval at which each margin crossed zero
+        if isLeaving:
+            # left bounds when first margin became negative
+            crossed = (m0 >= 0) & (m1 < 0)
+            if not crossed.any():
+                return t0
+            frac = fracs[crossed].min()
+        else:
+            # entered bounds when last negative margin became non-negative
+            crossed = (m0 < 0) & (m1 >= 0)
+            if not crossed.any():
+                return t0
+            frac = fracs[crossed].max()
+
+        return t0 + float(np.clip(frac, 0., 1.)) * (t1 - t0)
+
+    def _changeState(self, atTime: float) -> tuple[bool, float]:
+        self._isOnTarget = not self._isOnTarget
+        self._changedAtTime = atTime
+        self._pendingChangeSince = None
+        logger.debug(f'isOnTarget: {self._isOnTarget} at {atTime}')
+        return self._isOnTarget, atTime
+
+    def _advance(self, poseTime: float) -> list[tuple[bool, float]]:
+        transitions = []
+
+        deadline = self.pendingChangeDeadline
+        if deadline is not None and poseTime >= deadline:
+            if self._wantsChange(self._margins, self._additionalChecksPassed, self._isOnTarget):
+                transitions.append(self._changeState(deadline))
+            else:
+                # condition for change stopped holding at some point between previous and latest pose; only
+                #  change if that was after the deadline
+                if self._isOnTarget:
+                    stoppedAtTime = self._getCrossingTime(iBounds=1, isLeaving=False)
+                else:
+                    stoppedAtTime = self._getCrossingTime(iBounds=0, isLeaving=True)
+                if stoppedAtTime >= deadline:
+                    transitions.append(self._changeState(deadline))
+                else:
+                    self._pendingChangeSince = None
+
+        if self._wantsChange(self._margins, self._additionalChecksPassed, self._isOnTarget):
+            if self._pendingChangeSince is None:
+                if self._isOnTarget:
+                    crossingTime = self._getCrossingTime(iBounds=1, isLeaving=True)
+                else:
+                    crossingTime = self._getCrossingTime(iBounds=0, isLeaving=False)
+                if self._changedAtTime is not None:
+                    crossingTime = max(crossingTime, self._changedAtTime)
+                self._pendingChangeSince = crossingTime
+            deadline = self.pendingChangeDeadline
+            if poseTime >= deadline:
+                transitions.append(self._changeState(deadline))
+        else:
+            self._pendingChangeSince = None
+
+        return transitions
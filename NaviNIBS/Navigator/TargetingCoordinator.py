@@ -17,9 +17,12 @@ from typing import ClassVar
 
 from NaviNIBS.Devices.ToolPositionsClient import ToolPositionsClient, ToolPositionsClientBase
 from NaviNIBS.Navigator.Model.Session import Session, Tool, CoilTool, SubjectTracker, Target, Sample
+from NaviNIBS.Navigator.OnTargetMonitor import OnTargetMonitor
 from NaviNIBS.util.Asyncio import asyncCreateTask
 from NaviNIBS.util.CoilOrientations import PoseMetricCalculator
+from NaviNIBS.util.LatencyTracing import getLatencyTracer, stageCoordinatorUpdate
 from NaviNIBS.util.Signaler import Signal
+from NaviNIBS.util.TransformGraph import TransformGraph, EdgeKey
 from NaviNIBS.util.Transforms import invertTransform, concatenateTransforms, applyTransform
 from NaviNIBS.util.GUI.QFileSelectWidget import QFileSelectWidget
 
@@ -30,6 +33,27 @@ logger = logging.getLogger(__name__)
 Transform = np.ndarray
 
 
+worldFrame = 'world'
+"""
+Tracking camera space, in which tool positions are reported
+"""
+MRIFrame = 'MRI'
+
+
+def trackerFrame(trackerKey: str) -> str:
+    """
+    Name of frame in `TargetingCoordinator.transformGraph` for a tracker, positioned relative to `worldFrame`
+    """
+    return f'tracker:{trackerKey}'
+
+
+def toolFrame(toolKey: str) -> str:
+    """
+    Name of frame in `TargetingCoordinator.transformGraph` for a tool, positioned relative to its tracker's frame
+    """
+    return f'tool:{toolKey}'
+
+
 @attrs.define(frozen=True)
 class ProjectionSpecification:
     """
@@ -52,8 +76,14 @@ class TargetingCoordinator:
     __cachedActiveCoilKey: str | None = attrs.field(init=False, default=None)
     __cachedActiveCoil: CoilTool | None = attrs.field(init=False, default=None)
 
-    _currentCoilToMRITransform: tp.Optional[Transform] = attrs.field(init=False, default=None)  # relative to head tracker
-    _currentMRIToWorldTransform: tp.Optional[Transform] = attrs.field(init=False, default=None)  # relative to world
+    _transformGraph: TransformGraph = attrs.field(init=False, factory=TransformGraph, repr=False)
+    """
+    Transforms between trackers (from latest positions), tools (from calibrations), world, and MRI (from subject
+    registration), with composed transforms cached until an upstream transform changes.
+    """
+    _trackerKeysInGraph: set[str] = attrs.field(init=False, factory=set, repr=False)
+    _toolEdgesInGraph: dict[str, EdgeKey] = attrs.field(init=False, factory=dict, repr=False)
+    _registrationEdgeInGraph: EdgeKey | None = attrs.field(init=False, default=None, repr=False)
     _currentPoseMetrics: PoseMetricCalculator = attrs.field(init=False, repr=False)
     _currentSamplePoseMetrics: PoseMetricCalculator = attrs.field(init=False, repr=False)
 
@@ -71,16 +101,28 @@ class TargetingCoordinator:
     _isOffTargetWhenZDistErrorExceeds: float = 4.  # in mm
     _isOffTargetMinTime: float = 0.1  # in sec, don't report being off target until after staying off target for at least this long
     _doMonitorOnTarget: bool = False
-    _monitorOnTargetRate: float = 5.  # in Hz
-    _isOnTarget: bool = attrs.field(init=False, default=False)
+    _onTargetMonitor: OnTargetMonitor = attrs.field(init=False, repr=False)
+    """
+    Evaluated on every new coil pose while doMonitorOnTarget is True
+    """
     _additionalIsOnTargetChecks: list[tp.Callable[[], bool]] = attrs.field(init=False, factory=list, repr=False)
     """
     Allow additional checks to be registered for determining on-target status, e.g. based on Cobot status 
     """
-    _onTargetMaybeChangedAtTime: float | None = None
+    _latestPoseTimes: tuple[float, float] | None = attrs.field(init=False, default=None, repr=False)
+    """
+    (tracker time, local time) at which latest coil pose was measured and received, for mapping local time to
+    tracker time when no new poses are received
+    """
     _needToCheckIfOnTarget: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
     _monitorOnTargetTask: asyncio.Task | None = attrs.field(init=False, default=None, repr=False)
     sigIsOnTargetChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)  # only emitted when doMonitorOnTarget is True and isOnTarget changes
+    sigIsOnTargetChangedAtTime: Signal = attrs.field(init=False, factory=lambda: Signal((bool, float)), repr=False)
+    """
+    Emitted along with sigIsOnTargetChanged, with (isOnTarget, time of change). Time of change is in tracker time
+    (as in `TimestampedToolPosition.time`), interpolated between tracker samples, so may be slightly earlier than
+    when the change was detected.
+    """
 
     sigActiveCoilKeyChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
     sigCurrentTargetChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
@@ -92,7 +134,26 @@ class TargetingCoordinator:
     sigCurrentSubjectPositionChanged: Signal = attrs.field(init=False, factory=Signal, repr=False)
 
     def __attrs_post_init__(self):
+        self._onTargetMonitor = OnTargetMonitor(
+            onTargetBounds=np.asarray([
+                [-self._isOnTargetWhenZAngleErrorUnder, -self._isOnTargetWhenHorizAngleErrorUnder,
+                 -self._isOnTargetWhenDistErrorUnder, self._isOnTargetWhenZDistErrorBetween[0]],
+                [self._isOnTargetWhenZAngleErrorUnder, self._isOnTargetWhenHorizAngleErrorUnder,
+                 self._isOnTargetWhenDistErrorUnder, self._isOnTargetWhenZDistErrorBetween[1]]]),
+            offTargetBounds=np.asarray([
+                [-self._isOffTargetWhenZAngleErrorExceeds, -self._isOffTargetWhenHorizAngleErrorExceeds,
+                 -self._isOffTargetWhenDistErrorExceeds, -self._isOffTargetWhenZDistErrorExceeds],
+                [self._isOffTargetWhenZAngleErrorExceeds, self._isOffTargetWhenHorizAngleErrorExceeds,
+                 self._isOffTargetWhenDistErrorExceeds, self._isOffTargetWhenZDistErrorExceeds]]),
+            onTargetMinTime=self._isOnTargetMinTime,
+            offTargetMinTime=self._isOffTargetMinTime)
+
+        self._updateToolTransforms()
+        self._updateRegistrationTransform()
+        self._updateTrackerTransforms()
+
         self._positionsClient.sigLatestPositionsChanged.connect(self._onLatestPositionsChanged)
+        self._session.subjectRegistration.sigTrackerToMRITransfChanged.connect(self._updateRegistrationTransform)
         self._session.tools.sigItemsAboutToChange.connect(self._onToolsAboutToChange)
         self._session.tools.sigItemsChanged.connect(self._onToolsChanged)
         self._session.targets.sigItemsChanged.connect(self._onSessionTargetsChanged)
@@ -117,7 +178,7 @@ class TargetingCoordinator:
         )
 
         self.sigCurrentTargetChanged.connect(self.resetIsOnTarget)
-        self.sigCurrentTargetChanged.connect(lambda: self._needToCheckIfOnTarget.set())
+        self.sigCurrentTargetChanged.connect(self._onCurrentTargetChangedForMonitor)
 
         if self._doMonitorOnTarget:
             self._startMonitoringOnTarget()
@@ -155,6 +216,8 @@ class TargetingCoordinator:
             self._cachedActiveCoilKey = None  # clear cache so that active coil is re-detected on next request
 
     def _onToolsChanged(self, keys: list[str], attribs: list[str] | None = None):
+        self._updateToolTransforms()
+        self._updateRegistrationTransform()  # in case subject tracker changed
         if attribs is None or 'isActive' in attribs:
             self._cachedActiveCoilKey = None  # clear cache so that active coil is re-detected on next request
 
@@ -166,22 +229,21 @@ class TargetingCoordinator:
         """
         This is called whenever any attribute of active coil tool changes, not just when it becomes inactive
         """
+        self._updateToolTransforms()  # before emitting, since tools collection may not have signaled change yet
+
         if attribs is None:
             if key in self._session.tools and self._session.tools[key].isActive:
                 # tool is still active
-                self._currentCoilToMRITransform = None  # clear any previously cached value
                 self.sigCurrentCoilPositionChanged.emit()  # transform may have changed
                 return
         elif 'isActive' not in attribs:
             assert self._session.tools[key].isActive
-            self._currentCoilToMRITransform = None  # clear any previously cached value
             self.sigCurrentCoilPositionChanged.emit()  # transform may have changed
             return
 
         # tool is no longer active
         self._cachedActiveCoilKey = None
 
-        self._currentCoilToMRITransform = None  # clear any previously cached value
         self.sigCurrentCoilPositionChanged.emit()
 
     def _onSessionTargetsChanged(self, targetKeysChanged: tp.List[str], targetAttribsChanged: tp.Optional[tp.List[str]]):
@@ -199,135 +261,117 @@ class TargetingCoordinator:
         if self._currentSampleKey is not None and self._currentSampleKey in sampleKeysChanged:
             self.sigCurrentSampleChanged.emit()
 
+    def _updateTrackerTransforms(self):
+        latestPositions = self._positionsClient.latestPositions
+        for trackerKey in self._trackerKeysInGraph - latestPositions.keys():
+            self._transformGraph.removeTransform(trackerFrame(trackerKey), worldFrame)
+        self._trackerKeysInGraph = set(latestPositions.keys())
+        for trackerKey in latestPositions.keys():
+            # note: unchanged transforms don't invalidate anything cached in graph
+            self._transformGraph.setTransform(trackerFrame(trackerKey), worldFrame,
+                                              self._positionsClient.getLatestTransf(trackerKey, None))
+
+    def _updateToolTransforms(self):
+        toolEdges = dict()
+        for toolKey, tool in self._session.tools.items():
+            if tool.trackerKey is None or tool.toolToTrackerTransf is None:
+                continue
+            toolEdges[toolKey] = (toolFrame(toolKey), trackerFrame(tool.trackerKey))
+            self._transformGraph.setTransform(*toolEdges[toolKey], tool.toolToTrackerTransf)
+
+        for toolKey, edge in self._toolEdgesInGraph.items():
+            if toolEdges.get(toolKey, None) != edge:
+                self._transformGraph.removeTransform(*edge)
+        self._toolEdgesInGraph = toolEdges
+
+    def _updateRegistrationTransform(self):
+        subjectTracker = self._session.tools.subjectTracker
+        subjectTrackerToMRITransf = self._session.subjectRegistration.trackerToMRITransf
+        if subjectTracker is None or subjectTracker.trackerKey is None or subjectTrackerToMRITransf is None:
+            edge = None
+        else:
+            edge = (trackerFrame(subjectTracker.trackerKey), MRIFrame)
+            self._transformGraph.setTransform(*edge, subjectTrackerToMRITransf)
+
+        if self._registrationEdgeInGraph is not None and self._registrationEdgeInGraph != edge:
+            self._transformGraph.removeTransform(*self._registrationEdgeInGraph)
+        self._registrationEdgeInGraph = edge
+
     def _onLatestPositionsChanged(self):
-        self._currentCoilToMRITransform = None  # clear any previously cached value
-        self._currentMRIToWorldTransform = None  # clear any previously cached value
+        self._updateTrackerTransforms()
         self.sigCurrentCoilPositionChanged.emit()
         self.sigCurrentSubjectPositionChanged.emit()
+        if self._doMonitorOnTarget:
+            self._checkIfOnTarget(isNewPose=True)
+        getLatencyTracer().markStage(stageCoordinatorUpdate)
+
+    def _onCurrentTargetChangedForMonitor(self):
+        currentTarget = self.currentTarget
+        self._onTargetMonitor.setTarget(None if currentTarget is None else currentTarget.coilToMRITransf)
         self._needToCheckIfOnTarget.set()
 
+    def _getLatestCoilPoseTime(self) -> float:
+        """
+        Tracker time at which the current coil to MRI transform was measured, i.e. the latest time of the coil and
+        subject trackers' positions
+        """
+        poseTime = None
+        latestPositions = self._positionsClient.latestPositions
+        for tool in (self.activeCoilTool, self._session.tools.subjectTracker):
+            if tool is None:
+                continue
+            pos = latestPositions.get(tool.trackerKey, None)
+            if pos is not None and (poseTime is None or pos.time > poseTime):
+                poseTime = pos.time
+        if poseTime is None:
+            poseTime = time.time()
+        return poseTime
+
+    def _getCurrentTrackerTime(self) -> float:
+        if self._latestPoseTimes is None:
+            return time.time()
+        trackerTime, localTime = self._latestPoseTimes
+        return trackerTime + (time.time() - localTime)
+
     async def _loop_monitorOnTarget(self):
         while True:
             await self._needToCheckIfOnTarget.wait()
+            deadline = self._onTargetMonitor.pendingChangeDeadline
+            if deadline is not None:
+                # wait until pending change would take effect, in case no new poses are received before then
+                #  (new poses are checked as soon as they are received)
+                await asyncio.sleep(max(0., deadline - self._getCurrentTrackerTime()))
             self._checkIfOnTarget()
-            await asyncio.sleep(1/self._monitorOnTargetRate)
 
-    def _checkIfOnTarget(self):
+    def _checkIfOnTarget(self, isNewPose: bool = False):
         if not self._doMonitorOnTarget:
             return
 
         self._needToCheckIfOnTarget.clear()
 
-        if self._isOnTarget:
-            # previously on target
-            isStillOnTarget = True
-            if isStillOnTarget:
-                depthAngleError = self._currentPoseMetrics.getDepthAngleError()
-                if np.isnan(depthAngleError) or abs(depthAngleError) > self._isOffTargetWhenZAngleErrorExceeds:
-                    isStillOnTarget = False
-
-            if isStillOnTarget:
-                horizAngleError = self._currentPoseMetrics.getHorizAngleError()
-                if np.isnan(horizAngleError) or abs(horizAngleError) > self._isOffTargetWhenHorizAngleErrorExceeds:
-                    isStillOnTarget = False
-
-            if isStillOnTarget:
-                horizDistError = self._currentPoseMetrics.getTargetErrorAtCoil()
-                if np.isnan(horizDistError) or abs(horizDistError) > self._isOffTargetWhenDistErrorExceeds:
-                    isStillOnTarget = False
-
-            if isStillOnTarget:
-                depthDistError = self._currentPoseMetrics.getDepthOffsetError()
-                if np.isnan(depthDistError) or abs(depthDistError) > self._isOffTargetWhenZDistErrorExceeds:
-                    isStillOnTarget = False
-
-            if isStillOnTarget:
-                for additionalCheck in self._additionalIsOnTargetChecks:
-                    if not additionalCheck():
-                        isStillOnTarget = False
-                        break
-
-            if self._onTargetMaybeChangedAtTime is not None:
-                if isStillOnTarget:
-                    self._onTargetMaybeChangedAtTime = None
-                else:
-                    currentTime = time.time()
-                    if currentTime - self._onTargetMaybeChangedAtTime > self._isOffTargetMinTime:
-                        self._onTargetMaybeChangedAtTime = None
-                        self._isOnTarget = False
-                        logger.debug(f'isOnTarget: {self._isOnTarget}')
-                        self.sigIsOnTargetChanged.emit()
-
-            elif not isStillOnTarget:
-                self._onTargetMaybeChangedAtTime = time.time()
-                if self._isOffTargetMinTime > 0:
-                    pass # don't report change yet, not sure if this is an erroneous measure
-                else:
-                    self._isOnTarget = False
-                    logger.debug(f'isOnTarget: {self._isOnTarget}')
-                    self.sigIsOnTargetChanged.emit()
-
-            else:
-                pass  # still on target
-
+        additionalChecksPassed = True
+        for additionalCheck in self._additionalIsOnTargetChecks:
+            if not additionalCheck():
+                additionalChecksPassed = False
+                break
+
+        poseTime = self._getLatestCoilPoseTime()
+        if not self._onTargetMonitor.hasPose or (isNewPose and poseTime != self._latestPoseTimes[0]):
+            self._latestPoseTimes = (poseTime, time.time())
+            transitions = self._onTargetMonitor.update(poseTime=poseTime,
+                                                       coilToMRITransf=self.currentCoilToMRITransform,
+                                                       additionalChecksPassed=additionalChecksPassed)
         else:
-            # not previously on target
-            isStillOffTarget = False
-            if not isStillOffTarget:
-                depthAngleError = self._currentPoseMetrics.getDepthAngleError()
-                if np.isnan(depthAngleError) or abs(depthAngleError) > self._isOnTargetWhenZAngleErrorUnder:
-                    isStillOffTarget = True
-
-            if not isStillOffTarget:
-                horizAngleError = self._currentPoseMetrics.getHorizAngleError()
-                if np.isnan(horizAngleError) or abs(horizAngleError) > self._isOnTargetWhenHorizAngleErrorUnder:
-                    isStillOffTarget = True
-
-            if not isStillOffTarget:
-                horizDistError = self._currentPoseMetrics.getTargetErrorAtCoil()
-                if np.isnan(horizDistError) or abs(horizDistError) > self._isOnTargetWhenDistErrorUnder:
-                    isStillOffTarget = True
-
-            if not isStillOffTarget:
-                depthDistError = self._currentPoseMetrics.getDepthOffsetError()
-                if (np.isnan(depthDistError) or
-                        self._isOnTargetWhenZDistErrorBetween[0] > depthDistError or
-                        depthDistError > self._isOnTargetWhenZDistErrorBetween[1]):
-
-                    isStillOffTarget = True
-
-            if not isStillOffTarget:
-                for additionalCheck in self._additionalIsOnTargetChecks:
-                    if not additionalCheck():
-                        isStillOffTarget = True
-                        break
-
-            if self._onTargetMaybeChangedAtTime is not None:
-                if isStillOffTarget:
-                    self._onTargetMaybeChangedAtTime = None
-                else:
-                    currentTime = time.time()
-                    if currentTime - self._onTargetMaybeChangedAtTime > self._isOnTargetMinTime:
-                        self._onTargetMaybeChangedAtTime = None
-                        self._isOnTarget = True
-                        logger.debug(f'isOnTarget: {self._isOnTarget}')
-                        self.sigIsOnTargetChanged.emit()
-
-            elif not isStillOffTarget:
-                self._onTargetMaybeChangedAtTime = time.time()
-                if self._isOnTargetMinTime > 0:
-                    pass  # don't report change yet, wait to be stable on target
-                else:
-                    self._isOnTarget = True
-                    logger.debug(f'isOnTarget: {self._isOnTarget}')
-                    self.sigIsOnTargetChanged.emit()
-
-            else:
-                pass  # still off target
-
-        if self._onTargetMaybeChangedAtTime is not None:
-            self._needToCheckIfOnTarget.set()  # check back again soon, even if tool positions didn't change
+            transitions = self._onTargetMonitor.updateTime(currentTime=self._getCurrentTrackerTime(),
+                                                           additionalChecksPassed=additionalChecksPassed)
 
+        for isOnTarget, changeTime in transitions:
+            logger.debug(f'isOnTarget: {isOnTarget}')
+            self.sigIsOnTargetChanged.emit()
+            self.sigIsOnTargetChangedAtTime.emit(isOnTarget, changeTime)
+
+        if self._onTargetMonitor.pendingChangeDeadline is not None:
+            self._needToCheckIfOnTarget.set()  # check back again when pending change would take effect, even if tool positions didn't change
 
     @property
     def session(self):
@@ -337,6 +381,14 @@ class TargetingCoordinator:
     def positionsClient(self):
         return self._positionsClient
 
+    @property
+    def transformGraph(self) -> TransformGraph:
+        """
+        Graph of current transforms between `worldFrame`, `MRIFrame`, and each tracker's and tool's frame (see
+        `trackerFrame` and `toolFrame`). Composed transforms returned from this should not be modified in place.
+        """
+        return self._transformGraph
+
     @property
     def currentTargetKey(self):
         return self._currentTargetKey
@@ -403,58 +455,52 @@ class TargetingCoordinator:
                 return None
         return self._cachedActiveCoilKey
 
-    @property
-    def currentCoilToMRITransform(self) -> tp.Optional[Transform]:
-        if self._currentCoilToMRITransform is None:
-            if self.activeCoilTool is None:
-                # no coil active
-                return None
-            coilTrackerToCameraTransf = self._positionsClient.getLatestTransf(self.activeCoilTool.trackerKey, None)
-            subjectTrackerToCameraTransf = self._positionsClient.getLatestTransf(self._session.tools.subjectTracker.trackerKey,
-                                                                                 None)
-            coilToTrackerTransf = self.activeCoilTool.toolToTrackerTransf
-
-            subjectTrackerToMRITransf = self._session.subjectRegistration.trackerToMRITransf
-
-            if coilToTrackerTransf is None \
-                    or coilTrackerToCameraTransf is None \
-                    or subjectTrackerToCameraTransf is None\
-                    or subjectTrackerToMRITransf is None:
-                # cannot compute valid position
-                return None
+    def _calculateCoilToMRITransform(self, getTrackerTransf: tp.Callable[[str], tp.Optional[Transform]]) \
+            -> tp.Optional[Transform]:
+        if self.activeCoilTool is None:
+            # no coil active
+            return None
+        coilTrackerToCameraTransf = getTrackerTransf(self.activeCoilTool.trackerKey)
+        subjectTrackerToCameraTransf = getTrackerTransf(self._session.tools.subjectTracker.trackerKey)
+        coilToTrackerTransf = self.activeCoilTool.toolToTrackerTransf
 
-            coilToMRITransform = concatenateTransforms([
-                coilToTrackerTransf,
-                coilTrackerToCameraTransf,
-                invertTransform(subjectTrackerToCameraTransf),
-                subjectTrackerToMRITransf
-            ])
+        subjectTrackerToMRITransf = self._session.subjectRegistration.trackerToMRITransf
 
-            self._currentCoilToMRITransform = coilToMRITransform
+        if coilToTrackerTransf is None \
+                or coilTrackerToCameraTransf is None \
+                or subjectTrackerToCameraTransf is None\
+                or subjectTrackerToMRITransf is None:
+            # cannot compute valid position
+            return None
 
-        return self._currentCoilToMRITransform
+        return concatenateTransforms([
+            coilToTrackerTransf,
+            coilTrackerToCameraTransf,
+            invertTransform(subjectTrackerToCameraTransf),
+            subjectTrackerToMRITransf
+        ])
 
     @property
-    def currentMRIToWorldTransform(self) -> tp.Optional[Transform]:
-        if self._currentMRIToWorldTransform is None:
-            subjectTrackerToMRITransf = self._session.subjectRegistration.trackerToMRITransf
-            if subjectTrackerToMRITransf is None:
-                # cannot compute valid position
-                return None
-
-            tool = self.session.tools.subjectTracker
-            if tool is None:
-                # no subject tracker, cannot compute MRI to world transform
-                return None
+    def currentCoilToMRITransform(self) -> tp.Optional[Transform]:
+        activeCoilKey = self.activeCoilKey
+        if activeCoilKey is None:
+            return None
+        return self._transformGraph.getTransform(toolFrame(activeCoilKey), MRIFrame)
 
-            subTrackerToCameraTransf = self._positionsClient.getLatestTransf(tool.trackerKey, None)
-            if subTrackerToCameraTransf is None:
-                # cannot compute valid position
-                return None
+    def getCoilToMRITransformAtTime(self, time: float) -> tp.Optional[Transform]:
+        """
+        Get the coil to MRI transform at a recent time (seconds since epoch), interpolated from the coil and subject
+        trackers' positions around that time, e.g. to record the coil pose when a pulse was triggered rather than
+        when the trigger was handled.
 
-            self._currentMRIToWorldTransform = concatenateTransforms([invertTransform(subjectTrackerToMRITransf), subTrackerToCameraTransf])
+        Returns None if tracker positions at that time are not available.
+        """
+        return self._calculateCoilToMRITransform(
+            lambda key: self._positionsClient.getTransfAtTime(key, time, None))
 
-        return self._currentMRIToWorldTransform
+    @property
+    def currentMRIToWorldTransform(self) -> tp.Optional[Transform]:
+        return self._transformGraph.getTransform(MRIFrame, worldFrame)
 
     @property
     def doMonitorOnTarget(self):
@@ -478,7 +524,15 @@ class TargetingCoordinator:
         if self._needToCheckIfOnTarget.is_set():
             # check immediately to make sure we don't give outdated information
             self._checkIfOnTarget()
-        return self._isOnTarget
+        return self._onTargetMonitor.isOnTarget
+
+    @property
+    def isOnTargetChangedAtTime(self) -> float | None:
+        """
+        Tracker time of the most recent change in isOnTarget (see `sigIsOnTargetChangedAtTime`), or None if not
+        changed since monitoring started or was last reset.
+        """
+        return self._onTargetMonitor.changedAtTime
 
     def resetIsOnTarget(self):
         """
@@ -486,11 +540,12 @@ class TargetingCoordinator:
         (e.g. to temporarily show as off target after a change in target, even if that otherwise
          might not be enough to register as off target)
         """
-        if self._isOnTarget:
-            self._isOnTarget = False
-            self._onTargetMaybeChangedAtTime = None
-            logger.debug(f'isOnTarget: {self._isOnTarget}')
+        wasOnTarget = self._onTargetMonitor.isOnTarget
+        self._onTargetMonitor.reset()
+        if wasOnTarget:
+            logger.debug('isOnTarget: False')
             self.sigIsOnTargetChanged.emit()
+            self.sigIsOnTargetChangedAtTime.emit(False, self._getCurrentTrackerTime())
 
     def registerAdditionalIsOnTargetCheck(self, checkFunc: tp.Callable[[], bool]):
         """
@@ -503,7 +558,7 @@ class TargetingCoordinator:
 
     def _startMonitoringOnTarget(self):
         assert self._monitorOnTargetTask is None
-        self._needToCheckIfOnTarget.set()
+        self._onCurrentTargetChangedForMonitor()  # poses received while not monitoring were not evaluated
         self._monitorOnTargetTask = asyncCreateTask(self._loop_monitorOnTarget)
 
     def _stopMonitoringOnTarget(self):
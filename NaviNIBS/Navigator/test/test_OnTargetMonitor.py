@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ReplayToolPositionsClient import ReplayToolPositionsClient
+from NaviNIBS.Devices.ToolPositionsRecording import ToolPositionsRecorder
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Targets import Target
+from NaviNIBS.Navigator.Model.Tools import CoilTool, SubjectTracker
+from NaviNIBS.Navigator.OnTargetMonitor import OnTargetMonitor
+from NaviNIBS.Navigator.TargetingCoordinator import TargetingCoordinator
+
+
+trackerRate = 60.  # in Hz
+framePhase = 0.007  # in sec, so that threshold crossings fall between frames
+speed = 2.  # in mm/s
+startOffset = 3.  # in mm
+onTargetMinTime = 0.5
+offTargetMinTime = 0.1
+
+# target error at coil of the trajectory below crosses 1 mm (on target threshold) at t=1 and 1.5 mm (off target
+#  threshold) at t=2.25
+expectedChanges = [(True, 1. + onTargetMinTime), (False, 2.25 + offTargetMinTime)]
+
+_targetCoilToMRITransf = np.asarray([
+    [0., -1., 0., 10.],
+    [1., 0., 0., 20.],
+    [0., 0., 1., 80.],
+    [0., 0., 0., 1.]])
+
+
+def _getCoilToMRITransf(t: float) -> np.ndarray:
+    """
+    Coil sliding at constant speed along target X axis, passing over target
+    """
+    offset = np.eye(4)
+    offset[0, 3] = startOffset - speed * t
+    return _targetCoilToMRITransf @ offset
+
+
+def _getFrameTimes(duration: float = 3.) -> np.ndarray:
+    return np.arange(0., duration, 1 / trackerRate) + framePhase
+
+
+def _makeMonitor() -> OnTargetMonitor:
+    return OnTargetMonitor(onTargetBounds=[[-2., -4., -1., -4.], [2., 4., 1., 2.]],
+                           offTargetBounds=[[-3., -6., -1.5, -4.], [3., 6., 1.5, 4.]],
+                           onTargetMinTime=onTargetMinTime,
+                           offTargetMinTime=offTargetMinTime)
+
+
+def _assertChangesMatch(changes: list[tuple[bool, float]], t0: float = 0., tol: float = 1e-4):
+    assert [isOnTarget for isOnTarget, _ in changes] == [isOnTarget for isOnTarget, _ in expectedChanges]
+    for (_, changeTime), (_, expectedTime) in zip(changes, expectedChanges):
+        # sub-frame accuracy, vs. up to a full frame interval (17 ms) if only evaluated at frame times
+        assert changeTime - t0 == pytest.approx(expectedTime, abs=tol)
+
+
+def test_transitionTiming():
+    monitor = _makeMonitor()
+    monitor.setTarget(_targetCoilToMRITransf)
+    changes = []
+    for t in _getFrameTimes():
+        changes.extend(monitor.update(t, _getCoilToMRITransf(t)))
+    _assertChangesMatch(changes)
+    assert monitor.changedAtTime == changes[-1][1]
+    assert not monitor.isOnTarget
+
+
+def test_dwellAndHysteresis():
+    monitor = _makeMonitor()
+    monitor.setTarget(_targetCoilToMRITransf)
+
+    def offsetTransf(dx: float) -> np.ndarray:
+        offset = np.eye(4)
+        offset[0, 3] = dx
+        return _targetCoilToMRITransf @ offset
+
+    # brief excursion onto target (shorter than on target dwell time) does not change state
+    assert monitor.update(0., offsetTransf(2.)) == []
+    assert monitor.update(0.1, offsetTransf(0.)) == []
+    assert monitor.pendingChangeDeadline == pytest.approx(0.05 + onTargetMinTime)
+    assert monitor.update(0.2, offsetTransf(2.)) == []
+    assert monitor.pendingChangeDeadline is None
+
+    # stationary on target: change takes effect at deadline even without new poses
+    assert monitor.update(0.9, offsetTransf(2.)) == []
+    assert monitor.update(1., offsetTransf(0.)) == []
+    assert monitor.updateTime(1.2) == []
+    assert monitor.updateTime(1.6) == [(True, pytest.approx(0.95 + onTargetMinTime))]
+
+    # staying within off target threshold (but outside on target threshold) stays on target
+    assert monitor.update(2., offsetTransf(1.4)) == []
+    assert monitor.update(3., offsetTransf(-1.4)) == []
+    assert monitor.isOnTarget
+
+    # additional checks failing makes off target, after dwell time
+    assert monitor.updateTime(3.5, additionalChecksPassed=False) == []
+    assert monitor.updateTime(3.7) == [(False, pytest.approx(3.5 + offTargetMinTime))]
+
+    # losing tracking makes off target
+    monitor.reset()
+    assert monitor.update(4., offsetTransf(0.)) == []
+    assert monitor.update(5., offsetTransf(0.)) == [(True, pytest.approx(4. + onTargetMinTime))]
+    assert monitor.update(5.1, None) == []
+    assert monitor.update(5.3, None) == [(False, pytest.approx(5.1 + offTargetMinTime))]
+
+
+def _writeReplayRecording(filepath, t0: float):
+    recorder = ToolPositionsRecorder(filepath=str(filepath))
+    with recorder:
+        for t in _getFrameTimes():
+            recorder.recordPositions(dict(
+                Subject=TimestampedToolPosition(time=t0 + t, transf=np.eye(4)),
+                Coil=TimestampedToolPosition(time=t0 + t, transf=_getCoilToMRITransf(t)),
+            ), receiveTime=t0 + t + 0.002)
+
+
+def _makeSession(tmp_path) -> Session:
+    session = Session.createNew(filepath=str(tmp_path / 'session.navinibs'),
+                                unpackedSessionDir=str(tmp_path / 'unpacked'))
+    session.tools.addItem(SubjectTracker(key='Subject'))
+    session.tools.addItem(CoilTool(key='Coil', toolToTrackerTransf=np.eye(4)))
+    session.subjectRegistration.trackerToMRITransf = np.eye(4)
+    session.targets.addItem(Target(key='Target', coilToMRITransf=_targetCoilToMRITransf))
+    return session
+
+
+@pytest.mark.asyncio
+async def test_replayedTransitionTiming(tmp_path):
+    t0 = time.time() - 10.
+    _writeReplayRecording(tmp_path / 'recording.nntr', t0=t0)
+
+    session = _makeSession(tmp_path)
+    client = ReplayToolPositionsClient(recordingPath=str(tmp_path / 'recording.nntr'), speed=None, autostart=False)
+    coordinator = TargetingCoordinator(session=session, positionsClient=client, currentTargetKey='Target',
+                                       isOnTargetMinTime=onTargetMinTime, isOffTargetMinTime=offTargetMinTime)
+    changes = []
+    coordinator.sigIsOnTargetChangedAtTime.connect(lambda isOnTarget, changeTime:
+                                                   changes.append((isOnTarget, changeTime)))
+    numChangeSignals = 0
+
+    def onIsOnTargetChanged():
+        nonlocal numChangeSignals
+        numChangeSignals += 1
+
+    coordinator.sigIsOnTargetChanged.connect(onIsOnTargetChanged)
+    coordinator.doMonitorOnTarget = True
+    try:
+        client.startReplay()
+        await client.waitForReplayToFinish()
+    finally:
+        coordinator.doMonitorOnTarget = False
+    await asyncio.sleep(0)
+
+    _assertChangesMatch(changes, t0=t0)
+    assert numChangeSignals == len(changes)
+    assert coordinator.isOnTargetChangedAtTime == changes[-1][1]
+
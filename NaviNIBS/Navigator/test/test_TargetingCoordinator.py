@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+import pytest
+import pytransform3d.rotations as ptr
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Tools import CoilTool, Pointer, SubjectTracker
+from NaviNIBS.Navigator.TargetingCoordinator import TargetingCoordinator
+from NaviNIBS.util.numpy import array_equalish
+
+
+def _randomTransf(rng: np.random.Generator) -> np.ndarray:
+    transf = np.eye(4)
+    transf[:3, :3] = ptr.random_matrix(rng)
+    transf[:3, 3] = rng.normal(scale=100, size=3)
+    return transf
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def coordinator(tmp_path, rng) -> TargetingCoordinator:
+    session = Session.createNew(filepath=str(tmp_path / 'session.navinibs'),
+                                unpackedSessionDir=str(tmp_path / 'unpacked'))
+    session.tools.addItem(SubjectTracker(key='Subject'))
+    session.tools.addItem(CoilTool(key='Coil', trackerKey='CoilTracker', toolToTrackerTransf=_randomTransf(rng)))
+    session.tools.addItem(Pointer(key='Pointer', toolToTrackerTransf=_randomTransf(rng)))
+    session.subjectRegistration.trackerToMRITransf = _randomTransf(rng)
+
+    client = SimulatedToolPositionsClient()
+    for trackerKey in ('Subject', 'CoilTracker', 'Pointer'):
+        client.recordNewPosition_sync(trackerKey, TimestampedToolPosition(time=time.time(),
+                                                                          transf=_randomTransf(rng)))
+
+    return TargetingCoordinator(session=session, positionsClient=client)
+
+
+def _expectedCoilToMRI(coordinator: TargetingCoordinator) -> np.ndarray | None:
+    return coordinator._calculateCoilToMRITransform(
+        lambda key: coordinator.positionsClient.getLatestTransf(key, None))
+
+
+def _moveTracker(coordinator: TargetingCoordinator, trackerKey: str, transf: np.ndarray | None):
+    coordinator.positionsClient.recordNewPosition_sync(trackerKey, TimestampedToolPosition(time=time.time(),
+                                                                                         transf=transf))
+
+
+def test_coilToMRITransform(coordinator, rng):
+    coilToMRI = coordinator.currentCoilToMRITransform
+    assert array_equalish(coilToMRI, _expectedCoilToMRI(coordinator))
+    MRIToWorld = coordinator.currentMRIToWorldTransform
+    assert array_equalish(np.linalg.pinv(coordinator.session.subjectRegistration.trackerToMRITransf),
+                          np.linalg.pinv(coordinator.positionsClient.getLatestTransf('Subject')) @ MRIToWorld)
+
+    # unrelated tool moving does not invalidate
+    numCompositions = coordinator.transformGraph.numCompositions
+    _moveTracker(coordinator, 'Pointer', _randomTransf(rng))
+    assert coordinator.currentCoilToMRITransform is coilToMRI
+    assert coordinator.currentMRIToWorldTransform is MRIToWorld
+    assert coordinator.transformGraph.numCompositions == numCompositions
+
+    # coil moving invalidates coil but not subject transforms
+    _moveTracker(coordinator, 'CoilTracker', _randomTransf(rng))
+    assert coordinator.currentCoilToMRITransform is not coilToMRI
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+    assert coordinator.currentMRIToWorldTransform is MRIToWorld
+
+    # subject moving invalidates both
+    _moveTracker(coordinator, 'Subject', _randomTransf(rng))
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+    assert coordinator.currentMRIToWorldTransform is not MRIToWorld
+
+
+def test_calibrationAndRegistrationChanges(coordinator, rng):
+    coordinator.session.subjectRegistration.trackerToMRITransf = _randomTransf(rng)
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+
+    coordinator.session.tools['Coil'].toolToTrackerTransf = _randomTransf(rng)
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+
+    coordinator.session.tools['Coil'].trackerKey = 'Pointer'
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+    coordinator.session.tools['Coil'].trackerKey = 'CoilTracker'
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+
+    coordinator.session.tools['Coil'].toolToTrackerTransf = None
+    assert coordinator.currentCoilToMRITransform is None
+
+    coordinator.session.tools['Coil'].toolToTrackerTransf = _randomTransf(rng)
+    coordinator.session.subjectRegistration.trackerToMRITransf = None
+    assert coordinator.currentCoilToMRITransform is None
+    assert coordinator.currentMRIToWorldTransform is None
+
+
+def test_lostTracking(coordinator, rng):
+    _moveTracker(coordinator, 'CoilTracker', None)
+    assert coordinator.currentCoilToMRITransform is None
+    assert coordinator.currentMRIToWorldTransform is not None
+
+    _moveTracker(coordinator, 'CoilTracker', _randomTransf(rng))
+    assert array_equalish(coordinator.currentCoilToMRITransform, _expectedCoilToMRI(coordinator))
+
+    _moveTracker(coordinator, 'Subject', None)
+    assert coordinator.currentCoilToMRITransform is None
+    assert coordinator.currentMRIToWorldTransform is None
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import attrs
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import typing as tp
+from typing import ClassVar
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+
+_recordMagic = b'NNAJ'
+_recordVersion = 1
+_recordHeader = struct.Struct('<4sHHqQQI')
+"""
+magic, record version, reserved, checkpoint time (int64 microseconds since epoch, UTC), payload length,
+config length, payload crc32
+"""
+
+_journalRefPattern = re.compile(r'^(?P<path>.+)#(?P<offset>\d+)\+(?P<length>\d+)(?P<ext>\.\w+)$')
+
+
+def makeJournalRef(journalPath: str, offset: int, length: int, ext: str) -> str:
+    """
+    Reference to a blob within a journal, usable in place of a filename in session configs.
+    The extension indicates the blob format (e.g. '.json' or '.npz').
+    """
+    return f'{journalPath}#{offset}+{length}{ext}'
+
+
+def parseJournalRef(ref: str) -> tuple[str, int, int, str] | None:
+    """
+    Returns (journalPath, offset, length, ext), or None if `ref` is not a journal reference.
+    """
+    match = _journalRefPattern.match(ref)
+    if match is None:
+        return None
+    return match['path'], int(match['offset']), int(match['length']), match['ext']
+
+
+def readJournalRef(ref: str) -> bytes:
+    journalPath, offset, length, _ = parseJournalRef(ref)
+    with open(journalPath, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    if len(data) != length:
+        raise ValueError(f'Journal reference {ref} extends past end of journal')
+    return data
+
+
+@attrs.define(frozen=True)
+class AutosaveCheckpoint:
+    time: datetime
+    configRef: str
+    """
+    Journal reference to this checkpoint's complete session config, with paths relative to the unpacked session
+    dir. Can be passed as `configPath` to `Session.loadFromUnpackedDir`.
+    """
+
+
+@attrs.define
+class AutosaveJournal:
+    """
+    Append-only journal of autosaved session sections, with an index of checkpoints.
+
+    Each autosave appends one record to the journal file, containing the encoded contents of the sections that
+    changed since the previous autosave, followed by a complete session config for that checkpoint. Entries in the
+    config refer to section contents by journal reference (see `makeJournalRef`), either in the same record or,
+    for unchanged sections, in an earlier record or the main session files.
+
+    After each record is written and flushed to disk, a small index file listing all checkpoints is atomically
+    replaced, so that listing checkpoints and restoring from any of them only requires reading the index and the
+    referenced blobs rather than scanning the autosave directory or journal. If the process dies after a record is
+    written but before the index is updated, the complete record is recovered from the journal tail on next open;
+    an incomplete (torn) record at the end of the journal is ignored and truncated before the next append.
+    """
+
+    _autosaveDir: str
+    _refRelTo: str
+    """
+    Dir that paths in configs are relative to (i.e. the unpacked session dir).
+    """
+
+    _journalFilename: str | None = attrs.field(init=False, default=None)
+    _validLength: int = attrs.field(init=False, default=0)
+    _checkpoints: list[dict[str, tp.Any]] = attrs.field(init=False, factory=list)
+
+    indexFilename: ClassVar[str] = 'autosaveIndex.json'
+    _indexFormatVersion: ClassVar[int] = 1
+
+    def __attrs_post_init__(self):
+        index = self._readIndex(self._autosaveDir)
+        if index is not None:
+            self._journalFilename = index['journal']
+            self._validLength = index['validLength']
+            self._checkpoints = index['checkpoints']
+            recovered, self._validLength = self._scanTail(self.journalPath, self._validLength)
+            if len(recovered) > 0:
+                logger.info(f'Recovered {len(recovered)} autosave checkpoint(s) missing from index')
+                self._checkpoints.extend(recovered)
+                self._writeIndex()
+
+    @property
+    def journalPath(self) -> str | None:
+        if self._journalFilename is None:
+            return None
+        return os.path.join(self._autosaveDir, self._journalFilename)
+
+    @property
+    def checkpoints(self) -> list[AutosaveCheckpoint]:
+        return [self._toCheckpoint(self._autosaveDir, self._journalFilename, entry) for entry in self._checkpoints]
+
+    @classmethod
+    def getIndexPath(cls, autosaveDir: str) -> str:
+        return os.path.join(autosaveDir, cls.indexFilename)
+
+    @classmethod
+    def readCheckpoints(cls, autosaveDir: str) -> list[AutosaveCheckpoint] | None:
+        """
+        List checkpoints in the current journal, oldest first, without modifying any files.
+
+        Returns None if there is no journal index in `autosaveDir`.
+        """
+        index = cls._readIndex(autosaveDir)
+        if index is None:
+            return None
+        entries = list(index['checkpoints'])
+        recovered, _ = cls._scanTail(os.path.join(autosaveDir, index['journal']), index['validLength'])
+        entries.extend(recovered)
+        return [cls._toCheckpoint(autosaveDir, index['journal'], entry) for entry in entries]
+
+    def append(self, time: datetime, sections: dict[str, tuple[str, bytes]],
+               config: dict[str, tp.Any]) -> tuple[AutosaveCheckpoint, dict[str, tp.Any]]:
+        """
+        Append a checkpoint.
+
+        `sections` maps config key -> (filename extension indicating format, encoded contents). `config` is the full
+        session config for this checkpoint; entries for keys in `sections` are set to references to the newly
+        written contents. Returns the new checkpoint and its config as written.
+        """
+        if self._journalFilename is None:
+            self._startNewJournal()
+
+        journalPath = self.journalPath
+        relJournalPath = os.path.relpath(journalPath, self._refRelTo).replace(os.sep, '/')
+
+        config = dict(config)
+        offset = self._validLength + _recordHeader.size
+        blobs = []
+        for key, (ext, data) in sections.items():
+            config[key] = makeJournalRef(relJournalPath, offset, len(data), ext)
+            blobs.append(data)
+            offset += len(data)
+        configBytes = json.dumps(config).encode('utf-8')
+        blobs.append(configBytes)
+        payload = b''.join(blobs)
+
+        timeMicros = round(time.astimezone(timezone.utc).timestamp() * 1e6)
+        header = _recordHeader.pack(_recordMagic, _recordVersion, 0, timeMicros, len(payload), len(configBytes),
+                                    zlib.crc32(payload))
+
+        with open(journalPath, 'r+b' if os.path.exists(journalPath) else 'wb') as f:
+            f.truncate(self._validLength)  # discard any torn record left by an interrupted write
+            f.seek(self._validLength)
+            f.write(header)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = dict(time=timeMicros, offset=offset, length=len(configBytes))
+        self._validLength = offset + len(configBytes)
+        self._checkpoints.append(entry)
+        self._writeIndex()
+        return self._toCheckpoint(self._autosaveDir, self._journalFilename, entry), config
+
+    def rotate(self):
+        """
+        Start a new, empty journal, deleting the previous journal.
+
+        Does nothing if the current journal has no checkpoints (including if there is no journal yet), so that saving
+        a session that was never autosaved doesn't create or replace any autosave files.
+        """
+        if len(self._checkpoints) == 0:
+            return
+        self._startNewJournal()
+
+    def _startNewJournal(self):
+        prevJournalPath = self.journalPath
+        self._journalFilename = 'autosaveJournal_' + datetime.today().strftime('%y%m%d%H%M%S.%f') + '.journal'
+        self._validLength = 0
+        self._checkpoints = []
+        os.makedirs(self._autosaveDir, exist_ok=True)
+        open(self.journalPath, 'wb').close()
+        self._writeIndex()
+        if prevJournalPath is not None and os.path.exists(prevJournalPath):
+            os.remove(prevJournalPath)
+
+    @staticmethod
+    def _toCheckpoint(autosaveDir: str, journalFilename: str, entry: dict[str, tp.Any]) -> AutosaveCheckpoint:
+        time = datetime.fromtimestamp(entry['time'] / 1e6)
+        configRef = makeJournalRef(os.path.join(autosaveDir, journalFilename), entry['offset'], entry['length'],
+                                   '.json')
+        return AutosaveCheckpoint(time=time, configRef=configRef)
+
+    @classmethod
+    def _readIndex(cls, autosaveDir: str) -> dict[str, tp.Any] | None:
+        indexPath = cls.getIndexPath(autosaveDir)
+        if not os.path.exists(indexPath):
+            return None
+        with open(indexPath, 'r') as f:
+            index = json.load(f)
+        if index['formatVersion'] > cls._indexFormatVersion:
+            raise ValueError(f'Autosave index format version {index["formatVersion"]} is newer than supported')
+        return index
+
+    def _writeIndex(self):
+        index = dict(formatVersion=self._indexFormatVersion,
+                     journal=self._journalFilename,
+                     validLength=self._validLength,
+                     checkpoints=self._checkpoints)
+        indexPath = self.getIndexPath(self._autosaveDir)
+        tempPath = indexPath + '.tmp'
+        with open(tempPath, 'w') as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, indexPath)
+
+    @staticmethod
+    def _scanTail(journalPath: str, validLength: int) -> tuple[list[dict[str, tp.Any]], int]:
+        """
+        Find complete records after `validLength`. Returns (checkpoint entries, new valid length).
+        """
+        entries = []
+        if not os.path.exists(journalPath):
+            return entries, validLength
+        with open(journalPath, 'rb') as f:
+            f.seek(validLength)
+            while True:
+                headerBytes = f.read(_recordHeader.size)
+                if len(headerBytes) < _recordHeader.size:
+                    break
+                magic, version, _, timeMicros, payloadLength, configLength, crc = _recordHeader.unpack(headerBytes)
+                if magic != _recordMagic or version > _recordVersion or configLength > payloadLength:
+                    break
+                payload = f.read(payloadLength)
+                if len(payload) < payloadLength or zlib.crc32(payload) != crc:
+                    break
+                recordEnd = validLength + _recordHeader.size + payloadLength
+                entries.append(dict(time=timeMicros, offset=recordEnd - configLength, length=configLength))
+                validLength = recordEnd
+        return entries, validLength
+
+
+@attrs.define
+class AutosaveJournalWriter:
+    """
+    Writes autosave checkpoints to an `AutosaveJournal` on a background thread.
+
+    Callers submit already-snapshotted section contents along with functions to encode them; encoding and all file
+    I/O happen on the worker thread, in submission order.
+    """
+
+    _autosaveDir: str
+    _refRelTo: str
+    _getBaseConfig: tp.Callable[[], dict[str, tp.Any]]
+    """
+    Returns config to build the first checkpoint on, and the first after each rotation (i.e. the main session
+    config). Called on worker thread.
+    """
+
+    _queue: queue.Queue = attrs.field(init=False, factory=queue.Queue, repr=False)
+    _thread: threading.Thread | None = attrs.field(init=False, default=None, repr=False)
+    _journal: AutosaveJournal | None = attrs.field(init=False, default=None, repr=False)
+    _lastConfig: dict[str, tp.Any] | None = attrs.field(init=False, default=None, repr=False)
+    """
+    Config of the last checkpoint written by this writer. Checkpoints already in the journal when the writer started
+    (e.g. from a previous run) are not built on, since they may not match the current main session config.
+    """
+    _failedKeys: set[str] = attrs.field(init=False, factory=set)
+    _failedKeysLock: threading.Lock = attrs.field(init=False, factory=threading.Lock, repr=False)
+
+    @property
+    def autosaveDir(self):
+        return self._autosaveDir
+
+    def submit(self, time: datetime,
+               sections: dict[str, tuple[str, tp.Callable[[], bytes]]],
+               configUpdates: dict[str, tp.Any],
+               configRemovals: tp.Iterable[str] = (),
+               dirtyKeys: tp.Iterable[str] = ()):
+        """
+        Queue a checkpoint.
+
+        `sections` maps config key -> (filename extension, function returning encoded contents).
+        `configUpdates` are applied to the previous checkpoint's config, and keys in `configRemovals` are removed
+        from it. `dirtyKeys` are reported by `popFailedKeys` if this checkpoint fails to write.
+        """
+        self._queue.put(('append', (time, sections, configUpdates, set(configRemovals), set(dirtyKeys))))
+        self._ensureThread()
+
+    def rotate(self):
+        """
+        Queue start of a new journal, e.g. after a full (non-autosave) session save.
+        """
+        self._queue.put(('rotate', ()))
+        self._ensureThread()
+
+    def waitUntilIdle(self):
+        """
+        Block until all queued work is finished.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Finish all queued work, then stop the worker thread.
+
+        The worker is a daemon thread, so anything still queued at interpreter exit would otherwise be lost. The
+        writer can still be used after closing; a new worker thread is started on next submit.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(('stop', ()))
+        thread.join()
+        self._thread = None
+
+    def popFailedKeys(self) -> set[str]:
+        """
+        Keys of sections from checkpoints that failed to write, which should be included in the next autosave.
+        """
+        with self._failedKeysLock:
+            keys = self._failedKeys
+            self._failedKeys = set()
+        return keys
+
+    def _ensureThread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='AutosaveJournalWriter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            action, args = self._queue.get()
+            if action == 'stop':
+                self._queue.task_done()
+                return
+            try:
+                if action == 'append':
+                    self._append(*args[:4])
+                elif action == 'rotate':
+                    self._getJournal().rotate()
+                    self._lastConfig = None
+                else:
+                    raise NotImplementedError(action)
+            except Exception as e:
+                logger.exception(f'Problem writing autosave: {e}')
+                if action == 'append':
+                    with self._failedKeysLock:
+                        self._failedKeys.update(args[4])
+            finally:
+                self._queue.task_done()
+
+    def _getJournal(self) -> AutosaveJournal:
+        if self._journal is None:
+            self._journal = AutosaveJournal(autosaveDir=self._autosaveDir, refRelTo=self._refRelTo)
+        return self._journal
+
+    def _append(self, time: datetime, sections: dict[str, tuple[str, tp.Callable[[], bytes]]],
+                configUpdates: dict[str, tp.Any], configRemovals: set[str]):
+        journal = self._getJournal()
+        config = self._lastConfig
+        if config is None:
+            config = self._getBaseConfig()
+        config = dict(config)
+        for key in configRemovals:
+            config.pop(key, None)
+        config.update(configUpdates)
+        encodedSections = {key: (ext, encode()) for key, (ext, encode) in sections.items()}
+        checkpoint, self._lastConfig = journal.append(time=time, sections=encodedSections, config=config)
+        logger.debug(f'Wrote autosave checkpoint {checkpoint.time} with sections {list(sections.keys())}')
@@ -7,14 +7,19 @@ import pyvista as pv
 from skspatial.objects import Line, Plane, Vector
 import types
 import typing as tp
+from typing import ClassVar
 
 from NaviNIBS.Navigator.Model import Session
-from NaviNIBS.Navigator.Model.Calculations import calculateAngleFromMidlineFromCoilToMRITransf, getClosestPointToPointOnMesh
+from NaviNIBS.Navigator.Model.Calculations import calculateAngleFromMidlineFromCoilToMRITransf, \
+    calculateAnglesFromMidlineFromCoilToMRITransfs, getClosestPointToPointOnMesh
 from NaviNIBS.Navigator.Model.Samples import Sample
 from NaviNIBS.Navigator.Model.Targets import Target
-from NaviNIBS.util.pyvista.dataset import find_closest_point, find_closest_cell
+from NaviNIBS.util.pyvista.dataset import find_closest_point, find_closest_cell, BatchClosestCellQuery
+from NaviNIBS.util.pyvista.IncrementalClosestPointQuery import IncrementalClosestPointQuery
+from NaviNIBS.util.pyvista.SignedDistanceField import SignedDistanceField
 from NaviNIBS.util.Signaler import Signal
-from NaviNIBS.util.Transforms import applyTransform, composeTransform, invertTransform, estimateAligningTransform
+from NaviNIBS.util.Transforms import applyTransform, applyTransforms, composeTransform, invertTransform, invertTransforms, \
+    estimateAligningTransform
 
 
 logger = logging.getLogger(__name__)
@@ -36,9 +41,20 @@ class MetricSpecification:
 class PoseMetricCalculator:
     _session: Session = attrs.field(repr=False)
     _sample: tp.Optional[Sample]
+    _useDistanceFields: bool = False
+    """
+    Whether to find closest points on surfaces for sample coil to scalp/cortex distances from precomputed distance
+    fields (see `HeadModel.getDistanceField`) rather than exact queries. Much faster per query, accurate to about a
+    tenth of a mm, but the first query for each surface has to build (or load) the field.
+    """
 
     _cachedValues: dict[str, tp.Any] = attrs.field(init=False, factory=dict, repr=False)
     _supportedMetrics: list[MetricSpecification] = attrs.field(init=False, factory=list)
+    _closestPointQueries: dict[str, IncrementalClosestPointQuery] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    Closest point query engines for sample poses, keyed by purpose and surface, so that repeated queries for a moving
+    sample (e.g. the current coil pose) warm-start from the result for the previous pose.
+    """
 
     sigCacheReset: Signal = attrs.field(init=False, factory=Signal)
     """
@@ -47,7 +63,7 @@ class PoseMetricCalculator:
 
     def __attrs_post_init__(self):
         # self.session.MNIRegistration.sigTransformChanged.connect(lambda *args: self._clearCachedValues())  # TODO: debug, uncomment
-        self.session.headModel.sigDataChanged.connect(lambda *args: self._clearCachedValues())
+        self.session.headModel.sigDataChanged.connect(self._onHeadModelDataChanged)
         self.session.targets.sigItemsChanged.connect(self._onTargetsChanged)
         self.session.subjectRegistration.fiducials.sigItemsChanged.connect(self._onFiducialsChanged)
         if self._sample is not None:
@@ -105,6 +121,17 @@ class PoseMetricCalculator:
     def session(self):
         return self._session
 
+    @property
+    def useDistanceFields(self) -> bool:
+        return self._useDistanceFields
+
+    @useDistanceFields.setter
+    def useDistanceFields(self, useDistanceFields: bool):
+        if self._useDistanceFields == useDistanceFields:
+            return
+        self._useDistanceFields = useDistanceFields
+        self._clearCachedValues()
+
     @property
     def sample(self):
         return self._sample
@@ -121,6 +148,26 @@ class PoseMetricCalculator:
             self._sample.sigItemChanged.connect(self._onSampleChanged)
         self._clearCachedValues()
 
+    def _onHeadModelDataChanged(self, *args):
+        self._closestPointQueries.clear()
+        self._clearCachedValues()
+
+    def _getClosestPointQuery(self, purpose: str, surfKey: str) -> IncrementalClosestPointQuery | None:
+        surf = getattr(self._session.headModel, surfKey)
+        if surf is None:
+            return None
+        key = f'{purpose}:{surfKey}'
+        query = self._closestPointQueries.get(key, None)
+        if query is None or query.surf is not surf:
+            query = IncrementalClosestPointQuery(surf)
+            self._closestPointQueries[key] = query
+        return query
+
+    def _getDistanceField(self, surfKey: str) -> SignedDistanceField | None:
+        if not self._useDistanceFields:
+            return None
+        return self._session.headModel.getDistanceField(surfKey)
+
     def _onTargetsChanged(self, targetKeys: list[str], targetAttrs: tp.Optional[list[str]] = None):
         if self._sample is not None and self._sample.targetKey in targetKeys and \
                 (targetAttrs is None or len(set(targetAttrs) - {'isVisible'}) > 0):
@@ -239,7 +286,9 @@ class PoseMetricCalculator:
             return np.nan
 
         return self._getCoilToSurfDist(coilToMRITransf=self._sample.coilToMRITransf,
-                                       surf=skinSurf)
+                                       surf=skinSurf,
+                                       query=self._getClosestPointQuery('sampleCoil', 'skinSurf'),
+                                       distanceField=self._getDistanceField('skinSurf'))
 
     getSampleCoilToScalpDist.cacheKey = 'sampleCoilToScalpDist'
 
@@ -255,18 +304,30 @@ class PoseMetricCalculator:
             return np.nan
 
         return self._getCoilToSurfDist(coilToMRITransf=self._sample.coilToMRITransf,
-                                       surf=gmSurf)
+                                       surf=gmSurf,
+                                       query=self._getClosestPointQuery('sampleCoil', 'gmSurf'),
+                                       distanceField=self._getDistanceField('gmSurf'))
 
     getSampleCoilToCortexDist.cacheKey = 'sampleCoilToCortexDist'
 
-    def _getCoilToSurfDist(self, coilToMRITransf: np.ndarray, surf: pv.PolyData) -> float:
+    def _getCoilToSurfDist(self, coilToMRITransf: np.ndarray, surf: pv.PolyData,
+                           query: IncrementalClosestPointQuery | None = None,
+                           distanceField: SignedDistanceField | None = None) -> float:
         coilOrigin_MRI = applyTransform(coilToMRITransf, np.zeros((3,)), doCheck=False)
 
         # TODO: maybe use additional constraint to find distance within a small range along coil depth axis
         # (e.g. a small sphere sliding down along the depth axis until reaching cortex)
         # Currently, this may find a closest point at a very oblique angle from coil center if coil is tilted
 
-        if False:
+        if distanceField is not None:
+            # find approximate closest point, anywhere on surface, from precomputed distance field
+            assert distanceField.surf is surf
+            closestPt = distanceField.getClosestPoint(coilOrigin_MRI)
+        elif query is not None:
+            # find closest point, anywhere on surface, warm-starting from previous pose
+            assert query.surf is surf
+            _, closestPt = query.findClosestPoint(coilOrigin_MRI)
+        elif False:
             # find closest point, constrained to vertices in surf
             closestPtIndex = find_closest_point(surf, coilOrigin_MRI)
             closestPt = surf.points[closestPtIndex, :]
@@ -581,7 +642,8 @@ class PoseMetricCalculator:
         return getClosestPointToPointOnMesh(
             session=self._session,
             whichMesh=surfKey,
-            point_MRISpace=applyTransform(self._sample.coilToMRITransf, np.zeros((3,)), doCheck=False)
+            point_MRISpace=applyTransform(self._sample.coilToMRITransf, np.zeros((3,)), doCheck=False),
+            query=self._getClosestPointQuery('sampleCoil', surfKey),
         )
 
     getClosestPointToCoilOnSurf.cacheKey = 'closestPointToCoilOnSurf'
@@ -601,7 +663,8 @@ class PoseMetricCalculator:
 
         return getClosestPointToPointOnMesh(session=self._session,
                                             whichMesh=surfKey,
-                                            point_MRISpace=point_MRISpace)
+                                            point_MRISpace=point_MRISpace,
+                                            query=self._getClosestPointQuery('sampleCortexDepth', surfKey))
 
     getClosestPointToSampleCortexDepthOnSurf.cacheKey = 'getClosestPointToSampleCortexDepthOnSurf'
 
@@ -645,3 +708,372 @@ class PoseMetricCalculator:
         return self._getNormalCoilAngleError(iDim=1)
 
     getNormalCoilYAngleError.cacheKey = 'normalCoilYAngleError'
+
+
+def _angleBetween(vecsA: np.ndarray, vecsB: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of skspatial Vector.angle_between for Nx3 vectors, in radians
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosTheta = np.einsum('ij,ij->i', vecsA, vecsB) / (np.linalg.norm(vecsA, axis=1) * np.linalg.norm(vecsB, axis=1))
+    return np.arccos(np.clip(cosTheta, -1, 1))
+
+
+@attrs.define
+class BatchPoseMetricCalculator:
+    """
+    Vectorized equivalent of `PoseMetricCalculator`, calculating metrics for many coil poses at once.
+
+    Poses are given as Nx4x4 sample coil transforms, with corresponding target coil transforms. Rows containing NaN
+    (e.g. for samples without a coil transform or target) give NaN for any metric depending on them.
+
+    Results are keyed by the same labels as `PoseMetricCalculator.supportedMetrics`.
+    """
+    _session: Session = attrs.field(repr=False)
+    _useDistanceFields: bool = False
+    """
+    Whether to find closest points on surfaces from precomputed distance fields rather than exact queries (see
+    `PoseMetricCalculator.useDistanceFields`)
+    """
+
+    _metricGetters: dict[str, tp.Callable[[], np.ndarray]] = attrs.field(init=False, factory=dict, repr=False)
+    _closestCellQueries: dict[str, BatchClosestCellQuery] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    Batch closest cell query engines keyed by surface, reused across calls while the surface is unchanged
+    """
+
+    # per-call state
+    _coilToMRITransfs: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _targetCoilToMRITransfs: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _cachedValues: dict[str, np.ndarray] = attrs.field(init=False, factory=dict, repr=False)
+
+    def __attrs_post_init__(self):
+        self._metricGetters = {
+            'Target error in brain': self._getTargetErrorInBrain,
+            'Target error at coil': lambda: self._getTargetErrorAtDepth(depthsFromTargetCoil=0.),
+            'Target X error at coil': lambda: self._getTargetErrorAtDepth(depthsFromTargetCoil=0., axis=0),
+            'Target Y error at coil': lambda: self._getTargetErrorAtDepth(depthsFromTargetCoil=0., axis=1),
+            'Depth offset error': lambda: self._sampleInTargetSpace[:, 2, 3],
+            'Depth angle error': self._getDepthAngleError,
+            'Depth target X angle error': lambda: self._getDepthComponentAngleError(iDim=0, relTo='target'),
+            'Depth target Y angle error': lambda: self._getDepthComponentAngleError(iDim=1, relTo='target'),
+            'Depth coil X angle error': lambda: self._getDepthComponentAngleError(iDim=0, relTo='coil'),
+            'Depth coil Y angle error': lambda: self._getDepthComponentAngleError(iDim=1, relTo='coil'),
+            'Normal coil X angle error': lambda: self._getNormalCoilAngleError(iDim=0),
+            'Normal coil Y angle error': lambda: self._getNormalCoilAngleError(iDim=1),
+            'Horiz angle error': self._getHorizAngleError,
+            'Angle from midline': lambda: calculateAnglesFromMidlineFromCoilToMRITransfs(self._session,
+                                                                                        self._coilToMRITransfs),
+            'Angle from normal': self._getAngleFromNormal,
+            'Coil to cortex dist': lambda: self._cacheWrap('sampleCoilToCortexDist', lambda: self._getCoilToSurfDists(
+                self._coilToMRITransfs, 'gmSurf')),
+            'Coil to scalp dist': lambda: self._getCoilToSurfDists(self._coilToMRITransfs, 'skinSurf'),
+            'Coil X position': lambda: self._coilToMRITransfs[:, 0, 3],
+            'Coil Y position': lambda: self._coilToMRITransfs[:, 1, 3],
+            'Coil Z position': lambda: self._coilToMRITransfs[:, 2, 3],
+        }
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def useDistanceFields(self) -> bool:
+        return self._useDistanceFields
+
+    @property
+    def supportedMetricLabels(self) -> list[str]:
+        return list(self._metricGetters.keys())
+
+    def calculate(self,
+                  coilToMRITransfs: np.ndarray,
+                  targetCoilToMRITransfs: np.ndarray | None = None,
+                  labels: tp.Iterable[str] | None = None) -> dict[str, np.ndarray]:
+        """
+        :param coilToMRITransfs: Nx4x4 sample coil transforms
+        :param targetCoilToMRITransfs: Nx4x4 target coil transforms, or a single 4x4 transform for all samples, or None
+            if no samples have targets
+        :param labels: metrics to calculate. If None, will calculate all supported metrics.
+        :return: dict of N-length arrays, keyed by metric label
+        """
+        coilToMRITransfs = np.asarray(coilToMRITransfs, dtype=np.float64)
+        if coilToMRITransfs.ndim != 3 or coilToMRITransfs.shape[1:] != (4, 4):
+            raise ValueError('coilToMRITransfs should be of shape Nx4x4')
+        N = coilToMRITransfs.shape[0]
+        if targetCoilToMRITransfs is None:
+            targetCoilToMRITransfs = np.full((N, 4, 4), np.nan)
+        else:
+            targetCoilToMRITransfs = np.broadcast_to(np.asarray(targetCoilToMRITransfs, dtype=np.float64), (N, 4, 4))
+
+        if labels is None:
+            labels = self.supportedMetricLabels
+
+        self._coilToMRITransfs = coilToMRITransfs
+        self._targetCoilToMRITransfs = targetCoilToMRITransfs
+        self._cachedValues = dict()
+        try:
+            results = dict()
+            for label in labels:
+                try:
+                    getter = self._metricGetters[label]
+                except KeyError:
+                    raise KeyError(f'No metric with label {label} found')
+                results[label] = np.asarray(getter(), dtype=np.float64)
+            return results
+        finally:
+            self._coilToMRITransfs = None
+            self._targetCoilToMRITransfs = None
+            self._cachedValues = dict()
+
+    def calculateForSamples(self, samples: tp.Iterable[Sample], labels: tp.Iterable[str] | None = None) \
+            -> dict[str, np.ndarray]:
+        """
+        Calculate metrics for samples, using each sample's coil transform and its target's coil transform (if any).
+        """
+        samples = list(samples)
+        coilToMRITransfs = np.full((len(samples), 4, 4), np.nan)
+        targetCoilToMRITransfs = np.full((len(samples), 4, 4), np.nan)
+        for iSample, sample in enumerate(samples):
+            if sample.coilToMRITransf is not None:
+                coilToMRITransfs[iSample] = sample.coilToMRITransf
+            if sample.targetKey is not None:
+                target = self._session.targets.get(sample.targetKey, None)
+                if target is not None and target.coilToMRITransf is not None:
+                    targetCoilToMRITransfs[iSample] = target.coilToMRITransf
+        return self.calculate(coilToMRITransfs, targetCoilToMRITransfs, labels=labels)
+
+    def _cacheWrap(self, key: str, fn: tp.Callable[[], T]) -> T:
+        if key not in self._cachedValues:
+            self._cachedValues[key] = fn()
+        return self._cachedValues[key]
+
+    @property
+    def _sampleInTargetSpace(self) -> np.ndarray:
+        """
+        Sample coil to target coil space transforms
+        """
+        return self._cacheWrap('sampleInTargetSpace',
+                               lambda: invertTransforms(self._targetCoilToMRITransfs) @ self._coilToMRITransfs)
+
+    @property
+    def _targetInSampleSpace(self) -> np.ndarray:
+        """
+        Target coil to sample coil space transforms
+        """
+        return self._cacheWrap('targetInSampleSpace',
+                               lambda: invertTransforms(self._coilToMRITransfs) @ self._targetCoilToMRITransfs)
+
+    def _getClosestPointsOnSurf(self, pts: np.ndarray, surfKey: str) -> np.ndarray | None:
+        """
+        :return: Nx3 closest points (NaN where input points were NaN), or None if surface is not available
+        """
+        surf = getattr(self._session.headModel, surfKey)
+        if surf is None:
+            return None
+        closestPts = np.full_like(pts, np.nan)
+        isValid = np.isfinite(pts).all(axis=1)
+        if isValid.any():
+            if self._useDistanceFields:
+                closestPts[isValid] = self._session.headModel.getDistanceField(surfKey).getClosestPoints(pts[isValid])
+            else:
+                query = self._closestCellQueries.get(surfKey, None)
+                if query is None or query.dataset is not surf:
+                    query = BatchClosestCellQuery(surf)
+                    self._closestCellQueries[surfKey] = query
+                _, closestPts[isValid], _ = query.findClosestCells(pts[isValid])
+        return closestPts
+
+    def _getCoilToSurfDists(self, coilToMRITransfs: np.ndarray, surfKey: str) -> np.ndarray:
+        """
+        Signed distances, where coil -Z axis pointing down to surface is positive offset
+        (see `PoseMetricCalculator._getCoilToSurfDist`)
+        """
+        closestPts = self._getClosestPointsOnSurf(coilToMRITransfs[:, :3, 3], surfKey)
+        if closestPts is None:
+            return np.full((coilToMRITransfs.shape[0],), np.nan)
+        closestPts_coilSpace = applyTransforms(invertTransforms(coilToMRITransfs), closestPts)
+        return -1 * closestPts_coilSpace[:, 2]
+
+    def _getTargetCoilToCortexDists(self) -> np.ndarray:
+        def calculate():
+            # many samples usually share a few targets, so only query surface once per unique target
+            N = self._targetCoilToMRITransfs.shape[0]
+            dists = np.full((N,), np.nan)
+            isValid = np.isfinite(self._targetCoilToMRITransfs).all(axis=(1, 2))
+            if not isValid.any():
+                return dists
+            uniqueTransfs, iUnique = np.unique(self._targetCoilToMRITransfs[isValid].reshape(-1, 16), axis=0,
+                                               return_inverse=True)
+            uniqueDists = self._getCoilToSurfDists(uniqueTransfs.reshape(-1, 4, 4), 'gmSurf')
+            dists[isValid] = uniqueDists[iUnique.reshape(-1)]
+            return dists
+
+        return self._cacheWrap('targetCoilToCortexDist', calculate)
+
+    def _getTargetErrorAtDepth(self, depthsFromTargetCoil: float | np.ndarray, axis: int | None = None) -> np.ndarray:
+        """
+        See `PoseMetricCalculator._getTargetErrorAtDepth`
+        """
+        sampleInTargetSpace = self._sampleInTargetSpace
+        samplePts = sampleInTargetSpace[:, :3, 3]
+        sampleDirs = sampleInTargetSpace[:, :3, 2]
+
+        # intersect sample depth axis with plane at target depth, perpendicular to target depth axis
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = (-depthsFromTargetCoil - samplePts[:, 2]) / sampleDirs[:, 2]
+        samplePtsOnPlane = samplePts + scale[:, np.newaxis] * sampleDirs
+        samplePtsOnPlane[sampleDirs[:, 2] == 0, :] = np.nan  # sample axis is parallel to plane
+
+        if axis is None:
+            return np.linalg.norm(samplePtsOnPlane[:, :2], axis=1)
+        else:
+            return -samplePtsOnPlane[:, axis]  # note that this is signed
+
+    def _getTargetErrorInBrain(self) -> np.ndarray:
+        return self._getTargetErrorAtDepth(depthsFromTargetCoil=self._getTargetCoilToCortexDists())
+
+    def _getDepthAngleError(self) -> np.ndarray:
+        return np.rad2deg(_angleBetween(self._targetCoilToMRITransfs[:, :3, 2], self._coilToMRITransfs[:, :3, 2]))
+
+    def _getDepthComponentAngleError(self, iDim: int, relTo: str) -> np.ndarray:
+        match relTo:
+            case 'target':
+                # signed angle from target depth axis to sample depth axis, projected onto target plane iDim-Z
+                sampleDirs = self._sampleInTargetSpace[:, :3, 2]
+                return np.rad2deg(np.arctan2(-sampleDirs[:, iDim], sampleDirs[:, 2]))
+            case 'coil':
+                # signed angle from target depth axis to sample depth axis, projected onto coil plane iDim-Z
+                targetDirs = self._targetInSampleSpace[:, :3, 2]
+                return np.rad2deg(np.arctan2(targetDirs[:, iDim], targetDirs[:, 2]))
+            case _:
+                raise NotImplementedError
+
+    def _getHorizAngleError(self) -> np.ndarray:
+        # signed angle from target handle (-Y) to sample handle projected onto target horizontal plane
+        sampleHandleDirs = -self._sampleInTargetSpace[:, :3, 1]
+        return np.rad2deg(np.arctan2(sampleHandleDirs[:, 0], -sampleHandleDirs[:, 1]))
+
+    def _getSampleCortexDepthPts(self) -> np.ndarray:
+        """
+        Points along sample depth axis at the depth of the cortex, in MRI space
+        """
+        def calculate():
+            coilToCortexDists = self._metricGetters['Coil to cortex dist']()
+            return self._coilToMRITransfs[:, :3, 3] - coilToCortexDists[:, np.newaxis] * self._coilToMRITransfs[:, :3, 2]
+
+        return self._cacheWrap('sampleCortexDepthPts', calculate)
+
+    def _getAngleFromNormal(self) -> np.ndarray:
+        pts_gm = self._getSampleCortexDepthPts()
+        closestPts_skin = self._getClosestPointsOnSurf(pts_gm, 'skinConvexSurf')
+        if closestPts_skin is None:
+            return np.full((pts_gm.shape[0],), np.nan)
+
+        # find ideal normal by defining line through these two points
+        idealNormals = closestPts_skin - pts_gm
+        actualNormals = self._coilToMRITransfs[:, :3, 2]
+        return np.rad2deg(_angleBetween(idealNormals, actualNormals))
+
+    def _getNormalCoilAngleError(self, iDim: int) -> np.ndarray:
+        pts_gm = self._getSampleCortexDepthPts()
+        closestPts_skin = self._cacheWrap('closestSkinPtsToSampleCortexDepth',
+                                          lambda: self._getClosestPointsOnSurf(pts_gm, 'skinSurf'))
+        if closestPts_skin is None:
+            return np.full((pts_gm.shape[0],), np.nan)
+
+        # find ideal normal by defining line through these two points, in coil space
+        MRIToCoilTransfs = invertTransforms(self._coilToMRITransfs)
+        idealNormals_coilSpace = applyTransforms(MRIToCoilTransfs, closestPts_skin) - \
+                                 applyTransforms(MRIToCoilTransfs, pts_gm)
+
+        # signed angle from ideal normal to coil depth axis, projected onto coil plane iDim-Z
+        return np.rad2deg(np.arctan2(idealNormals_coilSpace[:, iDim], idealNormals_coilSpace[:, 2]))
+
+
+
+@attrs.define
+class OnTargetErrorKernel:
+    """
+    Calculates only the pose errors used to determine whether the coil is on target (see `errorLabels`), for one or
+    more coil poses relative to a single target, into preallocated buffers.
+
+    Values match the corresponding `PoseMetricCalculator` metrics, but without per-call allocation of intermediate
+    transforms and vectors, so that this is cheap enough to run on every new coil pose.
+    """
+    errorLabels: ClassVar[tuple[str, ...]] = (
+        'Depth angle error',
+        'Horiz angle error',
+        'Target error at coil',
+        'Depth offset error',
+    )
+
+    _capacity: int = 1
+    """
+    Initial number of poses to allocate buffers for. Buffers grow as needed.
+    """
+
+    _MRIToTargetCoilTransf: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _sampleInTargetSpace: np.ndarray = attrs.field(init=False, repr=False)
+    _errors: np.ndarray = attrs.field(init=False, repr=False)
+    _scratch: np.ndarray = attrs.field(init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self._allocate(self._capacity)
+
+    def _allocate(self, capacity: int):
+        self._capacity = capacity
+        self._sampleInTargetSpace = np.empty((capacity, 4, 4))
+        self._errors = np.empty((capacity, len(self.errorLabels)))
+        self._scratch = np.empty((capacity, 2))
+
+    def setTarget(self, targetCoilToMRITransf: np.ndarray | None):
+        if targetCoilToMRITransf is None:
+            self._MRIToTargetCoilTransf = None
+        else:
+            self._MRIToTargetCoilTransf = invertTransform(targetCoilToMRITransf)
+
+    def calculate(self, coilToMRITransfs: np.ndarray) -> np.ndarray:
+        """
+        :param coilToMRITransfs: Nx4x4 coil transforms, or a single 4x4 transform
+        :return: Nx4 errors, in order of `errorLabels`. NaN if no target is set. Note that this is a view into a
+            buffer that is overwritten on the next call.
+        """
+        if coilToMRITransfs.ndim == 2:
+            coilToMRITransfs = coilToMRITransfs[np.newaxis, :, :]
+        N = coilToMRITransfs.shape[0]
+        if N > self._capacity:
+            self._allocate(max(N, 2 * self._capacity))
+
+        errors = self._errors[:N]
+        if self._MRIToTargetCoilTransf is None:
+            errors.fill(np.nan)
+            return errors
+
+        M = self._sampleInTargetSpace[:N]
+        np.matmul(self._MRIToTargetCoilTransf, coilToMRITransfs, out=M)
+        scratch = self._scratch[:N]
+
+        # depth angle error: angle between target and sample depth axes
+        np.hypot(M[:, 0, 2], M[:, 1, 2], out=scratch[:, 0])
+        np.arctan2(scratch[:, 0], M[:, 2, 2], out=errors[:, 0])
+
+        # horiz angle error: signed angle from target handle (-Y) to sample handle, projected onto target
+        #  horizontal plane
+        np.negative(M[:, 0, 1], out=scratch[:, 0])
+        np.arctan2(scratch[:, 0], M[:, 1, 1], out=errors[:, 1])
+
+        np.rad2deg(errors[:, :2], out=errors[:, :2])
+
+        # target error at coil: distance from target coil origin to where sample depth axis intersects target
+        #  horizontal plane
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(M[:, 2, 3], M[:, 2, 2], out=errors[:, 2])  # distance along sample depth axis to plane
+            np.multiply(errors[:, 2, np.newaxis], M[:, :2, 2], out=scratch)
+            np.subtract(M[:, :2, 3], scratch, out=scratch)
+        np.hypot(scratch[:, 0], scratch[:, 1], out=errors[:, 2])
+        errors[M[:, 2, 2] == 0, 2] = np.nan  # sample axis is parallel to plane
+
+        # depth offset error
+        errors[:, 3] = M[:, 2, 3]
+
+        return errors
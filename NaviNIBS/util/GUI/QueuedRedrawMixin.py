@@ -5,6 +5,7 @@ import logging
 import typing as tp
 
 from NaviNIBS.util.Asyncio import asyncCreateTask
+from NaviNIBS.util.LatencyTracing import getLatencyTracer, stageRedraw
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -51,6 +52,7 @@ class QueuedRedrawMixin:
                     # tuple of (which, kwargs)
                     assert len(toRedraw) == 2
                     self._redraw(which=toRedraw[0], **toRedraw[1])
+            getLatencyTracer().markStage(stageRedraw, key=id(self))
             self._redrawQueueModified.clear()
             self.redrawQueueIsEmpty.set()
 
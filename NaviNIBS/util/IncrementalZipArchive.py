@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import attrs
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import typing as tp
+import warnings
+import zipfile
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define(frozen=True)
+class ArchiveSaveStats:
+    mode: str
+    """
+    One of 'unchanged', 'append', or 'full'
+    """
+    numMembersWritten: int = 0
+    numBytesWritten: int = 0
+
+
+@attrs.define
+class IncrementalZipArchiveWriter:
+    """
+    Keeps a zip archive in sync with the contents of a directory, rewriting only what changed.
+
+    On each save, each file under `rootDir` is compared (by CRC32 and size, as recorded in the zip's central
+    directory) against the latest archive member of the same name. Changed and new files are appended to the
+    archive as new members that shadow older ones; readers that open members by name (e.g. zipfile,
+    shutil.unpack_archive) see the latest version. If any files were removed from the directory, the archive is
+    rewritten in full.
+
+    Shadowed members waste space, so once they exceed a threshold the archive is compacted, by default in a
+    background thread. Any save waits for an in-progress compaction to finish.
+
+    Other zip readers do not all agree on which of several same-named members to use, so `close` should be called
+    when done with the archive; it compacts synchronously so that the archive left on disk has exactly one member
+    per name. The compaction thread is not a daemon thread, so interpreter exit waits for it rather than killing
+    it partway through.
+
+    To keep an append from corrupting the archive if the process dies mid-write, the original central directory
+    is first copied to a journal file next to the archive; `recoverInterruptedAppend` restores from this journal.
+    """
+
+    _archivePath: str
+    _rootDir: str
+
+    _compactWhenWastedFraction: float = 0.5
+    """
+    Compact once shadowed members make up more than this fraction of the archive...
+    """
+    _compactWhenWastedBytes: int = 1_000_000
+    """
+    ...and more than this many bytes.
+    """
+    _doCompactInBackground: bool = True
+
+    _crcCache: dict[str, tuple[int, int, int]] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    Mapping from member name -> (mtime_ns, size, crc) of the corresponding local file when last hashed.
+    """
+    _crcCacheTime_ns: dict[str, int] = attrs.field(init=False, factory=dict, repr=False)
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock, repr=False)
+    _compactionThread: threading.Thread | None = attrs.field(init=False, default=None, repr=False)
+
+    _coarseMTimeWindow_ns: tp.ClassVar[int] = 2_000_000_000
+    _fineMTimeWindow_ns: tp.ClassVar[int] = 10_000_000
+    """
+    Files modified within this long of being hashed are re-hashed on next check, since a change within the
+    same mtime tick would not otherwise be detected. The coarse window is used for filesystems that appear to
+    only store whole-second mtimes.
+    """
+
+    @property
+    def archivePath(self):
+        return self._archivePath
+
+    @property
+    def rootDir(self):
+        return self._rootDir
+
+    @property
+    def journalPath(self):
+        return self.getJournalPath(self._archivePath)
+
+    @staticmethod
+    def getJournalPath(archivePath: str) -> str:
+        return archivePath + '.appendjournal'
+
+    @classmethod
+    def recoverInterruptedAppend(cls, archivePath: str) -> bool:
+        """
+        If a previous append to the archive was interrupted, restore the archive to its state before that append.
+
+        Returns True if recovery was needed.
+        """
+        journalPath = cls.getJournalPath(archivePath)
+        if not os.path.exists(journalPath):
+            return False
+        logger.warning(f'Recovering archive {archivePath} from interrupted append')
+        with open(journalPath, 'rb') as f:
+            journal = f.read()
+        offset, = struct.unpack_from('<Q', journal)
+        tail = journal[8:]
+        with open(archivePath, 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(journalPath)
+        return True
+
+    def primeFromArchive(self):
+        """
+        Record current local file stats as matching the archive, e.g. immediately after extracting the archive
+        into rootDir. This avoids re-hashing every file on the first save.
+        """
+        with zipfile.ZipFile(self._archivePath, 'r') as zf:
+            latestInfos = self._getLatestInfos(zf)
+        now_ns = time.time_ns()
+        for name, info in latestInfos.items():
+            if name.endswith('/'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._rootDir, *name.split('/')))
+            except FileNotFoundError:
+                continue
+            if stat.st_size != info.file_size:
+                continue
+            self._crcCache[name] = (stat.st_mtime_ns, stat.st_size, info.CRC)
+            self._crcCacheTime_ns[name] = now_ns
+
+    def save(self) -> ArchiveSaveStats:
+        with self._lock:
+            self.recoverInterruptedAppend(self._archivePath)
+
+            if not os.path.exists(self._archivePath) or not zipfile.is_zipfile(self._archivePath):
+                return self._writeFull()
+
+            localNames = self._listLocalMembers()
+
+            with zipfile.ZipFile(self._archivePath, 'r') as zf:
+                latestInfos = self._getLatestInfos(zf)
+
+            archivedFileNames = {name for name in latestInfos if not name.endswith('/')}
+            if not archivedFileNames.issubset(localNames):
+                logger.debug('Files removed since last save, rewriting full archive')
+                return self._writeFull()
+
+            toWrite = []
+            for name in localNames:
+                info = latestInfos.get(name, None)
+                size, crc = self._getLocalSizeAndCRC(name)
+                if info is None or info.file_size != size or info.CRC != crc:
+                    toWrite.append(name)
+
+            if len(toWrite) == 0:
+                return ArchiveSaveStats(mode='unchanged')
+
+            stats = self._append(toWrite)
+
+        self._compactIfNeeded()
+        return stats
+
+    def compact(self):
+        """
+        Rewrite archive with only the latest version of each member.
+        """
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        """
+        Finish any in-progress compaction, then compact synchronously if any shadowed members remain.
+        """
+        self.waitForCompaction()
+        with self._lock:
+            if os.path.exists(self._archivePath) and zipfile.is_zipfile(self._archivePath):
+                self._compact()
+
+    def waitForCompaction(self, timeout: float | None = None):
+        thread = self._compactionThread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def getWastedBytes(self) -> int:
+        with zipfile.ZipFile(self._archivePath, 'r') as zf:
+            return self._getWastedBytes(zf)
+
+    def _listLocalMembers(self) -> list[str]:
+        names = []
+        for dirpath, dirnames, filenames in os.walk(self._rootDir):
+            dirnames.sort()
+            relDir = os.path.relpath(dirpath, self._rootDir)
+            for filename in sorted(filenames):
+                relPath = filename if relDir == '.' else os.path.join(relDir, filename)
+                names.append(relPath.replace(os.sep, '/'))
+        return names
+
+    def _getLocalSizeAndCRC(self, name: str) -> tuple[int, int]:
+        localPath = os.path.join(self._rootDir, *name.split('/'))
+        stat = os.stat(localPath)
+        cached = self._crcCache.get(name, None)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            if stat.st_mtime_ns % 1_000_000_000 == 0:
+                window = self._coarseMTimeWindow_ns
+            else:
+                window = self._fineMTimeWindow_ns
+            if self._crcCacheTime_ns[name] - stat.st_mtime_ns > window:
+                return cached[1], cached[2]
+
+        crc = 0
+        with open(localPath, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                crc = zlib.crc32(chunk, crc)
+        self._crcCache[name] = (stat.st_mtime_ns, stat.st_size, crc)
+        self._crcCacheTime_ns[name] = time.time_ns()
+        return stat.st_size, crc
+
+    @staticmethod
+    def _getLatestInfos(zf: zipfile.ZipFile) -> dict[str, zipfile.ZipInfo]:
+        latestInfos = {}
+        for info in zf.infolist():
+            latestInfos[info.filename] = info  # later members shadow earlier ones
+        return latestInfos
+
+    @staticmethod
+    def _getWastedBytes(zf: zipfile.ZipFile) -> int:
+        latestInfos = IncrementalZipArchiveWriter._getLatestInfos(zf)
+        wasted = 0
+        for info in zf.infolist():
+            if latestInfos[info.filename] is not info:
+                wasted += 30 + len(info.filename.encode()) + len(info.extra) + info.compress_size
+        return wasted
+
+    def _writeFull(self) -> ArchiveSaveStats:
+        logger.debug(f'Writing full archive {self._archivePath}')
+        archiveDir = os.path.dirname(os.path.abspath(self._archivePath))
+        fd, tempPath = tempfile.mkstemp(dir=archiveDir, prefix='.tmp_', suffix='.zip')
+        os.close(fd)
+        numMembers = 0
+        try:
+            with zipfile.ZipFile(tempPath, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for dirpath, dirnames, filenames in os.walk(self._rootDir):
+                    dirnames.sort()
+                    relDir = os.path.relpath(dirpath, self._rootDir)
+                    if relDir != '.':
+                        zf.write(dirpath, relDir.replace(os.sep, '/') + '/')
+                    for filename in sorted(filenames):
+                        relPath = filename if relDir == '.' else os.path.join(relDir, filename)
+                        zf.write(os.path.join(dirpath, filename), relPath.replace(os.sep, '/'))
+                        numMembers += 1
+            os.replace(tempPath, self._archivePath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        return ArchiveSaveStats(mode='full', numMembersWritten=numMembers,
+                                numBytesWritten=os.path.getsize(self._archivePath))
+
+    def _append(self, names: list[str]) -> ArchiveSaveStats:
+        logger.debug(f'Appending {len(names)} members to archive {self._archivePath}')
+        with zipfile.ZipFile(self._archivePath, 'r') as zf:
+            startDir = zf.start_dir
+        with open(self._archivePath, 'rb') as f:
+            f.seek(startDir)
+            tail = f.read()
+
+        with open(self.journalPath, 'wb') as f:
+            f.write(struct.pack('<Q', startDir) + tail)
+            f.flush()
+            os.fsync(f.fileno())
+
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='Duplicate name', category=UserWarning)
+                with zipfile.ZipFile(self._archivePath, 'a', compression=zipfile.ZIP_DEFLATED) as zf:
+                    for name in names:
+                        zf.write(os.path.join(self._rootDir, *name.split('/')), name)
+            with open(self._archivePath, 'r+b') as f:
+                os.fsync(f.fileno())
+        except BaseException:
+            self.recoverInterruptedAppend(self._archivePath)
+            raise
+        else:
+            os.remove(self.journalPath)
+
+        return ArchiveSaveStats(mode='append', numMembersWritten=len(names),
+                                numBytesWritten=os.path.getsize(self._archivePath) - startDir)
+
+    def _compactIfNeeded(self):
+        with zipfile.ZipFile(self._archivePath, 'r') as zf:
+            wasted = self._getWastedBytes(zf)
+        if wasted < self._compactWhenWastedBytes \
+                or wasted < self._compactWhenWastedFraction * os.path.getsize(self._archivePath):
+            return
+        if not self._doCompactInBackground:
+            self.compact()
+            return
+        if self._compactionThread is not None and self._compactionThread.is_alive():
+            return
+        logger.debug(f'Starting background compaction of {self._archivePath}')
+        self._compactionThread = threading.Thread(target=self.compact, name='ArchiveCompaction', daemon=False)
+        self._compactionThread.start()
+
+    def _compact(self):
+        self.recoverInterruptedAppend(self._archivePath)
+        archiveDir = os.path.dirname(os.path.abspath(self._archivePath))
+        fd, tempPath = tempfile.mkstemp(dir=archiveDir, prefix='.tmp_', suffix='.zip')
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(self._archivePath, 'r') as zin:
+                latestInfos = self._getLatestInfos(zin)
+                if len(latestInfos) == len(zin.infolist()):
+                    os.remove(tempPath)
+                    return  # nothing to compact
+                with zipfile.ZipFile(tempPath, 'w') as zout:
+                    for name, info in latestInfos.items():
+                        zout.writestr(info, zin.read(info), compress_type=info.compress_type)
+            os.replace(tempPath, self._archivePath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        logger.debug(f'Compacted {self._archivePath}')
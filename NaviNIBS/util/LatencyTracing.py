@@ -0,0 +1,310 @@
+"""
+Lightweight end-to-end latency tracing, from tracker sample to pixels on screen.
+
+Each time new tool positions are received, a trace is started with the tracker timestamp of the newest sample as its
+origin. As the positions propagate through the navigator (e.g. server publish, client receipt, coordinator
+transform update, view redraw), each stage is marked on the shared tracer (see `getLatencyTracer`), which records the
+time since the tracker sample and the time since the previous stage into in-memory histograms. Live percentiles are
+available from `LatencyTracer.getStats`, and can be saved with `LatencyTracer.dumpToFile`.
+
+Timestamps are seconds since epoch (`time.time()`), as used for `TimestampedToolPosition.time`, so tracker and
+navigator clocks are assumed to be the same (i.e. the tracker server runs on the same machine).
+
+Tracing is disabled by default, in which case marking a stage only costs an attribute check. The tracer is not
+thread-safe, and should only be used from the main event loop thread.
+"""
+
+from __future__ import annotations
+
+import attrs
+import json
+import logging
+import math
+import os
+import time
+import typing as tp
+
+
+logger = logging.getLogger(__name__)
+
+
+stageTracker = 'tracker'
+stageServerPublish = 'serverPublish'
+stageClientReceive = 'clientReceive'
+stageCoordinatorUpdate = 'coordinatorUpdate'
+stageRedraw = 'redraw'
+
+
+@attrs.define
+class LatencyHistogram:
+    """
+    Histogram of durations (in seconds) with logarithmically spaced bins, so that recording a value is O(1) and
+    percentiles have bounded relative error (about 6% with the default 20 bins per decade).
+
+    Values below `minValue` or above `maxValue` are counted in under/overflow bins.
+    """
+    _minValue: float = 1.e-6
+    _maxValue: float = 100.
+    _binsPerDecade: int = 20
+
+    _log10MinValue: float = attrs.field(init=False)
+    _numBins: int = attrs.field(init=False)
+    _counts: list[int] = attrs.field(init=False, repr=False)
+    _count: int = attrs.field(init=False, default=0)
+    _sum: float = attrs.field(init=False, default=0.)
+    _min: float = attrs.field(init=False, default=math.inf)
+    _max: float = attrs.field(init=False, default=-math.inf)
+
+    def __attrs_post_init__(self):
+        if not 0 < self._minValue < self._maxValue:
+            raise ValueError('Must have 0 < minValue < maxValue')
+        self._log10MinValue = math.log10(self._minValue)
+        self._numBins = math.ceil((math.log10(self._maxValue) - self._log10MinValue) * self._binsPerDecade)
+        self._counts = [0] * (self._numBins + 2)  # plus underflow and overflow bins
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._count if self._count > 0 else math.nan
+
+    @property
+    def min(self) -> float:
+        return self._min if self._count > 0 else math.nan
+
+    @property
+    def max(self) -> float:
+        return self._max if self._count > 0 else math.nan
+
+    @property
+    def binEdges(self) -> list[float]:
+        """
+        Edges of the regular bins, i.e. `numBins + 1` values from `minValue` to (at least) `maxValue`
+        """
+        return [10 ** (self._log10MinValue + i / self._binsPerDecade) for i in range(self._numBins + 1)]
+
+    @property
+    def counts(self) -> list[int]:
+        """
+        Counts for [underflow bin, regular bins..., overflow bin]
+        """
+        return list(self._counts)
+
+    def record(self, value: float):
+        if value < self._minValue:
+            iBin = 0
+        elif value >= self._maxValue:
+            iBin = self._numBins + 1
+        else:
+            iBin = min(int((math.log10(value) - self._log10MinValue) * self._binsPerDecade), self._numBins - 1) + 1
+        self._counts[iBin] += 1
+        self._count += 1
+        self._sum += value
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+
+    def percentile(self, p: float) -> float:
+        """
+        Approximate percentile (0-100) of recorded values, as the geometric center of the bin containing it
+        (clamped to the observed min/max)
+        """
+        if self._count == 0:
+            return math.nan
+        if not 0 <= p <= 100:
+            raise ValueError('Percentile must be in range [0, 100]')
+        if p == 0:
+            return self._min
+        elif p == 100:
+            return self._max
+        rank = max(1, math.ceil(p / 100 * self._count))
+        cumCount = 0
+        for iBin, binCount in enumerate(self._counts):
+            cumCount += binCount
+            if cumCount >= rank:
+                break
+        if iBin == 0:
+            return self._min
+        elif iBin == self._numBins + 1:
+            return self._max
+        value = 10 ** (self._log10MinValue + (iBin - 0.5) / self._binsPerDecade)
+        return min(max(value, self._min), self._max)
+
+    def reset(self):
+        self._counts = [0] * (self._numBins + 2)
+        self._count = 0
+        self._sum = 0.
+        self._min = math.inf
+        self._max = -math.inf
+
+    def getStats(self, percentiles: tp.Iterable[float] = (50, 90, 99)) -> dict[str, float]:
+        stats = dict(count=self._count, mean=self.mean, min=self.min, max=self.max)
+        for p in percentiles:
+            stats[f'p{p:g}'] = self.percentile(p)
+        return stats
+
+
+@attrs.define
+class _StageHistograms:
+    latency: LatencyHistogram = attrs.field(factory=LatencyHistogram)
+    """
+    Time from tracker sample to this stage
+    """
+    duration: LatencyHistogram = attrs.field(factory=LatencyHistogram)
+    """
+    Time from previous stage to this stage
+    """
+
+
+@attrs.define
+class LatencyTracer:
+    """
+    Tracks the current trace (origin = tracker timestamp of the newest received sample) and records per-stage
+    latencies for it.
+
+    Each (stage, key) is recorded at most once per trace, so e.g. only the first redraw of each view after new
+    positions arrive is counted. Stages with multiple keys (e.g. several views redrawing) measure their duration from
+    the preceding different stage. Stages marked more than `maxTraceAge` seconds after the trace origin are ignored,
+    so that unrelated activity after tracking stops is not attributed to a stale trace.
+    """
+    _isEnabled: bool = False
+    _maxTraceAge: float = 1.
+
+    _stages: dict[str, _StageHistograms] = attrs.field(init=False, factory=dict, repr=False)
+    _numTraces: int = attrs.field(init=False, default=0)
+    _originTime: float | None = attrs.field(init=False, default=None)
+    _traceMarked: set[tuple[str, tp.Hashable]] = attrs.field(init=False, factory=set, repr=False)
+    _lastStage: str | None = attrs.field(init=False, default=None, repr=False)
+    _lastStageTime: float = attrs.field(init=False, default=math.nan, repr=False)
+    _prevStageTime: float = attrs.field(init=False, default=math.nan, repr=False)
+
+    @property
+    def isEnabled(self):
+        return self._isEnabled
+
+    @isEnabled.setter
+    def isEnabled(self, isEnabled: bool):
+        if isEnabled == self._isEnabled:
+            return
+        self._isEnabled = isEnabled
+        self._originTime = None
+        logger.info(f'Latency tracing {"enabled" if isEnabled else "disabled"}')
+
+    @property
+    def numTraces(self):
+        return self._numTraces
+
+    @property
+    def stageKeys(self) -> list[str]:
+        return list(self._stages.keys())
+
+    def __getitem__(self, stage: str) -> _StageHistograms:
+        return self._stages[stage]
+
+    def startTrace(self, originTime: float, stageTimes: tp.Iterable[tuple[str, float]] = (), now: float | None = None):
+        """
+        Start a new trace originating at the given tracker timestamp.
+
+        :param stageTimes: (stage, time) for stages that already happened elsewhere (e.g. server publish time
+            reported by the server), in order
+        :param now: if provided, also mark `stageClientReceive` at this time
+        """
+        if not self._isEnabled:
+            return
+        if self._originTime is not None and originTime <= self._originTime:
+            return  # no newer sample (e.g. repeated keyframe)
+        self._originTime = originTime
+        self._numTraces += 1
+        self._traceMarked.clear()
+        self._lastStage = stageTracker
+        self._lastStageTime = originTime
+        self._prevStageTime = math.nan
+        for stage, t in stageTimes:
+            self._record(stage, None, t)
+        if now is not None:
+            self._record(stageClientReceive, None, now)
+
+    def markStage(self, stage: str, key: tp.Hashable = None, now: float | None = None):
+        """
+        Mark that the given stage was reached (by the component identified by `key`) for the current trace
+        """
+        if not self._isEnabled or self._originTime is None:
+            return
+        if (stage, key) in self._traceMarked:
+            return
+        if now is None:
+            now = time.time()
+        if now - self._originTime > self._maxTraceAge:
+            return
+        self._record(stage, key, now)
+
+    def _record(self, stage: str, key: tp.Hashable, t: float):
+        self._traceMarked.add((stage, key))
+        if stage != self._lastStage:
+            self._prevStageTime = self._lastStageTime
+            self._lastStage = stage
+            self._lastStageTime = t
+        try:
+            histograms = self._stages[stage]
+        except KeyError:
+            histograms = _StageHistograms()
+            self._stages[stage] = histograms
+        histograms.latency.record(t - self._originTime)
+        histograms.duration.record(t - self._prevStageTime)
+
+    def getStats(self, percentiles: tp.Iterable[float] = (50, 90, 99)) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        Live summary statistics (in seconds) per stage, in the order stages were first reached, e.g.
+        ``stats['redraw']['latency']['p99']``
+        """
+        percentiles = tuple(percentiles)
+        return {stage: dict(latency=histograms.latency.getStats(percentiles),
+                            duration=histograms.duration.getStats(percentiles))
+                for stage, histograms in self._stages.items()}
+
+    def reset(self):
+        self._stages.clear()
+        self._numTraces = 0
+        self._originTime = None
+
+    def dumpToFile(self, filepath: str | os.PathLike, percentiles: tp.Iterable[float] = (50, 90, 95, 99, 99.9)):
+        """
+        Save summary statistics and full histograms to a JSON file
+        """
+        d = dict(
+            dumpTime=time.time(),
+            numTraces=self._numTraces,
+            stats=self.getStats(percentiles),
+            histograms={stage: dict(latency=dict(binEdges=histograms.latency.binEdges,
+                                                 counts=histograms.latency.counts),
+                                    duration=dict(binEdges=histograms.duration.binEdges,
+                                                  counts=histograms.duration.counts))
+                        for stage, histograms in self._stages.items()},
+        )
+        with open(filepath, 'w') as f:
+            json.dump(d, f, indent=2)
+        logger.info(f'Saved latency traces to {filepath}')
+
+    def formatStats(self, percentiles: tp.Iterable[float] = (50, 90, 99)) -> str:
+        """
+        Human-readable table of latency since tracker sample per stage, in ms
+        """
+        percentiles = tuple(percentiles)
+        lines = [f'{"stage":<20} {"count":>8} ' + ' '.join(f'{f"p{p:g} (ms)":>10}' for p in percentiles)]
+        for stage, histograms in self._stages.items():
+            lines.append(f'{stage:<20} {histograms.latency.count:>8d} '
+                         + ' '.join(f'{histograms.latency.percentile(p) * 1e3:>10.2f}' for p in percentiles))
+        return '\n'.join(lines)
+
+
+_latencyTracer = LatencyTracer()
+
+
+def getLatencyTracer() -> LatencyTracer:
+    """
+    Shared tracer used by tracking, coordinator, and GUI instrumentation
+    """
+    return _latencyTracer
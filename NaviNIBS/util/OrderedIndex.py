@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import bisect
+from collections.abc import Mapping, MutableMapping, ItemsView, ValuesView, Iterable
+import typing as tp
+
+
+K = tp.TypeVar('K')
+V = tp.TypeVar('V')
+
+
+class _Deleted:
+    def __repr__(self):
+        return '<deleted>'
+
+
+_deleted = _Deleted()
+
+
+class OrderedIndex(MutableMapping[K, V]):
+    """
+    Insertion-ordered mapping that supports renaming a key in place (without moving it to the end) in O(1),
+    and looking up the position of a key (or the key at a position) in O(log d), where d is the number of
+    deleted slots not yet compacted.
+
+    Entries are stored in parallel slot lists, with a key->slot dict. Deleted slots are left as tombstones
+    and compacted lazily, only when they make up more than half of the slots. A sorted list of tombstone slots is
+    kept so that positions can be computed without compacting.
+
+    Can be used like:
+            d = OrderedIndex(dict(a=1, b=2, c=3))
+            d.renameKey('a', 'z')
+            list(d.keys())  # ['z', 'b', 'c']
+            d.positionOf('b')  # 1
+    """
+
+    __slots__ = ('_slotKeys', '_slotValues', '_keyToSlot', '_deletedSlots')
+
+    _minDeletedBeforeCompact: tp.ClassVar[int] = 32
+
+    def __init__(self, other: Mapping[K, V] | Iterable[tuple[K, V]] = ()):
+        self._slotKeys: list[K | _Deleted] = []
+        self._slotValues: list[V | None] = []
+        self._keyToSlot: dict[K, int] = {}
+        self._deletedSlots: list[int] = []  # sorted
+        if isinstance(other, Mapping):
+            other = other.items()
+        for key, value in other:
+            self[key] = value
+
+    def __getitem__(self, key: K) -> V:
+        return self._slotValues[self._keyToSlot[key]]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        try:
+            slot = self._keyToSlot[key]
+        except KeyError:
+            self._keyToSlot[key] = len(self._slotKeys)
+            self._slotKeys.append(key)
+            self._slotValues.append(value)
+        else:
+            self._slotValues[slot] = value
+
+    def __delitem__(self, key: K) -> None:
+        slot = self._keyToSlot.pop(key)
+        self._slotKeys[slot] = _deleted
+        self._slotValues[slot] = None
+        bisect.insort(self._deletedSlots, slot)
+        numDeleted = len(self._deletedSlots)
+        if numDeleted >= self._minDeletedBeforeCompact and numDeleted * 2 > len(self._slotKeys):
+            self._compact()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keyToSlot
+
+    def __iter__(self) -> tp.Iterator[K]:
+        if not self._deletedSlots:
+            return iter(self._slotKeys)
+        return (key for key in self._slotKeys if key is not _deleted)
+
+    def __len__(self) -> int:
+        return len(self._keyToSlot)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self.items())!r})'
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        try:
+            return self._slotValues[self._keyToSlot[key]]
+        except KeyError:
+            return default
+
+    def values(self) -> ValuesView[V]:
+        return _OrderedIndexValuesView(self)
+
+    def items(self) -> ItemsView[K, V]:
+        return _OrderedIndexItemsView(self)
+
+    def clear(self) -> None:
+        self._slotKeys.clear()
+        self._slotValues.clear()
+        self._keyToSlot.clear()
+        self._deletedSlots.clear()
+
+    def copy(self) -> OrderedIndex[K, V]:
+        return self.__class__(self.items())
+
+    def renameKey(self, fromKey: K, toKey: K) -> None:
+        """
+        Change the key of an existing entry, keeping its value and position.
+        """
+        if fromKey == toKey:
+            return
+        if toKey in self._keyToSlot:
+            raise KeyError(f'Key {toKey!r} already present')
+        slot = self._keyToSlot.pop(fromKey)
+        self._keyToSlot[toKey] = slot
+        self._slotKeys[slot] = toKey
+
+    def positionOf(self, key: K) -> int:
+        """
+        Position of key in iteration order.
+        """
+        slot = self._keyToSlot[key]
+        if not self._deletedSlots:
+            return slot
+        return slot - bisect.bisect_left(self._deletedSlots, slot)
+
+    def keyAtPosition(self, position: int) -> K:
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f'Position {position} out of range')
+        deletedSlots = self._deletedSlots
+        if not deletedSlots:
+            return self._slotKeys[position]
+        # deletedSlots[i] - i is the number of live slots before the i-th tombstone, so the number of tombstones
+        # before the requested live slot is the number of i for which that is <= position
+        numDeletedBefore = bisect.bisect_right(range(len(deletedSlots)), position,
+                                               key=lambda i: deletedSlots[i] - i)
+        return self._slotKeys[position + numDeletedBefore]
+
+    def _compact(self) -> None:
+        slotKeys = []
+        slotValues = []
+        for key, value in zip(self._slotKeys, self._slotValues):
+            if key is _deleted:
+                continue
+            self._keyToSlot[key] = len(slotKeys)
+            slotKeys.append(key)
+            slotValues.append(value)
+        self._slotKeys = slotKeys
+        self._slotValues = slotValues
+        self._deletedSlots.clear()
+
+
+class _OrderedIndexValuesView(ValuesView):
+    _mapping: OrderedIndex
+
+    def __iter__(self):
+        mapping = self._mapping
+        if not mapping._deletedSlots:
+            return iter(mapping._slotValues)
+        return (value for key, value in zip(mapping._slotKeys, mapping._slotValues) if key is not _deleted)
+
+
+class _OrderedIndexItemsView(ItemsView):
+    _mapping: OrderedIndex
+
+    def __iter__(self):
+        mapping = self._mapping
+        if not mapping._deletedSlots:
+            return zip(mapping._slotKeys, mapping._slotValues)
+        return ((key, value) for key, value in zip(mapping._slotKeys, mapping._slotValues) if key is not _deleted)
+
+
+def asOrderedIndex(other: Mapping[K, V] | Iterable[tuple[K, V]]) -> OrderedIndex[K, V]:
+    """
+    Converter for attrs fields; avoids copying if already an OrderedIndex.
+    """
+    if isinstance(other, OrderedIndex):
+        return other
+    return OrderedIndex(other)
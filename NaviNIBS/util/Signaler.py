@@ -30,6 +30,11 @@ class Signal(tp.Generic[*ET]):
 
     _blockedSemaphoreCounter: int = attr.ib(init=False, default=0, repr=False)
 
+    _dispatch: tuple[tuple[int, Connection], ...] | None = attr.ib(init=False, default=None, repr=False)
+    """
+    Cached (priority, fn) pairs in call order, compiled on first emit after any connect/disconnect.
+    """
+
     def __attrs_post_init__(self):
         pass
 
@@ -42,6 +47,7 @@ class Signal(tp.Generic[*ET]):
             self._connections[priority] = set()
 
         self._connections[priority].add(fn)
+        self._dispatch = None
 
     def disconnect(self, fn: Connection) -> int:
         removedAtPriority = None
@@ -55,8 +61,16 @@ class Signal(tp.Generic[*ET]):
                 break
         if removedAtPriority is None:
             raise ValueError(f'Function {fn} not connected to signal')
+        self._dispatch = None
         return removedAtPriority
 
+    def _compileDispatch(self) -> tuple[tuple[int, Connection], ...]:
+        self._dispatch = tuple(
+            (priority, fn)
+            for priority in sorted(self._connections.keys(), reverse=True)
+            for fn in self._connections[priority])
+        return self._dispatch
+
     @property
     def isBlocked(self):
         return self._blockedSemaphoreCounter > 0
@@ -65,16 +79,18 @@ class Signal(tp.Generic[*ET]):
     def emit(self, *args: *ET, **kwargs) -> None:
         if self._blockedSemaphoreCounter > 0:
             return
-        priorities = sorted(self._connections.keys(), reverse=True)
-        for priority in priorities:
-            connectionSet = self._connections[priority].copy()
-            for fn in connectionSet:
-                if fn in self._connections[priority]:
-                    try:
-                        fn(*args, **kwargs)
-                    except Exception as e:
-                        logger.error(f'Exception in connected slot: {exceptionToStr(e)}')
-                        raise e
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self._compileDispatch()
+        for priority, fn in dispatch:
+            if self._dispatch is not dispatch and fn not in self._connections.get(priority, ()):
+                # connections changed during this emit; skip anything disconnected since we started
+                continue
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f'Exception in connected slot: {exceptionToStr(e)}')
+                raise e
 
     @contextlib.contextmanager
     def blocked(self):
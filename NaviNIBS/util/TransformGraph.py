@@ -0,0 +1,236 @@
+"""
+Graph of coordinate frames connected by transforms, with cached composition of transforms between frames.
+
+Frames are nodes (identified by strings), and each edge holds the transform from one frame to another, e.g. a
+tracker's pose in camera space from the tool positions stream, a tool's calibration to its tracker, or the subject
+registration from the subject tracker to MRI space. Edges can be traversed in either direction, using the inverse
+transform when traversing backwards.
+
+Composed transforms between any two frames are cached when first requested. Each edge keeps track of which cached
+paths pass through it, so that changing an edge only invalidates transforms downstream of it. For example, when only
+an unrelated tool moves, the coil to MRI transform is returned from cache without being recomposed. Setting an edge to
+a value equal to its current value does not invalidate anything.
+
+Each edge also has a version number, taken from a graph-wide counter whenever it changes. `getVersion` gives a
+version for a composed path that changes whenever any edge along it changes (or edges are added or removed anywhere in
+the graph), which callers can use to skip redundant work (e.g. re-rendering an actor whose transform did not change).
+"""
+
+from __future__ import annotations
+
+import attrs
+import logging
+import numpy as np
+import typing as tp
+
+from NaviNIBS.util.Signaler import Signal
+from NaviNIBS.util.Transforms import concatenateTransforms, invertTransform
+
+
+logger = logging.getLogger(__name__)
+
+
+Transform = np.ndarray
+EdgeKey = tuple[str, str]
+
+
+@attrs.define(eq=False)
+class _Edge:
+    transf: Transform
+    version: int
+    inverse: Transform | None = None
+    dependentPaths: set[EdgeKey] = attrs.field(factory=set)
+    """
+    Keys of cached paths that pass through this edge
+    """
+
+    def getInverse(self) -> Transform:
+        if self.inverse is None:
+            self.inverse = invertTransform(self.transf)
+        return self.inverse
+
+
+@attrs.define(eq=False)
+class _CachedPath:
+    transf: Transform | None
+    """
+    None if frames are not connected
+    """
+    version: int
+
+
+@attrs.define
+class TransformGraph:
+    _edges: dict[EdgeKey, _Edge] = attrs.field(init=False, factory=dict)
+    _neighbors: dict[str, dict[str, tuple[EdgeKey, bool]]] = attrs.field(init=False, factory=dict, repr=False)
+    """
+    For each frame, maps each directly connected frame to (key of edge connecting them, whether edge is traversed
+    forward when going from this frame to the other)
+    """
+    _cachedPaths: dict[EdgeKey, _CachedPath] = attrs.field(init=False, factory=dict, repr=False)
+    _latestVersion: int = attrs.field(init=False, default=0)
+    _topologyVersion: int = attrs.field(init=False, default=0)
+    """
+    Version at which edges were last added or removed. Included in every path version, since the path between two
+    frames (not just the transforms along it) may have changed.
+    """
+    _numCompositions: int = attrs.field(init=False, default=0)
+
+    sigTransformChanged: Signal = attrs.field(init=False, factory=lambda: Signal((str, str)), repr=False)
+    """
+    Emitted with (fromFrame, toFrame) when an edge is added, changed, or removed.
+    """
+
+    @property
+    def frames(self) -> list[str]:
+        return list(self._neighbors.keys())
+
+    @property
+    def edges(self) -> list[EdgeKey]:
+        return list(self._edges.keys())
+
+    @property
+    def numCompositions(self) -> int:
+        """
+        Number of times a transform between frames has been (re)composed, i.e. number of cache misses. Mainly for
+        testing and benchmarking.
+        """
+        return self._numCompositions
+
+    def hasTransform(self, fromFrame: str, toFrame: str) -> bool:
+        """
+        Whether a direct edge exists between these frames (in either direction)
+        """
+        return toFrame in self._neighbors.get(fromFrame, {})
+
+    def setTransform(self, fromFrame: str, toFrame: str, transf: Transform | None):
+        """
+        Set the transform of the edge from `fromFrame` to `toFrame`, adding the edge if needed. Setting to None
+        removes the edge.
+
+        Transforms are stored by reference, so should not be modified in place after being set.
+        """
+        if transf is None:
+            self.removeTransform(fromFrame, toFrame)
+            return
+
+        key = (fromFrame, toFrame)
+        edge = self._edges.get(key, None)
+        if edge is None:
+            if (toFrame, fromFrame) in self._edges:
+                raise ValueError(f'Transform from {toFrame} to {fromFrame} already set, cannot also set inverse')
+            if fromFrame == toFrame:
+                raise ValueError('Cannot set transform from a frame to itself')
+            self._latestVersion += 1
+            self._topologyVersion = self._latestVersion
+            self._edges[key] = _Edge(transf=transf, version=self._latestVersion)
+            self._neighbors.setdefault(fromFrame, {})[toFrame] = (key, True)
+            self._neighbors.setdefault(toFrame, {})[fromFrame] = (key, False)
+            # new edge may connect previously disconnected frames or create shorter paths
+            self._clearCachedPaths()
+        else:
+            if edge.transf is transf or np.array_equal(edge.transf, transf):
+                return
+            self._latestVersion += 1
+            edge.transf = transf
+            edge.inverse = None
+            edge.version = self._latestVersion
+            for pathKey in edge.dependentPaths:
+                self._cachedPaths.pop(pathKey, None)
+            edge.dependentPaths.clear()
+
+        self.sigTransformChanged.emit(fromFrame, toFrame)
+
+    def removeTransform(self, fromFrame: str, toFrame: str):
+        key = (fromFrame, toFrame)
+        if key not in self._edges:
+            return
+        del self._edges[key]
+        for frameA, frameB in (key, key[::-1]):
+            neighbors = self._neighbors[frameA]
+            del neighbors[frameB]
+            if len(neighbors) == 0:
+                del self._neighbors[frameA]
+        self._latestVersion += 1
+        self._topologyVersion = self._latestVersion
+        self._clearCachedPaths()
+        self.sigTransformChanged.emit(fromFrame, toFrame)
+
+    def getTransform(self, fromFrame: str, toFrame: str) -> Transform | None:
+        """
+        Get the composed transform from `fromFrame` to `toFrame`, or None if frames are not connected.
+
+        The returned transform may be shared with other callers and the cache, so should not be modified in place.
+        """
+        return self._getCachedPath(fromFrame, toFrame).transf
+
+    def getVersion(self, fromFrame: str, toFrame: str) -> int:
+        """
+        Version of the composed transform from `fromFrame` to `toFrame`, which changes whenever the transform may have
+        changed.
+        """
+        return self._getCachedPath(fromFrame, toFrame).version
+
+    def _getCachedPath(self, fromFrame: str, toFrame: str) -> _CachedPath:
+        pathKey = (fromFrame, toFrame)
+        cachedPath = self._cachedPaths.get(pathKey, None)
+        if cachedPath is None:
+            cachedPath = self._composePath(fromFrame, toFrame)
+            self._cachedPaths[pathKey] = cachedPath
+        return cachedPath
+
+    def _composePath(self, fromFrame: str, toFrame: str) -> _CachedPath:
+        self._numCompositions += 1
+        pathKey = (fromFrame, toFrame)
+
+        if fromFrame == toFrame:
+            return _CachedPath(transf=np.eye(4) if fromFrame in self._neighbors else None,
+                               version=self._topologyVersion)
+
+        steps = self._findPath(fromFrame, toFrame)
+        if steps is None:
+            return _CachedPath(transf=None, version=self._topologyVersion)
+
+        transfs = []
+        version = self._topologyVersion
+        for edgeKey, isForward in steps:
+            edge = self._edges[edgeKey]
+            transfs.append(edge.transf if isForward else edge.getInverse())
+            version = max(version, edge.version)
+            edge.dependentPaths.add(pathKey)
+
+        return _CachedPath(transf=concatenateTransforms(transfs), version=version)
+
+    def _findPath(self, fromFrame: str, toFrame: str) -> list[tuple[EdgeKey, bool]] | None:
+        """
+        Breadth-first search for the path with fewest edges between frames.
+
+        :return: list of (edge key, whether edge is traversed forward), or None if not connected
+        """
+        if fromFrame not in self._neighbors or toFrame not in self._neighbors:
+            return None
+
+        cameFrom: dict[str, tuple[str, EdgeKey, bool] | None] = {fromFrame: None}
+        queue = [fromFrame]
+        iQueue = 0
+        while iQueue < len(queue):
+            frame = queue[iQueue]
+            iQueue += 1
+            for neighbor, (edgeKey, isForward) in self._neighbors[frame].items():
+                if neighbor in cameFrom:
+                    continue
+                cameFrom[neighbor] = (frame, edgeKey, isForward)
+                if neighbor == toFrame:
+                    steps = []
+                    while cameFrom[neighbor] is not None:
+                        neighbor, edgeKey, isForward = cameFrom[neighbor]
+                        steps.append((edgeKey, isForward))
+                    return steps[::-1]
+                queue.append(neighbor)
+
+        return None
+
+    def _clearCachedPaths(self):
+        self._cachedPaths.clear()
+        for edge in self._edges.values():
+            edge.dependentPaths.clear()
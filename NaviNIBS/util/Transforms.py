@@ -9,6 +9,12 @@ from skspatial.objects import Vector
 import typing as tp
 
 
+_rigidOrthonormalityTol = 1e-6
+"""
+Max deviation (Frobenius norm) of R^T R from identity for a transform to be treated as rigid when inverting
+"""
+
+
 def composeTransform(R: np.ndarray, p: tp.Optional[np.ndarray] = None) -> np.ndarray:
     if p is None:
         p = np.zeros((3,))
@@ -25,21 +31,6 @@ def decomposeTransform(A2B: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     return R, T
 
 
-def _pttTransform_noCheck(A2B: np.ndarray, PA: np.ndarray) -> np.ndarray:
-    """
-    Adapted from ptt.transform but bypassing check for speed
-    """
-    PA = np.asarray(PA)
-
-    if PA.ndim == 1:
-        return np.dot(A2B, PA)
-
-    if PA.ndim == 2:
-        return np.dot(PA, A2B.T)
-
-    raise ValueError("Cannot transform array with more than 2 dimensions")
-
-
 def applyTransform(A2B: tp.Union[np.ndarray, tp.Iterable[np.ndarray]],
                    pts: np.ndarray,
                    doCheck: bool = True,
@@ -65,8 +56,9 @@ def applyTransform(A2B: tp.Union[np.ndarray, tp.Iterable[np.ndarray]],
         A2B = concatenateTransforms(A2B)
 
     if not doCheck:
-        # adapt ptt.transform here since it doesn't allow bypassing check
-        result = _pttTransform_noCheck(A2B, ptt.vectors_to_points(pts))[:, 0:3]
+        # equivalent to first 3 columns of ptt.transform(A2B, ptt.vectors_to_points(pts)), without check or
+        #  intermediate augmented points
+        result = pts @ A2B[0:3, 0:3].T + A2B[0:3, 3]
     else:
         result = ptt.transform(A2B, ptt.vectors_to_points(pts), strict_check=doStrictCheck)[:, 0:3]
     if didInsertAxis:
@@ -89,7 +81,7 @@ def applyDirectionTransform(A2B: np.ndarray,
         A2B = concatenateTransforms(A2B)
 
     if not doCheck:
-        result = _pttTransform_noCheck(A2B, ptt.vectors_to_directions(dirs))[:, 0:3]
+        result = dirs @ A2B[0:3, 0:3].T
     else:
         result = ptt.transform(A2B, ptt.vectors_to_directions(dirs), strict_check=doStrictCheck)[:, 0:3]
     if didInsertAxis:
@@ -103,16 +95,115 @@ def concatenateTransforms(A2B: tp.Iterable[np.ndarray]) -> np.ndarray:
     `applyTransform(concatenateTransforms([space1ToSpace2Transf, space2TransfToSpace3Transf]), pts)` correctly transforms from space1 to space3
     as might be expected with `space2TransfToSpace3Transf @ space1ToSpace2Transf @ augmentedPts`
     """
-    A2B_combined = np.eye(4)
+    A2B_combined = None
     for A2B_i in A2B:
-        A2B_combined = A2B_i @ A2B_combined
+        if A2B_combined is None:
+            A2B_combined = np.array(A2B_i, dtype=np.float64)
+        else:
+            A2B_combined = A2B_i @ A2B_combined
+    if A2B_combined is None:
+        return np.eye(4)
     return A2B_combined
 
 
+_eye3 = np.eye(3)
+
+
+def _isRigid(A2Bs: np.ndarray) -> np.ndarray:
+    """
+    Check whether stacked transforms have orthonormal rotation components and no projective components.
+
+    :param A2Bs: Nx4x4 transforms
+    :return: N-length bool array
+    """
+    R = A2Bs[:, 0:3, 0:3]
+    RtRErr = np.swapaxes(R, -1, -2) @ R - _eye3
+    return (np.einsum('nij,nij->n', RtRErr, RtRErr) < _rigidOrthonormalityTol ** 2) & \
+        (A2Bs[:, 3, 0:3] == 0).all(axis=-1) & (A2Bs[:, 3, 3] == 1)
+
+
+def _invertRigidTransforms(A2Bs: np.ndarray) -> np.ndarray:
+    """
+    Closed-form inverse of stacked rigid transforms, without checking that they are actually rigid.
+    """
+    Rt = np.swapaxes(A2Bs[:, 0:3, 0:3], -1, -2)
+    B2As = np.zeros_like(A2Bs)
+    B2As[:, 0:3, 0:3] = Rt
+    B2As[:, 0:3, 3] = -(Rt @ A2Bs[:, 0:3, 3, np.newaxis])[:, :, 0]
+    B2As[:, 3, 3] = 1
+    return B2As
+
+
 def invertTransform(A2B: np.ndarray) -> np.ndarray:
+    """
+    Invert a 4x4 transform.
+
+    Rigid transforms (orthonormal rotation, no projective component) are inverted in closed form as [R^T, -R^T t].
+    Anything else (e.g. transforms with scaling or shear) falls back to a pseudoinverse.
+    """
+    A2B = np.asarray(A2B, dtype=np.float64)
+    # note: written out for a single transform rather than reusing stacked helpers since this is called very
+    #  frequently, and per-call numpy overhead dominates for 4x4 matrices
+    if A2B[3, 0] == 0 and A2B[3, 1] == 0 and A2B[3, 2] == 0 and A2B[3, 3] == 1:
+        Rt = A2B[0:3, 0:3].T
+        RtRErr = (Rt @ A2B[0:3, 0:3] - _eye3).ravel()
+        if np.dot(RtRErr, RtRErr) < _rigidOrthonormalityTol ** 2:
+            B2A = np.empty((4, 4))
+            B2A[0:3, 0:3] = Rt
+            B2A[0:3, 3] = -(Rt @ A2B[0:3, 3])
+            B2A[3, :] = (0, 0, 0, 1)
+            return B2A
     return np.linalg.pinv(A2B)
 
 
+def invertTransforms(A2Bs: np.ndarray) -> np.ndarray:
+    """
+    Invert a stack of transforms, equivalent to calling `invertTransform` on each.
+
+    :param A2Bs: Nx4x4 transforms. Transforms containing any non-finite values give all-NaN inverses.
+    :return: Nx4x4 inverted transforms
+    """
+    A2Bs = np.asarray(A2Bs, dtype=np.float64)
+    if A2Bs.ndim != 3 or A2Bs.shape[1:] != (4, 4):
+        raise ValueError('A2Bs should be of shape Nx4x4')
+
+    B2As = np.full_like(A2Bs, np.nan)
+    isFinite = np.isfinite(A2Bs).all(axis=(1, 2))
+    isRigid = np.zeros_like(isFinite)
+    isRigid[isFinite] = _isRigid(A2Bs[isFinite])
+    B2As[isRigid] = _invertRigidTransforms(A2Bs[isRigid])
+    isOther = isFinite & ~isRigid
+    if isOther.any():
+        B2As[isOther] = np.linalg.pinv(A2Bs[isOther])
+    return B2As
+
+
+def concatenateTransformStacks(A2Bs: tp.Iterable[np.ndarray]) -> np.ndarray:
+    """
+    Stacked equivalent of `concatenateTransforms`, using the same (reverse) ordering convention.
+
+    :param A2Bs: iterable of Nx4x4 transform stacks, each combined row-wise. Single 4x4 transforms can also be included,
+        and will be broadcast to apply to every row.
+    :return: Nx4x4 combined transforms
+    """
+    return concatenateTransforms(A2Bs)  # matmul broadcasts over leading stack dimension
+
+
+def applyTransforms(A2Bs: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    """
+    Apply a stack of transforms to corresponding points, without checking transform validity.
+
+    :param A2Bs: Nx4x4 transforms
+    :param pts: Nx3 points, one per transform. Or a single (3,) point to be transformed by every transform.
+    :return: Nx3 transformed points
+    """
+    A2Bs = np.asarray(A2Bs)
+    if A2Bs.ndim != 3 or A2Bs.shape[1:] != (4, 4):
+        raise ValueError('A2Bs should be of shape Nx4x4')
+    pts = np.broadcast_to(pts, (A2Bs.shape[0], 3))
+    return (A2Bs[:, 0:3, 0:3] @ pts[:, :, np.newaxis])[:, :, 0] + A2Bs[:, 0:3, 3]
+
+
 def transformToString(A2B: np.ndarray, precision=12) -> str:
     return json.dumps(A2B.round(decimals=precision).tolist())
 
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
 import attr
 import asyncio
 import json
 import logging
 from math import ceil
+from multiprocessing import shared_memory
+import os
 import socket
+import struct
+import sys
+import time
 import typing as tp
 import unittest
 import zmq
@@ -25,8 +32,135 @@ def _msgSizeInGB(msg: tp.List[bytes]) -> float:
     return sum(len(item) for item in msg) / 1.e9
 
 
+_loopbackAddrs = ('127.0.0.1', 'localhost', '::1')
+
+
+def _openSharedMemory(name: str) -> shared_memory.SharedMemory:
+    """
+    Open an existing shared memory segment without taking ownership of it, so that it is not unlinked (or warned about
+    as leaked) when this process exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _writeFramesToSharedMemory(shm: shared_memory.SharedMemory, frames: tp.Sequence[bytes]):
+    offset = 0
+    for frame in frames:
+        with shm.buf[offset:offset + len(frame)] as view:
+            view[:] = frame
+        offset += len(frame)
+
+
+def _readFramesFromSharedMemory(shm: shared_memory.SharedMemory, sizes: tp.Sequence[int]) -> list[bytes]:
+    frames = []
+    offset = 0
+    for size in sizes:
+        with shm.buf[offset:offset + size] as view:
+            frames.append(bytes(view))
+        offset += size
+    return frames
+
+
+@attr.s(auto_attribs=True, eq=False)
+class _SharedMemorySegment:
+    shm: shared_memory.SharedMemory
+    frames: tp.List[bytes]  # keep references so that ids used for reuse lookup stay valid
+    refCount: int = 0
+
+    @property
+    def sizes(self) -> list[int]:
+        return [len(frame) for frame in self.frames]
+
+
+@attr.s(auto_attribs=True, eq=False)
+class SharedMemorySegments:
+    """
+    Reference-counted shared memory segments holding payloads for other processes on the same host to read.
+
+    Each `acquire` must be balanced by a `release` (e.g. when the reader reports that it has copied the payload). If
+    the same payload (i.e. the same bytes objects) is acquired again while its segment is still referenced, the
+    existing segment is reused rather than copying the payload again. When a segment's reference count drops to zero,
+    it is closed and unlinked.
+    """
+    _segments: dict[str, _SharedMemorySegment] = attr.ib(init=False, factory=dict)
+    _segmentNamesByFrameIDs: dict[tuple[int, ...], str] = attr.ib(init=False, factory=dict)
+
+    @property
+    def numSegments(self) -> int:
+        return len(self._segments)
+
+    @property
+    def segmentNames(self) -> list[str]:
+        return list(self._segments.keys())
+
+    def acquire(self, frames: tp.List[bytes]) -> tuple[str, list[int]]:
+        """
+        :return: (segment name, size of each frame in segment)
+        """
+        frameIDs = tuple(id(frame) for frame in frames)
+        name = self._segmentNamesByFrameIDs.get(frameIDs, None)
+        if name is not None:
+            segment = self._segments[name]
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(sum(len(frame) for frame in frames), 1))
+            try:
+                _writeFramesToSharedMemory(shm, frames)
+            except Exception:
+                shm.close()
+                shm.unlink()
+                raise
+            segment = _SharedMemorySegment(shm=shm, frames=list(frames))
+            self._segments[shm.name] = segment
+            self._segmentNamesByFrameIDs[frameIDs] = shm.name
+        segment.refCount += 1
+        return segment.shm.name, segment.sizes
+
+    def release(self, name: str):
+        segment = self._segments[name]
+        segment.refCount -= 1
+        if segment.refCount > 0:
+            return
+        self._close(name)
+
+    def releaseAll(self):
+        for name in list(self._segments.keys()):
+            self._close(name)
+
+    def _close(self, name: str):
+        segment = self._segments.pop(name)
+        del self._segmentNamesByFrameIDs[tuple(id(frame) for frame in segment.frames)]
+        segment.shm.close()
+        try:
+            segment.shm.unlink()
+        except FileNotFoundError:
+            pass  # already unlinked elsewhere
+
+
 @attr.s(auto_attribs=True)
 class ZMQConnectorServer:
+    """
+    Serves get / set / call requests on an object.
+
+    Requests are received on a ROUTER socket, so both plain REQ clients (one request in flight at a time) and
+    pipelined DEALER clients (see `ZMQConnectorClient` with ``pipelineAsyncCalls=True``) can connect to the same port.
+    Each request is preceded by its routing envelope, i.e. all frames up to the first empty frame, which is returned
+    unchanged with the response. A pipelined client includes a correlation ID frame in its envelope; its requests are
+    handled concurrently, so that a slow ``asyncCall`` does not block requests sent after it.
+
+    A ``batch`` request bundles many get / set / call operations in one message (see `ZMQConnectorBatch`), and is
+    answered with a list of per-operation responses in the same order.
+
+    Raw (bytes) gets and sets from clients on the same host can pass large payloads through shared memory instead of
+    message frames (``getBShm`` / ``bSetShm``). For gets, the server holds a reference to each segment (see
+    `SharedMemorySegments`) until the client reports it has copied the payload (``shmRelease``), or the server is
+    closed. For sets, the client owns the segment, and removes it after the server responds.
+    """
     _obj: tp.Any
     _reqRepPort: int
     _pubSubPort: tp.Optional[int] = None  # if not specified, will not be able to publish
@@ -38,10 +172,12 @@ class ZMQConnectorServer:
     _repSocket: tp.Optional[azmq.Socket] = attr.ib(init=False, default=None)
     _pubSocket: tp.Optional[azmq.Socket] = attr.ib(init=False, default=None)
     _asyncPollingTask: asyncio.Task = attr.ib(init=False)
+    _pipelinedRequestTasks: set[asyncio.Task] = attr.ib(init=False, factory=set)
+    _sharedMemorySegments: SharedMemorySegments = attr.ib(init=False, factory=SharedMemorySegments)
 
     def __attrs_post_init__(self):
-        logger.debug('Binding rep socket on port %d' % (self._reqRepPort,))
-        self._repSocket = self._ctx.socket(zmq.REP)
+        logger.debug('Binding router socket on port %d' % (self._reqRepPort,))
+        self._repSocket = self._ctx.socket(zmq.ROUTER)
         self._repSocket.bind('tcp://%s:%d' % (self._bindAddr, self._reqRepPort))
 
         if self._pubSubPort is not None:
@@ -57,6 +193,12 @@ class ZMQConnectorServer:
         self.close()
 
     def close(self):
+        for task in self._pipelinedRequestTasks:
+            task.cancel()
+        self._pipelinedRequestTasks.clear()
+
+        self._sharedMemorySegments.releaseAll()
+
         if self._repSocket is not None:
             self._repSocket.linger = 0
             self._repSocket.close(0)
@@ -72,16 +214,114 @@ class ZMQConnectorServer:
             self._ctx.term()
             self._ctx = None
 
-    async def _processRequest(self, req: tp.List[bytes]) -> tp.List[bytes]:
+    @property
+    def numSharedMemorySegments(self) -> int:
+        """
+        Number of shared memory segments created for raw gets that clients have not yet released
+        """
+        return self._sharedMemorySegments.numSegments
 
-        msgType = req[0]
+    @staticmethod
+    def _encodeResponse(resp: tp.Any) -> tp.List[bytes]:
+        try:
+            return [json.dumps(resp).encode('utf-8')]
+        except TypeError as e:
+            logger.error(f'Problem serializing request response: {resp}')
+            raise e
 
-        def encodeResponse(resp: tp.Any) -> bytes:
+    async def _processJSONRequest(self, msgType: str, req: tp.Any) -> tp.Any:
+        """
+        Process a get, set, call, or asyncCall request whose body has already been decoded, returning the
+        (not yet encoded) response
+        """
+        if not isinstance(req, list):
+            raise InvalidMessageError()
+
+        if msgType == 'get':
+            whatToGet = req[0]
+            if not isinstance(whatToGet, list):
+                raise InvalidMessageError()
+            resp = []
+            for what in whatToGet:
+                val = getattr(self._obj, what)
+                logger.debug("Got %s = %s" % (what, val))
+                resp.append(val)
+            return resp
+
+        elif msgType == 'set':
+            whatToSet = req[0]
+            if not isinstance(whatToSet, dict):
+                raise InvalidMessageError()
+            for what, val in whatToSet.items():
+                if not hasattr(self._obj, what):
+                    logger.warning("ZMQConnector setting new attribute via request: %s = %s" % (what, val))
+                try:
+                    setattr(self._obj, what, val)
+                except Exception as e:
+                    logger.error('Failed to set %s to %s: %s' % (what, val, exceptionToStr(e)))
+                    return ['__Error__', 'SetFailedError', exceptionToStr(e)]
+
+                logger.debug("Set %s = %s" % (what, val))
+            return 'success'
+
+        elif msgType in ('call', 'asyncCall'):
+            whatToCall = req[0]
+            if not isinstance(whatToCall, dict):
+                raise InvalidMessageError()
+
+            try:
+                method = whatToCall['method']
+            except KeyError as e:
+                raise InvalidMessageError()
+
+            args = whatToCall.get('args', list())
+            kwargs = whatToCall.get('kwargs', dict())
+
+            if not isinstance(args, list):
+                raise InvalidMessageError()
+
+            if not isinstance(kwargs, dict):
+                raise InvalidMessageError()
+
+            toCall = getattr(self._obj, method)
+
+            if msgType == 'call':
+                ret = toCall(*args, **kwargs)
+            else:
+                ret = await toCall(*args, **kwargs)
+
+            return ['success', ret]
+
+        else:
+            raise InvalidMessageError('Unsupported request type: %s' % (msgType,))
+
+    async def _processBatchRequest(self, ops: tp.Any) -> list[tp.Any]:
+        """
+        Process each (msgType, body) operation of a batch in order. Errors are reported per operation, and do not
+        prevent later operations from running.
+        """
+        if not isinstance(ops, list):
+            raise InvalidMessageError()
+
+        resps = []
+        for op in ops:
             try:
-                return [json.dumps(resp).encode('utf-8')]
-            except TypeError as e:
-                logger.error(f'Problem serializing request response: {resp}')
-                raise e
+                if not isinstance(op, list) or len(op) != 2:
+                    raise InvalidMessageError()
+                msgType, body = op
+                resps.append(await self._processJSONRequest(msgType, body))
+            except InvalidMessageError as e:
+                resps.append(['__Error__', 'InvalidMessageError', exceptionToStr(e)])
+            except AttributeError as e:
+                resps.append(['__Error__', 'AttributeError', exceptionToStr(e)])
+            except Exception as e:
+                logger.error("Unhandled exception in batched request:\n %s" % (exceptionToStr(e),))
+                resps.append(['__Error__', 'CriticalFailure', exceptionToStr(e)])
+        return resps
+
+    async def _processRequest(self, req: tp.List[bytes]) -> tp.List[bytes]:
+
+        msgType = req[0]
 
         logger.debug("Processing request of type %s" % msgType)
         try:
@@ -95,69 +335,15 @@ class ZMQConnectorServer:
             elif msgType in (b'get', b'set', b'call', b'asyncCall'):
                 assert len(req) == 2
                 req = json.loads(req[1].decode('utf-8'))
+                return self._encodeResponse(await self._processJSONRequest(msgType.decode('utf-8'), req))
 
-                if not isinstance(req, list):
-                    raise InvalidMessageError()
-
-                if msgType == b'get':
-                    whatToGet = req[0]
-                    if not isinstance(whatToGet, list):
-                        raise InvalidMessageError()
-                    resp = []
-                    for what in whatToGet:
-                        val = getattr(self._obj, what)
-                        logger.debug("Got %s = %s" % (what, val))
-                        resp.append(val)
-                    return encodeResponse(resp)
-
-                elif msgType == b'set':
-                    whatToSet = req[0]
-                    if not isinstance(whatToSet,dict):
-                        raise InvalidMessageError()
-                    for what, val in whatToSet.items():
-                        if not hasattr(self._obj, what):
-                            logger.warning("ZMQConnector setting new attribute via request: %s = %s" % (what, val))
-                        try:
-                            setattr(self._obj, what, val)
-                        except Exception as e:
-                            logger.error('Failed to set %s to %s: %s' % (what, val, exceptionToStr(e)))
-                            return encodeResponse(['__Error__', 'SetFailedError', exceptionToStr(e)])
-
-                        logger.debug("Set %s = %s" % (what, val))
-                    return encodeResponse('success')
-
-                elif msgType in (b'call', b'asyncCall'):
-                    whatToCall = req[0]
-                    if not isinstance(whatToCall, dict):
-                        raise InvalidMessageError()
-
-                    try:
-                        method = whatToCall['method']
-                    except KeyError as e:
-                        raise InvalidMessageError()
-
-                    args = whatToCall.get('args', list())
-                    kwargs = whatToCall.get('kwargs', dict())
-
-                    if not isinstance(args, list):
-                        raise InvalidMessageError()
-
-                    if not isinstance(kwargs, dict):
-                        raise InvalidMessageError()
-
-                    toCall = getattr(self._obj, method)
-
-                    if msgType == b'call':
-                        ret = toCall(*args, **kwargs)
-                    else:
-                        ret = await toCall(*args, **kwargs)
-
-                    return encodeResponse(['success', ret])
-                else:
-                    raise NotImplementedError()
+            elif msgType == b'batch':
+                assert len(req) == 2
+                ops = json.loads(req[1].decode('utf-8'))
+                return self._encodeResponse(await self._processBatchRequest(ops))
 
-            elif msgType in (b'getB', b'bSet'):
-                if msgType == b'getB':
+            elif msgType in (b'getB', b'bSet', b'getBShm', b'bSetShm', b'shmRelease'):
+                if msgType in (b'getB', b'getBShm'):
                     assert len(req) == 2
                     req = json.loads(req[1].decode('utf-8'))
 
@@ -173,7 +359,51 @@ class ZMQConnectorServer:
                     for subval in val:
                         assert isinstance(subval, bytes)
                     logger.debug("Got %s = <list of bytes, size = %.3f GB>" % (whatToGet[0], _msgSizeInGB(val)))
-                    return val
+                    if msgType == b'getB':
+                        return val
+
+                    # client is on same host, so try to pass payload through shared memory
+                    minSize = req[1] if len(req) > 1 else 0
+                    if sum(len(subval) for subval in val) >= minSize:
+                        try:
+                            name, sizes = self._sharedMemorySegments.acquire(val)
+                        except OSError as e:
+                            logger.warning('Could not create shared memory segment, sending frames instead: %s'
+                                           % (exceptionToStr(e),))
+                        else:
+                            return self._encodeResponse(dict(shm=name, sizes=sizes))
+                    return self._encodeResponse(dict(shm=None)) + val
+
+                elif msgType == b'shmRelease':
+                    assert len(req) == 2
+                    name = req[1].decode('utf-8')
+                    try:
+                        self._sharedMemorySegments.release(name)
+                    except KeyError:
+                        raise InvalidMessageError('Unknown shared memory segment: %s' % (name,))
+                    return self._encodeResponse('success')
+
+                elif msgType == b'bSetShm':
+                    assert len(req) == 3
+                    what = req[1].decode('utf-8')
+                    header = json.loads(req[2].decode('utf-8'))
+                    try:
+                        shm = _openSharedMemory(header['shm'])
+                    except OSError as e:
+                        # e.g. client is not actually on the same host
+                        return self._encodeResponse(['__Error__', 'SharedMemoryUnavailable', exceptionToStr(e)])
+                    try:
+                        val = _readFramesFromSharedMemory(shm, header['sizes'])
+                    finally:
+                        shm.close()
+                    try:
+                        setattr(self._obj, what, val)
+                    except Exception as e:
+                        logger.error('Failed to set %s: %s' % (what, exceptionToStr(e)))
+                        return self._encodeResponse(['__Error__', 'SetFailedError', exceptionToStr(e)])
+                    logger.debug('Set %s = <list of bytes, size = %.3f GB>' % (what, _msgSizeInGB(val)))
+                    return self._encodeResponse('success')
+
                 elif msgType == b'bSet':
                     assert len(req) > 2
                     what = req[1].decode('utf-8')
@@ -182,9 +412,9 @@ class ZMQConnectorServer:
                         setattr(self._obj, what, val)
                     except Exception as e:
                         logger.error('Failed to set %s: %s' % (what, exceptionToStr(e)))
-                        return encodeResponse(['__Error__', 'SetFailedError', exceptionToStr(e)])
+                        return self._encodeResponse(['__Error__', 'SetFailedError', exceptionToStr(e)])
                     logger.debug('Set %s = <list of bytes, size = %.3f GB>' % (what, _msgSizeInGB(val)))
-                    return encodeResponse('success')
+                    return self._encodeResponse('success')
                 else:
                     raise NotImplementedError()
 
@@ -196,40 +426,127 @@ class ZMQConnectorServer:
                     raise InvalidMessageError()
 
         except InvalidMessageError as e:
-            return encodeResponse(['__Error__', 'InvalidMessageError', exceptionToStr(e)])
+            return self._encodeResponse(['__Error__', 'InvalidMessageError', exceptionToStr(e)])
         except AttributeError as e:
-            return encodeResponse(['__Error__', 'AttributeError', exceptionToStr(e)])
+            return self._encodeResponse(['__Error__', 'AttributeError', exceptionToStr(e)])
 
     def publish(self, msg: tp.List[bytes]):
         assert self._pubSocket is not None
         self._pubSocket.send_multipart(msg)
 
+    async def _handleRequest(self, envelope: tp.List[bytes], req: tp.List[bytes]):
+        try:
+            #logger.debug('Processing request')
+            resp = await self._processRequest(req)
+            #logger.debug('Done processing request')
+        except Exception as e:
+            logger.error("Unhandled exception in ZMQConnectorServer:\n %s" % (exceptionToStr(e),))
+            resp = [json.dumps(['__Error__', 'CriticalFailure', exceptionToStr(e)]).encode('utf-8')]
+            #raise e
+
+        if self._repSocket is None:
+            return  # closed while processing request
+        await self._repSocket.send_multipart(envelope + resp)
+
     async def _asyncPoll(self):
         poller = azmq.Poller()
         poller.register(self._repSocket, zmq.POLLIN)
         while True:
             socks = dict(await poller.poll())
             if self._repSocket in socks:
-                req = await self._repSocket.recv_multipart()
-                try:
-                    #logger.debug('Processing request')
-                    resp = await self._processRequest(req)
-                    #logger.debug('Done processing request')
+                # handle all queued requests before polling again, since pipelined clients may send many at once
+                while self._repSocket is not None:
+                    try:
+                        msg = await self._repSocket.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    await self._onRequestReceived(msg)
 
-                    await self._repSocket.send_multipart(resp)
-                except Exception as e:
-                    logger.error("Unhandled exception in ZMQConnectorServer:\n %s" % (exceptionToStr(e),))
-                    await self._repSocket.send_multipart([json.dumps(
-                        ['__Error__', 'CriticalFailure', exceptionToStr(e)]).encode('utf-8')])
-                    #raise e
+    async def _onRequestReceived(self, msg: tp.List[bytes]):
+        try:
+            iDelimiter = msg.index(b'')
+        except ValueError:
+            logger.error('Received request without routing envelope delimiter, ignoring')
+            return
+        envelope = msg[:iDelimiter + 1]
+        req = msg[iDelimiter + 1:]
+        if len(req) == 0:
+            logger.error('Received empty request, ignoring')
+            return
+
+        if len(envelope) > 2:
+            # [peer identity, correlation ID, delimiter] from a pipelined client, so handle concurrently with later
+            # requests (tasks start in the order requests were received, so requests that don't await still
+            # complete in order)
+            task = asyncio.create_task(self._handleRequest(envelope, req))
+            self._pipelinedRequestTasks.add(task)
+            task.add_done_callback(self._pipelinedRequestTasks.discard)
+        else:
+            # [peer identity, delimiter] from a REQ client
+            await self._handleRequest(envelope, req)
 
 
 class RemoteError(Exception):
     pass
 
 
+def _checkGetResponse(item: str, resp: tp.Any) -> tp.Any:
+    if isinstance(resp, list):
+        if len(resp) > 0 and resp[0] == '__Error__':
+            if resp[1] == 'AttributeError':
+                raise AttributeError("Server could not get attribute '%s'" % item)
+            else:
+                raise RemoteError("Unhandled exception '%s' trying to get attribute '%s' from server.\n%s" % (
+                    resp[1], item, resp[2]))
+
+    if not isinstance(resp, list) or len(resp) != 1:
+        raise InvalidMessageError()
+
+    return resp[0]
+
+
+def _checkSetResponse(key: str, resp: tp.Any) -> None:
+    if isinstance(resp, list):
+        if resp[0] == '__Error__':
+            raise RemoteError("Unhandled exception '%s' trying to set attribute '%s' on server:\n %s" % (
+                resp[1], key, resp[2]))
+
+    if not isinstance(resp, str) or resp != 'success':
+        raise RemoteError("Failed to set '%s' on server" % key)
+
+
+def _checkCallResponse(method: str, resp: tp.Any) -> tp.Any:
+    assert isinstance(resp, list)
+
+    if resp[0] == '__Error__':
+        raise RemoteError(
+            "Unhandled exception '%s' trying to call method '%s' on server:\n%s" % (resp[1], method, resp[2]))
+
+    if resp[0] != 'success':
+        raise RemoteError("Failed to call '%s' on server" % method)
+
+    return resp[1]
+
+
 @attr.s(auto_attribs=True, cmp=False)
 class ZMQConnectorClient:
+    """
+    Client for a `ZMQConnectorServer`.
+
+    Synchronous calls (``get``, ``set``, ``call``, ...) use a REQ socket, with one request in flight at a time.
+
+    Asynchronous calls (``get_async``, ...) require ``allowAsyncCalls``. By default they share an async REQ socket,
+    so concurrent calls wait for each other's round trips. With ``pipelineAsyncCalls``, they are instead sent on a
+    DEALER socket tagged with correlation IDs, so that many requests can be in flight at once and responses are
+    matched to their requests as they arrive.
+
+    To reduce the number of round trips for chatty access patterns, many operations can also be combined into a
+    single request with `batch`.
+
+    If ``useSharedMemory`` (by default, when connecting to a loopback address), raw gets and sets of at least
+    ``sharedMemoryMinSize`` bytes pass the payload through a shared memory segment instead of message frames, falling
+    back to frames if the segment cannot be opened by the other side (e.g. it is not actually on the same host).
+    """
     _reqRepPort: int
     _pubSubPort: tp.Optional[int] = None  # if not specified, will not be able to subscribe
     _connAddr: str = '127.0.0.1'
@@ -244,8 +561,20 @@ class ZMQConnectorClient:
 
     _allowAsyncCalls: bool = False
     _allowSyncCalls: bool = True
+    _pipelineAsyncCalls: bool = False
+    _useSharedMemory: bool | None = None  # if None, will use shared memory when connAddr is a loopback address
+    _sharedMemoryMinSize: int = 2 ** 20
+
+    _dealerSocket: tp.Optional[azmq.Socket] = attr.ib(init=False, default=None)
+    _dealerPollingTask: tp.Optional[asyncio.Task] = attr.ib(init=False, default=None)
+    _pendingResponses: dict[bytes, asyncio.Future] = attr.ib(init=False, factory=dict)
+    _nextCorrelationID: int = attr.ib(init=False, default=0)
 
     def __attrs_post_init__(self):
+        if self._pipelineAsyncCalls and not self._allowAsyncCalls:
+            raise ValueError('pipelineAsyncCalls requires allowAsyncCalls')
+        if self._useSharedMemory is None:
+            self._useSharedMemory = self._connAddr in _loopbackAddrs
         self._connect()
 
     def __del__(self):
@@ -256,6 +585,13 @@ class ZMQConnectorClient:
     def connAddr(self):
         return self._connAddr
 
+    @property
+    def numPendingRequests(self) -> int:
+        """
+        Number of pipelined requests sent but not yet responded to
+        """
+        return len(self._pendingResponses)
+
     def _connect(self):
         if self._allowSyncCalls:
             logger.debug('Initializing req socket')
@@ -268,6 +604,11 @@ class ZMQConnectorClient:
             self._areqSocket.connect('tcp://%s:%d' % (self._connAddr, self._reqRepPort))
             if self._areqLock is None:
                 self._areqLock = asyncio.Lock()
+        if self._pipelineAsyncCalls:
+            logger.debug('Connecting dealer socket')
+            self._dealerSocket = self._actx.socket(zmq.DEALER)
+            self._dealerSocket.connect('tcp://%s:%d' % (self._connAddr, self._reqRepPort))
+            self._dealerPollingTask = asyncCreateTask(self._asyncPollDealer)
 
         if self._pubSubPort is not None:
             logger.debug('Setting up subscribe')
@@ -279,6 +620,19 @@ class ZMQConnectorClient:
             asyncCreateTask(self._asyncPoll)  # only need to poll if checking for published updates
             logger.debug('Finished setting up subscribe')
 
+    def _closeDealerSocket(self, linger=0):
+        if self._dealerPollingTask is not None:
+            self._dealerPollingTask.cancel()
+            self._dealerPollingTask = None
+        if self._dealerSocket is not None:
+            self._dealerSocket.close(linger)
+            self._dealerSocket = None
+        pendingResponses = self._pendingResponses
+        self._pendingResponses = dict()
+        for future in pendingResponses.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Connection closed before response was received'))
+
     def close(self, linger=0):
         if self._allowSyncCalls and self._reqSocket is not None:
             self._reqSocket.close(linger)
@@ -286,6 +640,7 @@ class ZMQConnectorClient:
         if self._allowAsyncCalls and self._areqSocket is not None:
             self._areqSocket.close(linger)
             self._areqSocket = None
+        self._closeDealerSocket(linger)
         if self._subSocket is not None:
             self._subSocket.close(linger)
             self._subSocket = None
@@ -308,9 +663,37 @@ class ZMQConnectorClient:
                 assert self.onMessagePublished is not None
                 self.onMessagePublished(rawMsg)
 
+    async def _asyncPollDealer(self):
+        dealerSocket = self._dealerSocket
+        while True:
+            resp = await dealerSocket.recv_multipart()
+            if len(resp) < 2 or resp[1] != b'':
+                logger.error('Received pipelined response without correlation ID envelope, ignoring')
+                continue
+            future = self._pendingResponses.pop(resp[0], None)
+            if future is None:
+                logger.warning('Received pipelined response for unknown request, ignoring')
+                continue
+            if not future.done():  # (may have been cancelled by caller)
+                future.set_result(resp[2:])
+
+    async def _send_pipelined(self, msg: tp.List[bytes]) -> tp.List[bytes]:
+        correlationID = struct.pack('<Q', self._nextCorrelationID)
+        self._nextCorrelationID += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pendingResponses[correlationID] = future
+        try:
+            await self._dealerSocket.send_multipart([correlationID, b''] + msg)
+            return await future
+        finally:
+            self._pendingResponses.pop(correlationID, None)
+
     async def send_async(self, msg: tp.List[bytes]) -> tp.List[bytes]:
         assert self._allowAsyncCalls
 
+        if self._pipelineAsyncCalls:
+            return await self._send_pipelined(msg)
+
         logger.debug('About to wait for areqLock')
         async with self._areqLock:
             logger.debug('Acquired areqLock')
@@ -375,30 +758,129 @@ class ZMQConnectorClient:
 
         return resp
 
+    def _readGetBShmResponse(self, item: str, resp: tp.List[bytes]) -> tuple[tp.List[bytes] | None, str | None]:
+        """
+        :return: (payload, or None if it could not be read from shared memory; name of segment to release, if any)
+        """
+        header = json.loads(resp[0].decode('utf-8'))
+        if isinstance(header, list):
+            _checkGetResponse(item, header)  # raise remote error
+            raise InvalidMessageError()
+
+        name = header['shm']
+        if name is None:
+            # payload was small enough to send as frames
+            return resp[1:], None
+
+        try:
+            shm = _openSharedMemory(name)
+        except OSError as e:
+            logger.warning('Could not open shared memory from server, falling back to frames: %s'
+                           % (exceptionToStr(e),))
+            self._useSharedMemory = False
+            return None, name
+
+        try:
+            return _readFramesFromSharedMemory(shm, header['sizes']), name
+        finally:
+            shm.close()
+
+    @staticmethod
+    def _checkReleaseResponse(name: str, resp: tp.Any):
+        if resp != 'success':
+            raise RemoteError("Failed to release shared memory segment '%s' on server: %s" % (name, resp))
+
+    async def _getB_sharedMemory_async(self, item: str) -> tp.List[bytes]:
+        resp = await self.send_async([b'getBShm', json.dumps([[item], self._sharedMemoryMinSize]).encode('utf-8')])
+        frames, name = self._readGetBShmResponse(item, resp)
+        if name is not None:
+            self._checkReleaseResponse(name, await self._sendTypePlusBody_receive_async(
+                'shmRelease', [name.encode('utf-8')], doEncode=False))
+        if frames is None:
+            frames = await self._sendTypePlusBody_receive_async('getB', [[item]], doDecodeResponse=False)
+        return frames
+
+    def _getB_sharedMemory(self, item: str) -> tp.List[bytes]:
+        resp = self.send([b'getBShm', json.dumps([[item], self._sharedMemoryMinSize]).encode('utf-8')])
+        frames, name = self._readGetBShmResponse(item, resp)
+        if name is not None:
+            self._checkReleaseResponse(name, self._sendTypePlusBody_receive(
+                'shmRelease', [name.encode('utf-8')], doEncode=False))
+        if frames is None:
+            frames = self._sendTypePlusBody_receive('getB', [[item]], doDecodeResponse=False)
+        return frames
+
+    @staticmethod
+    def _createSharedMemoryForSet(value: tp.List[bytes]) -> tuple[shared_memory.SharedMemory, bytes] | None:
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=max(sum(len(subvalue) for subvalue in value), 1))
+        except OSError as e:
+            logger.warning('Could not create shared memory segment, sending frames instead: %s' % (exceptionToStr(e),))
+            return None
+        try:
+            _writeFramesToSharedMemory(shm, value)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        header = json.dumps(dict(shm=shm.name, sizes=[len(subvalue) for subvalue in value])).encode('utf-8')
+        return shm, header
+
+    def _checkSetShmResponse(self, resp: tp.Any) -> tp.Any:
+        if isinstance(resp, list) and resp[0] == '__Error__' and resp[1] == 'SharedMemoryUnavailable':
+            logger.warning('Server could not open shared memory, falling back to frames: %s' % (resp[2],))
+            self._useSharedMemory = False
+            return None
+        return resp
+
+    async def _bSet_sharedMemory_async(self, key: str, value: tp.List[bytes]) -> tp.Any:
+        """
+        :return: server response, or None if shared memory could not be used
+        """
+        created = self._createSharedMemoryForSet(value)
+        if created is None:
+            return None
+        shm, header = created
+        try:
+            resp = await self._sendTypePlusBody_receive_async('bSetShm', [key.encode('utf-8'), header],
+                                                              doEncode=False)
+        finally:
+            # server has copied the payload (or failed to) by the time it responds
+            shm.close()
+            shm.unlink()
+        return self._checkSetShmResponse(resp)
+
+    def _bSet_sharedMemory(self, key: str, value: tp.List[bytes]) -> tp.Any:
+        """
+        :return: server response, or None if shared memory could not be used
+        """
+        created = self._createSharedMemoryForSet(value)
+        if created is None:
+            return None
+        shm, header = created
+        try:
+            resp = self._sendTypePlusBody_receive('bSetShm', [key.encode('utf-8'), header], doEncode=False)
+        finally:
+            # server has copied the payload (or failed to) by the time it responds
+            shm.close()
+            shm.unlink()
+        return self._checkSetShmResponse(resp)
+
     async def get_async(self, item: str, raw: bool = False) -> tp.Any:
         assert isinstance(item, str)
 
         logger.debug('Sending get request for %s' % item)
 
-        resp = await self._sendTypePlusBody_receive_async('get' if not raw else 'getB', [[item]], doDecodeResponse=not raw)
+        if raw and self._useSharedMemory:
+            resp = await self._getB_sharedMemory_async(item)
+        else:
+            resp = await self._sendTypePlusBody_receive_async('get' if not raw else 'getB', [[item]],
+                                                              doDecodeResponse=not raw)
 
         logger.debug('Received response')
 
         if not raw:
-            if isinstance(resp, list):
-                if resp[0] == '__Error__':
-                    if resp[1] == 'AttributeError':
-                        raise AttributeError("Server could not get attribute '%s'" % item)
-                    else:
-                        raise RemoteError("Unhandled exception '%s' trying to get attribute '%s' from server.\n%s" % (
-                            resp[1], item, resp[2]))
-
-            if len(resp) != 1:
-                logger.debug('problem')  # TODO: debug, delete
-                raise InvalidMessageError()
-
-            resp = resp[0]
-
+            resp = _checkGetResponse(item, resp)
             logger.debug("Got %s = %s" % (item, resp))
         else:
             logger.debug("Got %s = <list of bytes, size = %.2f GB>" % (item, _msgSizeInGB(resp)))
@@ -410,23 +892,13 @@ class ZMQConnectorClient:
 
         logger.debug('Sending get request for %s' % item)
 
-        resp = self._sendTypePlusBody_receive('get' if not raw else 'getB', [[item]], doDecodeResponse=not raw)
+        if raw and self._useSharedMemory:
+            resp = self._getB_sharedMemory(item)
+        else:
+            resp = self._sendTypePlusBody_receive('get' if not raw else 'getB', [[item]], doDecodeResponse=not raw)
 
         if not raw:
-            if isinstance(resp, list):
-                if resp[0] == '__Error__':
-                    if resp[1] == 'AttributeError':
-                        raise AttributeError("Server could not get attribute '%s'" % item)
-                    else:
-                        raise RemoteError("Unhandled exception '%s' trying to get attribute '%s' from server.\n%s" % (
-                            resp[1], item, resp[2]))
-
-            if len(resp) != 1:
-                logger.debug('problem')  # TODO: debug, delete
-                raise InvalidMessageError()
-
-            resp = resp[0]
-
+            resp = _checkGetResponse(item, resp)
             logger.debug("Got %s = %s" % (item, resp))
         else:
             logger.debug('Got %s = <list of bytes with %d items>' % (item, len(resp)))
@@ -440,14 +912,14 @@ class ZMQConnectorClient:
             assert isinstance(value, list)
             for subvalue in value:
                 assert isinstance(subvalue, bytes)
-            resp = await self._sendTypePlusBody_receive_async('bSet', [key.encode('utf-8')] + value, doEncode=False)
-
-        if isinstance(resp, list):
-            if resp[0] == '__Error__':
-                raise RemoteError("Unhandled exception '%s' trying to set attribute '%s' on server" % (resp[1], key))
+            resp = None
+            if self._useSharedMemory and sum(len(subvalue) for subvalue in value) >= self._sharedMemoryMinSize:
+                resp = await self._bSet_sharedMemory_async(key, value)
+            if resp is None:
+                resp = await self._sendTypePlusBody_receive_async('bSet', [key.encode('utf-8')] + value,
+                                                                  doEncode=False)
 
-        if not isinstance(resp, str) or resp != 'success':
-            raise RemoteError("Failed to set '%s' on server" % key)
+        _checkSetResponse(key, resp)
 
         if not raw:
             logger.debug("Set %s = %s" % (key, value))
@@ -461,14 +933,13 @@ class ZMQConnectorClient:
             assert isinstance(value, list)
             for subvalue in value:
                 assert isinstance(subvalue, bytes)
-            resp = self._sendTypePlusBody_receive('bSet', [key.encode('utf-8')] + value, doEncode=False)
+            resp = None
+            if self._useSharedMemory and sum(len(subvalue) for subvalue in value) >= self._sharedMemoryMinSize:
+                resp = self._bSet_sharedMemory(key, value)
+            if resp is None:
+                resp = self._sendTypePlusBody_receive('bSet', [key.encode('utf-8')] + value, doEncode=False)
 
-        if isinstance(resp, list):
-            if resp[0] == '__Error__':
-                raise RemoteError("Unhandled exception '%s' trying to set attribute '%s' on server:\n %s" % (resp[1], key, resp[2]))
-
-        if not isinstance(resp, str) or resp != 'success':
-            raise RemoteError("Failed to set '%s' on server" % key)
+        _checkSetResponse(key, resp)
 
         if not raw:
             logger.debug("Set %s = %s" % (key, value))
@@ -482,16 +953,7 @@ class ZMQConnectorClient:
             kwargs=kwargs
         )])
 
-        assert isinstance(resp, list)
-
-        if resp[0] == '__Error__':
-            raise RemoteError(
-                "Unhandled exception '%s' trying to call method '%s' on server:\n%s" % (resp[1], method, resp[2]))
-
-        if resp[0] != 'success':
-            raise RemoteError("Failed to call '%s' on server" % method)
-
-        return resp[1]
+        return _checkCallResponse(method, resp)
 
     def _call(self, method: str, doAsync: bool, *args, **kwargs):
         resp = self._sendTypePlusBody_receive('asyncCall' if doAsync else 'call', [dict(
@@ -500,16 +962,7 @@ class ZMQConnectorClient:
             kwargs=kwargs
         )])
 
-        assert isinstance(resp, list)
-
-        if resp[0] == '__Error__':
-            raise RemoteError(
-                "Unhandled exception '%s' trying to call method '%s' on server:\n%s" % (resp[1], method, resp[2]))
-
-        if resp[0] != 'success':
-            raise RemoteError("Failed to call '%s' on server" % method)
-
-        return resp[1]
+        return _checkCallResponse(method, resp)
 
     async def call_async(self, method: str, *args, **kwargs):
         """
@@ -532,6 +985,18 @@ class ZMQConnectorClient:
         """
         return self._call(method, True, *args, **kwargs)
 
+    def batch(self) -> ZMQConnectorBatch:
+        """
+        Start a batch of operations to send in a single request, e.g.::
+
+            batch = client.batch()
+            batch.get('a')
+            batch.set('b', 2)
+            batch.call('update', force=True)
+            a, _, updateResult = batch.execute()
+        """
+        return ZMQConnectorBatch(client=self)
+
     async def ping_async(self, timeout=100, numTries=2):
         """
         :param timeout: time in ms
@@ -563,6 +1028,8 @@ class ZMQConnectorClient:
                         self._reqSocket.setsockopt(zmq.LINGER, 0)
                         self._reqSocket.close()
 
+                    self._closeDealerSocket()
+
                     if self._subSocket is not None:
                         self._subSocket.setsockopt(zmq.LINGER, 0)
                         self._subSocket.close()
@@ -594,6 +1061,8 @@ class ZMQConnectorClient:
                     self._areqSocket.setsockopt(zmq.LINGER, 0)
                     self._areqSocket.close()
 
+                self._closeDealerSocket()
+
                 if self._subSocket is not None:
                     self._subSocket.setsockopt(zmq.LINGER, 0)
                     self._subSocket.close()
@@ -603,6 +1072,92 @@ class ZMQConnectorClient:
         raise TimeoutError()
 
 
+@attr.s(auto_attribs=True, eq=False)
+class ZMQConnectorBatch:
+    """
+    Operations to send to a `ZMQConnectorServer` in a single request, with results returned in the order the
+    operations were added.
+
+    The server runs every operation even if earlier ones fail. If ``raiseOnError`` is True (default), the first
+    failed operation's exception is raised after the whole batch completes; otherwise the exception is returned in
+    place of that operation's result.
+
+    Raw (bytes) gets and sets are not supported in batches.
+    """
+    _client: ZMQConnectorClient
+    _ops: list[list] = attr.ib(init=False, factory=list)
+    _checkResponses: list[tp.Callable[[tp.Any], tp.Any]] = attr.ib(init=False, factory=list)
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _addOp(self, msgType: str, body: list, checkResponse: tp.Callable[[tp.Any], tp.Any]) -> int:
+        self._ops.append([msgType, body])
+        self._checkResponses.append(checkResponse)
+        return len(self._ops) - 1
+
+    def get(self, item: str) -> int:
+        """
+        :return: index of this operation's result
+        """
+        assert isinstance(item, str)
+        return self._addOp('get', [[item]], lambda resp: _checkGetResponse(item, resp))
+
+    def set(self, key: str, value: tp.Any) -> int:
+        return self._addOp('set', [{key: value}], lambda resp: _checkSetResponse(key, resp))
+
+    def call(self, method: str, *args, **kwargs) -> int:
+        """
+        Make a synchronous call on the server
+        """
+        return self._addOp('call', [dict(method=method, args=args, kwargs=kwargs)],
+                           lambda resp: _checkCallResponse(method, resp))
+
+    def callAsync(self, method: str, *args, **kwargs) -> int:
+        """
+        Make an asynchronous call on the server (awaited before continuing with later operations)
+        """
+        return self._addOp('asyncCall', [dict(method=method, args=args, kwargs=kwargs)],
+                           lambda resp: _checkCallResponse(method, resp))
+
+    def _processResponse(self, resp: tp.Any, raiseOnError: bool) -> list[tp.Any]:
+        if isinstance(resp, list) and len(resp) == 3 and resp[0] == '__Error__':
+            # whole batch failed
+            raise RemoteError("Unhandled exception '%s' trying to run batch on server:\n%s" % (resp[1], resp[2]))
+
+        if not isinstance(resp, list) or len(resp) != len(self._ops):
+            raise InvalidMessageError('Unexpected batch response from remote')
+
+        results = []
+        firstError = None
+        for checkResponse, opResp in zip(self._checkResponses, resp):
+            try:
+                results.append(checkResponse(opResp))
+            except Exception as e:
+                if firstError is None:
+                    firstError = e
+                results.append(e)
+
+        if raiseOnError and firstError is not None:
+            raise firstError
+
+        return results
+
+    def execute(self, raiseOnError: bool = True) -> list[tp.Any]:
+        if len(self._ops) == 0:
+            return []
+        logger.debug('Sending batch of %d operations' % len(self._ops))
+        resp = self._client._sendTypePlusBody_receive('batch', self._ops)
+        return self._processResponse(resp, raiseOnError=raiseOnError)
+
+    async def execute_async(self, raiseOnError: bool = True) -> list[tp.Any]:
+        if len(self._ops) == 0:
+            return []
+        logger.debug('Sending batch of %d operations' % len(self._ops))
+        resp = await self._client._sendTypePlusBody_receive_async('batch', self._ops)
+        return self._processResponse(resp, raiseOnError=raiseOnError)
+
+
 def checkIfPortAvailable(port: int) -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         logger.debug('Created test socket on port %d' % (port,))  # TODO: debug, delete
@@ -645,6 +1200,9 @@ class Test_ZMQConnector(unittest.TestCase):
             await asyncio.sleep(delay)
             return toReturn
 
+        def add(self, x, y):
+            return x + y
+
     def _test_basic_sync(self, client):
         clientState = Test_ZMQConnector.state()
         clientState.a = client.get('a')
@@ -743,7 +1301,6 @@ class Test_ZMQConnector(unittest.TestCase):
         return clientState
 
     async def _test_large(self, doAsync):
-        import os
         reqRepPort = 7899
         logger.debug('Initializing server state')
         serverState = Test_ZMQConnector.state()
@@ -776,6 +1333,215 @@ class Test_ZMQConnector(unittest.TestCase):
         server.close()
         client.close()
 
+    def _test_batch_sync(self, client):
+        batch = client.batch()
+        batch.get('a')
+        batch.set('c', 3)
+        batch.get('c')
+        batch.call('add', 2, y=5)
+        batch.get('missing')
+        batch.get('b')
+        return batch.execute(raiseOnError=False)
+
+    async def _test_batch(self, doAsync):
+        reqRepPort = 7900
+
+        serverState = Test_ZMQConnector.state()
+        serverState.a = 1
+        serverState.b = 'two'
+        server = ZMQConnectorServer(obj=serverState, reqRepPort=reqRepPort)
+        await asyncio.sleep(1)
+        client = ZMQConnectorClient(reqRepPort=reqRepPort, allowAsyncCalls=doAsync)
+        await asyncio.sleep(1)
+
+        if doAsync:
+            batch = client.batch()
+            batch.get('a')
+            batch.set('c', 3)
+            batch.get('c')
+            batch.call('add', 2, y=5)
+            batch.get('missing')
+            batch.get('b')
+            results = await batch.execute_async(raiseOnError=False)
+        else:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, lambda: self._test_batch_sync(client))
+
+        # results are in order, and a failed operation does not prevent later operations
+        self.assertEqual(results[0], 1)
+        self.assertIsNone(results[1])
+        self.assertEqual(results[2], 3)
+        self.assertEqual(results[3], 7)
+        self.assertIsInstance(results[4], AttributeError)
+        self.assertEqual(results[5], 'two')
+        self.assertEqual(serverState.c, 3)
+
+        batch = client.batch()
+        batch.set('c', 4)
+        batch.get('missing')
+        with self.assertRaises(AttributeError):
+            if doAsync:
+                await batch.execute_async()
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, batch.execute)
+        self.assertEqual(serverState.c, 4)
+
+        server.close()
+        client.close()
+        await asyncio.sleep(1)
+
+    async def _test_pipelined(self):
+        reqRepPort = 7901
+
+        serverState = Test_ZMQConnector.state()
+        serverState.a = 1
+        serverState.b = 'two'
+        server = ZMQConnectorServer(obj=serverState, reqRepPort=reqRepPort)
+        await asyncio.sleep(1)
+        client = ZMQConnectorClient(reqRepPort=reqRepPort, allowAsyncCalls=True, pipelineAsyncCalls=True)
+        # a plain REQ client can connect to the same server at the same time
+        reqClient = ZMQConnectorClient(reqRepPort=reqRepPort, allowAsyncCalls=True)
+        await asyncio.sleep(1)
+
+        slowCall = asyncio.create_task(client.callAsync_async('respondAfterDelay', delay=2., toReturn='slow'))
+        await asyncio.sleep(0.1)
+        self.assertEqual(client.numPendingRequests, 1)
+
+        # later requests complete while the slow call is still in flight
+        futures = [client.get_async('a'), client.set_async('c', 3), client.get_async('c'), reqClient.get_async('b')]
+        futures += [client.call_async('add', i, y=1) for i in range(100)]
+        results = await asyncio.gather(*futures)
+        self.assertFalse(slowCall.done())
+        self.assertEqual(results[:4], [1, None, 3, 'two'])
+        self.assertEqual(results[4:], [i + 1 for i in range(100)])
+
+        batch = client.batch()
+        batch.get('a')
+        batch.get('c')
+        self.assertEqual(await batch.execute_async(), [1, 3])
+
+        self.assertEqual(await slowCall, 'slow')
+        self.assertEqual(client.numPendingRequests, 0)
+
+        with self.assertRaises(AttributeError):
+            await client.get_async('missing')
+
+        server.close()
+        client.close()
+        reqClient.close()
+        await asyncio.sleep(1)
+
+    def test_batch_async(self):
+        asyncio.get_event_loop().run_until_complete(self._test_batch(doAsync=True))
+
+    def test_batch_sync(self):
+        asyncio.get_event_loop().run_until_complete(self._test_batch(doAsync=False))
+
+    def test_pipelined_async(self):
+        asyncio.get_event_loop().run_until_complete(self._test_pipelined())
+
+    def _test_largeThroughput_sync(self, client, toSet):
+        t0 = time.perf_counter()
+        got = client.get('c', raw=True)
+        getDur = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        client.set('d', toSet, raw=True)
+        setDur = time.perf_counter() - t0
+        return got, getDur, setDur
+
+    async def _test_largeThroughput(self, doAsync):
+        """
+        Compare raw get / set throughput with and without shared memory, and check that no segments are left behind
+        """
+        reqRepPort = 7902
+        frameSize = 2 ** 25
+        numFrames = 4
+        serverState = Test_ZMQConnector.state()
+        serverState.c = [os.urandom(frameSize) for _ in range(numFrames)]
+        server = ZMQConnectorServer(obj=serverState, reqRepPort=reqRepPort)
+        await asyncio.sleep(1)
+
+        shmBefore = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else None
+
+        for useSharedMemory in (False, True):
+            client = ZMQConnectorClient(reqRepPort=reqRepPort, allowAsyncCalls=doAsync,
+                                        useSharedMemory=useSharedMemory)
+            await asyncio.sleep(1)
+
+            toSet = [os.urandom(frameSize) for _ in range(numFrames)]
+            for _ in range(3):
+                if doAsync:
+                    t0 = time.perf_counter()
+                    got = await client.get_async('c', raw=True)
+                    getDur = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    await client.set_async('d', toSet, raw=True)
+                    setDur = time.perf_counter() - t0
+                else:
+                    loop = asyncio.get_running_loop()
+                    got, getDur, setDur = await loop.run_in_executor(
+                        None, lambda: self._test_largeThroughput_sync(client, toSet))
+
+                self.assertEqual(got, serverState.c)
+                self.assertEqual(serverState.d, toSet)
+                self.assertEqual(server.numSharedMemorySegments, 0)
+
+                numGB = frameSize * numFrames / 1.e9
+                logger.info('%s shared memory: get %.2f GB/s, set %.2f GB/s' % (
+                    'With' if useSharedMemory else 'Without', numGB / getDur, numGB / setDur))
+
+            client.close()
+
+        server.close()
+        await asyncio.sleep(1)
+
+        if shmBefore is not None:
+            self.assertEqual(set(os.listdir('/dev/shm')) - shmBefore, set())
+
+    def test_largeThroughput_async(self):
+        asyncio.get_event_loop().run_until_complete(self._test_largeThroughput(doAsync=True))
+
+    def test_largeThroughput_sync(self):
+        asyncio.get_event_loop().run_until_complete(self._test_largeThroughput(doAsync=False))
+
+    def test_sharedMemorySegmentLifecycle(self):
+        segments = SharedMemorySegments()
+        frames = [os.urandom(1000), os.urandom(10)]
+        name, sizes = segments.acquire(frames)
+        self.assertEqual(sizes, [1000, 10])
+
+        # same payload reuses segment
+        name2, _ = segments.acquire(frames)
+        self.assertEqual(name, name2)
+        otherName, _ = segments.acquire([os.urandom(10)])
+        self.assertNotEqual(name, otherName)
+        self.assertEqual(segments.numSegments, 2)
+
+        shm = _openSharedMemory(name)
+        try:
+            self.assertEqual(_readFramesFromSharedMemory(shm, sizes), frames)
+        finally:
+            shm.close()
+
+        segments.release(name)
+        self.assertEqual(segments.numSegments, 2)
+        segments.release(name)
+        self.assertEqual(segments.segmentNames, [otherName])
+        if os.name == 'posix':
+            with self.assertRaises(FileNotFoundError):
+                _openSharedMemory(name)
+
+        # payload can be shared again after release
+        name3, _ = segments.acquire(frames)
+        self.assertEqual(segments.numSegments, 2)
+
+        segments.releaseAll()
+        self.assertEqual(segments.numSegments, 0)
+        if os.name == 'posix':
+            for toCheck in (name3, otherName):
+                with self.assertRaises(FileNotFoundError):
+                    _openSharedMemory(toCheck)
+
     def test_large_async(self):
         asyncio.get_event_loop().run_until_complete(self._test_large(doAsync=True))
 
@@ -0,0 +1,241 @@
+"""
+Binary alternative to JSON for numeric-heavy, JSON-compatible data (e.g. session sections with many transforms).
+
+A sidecar is an uncompressed `.npz` file containing a small JSON header (stored as a uint8 array named `header`)
+plus little-endian numeric arrays. The header holds the original structure, with numeric content replaced by
+references to arrays:
+
+- A list of numbers (or nested lists of numbers, e.g. a list of 4x4 transforms) becomes a single array. `None`
+  entries at the top level of the list are allowed and recorded in a mask.
+- A list of dicts becomes column-wise "records", so that the same field across many dicts (e.g. the transform of
+  each sample) is stored as one array.
+- A list of lists of varying length becomes a flat list plus an array of lengths.
+
+`loadSidecar` reverses this, returning the same plain lists/dicts that `json.load` would return for the equivalent
+JSON file. A few JSON-level distinctions are not preserved: numbers in a mixed int/float list come back as floats,
+and key order within records follows the first occurrence of each key.
+"""
+
+from __future__ import annotations
+
+import attrs
+import json
+import numpy as np
+import typing as tp
+
+
+sidecarFormatName = 'NaviNIBSBinarySidecar'
+latestSidecarVersion = 1
+sidecarExtension = '.npz'
+
+_headerName = 'header'
+_arrayKey = '$array'
+_recordsKey = '$records'
+_raggedKey = '$ragged'
+_escapedKey = '$escaped'
+_reservedKeys = frozenset((_arrayKey, _recordsKey, _raggedKey, _escapedKey))
+
+
+def isSidecarPath(path: str) -> bool:
+    return path.endswith(sidecarExtension)
+
+
+def dumpSidecar(obj: tp.Any, path: str | tp.BinaryIO, minArraySize: int = 16, compress: bool = False) -> None:
+    """
+    Write JSON-compatible `obj` to a binary sidecar file at `path` (or to an open binary file object).
+
+    Numeric lists with fewer than `minArraySize` elements are kept inline in the header, since a separate array
+    would be larger than the equivalent JSON.
+    """
+    encoder = _SidecarEncoder(minArraySize=minArraySize)
+    body = encoder.encode(obj)
+    header = dict(format=sidecarFormatName, version=latestSidecarVersion, body=body)
+    arrays = {_headerName: np.frombuffer(json.dumps(header, separators=(',', ':')).encode('utf-8'), dtype=np.uint8)}
+    arrays.update(encoder.arrays)
+    save = np.savez_compressed if compress else np.savez
+    if isinstance(path, str):
+        with open(path, 'wb') as f:  # pass file object so numpy doesn't append its own extension
+            save(f, **arrays)
+    else:
+        save(path, **arrays)
+
+
+def loadSidecar(path: str | tp.BinaryIO) -> tp.Any:
+    with np.load(path, allow_pickle=False) as npz:
+        header = json.loads(npz[_headerName].tobytes().decode('utf-8'))
+        if header.get('format', None) != sidecarFormatName:
+            raise ValueError(f'{path} is not a binary sidecar file')
+        if header['version'] > latestSidecarVersion:
+            raise ValueError(f'Binary sidecar version {header["version"]} in {path} is newer than supported '
+                             f'version {latestSidecarVersion}')
+        return _SidecarDecoder(arrays=npz).decode(header['body'])
+
+
+@attrs.define
+class _SidecarEncoder:
+    _minArraySize: int = 16
+    _arrays: dict[str, np.ndarray] = attrs.field(init=False, factory=dict)
+
+    @property
+    def arrays(self):
+        return self._arrays
+
+    def encode(self, obj: tp.Any) -> tp.Any:
+        if isinstance(obj, dict):
+            encoded = {key: self.encode(val) for key, val in obj.items()}
+            if not _reservedKeys.isdisjoint(obj.keys()):
+                encoded = {_escapedKey: encoded}
+            return encoded
+        elif isinstance(obj, (list, tuple)):
+            return self._encodeList(list(obj))
+        elif isinstance(obj, np.ndarray):
+            if obj.dtype.kind in 'biuf' and obj.size >= self._minArraySize:
+                return {_arrayKey: self._addArray(obj)}
+            return self._encodeList(obj.tolist())
+        else:
+            return obj
+
+    def _encodeList(self, lst: list) -> tp.Any:
+        if len(lst) == 0:
+            return lst
+
+        if len(lst) >= 2 and all(isinstance(val, dict) for val in lst):
+            return self._encodeRecords(lst)
+
+        isNumeric, encoded = self._encodeNumeric(lst)
+        if isNumeric:
+            return encoded
+
+        if len(lst) >= 2 and all(isinstance(val, list) for val in lst):
+            lengths = np.asarray([len(val) for val in lst], dtype=np.int64)
+            flat = [item for val in lst for item in val]
+            return {_raggedKey: self._packIndexArray(lengths), 'values': self._encodeList(flat)}
+
+        return [self.encode(val) for val in lst]
+
+    def _encodeNumeric(self, lst: list) -> tuple[bool, tp.Any]:
+        """
+        Returns (isNumeric, encoded). Small numeric lists are returned unchanged.
+        """
+        nullMask = None
+        nonNull = lst
+        if any(val is None for val in lst):
+            nullMask = np.asarray([val is None for val in lst])
+            nonNull = [val for val in lst if val is not None]
+            if len(nonNull) == 0:
+                return False, None
+
+        # cheap check of first leaf before attempting a full conversion
+        first = nonNull[0]
+        while isinstance(first, list) and len(first) > 0:
+            first = first[0]
+        if isinstance(first, np.ndarray):
+            # e.g. list of transforms from asList() within a numpyFieldsAsArrays() context
+            if first.dtype.kind not in 'iuf':
+                return False, None
+        elif isinstance(first, bool) or not isinstance(first, (int, float)):
+            return False, None
+
+        try:
+            arr = np.asarray(nonNull)
+        except (ValueError, TypeError, OverflowError):
+            return False, None  # e.g. ragged nested lists
+        if arr.dtype.kind not in 'iuf':
+            return False, None
+
+        if arr.size < self._minArraySize:
+            return True, [val.tolist() if isinstance(val, np.ndarray) else val for val in lst]
+
+        encoded = {_arrayKey: self._addArray(arr)}
+        if nullMask is not None:
+            encoded['nulls'] = self._packIndexArray(np.flatnonzero(nullMask))
+        return True, encoded
+
+    def _encodeRecords(self, lst: list[dict]) -> dict:
+        keys = dict()  # used as an ordered set
+        for record in lst:
+            for key in record:
+                keys[key] = None
+
+        columns = dict()
+        for key in keys:
+            present = np.fromiter((key in record for record in lst), dtype=bool, count=len(lst))
+            column = dict(values=self._encodeList([record[key] for record in lst if key in record]))
+            if not present.all():
+                column['present'] = self._packIndexArray(np.flatnonzero(present))
+            columns[key] = column
+
+        return {_recordsKey: len(lst), 'columns': columns}
+
+    def _packIndexArray(self, arr: np.ndarray) -> str | list[int]:
+        if arr.size < self._minArraySize:
+            return arr.tolist()
+        return self._addArray(arr.astype(np.int64))
+
+    def _addArray(self, arr: np.ndarray) -> str:
+        if arr.dtype.byteorder == '>':
+            arr = arr.astype(arr.dtype.newbyteorder('<'))
+        name = f'a{len(self._arrays)}'
+        self._arrays[name] = arr
+        return name
+
+
+@attrs.define
+class _SidecarDecoder:
+    _arrays: tp.Mapping[str, np.ndarray]
+
+    def decode(self, obj: tp.Any) -> tp.Any:
+        if isinstance(obj, dict):
+            if _arrayKey in obj:
+                return self._decodeArray(obj)
+            elif _recordsKey in obj:
+                return self._decodeRecords(obj)
+            elif _raggedKey in obj:
+                return self._decodeRagged(obj)
+            elif _escapedKey in obj:
+                obj = obj[_escapedKey]
+            return {key: self.decode(val) for key, val in obj.items()}
+        elif isinstance(obj, list):
+            if not any(isinstance(val, (dict, list)) for val in obj):
+                return obj  # e.g. column of strings; nothing to decode
+            return [self.decode(val) for val in obj]
+        else:
+            return obj
+
+    def _unpackIndexArray(self, packed: str | list[int]) -> list[int]:
+        if isinstance(packed, str):
+            return self._arrays[packed].tolist()
+        return packed
+
+    def _decodeArray(self, obj: dict) -> list:
+        values = self._arrays[obj[_arrayKey]].tolist()
+        if 'nulls' in obj:
+            nullIndices = self._unpackIndexArray(obj['nulls'])
+            withNulls = [None] * (len(values) + len(nullIndices))
+            isNull = np.zeros(len(withNulls), dtype=bool)
+            isNull[nullIndices] = True
+            for index, val in zip(np.flatnonzero(~isNull).tolist(), values):
+                withNulls[index] = val
+            values = withNulls
+        return values
+
+    def _decodeRecords(self, obj: dict) -> list[dict]:
+        records = [dict() for _ in range(obj[_recordsKey])]
+        for key, column in obj['columns'].items():
+            values = self.decode(column['values'])
+            if 'present' in column:
+                for index, val in zip(self._unpackIndexArray(column['present']), values):
+                    records[index][key] = val
+            else:
+                for record, val in zip(records, values):
+                    record[key] = val
+        return records
+
+    def _decodeRagged(self, obj: dict) -> list[list]:
+        flat = self.decode(obj['values'])
+        out = []
+        start = 0
+        for length in self._unpackIndexArray(obj[_raggedKey]):
+            out.append(flat[start:start + length])
+            start += length
+        return out
@@ -1,6 +1,35 @@
+"""
+JSON serialization for session files.
+
+`JSONSerializer` is used for writing session config files and anywhere else JSON-compatible session content (e.g.
+output of collections' `asList` / `asDict`) is serialized. It has a compact mode for speed and a pretty mode for
+human-readable output. Both produce the same content when loaded. numpy arrays and scalars are accepted anywhere
+in the serialized object. This allows, for example, output of `attrsWithNumpyAsDict` within a
+`numpyFieldsAsArrays()` context to be serialized without converting arrays to lists first. (One difference from
+converting to lists first: float32 values may be written with only as many digits as needed to round trip at
+float32 precision.)
+
+If `orjson` is installed it is used for encoding, which is several times faster than the standard library encoder
+and serializes arrays directly from their buffers. Otherwise the standard library `json` module is used. `orjson` is an
+optional dependency, installed with the `fast` extra (e.g. `pip install navinibs[fast]` or
+`poetry install --extras fast`).
+"""
+
+from __future__ import annotations
+
+import attrs
 import json
+import math
+import numpy as np
+import typing as tp
+
 import jsbeautifier
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def beautifyJSON(o: str) -> str:
     """
@@ -9,6 +38,8 @@ def beautifyJSON(o: str) -> str:
     See https://stackoverflow.com/questions/21866774/pretty-print-json-dumps
     Note that this is not particularly efficient or lightweight of a dependency, but perhaps better than hacky
      subclassing of JSONEncoder as in http://stackoverflow.com/a/17684652
+
+    Note: `JSONSerializer(pretty=True)` produces similar formatting much faster.
     """
     opts = jsbeautifier.default_options()
     opts.indent_size = 2
@@ -16,4 +47,171 @@ def beautifyJSON(o: str) -> str:
 
 
 def jsonPrettyDumps(o) -> str:
-    return beautifyJSON(json.dumps(o))
+    return prettyJSONSerializer.dumps(o)
+
+
+def _stdlibDefault(o: tp.Any) -> tp.Any:
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    elif isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f'Object of type {o.__class__.__name__} is not JSON serializable')
+
+
+def _orjsonDefault(o: tp.Any) -> tp.Any:
+    if isinstance(o, np.ndarray):
+        # e.g. non-contiguous or unsupported dtype
+        return o.tolist()
+    elif isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f'Object of type {o.__class__.__name__} is not JSON serializable')
+
+
+def _hasNonFinite(obj: tp.Any) -> bool:
+    """
+    Whether obj contains any NaN or infinite floats. orjson writes these as null, whereas the standard library
+    writes NaN / Infinity literals that load back as the original values, so output from orjson containing null
+    is checked with this.
+    """
+    if isinstance(obj, str):
+        return False
+    elif isinstance(obj, float):
+        return not math.isfinite(obj)
+    elif isinstance(obj, dict):
+        for val in obj.values():
+            if val.__class__ is not str and _hasNonFinite(val):
+                return True
+        return False
+    elif isinstance(obj, (list, tuple)):
+        try:
+            # fast path for lists of numbers. Overflow of a finite sum gives a false positive, which just means
+            #  using the slower encoder.
+            return not math.isfinite(sum(obj))
+        except (TypeError, OverflowError):
+            return any(_hasNonFinite(val) for val in obj)
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'O':
+            return _hasNonFinite(obj.tolist())
+        return obj.dtype.kind in 'fc' and not np.isfinite(obj).all()
+    elif isinstance(obj, np.floating):
+        return not np.isfinite(obj)
+    return False
+
+
+@attrs.define(frozen=True)
+class JSONSerializer:
+    """
+    Compact (default) or pretty-printed JSON serialization. See module docstring.
+
+    Pretty output indents dicts and lists of containers by `indentSize` spaces, and keeps lists of scalars (e.g.
+    coordinates, rows of transforms) on a single line, similar to previous jsbeautifier-based formatting.
+    """
+    pretty: bool = False
+    indentSize: int = 2
+    useOrjson: bool = attrs.field(default=orjson is not None)
+
+    def __attrs_post_init__(self):
+        if self.useOrjson and orjson is None:
+            raise ImportError('orjson is not installed')
+
+    def dumps(self, obj: tp.Any) -> str:
+        if self.pretty:
+            pieces = []
+            self._writePretty(obj, pieces, '\n')
+            return ''.join(pieces)
+        else:
+            return self._dumpsCompact(obj)
+
+    def dumpsBytes(self, obj: tp.Any) -> bytes:
+        if not self.pretty and self.useOrjson:
+            # skip decode / encode round trip
+            out = self._orjsonDumps(obj)
+            if out is not None:
+                return out
+        return self.dumps(obj).encode('utf-8')
+
+    def dump(self, obj: tp.Any, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.dumpsBytes(obj))
+
+    @staticmethod
+    def loads(s: str | bytes) -> tp.Any:
+        if orjson is not None:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN literals, which orjson doesn't accept; fall back to more permissive parser
+        return json.loads(s)
+
+    @classmethod
+    def load(cls, path: str) -> tp.Any:
+        with open(path, 'rb') as f:
+            return cls.loads(f.read())
+
+    def _dumpsCompact(self, obj: tp.Any) -> str:
+        if self.useOrjson:
+            out = self._orjsonDumps(obj)
+            if out is not None:
+                return out.decode('utf-8')
+        return json.dumps(obj, separators=(',', ':'), default=_stdlibDefault)
+
+    @staticmethod
+    def _orjsonDumps(obj: tp.Any) -> bytes | None:
+        """
+        Returns None if obj can't be encoded by orjson with the same meaning as by the standard library.
+        """
+        out = orjson.dumps(obj, default=_orjsonDefault, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        if b'null' in out and _hasNonFinite(obj):
+            return None
+        return out
+
+    def _dumpsInlineList(self, lst: list | tuple | np.ndarray) -> str:
+        if (isinstance(lst, np.ndarray) and lst.dtype.kind in 'biuf') or \
+                all(isinstance(val, (int, float)) or val is None for val in lst):
+            # no strings, so safe to add spaces after commas with a simple replace
+            return self._dumpsCompact(lst).replace(',', ', ')
+        return '[' + ', '.join(self._dumpsCompact(val) for val in lst) + ']'
+
+    def _writePretty(self, obj: tp.Any, pieces: list[str], newline: str):
+        if isinstance(obj, dict):
+            if len(obj) == 0:
+                pieces.append('{}')
+                return
+            innerNewline = newline + ' ' * self.indentSize
+            pieces.append('{')
+            for iItem, (key, val) in enumerate(obj.items()):
+                if iItem > 0:
+                    pieces.append(',')
+                pieces.append(innerNewline)
+                pieces.append(self._dumpsCompact(key if isinstance(key, str) else str(key)))
+                pieces.append(': ')
+                self._writePretty(val, pieces, innerNewline)
+            pieces.append(newline)
+            pieces.append('}')
+
+        elif isinstance(obj, np.ndarray) and obj.ndim > 0:
+            if obj.ndim == 1:
+                pieces.append(self._dumpsInlineList(obj))
+            else:
+                self._writePretty(list(obj), pieces, newline)
+
+        elif isinstance(obj, (list, tuple)):
+            if not any(isinstance(val, (dict, list, tuple, np.ndarray)) for val in obj):
+                pieces.append(self._dumpsInlineList(obj))
+                return
+            innerNewline = newline + ' ' * self.indentSize
+            pieces.append('[')
+            for iItem, val in enumerate(obj):
+                if iItem > 0:
+                    pieces.append(',')
+                pieces.append(innerNewline)
+                self._writePretty(val, pieces, innerNewline)
+            pieces.append(newline)
+            pieces.append(']')
+
+        else:
+            pieces.append(self._dumpsCompact(obj))
+
+
+compactJSONSerializer = JSONSerializer()
+prettyJSONSerializer = JSONSerializer(pretty=True)
@@ -1,4 +1,6 @@
 import attrs
+import contextlib
+import contextvars
 import numpy as np
 import typing as tp
 
@@ -30,6 +32,35 @@ def array_equalish(a: tp.Optional[np.ndarray], b: tp.Optional[np.ndarray], *args
 C = tp.TypeVar('C')
 
 
+_keepArraysWhenSerializing: contextvars.ContextVar[bool] = contextvars.ContextVar('keepArraysWhenSerializing',
+                                                                                   default=False)
+
+
+@contextlib.contextmanager
+def numpyFieldsAsArrays():
+    """
+    Within this context, `attrsWithNumpyAsDict` (and other `asDict` / `asList` implementations using
+    `ndarrayAsSerializable`) leave numpy fields as arrays rather than converting them to nested lists. Use when
+    the output goes directly to a serializer that handles arrays (see util/json.py and util/binarySidecar.py).
+
+    Output arrays may be the same objects held by the model, so should not be modified.
+    """
+    token = _keepArraysWhenSerializing.set(True)
+    try:
+        yield
+    finally:
+        _keepArraysWhenSerializing.reset(token)
+
+
+def ndarrayAsSerializable(val: tp.Optional[np.ndarray]) -> tp.Optional[np.ndarray | list]:
+    """
+    Convert array to nested lists for JSON-compatible output, unless within a `numpyFieldsAsArrays` context.
+    """
+    if val is None or _keepArraysWhenSerializing.get():
+        return val
+    return val.tolist()
+
+
 def attrsOptionalNDArrayField(init: bool = True) -> attrs.field:
     """
     Shorthand for an attrs field like ``x: np.ndarray | None = attrs.field(default=None)`` but with functional comparison behavior
@@ -56,7 +87,7 @@ def attrsWithNumpyAsDict(obj: C, npFields: tp.Optional[tp.Iterable[str]] = None,
 
         for key in npFields:
             if key in d and d[key] is not None:
-                d[key] = d[key].tolist()
+                d[key] = ndarrayAsSerializable(d[key])
 
         return d
 
@@ -0,0 +1,128 @@
+"""
+Closest point queries on a surface for a sequence of nearby query points, e.g. coil positions at tracker rate.
+
+Consecutive coil poses are almost identical, so rather than searching the whole surface from scratch for every pose
+(as `find_closest_cell` does), `IncrementalClosestPointQuery` warm-starts from the previous result: the distance from
+the new query point to the previous closest cell bounds the distance to the new closest point, so the cell locator
+only needs to search within that radius. Results are exact (matching `find_closest_cell` up to ties between cells).
+If the bounded search fails to find a cell (e.g. due to numerical precision in degenerate cells), the query falls back
+to an unbounded search with the global cell locator.
+
+Queries also call the cached cell locator directly with preallocated outputs, avoiding the per-call argument
+coercion and allocation overhead of `find_closest_cell`, which is significant relative to the search itself.
+"""
+
+from __future__ import annotations
+
+import attrs
+import logging
+import numpy as np
+import pyvista as pv
+from pyvista import _vtk
+
+from NaviNIBS.util.pyvista.dataset import get_cell_locator
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class IncrementalClosestPointQuery:
+    """
+    See module docstring.
+
+    Meant for one sequence of nearby query points; use separate instances for unrelated sequences (e.g. sample and
+    target coil positions) so that each warm-starts from its own previous result.
+
+    Like `find_closest_cell`, assumes the surface is not modified after creation.
+    """
+    _surf: pv.DataSet
+    _radiusTolerance: float = 1e-6
+    """
+    Relative and absolute padding added to the search radius, so that the previous closest cell is not excluded from
+    the bounded search by rounding errors.
+    """
+
+    _locator: _vtk.vtkCellLocator = attrs.field(init=False, repr=False)
+    _cell: _vtk.vtkGenericCell = attrs.field(init=False, factory=_vtk.vtkGenericCell, repr=False)
+    _prevCell: _vtk.vtkGenericCell = attrs.field(init=False, factory=_vtk.vtkGenericCell, repr=False)
+    """
+    Copy of previous closest cell, for evaluating distance from new query points
+    """
+    _hasPrevCell: bool = attrs.field(init=False, default=False)
+    _prevCellID: int = attrs.field(init=False, default=-1)
+    _prevPoint: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _prevClosestPoint: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+
+    # preallocated outputs for VTK calls
+    _closestPoint: list[float] = attrs.field(init=False, factory=lambda: [0., 0., 0.], repr=False)
+    _cellID: _vtk.mutable = attrs.field(init=False, factory=lambda: _vtk.mutable(0), repr=False)
+    _subID: _vtk.mutable = attrs.field(init=False, factory=lambda: _vtk.mutable(0), repr=False)
+    _dist2: _vtk.mutable = attrs.field(init=False, factory=lambda: _vtk.mutable(0.), repr=False)
+    _inside: _vtk.mutable = attrs.field(init=False, factory=lambda: _vtk.mutable(0), repr=False)
+    _pcoords: list[float] = attrs.field(init=False, factory=lambda: [0., 0., 0.], repr=False)
+    _weights: list[float] = attrs.field(init=False, factory=list, repr=False)
+
+    _numQueries: int = attrs.field(init=False, default=0)
+    _numFallbacks: int = attrs.field(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        self._locator = get_cell_locator(self._surf)
+        self._weights = [0.] * max(self._surf.GetMaxCellSize(), 1)
+
+    @property
+    def surf(self) -> pv.DataSet:
+        return self._surf
+
+    @property
+    def numQueries(self) -> int:
+        return self._numQueries
+
+    @property
+    def numFallbacks(self) -> int:
+        """
+        Number of queries that used an unbounded search of the whole surface, mainly for testing and benchmarking
+        """
+        return self._numFallbacks
+
+    def reset(self):
+        """
+        Forget previous result, so that the next query searches the whole surface
+        """
+        self._hasPrevCell = False
+        self._prevPoint = None
+
+    def findClosestPoint(self, point: np.ndarray) -> tuple[int, np.ndarray]:
+        """
+        :param point: query point, of shape (3,)
+        :return: (closest cell ID, closest point on surface). Cell ID is -1 if surface has no cells.
+        """
+        self._numQueries += 1
+        point = np.asarray(point, dtype=np.float64)
+
+        if self._prevPoint is not None and np.array_equal(point, self._prevPoint):
+            return self._prevCellID, self._prevClosestPoint.copy()
+
+        found = False
+        if self._hasPrevCell:
+            self._prevCell.EvaluatePosition(point, self._closestPoint, self._subID, self._pcoords, self._dist2,
+                                            self._weights)
+            radius = np.sqrt(float(self._dist2)) * (1 + self._radiusTolerance) + self._radiusTolerance
+            found = bool(self._locator.FindClosestPointWithinRadius(point, radius, self._closestPoint, self._cell,
+                                                                    self._cellID, self._subID, self._dist2,
+                                                                    self._inside))
+
+        if not found:
+            self._numFallbacks += 1
+            self._locator.FindClosestPoint(point, self._closestPoint, self._cell, self._cellID, self._subID,
+                                           self._dist2)
+
+        cellID = int(self._cellID)
+        closestPoint = np.asarray(self._closestPoint)
+        self._hasPrevCell = cellID >= 0
+        if self._hasPrevCell:
+            self._surf.GetCell(cellID, self._prevCell)
+        self._prevCellID = cellID
+        self._prevPoint = point.copy()
+        self._prevClosestPoint = closestPoint
+        return cellID, closestPoint.copy()
@@ -0,0 +1,499 @@
+"""
+Precomputed signed distance field of a closed surface, for fast approximate distance and closest point queries.
+
+The field is sampled on a regular grid of nodes, stored sparsely as blocks of `blockSize`^3 cells so that only the
+narrow band around the surface (from `maxInsideDist` inside to `maxOutsideDist` outside) is kept. Queries within the
+band are answered in constant time by trilinear interpolation, with gradients by central differences of the
+interpolated field. Queries outside of the band, or with `exact=True`, fall back to exact queries against the
+surface.
+
+Since distance is smooth away from the surface's medial axis, interpolation error is small even at resolutions
+coarser than the mesh (e.g. about 0.1 mm at most at 3 mm resolution on a head-sized surface), but can be larger in
+narrow concavities such as sulci of a cortical surface.
+
+Distances are positive outside and negative inside the surface, assuming a closed surface with consistently outward
+oriented faces. Each node's closest triangle is found among the nearest triangles by centroid, and the sign is taken
+from the angle-weighted pseudo-normal at the closest point (Baerentzen & Aanaes, 2005). Near the surface, a bound
+confirms that no other triangle could be closer (checking more triangles until it does), so node values there are
+exact. Farther away, where distance changes only to second order with where on the surface the closest point is,
+the best of the nearest triangles is used without confirmation.
+
+Building a field for a dense head surface takes several seconds, so fields are cached to disk (in `cacheDir`) keyed by
+a hash of the mesh and field parameters.
+"""
+
+from __future__ import annotations
+
+import attrs
+import hashlib
+import logging
+import numpy as np
+import os
+import platformdirs
+import pyvista as pv
+from pyvista import _vtk
+from scipy.spatial import cKDTree
+from typing import ClassVar
+
+from NaviNIBS.util.pyvista.dataset import closest_points_on_triangles
+
+
+logger = logging.getLogger(__name__)
+
+
+cacheFormatVersion = 1
+
+
+def getDefaultCacheDir() -> str:
+    return os.path.join(platformdirs.user_cache_dir(appname='NaviNIBS', appauthor=False), 'DistanceFields')
+
+
+@attrs.define
+class SignedDistanceField:
+    """
+    See module docstring.
+
+    Like `find_closest_cell`, assumes the surface is not modified after creation.
+    """
+    _surf: pv.PolyData
+    _resolution: float = 3.
+    """
+    Spacing between grid nodes, in mesh units (mm)
+    """
+    _maxOutsideDist: float = 30.
+    """
+    Distance outside of surface up to which the field is stored
+    """
+    _maxInsideDist: float = 5.
+    """
+    Distance inside of surface up to which the field is stored
+    """
+    _cacheDir: str | None = attrs.field(factory=getDefaultCacheDir)
+    """
+    Directory in which to cache built fields, or None to not cache
+    """
+
+    blockSize: ClassVar[int] = 8
+    _numCandidates: ClassVar[tuple[int, ...]] = (8, 32, 128)
+    """
+    Numbers of nearest triangles (by centroid) to check for each node when building, increasing until the closest
+    triangle is confirmed
+    """
+    _confirmWithinNumNodes: ClassVar[float] = 1.
+    """
+    Distance from surface (in multiples of resolution) within which each node's closest triangle is confirmed when
+    building
+    """
+    _buildChunkSize: ClassVar[int] = 8192
+
+    _origin: np.ndarray = attrs.field(init=False, repr=False)
+    _blockIndex: np.ndarray = attrs.field(init=False, repr=False)
+    """
+    Index into `_blocks` for each block in grid, or -1 for blocks outside the band
+    """
+    _blocks: np.ndarray = attrs.field(init=False, repr=False)
+    """
+    Node values of stored blocks, of shape (numBlocks, blockSize + 1, blockSize + 1, blockSize + 1). Nodes on
+    boundaries between blocks are duplicated so that interpolation within any cell only needs one block.
+    """
+    _triSurf: pv.PolyData = attrs.field(init=False, repr=False)
+    _hash: str = attrs.field(init=False)
+    _wasLoadedFromCache: bool = attrs.field(init=False, default=False)
+
+    _implicitDistance: _vtk.vtkImplicitPolyDataDistance | None = attrs.field(init=False, default=None, repr=False)
+
+    # triangle data, only set while building
+    _triA: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triAB: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triAC: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triNormals: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triAngles: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triRadii: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _centroidTree: cKDTree | None = attrs.field(init=False, default=None, repr=False)
+
+    def __attrs_post_init__(self):
+        if self._surf.is_all_triangles:
+            self._triSurf = self._surf
+        else:
+            self._triSurf = self._surf.triangulate()
+        self._hash = self._computeHash()
+        if not self._loadFromCache():
+            self._build()
+            self._saveToCache()
+
+    @property
+    def surf(self) -> pv.PolyData:
+        return self._surf  # as given, i.e. before any triangulation
+
+    @property
+    def resolution(self) -> float:
+        return self._resolution
+
+    @property
+    def hash(self) -> str:
+        """
+        Hash of mesh and field parameters, used as key for disk cache
+        """
+        return self._hash
+
+    @property
+    def wasLoadedFromCache(self) -> bool:
+        return self._wasLoadedFromCache
+
+    @property
+    def numBlocks(self) -> int:
+        return self._blocks.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self._blocks.nbytes + self._blockIndex.nbytes
+
+    @property
+    def _cachePath(self) -> str | None:
+        if self._cacheDir is None:
+            return None
+        return os.path.join(self._cacheDir, f'{self._hash}.npz')
+
+    def _computeHash(self) -> str:
+        hasher = hashlib.sha1()
+        hasher.update(np.ascontiguousarray(self._triSurf.points, dtype=np.float64).tobytes())
+        hasher.update(np.ascontiguousarray(self._triSurf.faces, dtype=np.int64).tobytes())
+        hasher.update(np.asarray([self._resolution, self._maxOutsideDist, self._maxInsideDist,
+                                  self.blockSize, cacheFormatVersion], dtype=np.float64).tobytes())
+        return hasher.hexdigest()
+
+    def _loadFromCache(self) -> bool:
+        cachePath = self._cachePath
+        if cachePath is None or not os.path.exists(cachePath):
+            return False
+        try:
+            with np.load(cachePath, allow_pickle=False) as npz:
+                self._origin = npz['origin']
+                self._blockIndex = npz['blockIndex']
+                self._blocks = npz['blocks']
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f'Could not load cached distance field from {cachePath}: {e}')
+            return False
+        if self._blocks.shape[1:] != (self.blockSize + 1,) * 3:
+            logger.warning(f'Unexpected block shape in cached distance field {cachePath}, rebuilding')
+            return False
+        logger.debug(f'Loaded distance field from {cachePath}')
+        self._wasLoadedFromCache = True
+        return True
+
+    def _saveToCache(self):
+        cachePath = self._cachePath
+        if cachePath is None:
+            return
+        try:
+            os.makedirs(self._cacheDir, exist_ok=True)
+            tmpPath = cachePath + '.tmp'
+            with open(tmpPath, 'wb') as f:  # pass file object so numpy doesn't append its own extension
+                np.savez(f, origin=self._origin, blockIndex=self._blockIndex, blocks=self._blocks)
+            os.replace(tmpPath, cachePath)
+        except OSError as e:
+            logger.warning(f'Could not save distance field to {cachePath}: {e}')
+        else:
+            logger.debug(f'Saved distance field to {cachePath}')
+
+    def _build(self):
+        logger.info(f'Building signed distance field for surface with {self._triSurf.n_cells} cells '
+                    f'at {self._resolution} mm resolution')
+        self._prepareTriangles()
+
+        h = self._resolution
+        B = self.blockSize
+        blockLength = B * h
+        pad = self._maxOutsideDist + blockLength
+        bounds = np.asarray(self._triSurf.bounds).reshape(3, 2)
+        self._origin = bounds[:, 0] - pad
+        numBlocks = np.ceil((bounds[:, 1] + pad - self._origin) / blockLength).astype(np.int64)
+
+        # find blocks that could overlap band, from distance at each block center
+        blockCoords = np.stack(np.meshgrid(*(np.arange(n) for n in numBlocks), indexing='ij'), axis=-1).reshape(-1, 3)
+        blockCenters = self._origin + (blockCoords + 0.5) * blockLength
+        centerDists = self._calculateSignedDistances(blockCenters)
+        blockHalfDiagonal = np.sqrt(3) * blockLength / 2
+        isActive = (centerDists - blockHalfDiagonal <= self._maxOutsideDist) & \
+                   (centerDists + blockHalfDiagonal >= -self._maxInsideDist)
+
+        self._blockIndex = np.full(numBlocks, -1, dtype=np.int32)
+        activeCoords = blockCoords[isActive]
+        self._blockIndex[tuple(activeCoords.T)] = np.arange(len(activeCoords), dtype=np.int32)
+
+        # calculate each unique node in active blocks once, then scatter into blocks. Distance changes by at most the
+        #  distance moved, so nodes that cannot be within the band (given their block's center distance) are skipped
+        #  and left as NaN, and queries in cells touching them fall back to exact queries.
+        localCoords = np.stack(np.meshgrid(*(np.arange(B + 1),) * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+        localOffsets = np.linalg.norm((localCoords - B / 2) * h, axis=1)
+        activeCenterDists = centerDists[isActive][:, np.newaxis]
+        isNeeded = ((activeCenterDists - localOffsets <= self._maxOutsideDist + h) &
+                    (activeCenterDists + localOffsets >= -self._maxInsideDist - h)).ravel()
+        nodeCoords = (activeCoords[:, np.newaxis, :] * B + localCoords[np.newaxis, :, :]).reshape(-1, 3)
+        nodeDims = numBlocks * B + 1
+        nodeIndices = np.ravel_multi_index(tuple(nodeCoords[isNeeded].T), nodeDims)
+        uniqueIndices, inverse = np.unique(nodeIndices, return_inverse=True)
+        uniqueCoords = np.stack(np.unravel_index(uniqueIndices, nodeDims), axis=-1)
+        uniqueDists = self._calculateSignedDistances(self._origin + uniqueCoords * h)
+        nodeDists = np.full((len(nodeCoords),), np.nan, dtype=np.float32)
+        nodeDists[isNeeded] = uniqueDists[inverse]
+        self._blocks = nodeDists.reshape((len(activeCoords),) + (B + 1,) * 3)
+
+        logger.info(f'Built signed distance field with {len(activeCoords)} blocks ({len(uniqueIndices)} nodes)')
+        self._clearTriangles()
+
+    def _prepareTriangles(self):
+        pts = np.asarray(self._triSurf.points, dtype=np.float64)
+        tris = self._triSurf.regular_faces
+        A, B, C = (pts[tris[:, i]] for i in range(3))
+        self._triA = A
+        self._triAB = B - A
+        self._triAC = C - A
+        normals = np.cross(self._triAB, self._triAC)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        self._triNormals = np.nan_to_num(normals)
+
+        # interior angle at each vertex, for angle-weighted pseudo-normals
+        angles = np.zeros((len(tris), 3))
+        for iVert, (P, Q, R) in enumerate(((A, B, C), (B, C, A), (C, A, B))):
+            u = Q - P
+            v = R - P
+            angles[:, iVert] = np.arctan2(np.linalg.norm(np.cross(u, v), axis=1), np.einsum('ij,ij->i', u, v))
+        self._triAngles = angles
+
+        centroids = (A + B + C) / 3
+        self._triRadii = np.max(np.stack([np.linalg.norm(X - centroids, axis=1) for X in (A, B, C)]), axis=0)
+        self._centroidTree = cKDTree(centroids)
+
+    def _clearTriangles(self):
+        self._triA = self._triAB = self._triAC = self._triNormals = self._triAngles = self._triRadii = None
+        self._centroidTree = None
+
+    def _calculateSignedDistances(self, points: np.ndarray) -> np.ndarray:
+        dists = np.empty((len(points),))
+        for iStart in range(0, len(points), self._buildChunkSize):
+            chunk = slice(iStart, iStart + self._buildChunkSize)
+            dists[chunk] = self._calculateSignedDistancesChunk(points[chunk])
+        return dists
+
+    def _calculateSignedDistancesChunk(self, points: np.ndarray) -> np.ndarray:
+        dists = np.full((len(points),), np.nan)
+        remaining = np.arange(len(points))
+        maxRadius = self._triRadii.max()
+        numTris = len(self._triA)
+        confirmWithin = self._confirmWithinNumNodes * self._resolution
+        for k in self._numCandidates:
+            if len(remaining) == 0:
+                break
+            k = min(k, numTris)
+            P = points[remaining]
+            centroidDists, candidates = self._centroidTree.query(P, k=k)
+            centroidDists = centroidDists.reshape(len(P), k)
+            candidates = candidates.reshape(len(P), k)
+            closestPts, dist2, v, w = closest_points_on_triangles(np.repeat(P, k, axis=0),
+                                                                self._triA[candidates.ravel()],
+                                                                self._triAB[candidates.ravel()],
+                                                                self._triAC[candidates.ravel()])
+            dist2 = dist2.reshape(len(P), k)
+            iClosest = np.argmin(dist2, axis=1)
+            minDist = np.sqrt(dist2[np.arange(len(P)), iClosest])
+
+            # any triangle not among candidates has a centroid at least as far as the farthest candidate's, so is
+            #  at least (that distance - max triangle radius) away. Farther from the surface this bound would need
+            #  many more candidates to be met (see module docstring), so is only required near the surface.
+            isConfirmed = (k == numTris) | (centroidDists[:, -1] - maxRadius >= minDist) | (minDist > confirmWithin)
+
+            signs = self._getSigns(P, candidates, closestPts.reshape(len(P), k, 3), dist2, v.reshape(len(P), k),
+                                   w.reshape(len(P), k), iClosest, minDist)
+
+            dists[remaining[isConfirmed]] = (signs * minDist)[isConfirmed]
+            remaining = remaining[~isConfirmed]
+
+        # closest triangle not confirmed among nearest candidates (e.g. very uneven triangle sizes); use exact
+        #  queries instead
+        for iPt in remaining:
+            dists[iPt] = self._getExactSignedDistance(points[iPt])
+
+        return dists
+
+    def _getSigns(self, P: np.ndarray, candidates: np.ndarray, closestPts: np.ndarray, dist2: np.ndarray,
+                  v: np.ndarray, w: np.ndarray, iClosest: np.ndarray, minDist: np.ndarray) -> np.ndarray:
+        """
+        Sign of distance from angle-weighted pseudo-normal at closest point, accumulated over all candidate triangles
+        sharing the closest point (i.e. all triangles around a closest vertex, both triangles at a closest edge, or
+        just the closest triangle).
+        """
+        N, k = candidates.shape
+        rows = np.arange(N)
+        tol = 1e-9 * max(self._resolution, 1.)
+        isTied = np.sqrt(dist2) <= minDist[:, np.newaxis] + tol
+        isTied[rows, iClosest] = True
+        u = 1 - v - w
+        atVertex = (u == 1.) | (v == 1.) | (w == 1.)
+        iVertex = np.where(v == 1., 1, np.where(w == 1., 2, 0))
+        weights = np.where(atVertex, self._triAngles[candidates, iVertex], 1.) * isTied
+        pseudoNormals = np.einsum('nk,nkj->nj', weights, self._triNormals[candidates])
+        signs = np.sign(np.einsum('ij,ij->i', P - closestPts[rows, iClosest], pseudoNormals))
+        signs[signs == 0] = 1.
+        return signs
+
+    def _getImplicitDistance(self) -> _vtk.vtkImplicitPolyDataDistance:
+        if self._implicitDistance is None:
+            self._implicitDistance = _vtk.vtkImplicitPolyDataDistance()
+            self._implicitDistance.SetInput(self._triSurf)
+        return self._implicitDistance
+
+    def _getExactSignedDistance(self, point: np.ndarray) -> float:
+        return self._getImplicitDistance().EvaluateFunction(point)
+
+    def _getExactSignedDistancesAndClosestPoints(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        implicitDistance = self._getImplicitDistance()
+        dists = np.empty((len(points),))
+        closestPts = np.empty((len(points), 3))
+        closestPt = [0., 0., 0.]
+        for iPt, point in enumerate(points):
+            dists[iPt] = implicitDistance.EvaluateFunctionAndGetClosestPoint(point, closestPt)
+            closestPts[iPt] = closestPt
+        return dists, closestPts
+
+    def _interpolate(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (N distances, N bool of whether each point was within stored cells). Distances are NaN for points
+            outside of stored cells.
+        """
+        B = self.blockSize
+        g = (points - self._origin) / self._resolution
+        cell = np.floor(g).astype(np.int64)
+        frac = g - cell
+        blockCoords = cell // B
+        localCoords = cell - blockCoords * B
+
+        isValid = np.all((blockCoords >= 0) & (blockCoords < self._blockIndex.shape), axis=1)
+        slots = np.full((len(points),), -1, dtype=np.int64)
+        slots[isValid] = self._blockIndex[tuple(blockCoords[isValid].T)]
+        isValid &= slots >= 0
+
+        dists = np.full((len(points),), np.nan)
+        if not isValid.any():
+            return dists, isValid
+
+        s = slots[isValid]
+        i, j, k = localCoords[isValid].T
+        fx, fy, fz = frac[isValid].T
+        blocks = self._blocks
+        c000 = blocks[s, i, j, k]
+        c100 = blocks[s, i + 1, j, k]
+        c010 = blocks[s, i, j + 1, k]
+        c110 = blocks[s, i + 1, j + 1, k]
+        c001 = blocks[s, i, j, k + 1]
+        c101 = blocks[s, i + 1, j, k + 1]
+        c011 = blocks[s, i, j + 1, k + 1]
+        c111 = blocks[s, i + 1, j + 1, k + 1]
+
+        # interpolate along x, then y, then z
+        c00 = c000 + fx * (c100 - c000)
+        c10 = c010 + fx * (c110 - c010)
+        c01 = c001 + fx * (c101 - c001)
+        c11 = c011 + fx * (c111 - c011)
+        c0 = c00 + fy * (c10 - c00)
+        c1 = c01 + fy * (c11 - c01)
+        dists[isValid] = c0 + fz * (c1 - c0)
+
+        # cells touching nodes skipped when building (beyond band) are not stored either
+        isValid &= ~np.isnan(dists)
+
+        return dists, isValid
+
+    def _interpolateGradients(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Gradients by central differences of the interpolated field, half a cell apart. Unlike the derivative of the
+        trilinear interpolant, these are continuous across cells, and are several times more accurate in direction.
+
+        :return: (Nx3 gradients, N bool of whether all samples for each point were within stored cells)
+        """
+        step = self._resolution / 2
+        gradients = np.empty((len(points), 3))
+        isValid = np.ones((len(points),), dtype=bool)
+        for iDim in range(3):
+            offset = np.zeros((3,))
+            offset[iDim] = step
+            distsAbove, isValidAbove = self._interpolate(points + offset)
+            distsBelow, isValidBelow = self._interpolate(points - offset)
+            gradients[:, iDim] = (distsAbove - distsBelow) / (2 * step)
+            isValid &= isValidAbove & isValidBelow
+        gradients[~isValid] = np.nan
+        return gradients, isValid
+
+    def isWithinBand(self, points: np.ndarray) -> np.ndarray:
+        """
+        Whether each point is within the stored part of the field, i.e. whether queries at that point are
+        interpolated rather than exact
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        return self._interpolate(points)[1]
+
+    def getSignedDistances(self, points: np.ndarray, exact: bool = False) -> np.ndarray:
+        """
+        :param points: Nx3 query points
+        :param exact: if True, query surface exactly instead of interpolating field
+        :return: N signed distances, positive outside surface
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if exact:
+            return np.asarray([self._getExactSignedDistance(point) for point in points])
+        dists, isValid = self._interpolate(points)
+        for iPt in np.flatnonzero(~isValid):
+            dists[iPt] = self._getExactSignedDistance(points[iPt])
+        return dists
+
+    def getSignedDistance(self, point: np.ndarray, exact: bool = False) -> float:
+        return float(self.getSignedDistances(point, exact=exact)[0])
+
+    def getGradients(self, points: np.ndarray, exact: bool = False) -> np.ndarray:
+        """
+        :return: Nx3 gradients of signed distance, i.e. approximately unit vectors pointing away from (or, inside,
+            toward) the closest point on the surface
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if exact:
+            dists, closestPts = self._getExactSignedDistancesAndClosestPoints(points)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                gradients = (points - closestPts) / dists[:, np.newaxis]
+            implicitDistance = self._getImplicitDistance()
+            gradient = [0., 0., 0.]
+            for iPt in np.flatnonzero(~np.isfinite(gradients).all(axis=1)):
+                # on surface, use face normal
+                implicitDistance.EvaluateGradient(points[iPt], gradient)
+                gradients[iPt] = gradient
+            return gradients
+        gradients, isValid = self._interpolateGradients(points)
+        if not isValid.all():
+            gradients[~isValid] = self.getGradients(points[~isValid], exact=True)
+        return gradients
+
+    def getSignedDistancesAndClosestPoints(self, points: np.ndarray, exact: bool = False) \
+            -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (N signed distances, Nx3 closest points on surface). Interpolated closest points are estimated by
+            stepping from each point along the gradient by the interpolated distance.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if exact:
+            return self._getExactSignedDistancesAndClosestPoints(points)
+        dists, isValid = self._interpolate(points)
+        gradients, isGradientValid = self._interpolateGradients(points)
+        isValid &= isGradientValid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            directions = gradients / np.linalg.norm(gradients, axis=1, keepdims=True)
+        closestPts = points - dists[:, np.newaxis] * directions
+        isValid &= np.isfinite(closestPts).all(axis=1)
+        if not isValid.all():
+            dists[~isValid], closestPts[~isValid] = self._getExactSignedDistancesAndClosestPoints(points[~isValid])
+        return dists, closestPts
+
+    def getClosestPoints(self, points: np.ndarray, exact: bool = False) -> np.ndarray:
+        return self.getSignedDistancesAndClosestPoints(points, exact=exact)[1]
+
+    def getClosestPoint(self, point: np.ndarray, exact: bool = False) -> np.ndarray:
+        return self.getClosestPoints(point, exact=exact)[0]
@@ -1,10 +1,13 @@
+import attrs
 import collections.abc
+import math
 import typing as tp
 import numpy as np
 import numpy.typing as npt
 import pyvista
 import pyvista as pv
 from pyvista import _vtk
+from scipy.spatial import cKDTree
 if pv.__version__ <= '0.39.1':
     from pyvista.utilities.helpers import vtk_id_list_to_array
 else:
@@ -71,20 +74,14 @@ def find_closest_point(dataset: pv.DataSet, point: tp.Iterable, n: int = 1) -> i
     return locator.FindClosestPoint(point)
 
 
-def find_closest_cell(dataset: pv.DataSet, point: tp.Iterable, return_closest_point: bool = False) -> \
-        int | npt.NDArray[int] | tuple[int | npt.NDArray[int], npt.NDArray[int]]:
+def get_cell_locator(dataset: pv.DataSet) -> _vtk.vtkCellLocator:
     """
-    Similar to pv.DataSet.find_closest_cell, but monkey-patches a cache of the
-    vtkPointLocator to speed up repeated calls. It turns out this construction
-    is more expensive than the actual find.
+    Get a vtkCellLocator for the dataset, building it on first call and caching it on the dataset for subsequent
+    calls (see `find_closest_cell`).
 
     Note: the cache is not automatically reset by changes to the dataset, so may break
     (or give incorrect results) if dataset is changed.
     """
-    from pyvista.core.utilities.arrays import _coerce_pointslike_arg
-
-    point, singular = _coerce_pointslike_arg(point, copy=False)
-
     if hasattr(dataset, '_cell_locator'):
         locator = dataset._cell_locator
     else:
@@ -118,6 +115,25 @@ def find_closest_cell(dataset: pv.DataSet, point: tp.Iterable, return_closest_po
                 return state
             dataset.__getstate__ = __getstate__.__get__(dataset, pv.DataSet)
 
+    return locator
+
+
+def find_closest_cell(dataset: pv.DataSet, point: tp.Iterable, return_closest_point: bool = False) -> \
+        int | npt.NDArray[int] | tuple[int | npt.NDArray[int], npt.NDArray[int]]:
+    """
+    Similar to pv.DataSet.find_closest_cell, but monkey-patches a cache of the
+    vtkPointLocator to speed up repeated calls. It turns out this construction
+    is more expensive than the actual find.
+
+    Note: the cache is not automatically reset by changes to the dataset, so may break
+    (or give incorrect results) if dataset is changed.
+    """
+    from pyvista.core.utilities.arrays import _coerce_pointslike_arg
+
+    point, singular = _coerce_pointslike_arg(point, copy=False)
+
+    locator = get_cell_locator(dataset)
+
     cell = _vtk.vtkGenericCell()
 
     closest_cells: list[int] = []
@@ -142,3 +158,295 @@ def find_closest_cell(dataset: pv.DataSet, point: tp.Iterable, return_closest_po
         return out_cells, out_points
     return out_cells
 
+
+def closest_points_on_triangles(P: np.ndarray, A: np.ndarray, AB: np.ndarray, AC: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Closest points on triangles to points, following the region tests of Ericson (Real-Time Collision Detection,
+    5.1.5), vectorized over pairs of points and triangles.
+
+    :param P: Nx3 points
+    :param A: Nx3 first vertex of each triangle
+    :param AB: Nx3 vectors from first to second vertex
+    :param AC: Nx3 vectors from first to third vertex
+    :return: (Nx3 closest points, N squared distances, N barycentric weights of second vertex, N barycentric weights
+        of third vertex)
+    """
+    AP = P - A
+    d1 = np.einsum('ij,ij->i', AB, AP)
+    d2 = np.einsum('ij,ij->i', AC, AP)
+    d3 = d1 - np.einsum('ij,ij->i', AB, AB)  # AB . BP
+    d4 = d2 - np.einsum('ij,ij->i', AC, AB)  # AC . BP
+    d5 = d1 - np.einsum('ij,ij->i', AB, AC)  # AB . CP
+    d6 = d2 - np.einsum('ij,ij->i', AC, AC)  # AC . CP
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # start with face region, then override with edge and vertex regions in increasing order of precedence
+        denom = va + vb + vc
+        v = vb / denom
+        w = vc / denom
+
+        isBC = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        wBC = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        v = np.where(isBC, 1 - wBC, v)
+        w = np.where(isBC, wBC, w)
+
+        isAC = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        v = np.where(isAC, 0., v)
+        w = np.where(isAC, d2 / (d2 - d6), w)
+
+        isAB = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        v = np.where(isAB, d1 / (d1 - d3), v)
+        w = np.where(isAB, 0., w)
+
+    isC = (d6 >= 0) & (d5 <= d6)
+    v[isC] = 0.
+    w[isC] = 1.
+    isB = (d3 >= 0) & (d4 <= d3)
+    v[isB] = 1.
+    w[isB] = 0.
+    isA = (d1 <= 0) & (d2 <= 0)
+    v[isA] = 0.
+    w[isA] = 0.
+
+    closestPts = A + v[:, np.newaxis] * AB + w[:, np.newaxis] * AC
+    diff = P - closestPts
+    dist2 = np.einsum('ij,ij->i', diff, diff)
+    dist2[~np.isfinite(dist2)] = np.inf  # degenerate triangles
+    return closestPts, dist2, v, w
+
+
+@attrs.define
+class BatchClosestCellQuery:
+    """
+    Exact closest cell queries for many points at once, vectorized rather than looping over points as
+    `find_closest_cell` does.
+
+    Each triangle is represented by sample points (its centroid, or for triangles much larger than typical,
+    centroids of equal sub-triangles) in a cKDTree, such that every point on a triangle is within a sample radius of
+    one of its samples. For each query point:
+
+    1. The distance to the triangle of the nearest sample is an upper bound on the distance to the closest triangle.
+    2. Any closer triangle must have a sample within (upper bound + sample radius) of the point. If there are not
+       too many samples within this radius (as for points near the surface, e.g. ROI vertices or points on another
+       surface), distances to all of their triangles are evaluated at once by `closest_points_on_triangles`, skipping
+       those that cannot be closer given their sample distance and radius.
+    3. Otherwise (as for points farther from the surface, e.g. coil positions), the point is finished with a search
+       of the cell locator, bounded by the upper bound from (1), which is considerably faster than an unbounded
+       search.
+
+    Results match `find_closest_cell` up to ties between cells. Datasets that are not PolyData of only triangles
+    use the cell locator for all points.
+
+    Like `find_closest_cell`, assumes the dataset is not modified after creation.
+    """
+    _dataset: pv.DataSet
+    _numCandidates: int = 32
+    """
+    Max number of samples to check for each point before falling back to a cell locator search
+    """
+    _maxSearchRadiusFactor: float = 3.
+    """
+    Points needing a search radius larger than this (relative to sample radius) fall back to a cell locator search
+    without first checking samples, since there would usually be more than `numCandidates` samples within the radius
+    """
+    _chunkSize: int = 8192
+    """
+    Number of points to evaluate at once, limiting memory use for large batches
+    """
+    _maxDivisions: int = 16
+    """
+    Max number of divisions along each edge when splitting large triangles into samples, limiting number of samples
+    for very uneven meshes
+    """
+
+    _isTriangleMesh: bool = attrs.field(init=False)
+    _triA: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triAB: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triAC: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    _triRadii: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    """
+    Max distance from any point on each triangle to the nearest of its samples
+    """
+    _sampleRadius: float = attrs.field(init=False, default=0.)
+    _sampleTris: np.ndarray | None = attrs.field(init=False, default=None, repr=False)
+    """
+    Index of triangle for each sample
+    """
+    _sampleTree: cKDTree | None = attrs.field(init=False, default=None, repr=False)
+    _numLocatorQueries: int = attrs.field(init=False, default=0)
+
+    _searchRadiusStep: tp.ClassVar[float] = 1.25
+    """
+    Ratio between search radii, for grouping points into a few searches with the same radius
+    """
+
+    def __attrs_post_init__(self):
+        self._isTriangleMesh = isinstance(self._dataset, pv.PolyData) and self._dataset.n_cells > 0 \
+            and self._dataset.is_all_triangles \
+            and self._dataset.n_verts == 0 and self._dataset.n_lines == 0 and self._dataset.n_strips == 0
+        if not self._isTriangleMesh:
+            return
+
+        pts = np.asarray(self._dataset.points, dtype=np.float64)
+        tris = self._dataset.regular_faces
+        A, B, C = (pts[tris[:, i]] for i in range(3))
+        self._triA = A
+        self._triAB = B - A
+        self._triAC = C - A
+        centroids = (A + B + C) / 3
+        radii = np.max([np.linalg.norm(X - centroids, axis=1) for X in (A, B, C)], axis=0)
+        radii = np.nan_to_num(radii, nan=0.)  # degenerate triangles will never be closest
+
+        # split triangles much larger than typical into m^2 similar sub-triangles, with radius 1/m of the original
+        maxRadius = max(2 * float(np.median(radii)), np.finfo(np.float64).tiny)
+        numDivisions = np.clip(np.ceil(radii / maxRadius), 1, self._maxDivisions).astype(np.int64)
+        self._triRadii = radii / numDivisions
+        self._sampleRadius = float(self._triRadii.max())
+        samples = [centroids[numDivisions == 1]]
+        sampleTris = [np.flatnonzero(numDivisions == 1)]
+        for m in np.unique(numDivisions[numDivisions > 1]):
+            iTris = np.flatnonzero(numDivisions == m)
+            # barycentric coordinates (of second and third vertices) of sub-triangle centroids, for sub-triangles
+            #  pointing the same way as the original and those pointing the opposite way
+            i, j = np.nonzero(np.add.outer(np.arange(m), np.arange(m)) <= m - 1)
+            iInv, jInv = np.nonzero(np.add.outer(np.arange(m), np.arange(m)) <= m - 2)
+            bary = np.concatenate([np.stack([i + 1 / 3, j + 1 / 3], axis=1),
+                                   np.stack([iInv + 2 / 3, jInv + 2 / 3], axis=1)]) / m
+            samples.append((A[iTris, np.newaxis, :]
+                            + bary[np.newaxis, :, 0:1] * self._triAB[iTris, np.newaxis, :]
+                            + bary[np.newaxis, :, 1:2] * self._triAC[iTris, np.newaxis, :]).reshape(-1, 3))
+            sampleTris.append(np.repeat(iTris, len(bary)))
+        self._sampleTris = np.concatenate(sampleTris)
+        self._sampleTree = cKDTree(np.concatenate(samples))
+
+    @property
+    def dataset(self) -> pv.DataSet:
+        return self._dataset
+
+    @property
+    def numLocatorQueries(self) -> int:
+        """
+        Number of points finished with a cell locator search, mainly for testing and benchmarking
+        """
+        return self._numLocatorQueries
+
+    def findClosestCells(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param points: Nx3 query points
+        :return: (N closest cell IDs, Nx3 closest points, N distances). For points that are not finite, or if the
+            dataset has no cells, cell ID is -1 and closest point and distance are NaN.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        N = points.shape[0]
+        cellIDs = np.full((N,), -1, dtype=np.int64)
+        closestPts = np.full((N, 3), np.nan)
+        dists = np.full((N,), np.nan)
+        if self._dataset.n_cells == 0:
+            return cellIDs, closestPts, dists
+
+        iValid = np.flatnonzero(np.isfinite(points).all(axis=1))
+        if self._isTriangleMesh and len(iValid) > self._chunkSize:
+            # group nearby points into the same chunks, for better locality of tree searches
+            voxels = np.floor(points[iValid] / (8 * self._sampleRadius))
+            iValid = iValid[np.lexsort(voxels.T)]
+        for iStart in range(0, len(iValid), self._chunkSize):
+            iChunk = iValid[iStart:iStart + self._chunkSize]
+            cellIDs[iChunk], closestPts[iChunk], dists[iChunk] = self._findClosestCellsChunk(points[iChunk])
+        return cellIDs, closestPts, dists
+
+    def _findClosestCellsChunk(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        N = points.shape[0]
+        if self._isTriangleMesh:
+            _, iNearest = self._sampleTree.query(points, k=1)
+            cellIDs = self._sampleTris[iNearest]
+            closestPts, dist2, _, _ = closest_points_on_triangles(points, self._triA[cellIDs],
+                                                                  self._triAB[cellIDs], self._triAC[cellIDs])
+            dists = np.sqrt(dist2)
+            isConfirmed = np.zeros((N,), dtype=bool)
+
+            # any closer triangle has a sample within this radius (with some slack for rounding error)
+            searchRadii = dists * (1 + 1e-9) + 1e-9 + self._sampleRadius
+            # group points into a few searches, each with a single radius that is at least as large as needed
+            with np.errstate(divide='ignore'):
+                radiusLevels = np.ceil(np.log(searchRadii / self._sampleRadius) / np.log(self._searchRadiusStep))
+            radiusLevels[searchRadii > self._maxSearchRadiusFactor * self._sampleRadius] = np.nan
+            for level in np.unique(radiusLevels[np.isfinite(radiusLevels)]):
+                iPts = np.flatnonzero(radiusLevels == level)
+                P = points[iPts]
+                sampleDists, iSamples = self._sampleTree.query(
+                    P, k=self._numCandidates,
+                    distance_upper_bound=self._sampleRadius * self._searchRadiusStep ** level)
+                sampleDists = sampleDists.reshape(len(P), self._numCandidates)
+                iSamples = iSamples.reshape(len(P), self._numCandidates)
+                # if the last neighbor is within radius, there may be more samples within radius than were returned
+                isComplete = ~np.isfinite(sampleDists[:, -1])
+                isFound = np.isfinite(sampleDists)
+                candidates = self._sampleTris[np.where(isFound, iSamples, 0)]
+                # skip triangles that cannot be closer than the upper bound
+                isCandidate = isFound & isComplete[:, np.newaxis] \
+                    & (sampleDists - self._triRadii[candidates] <= dists[iPts, np.newaxis])
+                rows, cols = np.nonzero(isCandidate)
+                flatCandidates = candidates[rows, cols]
+                candidatePts, candidateDist2, _, _ = closest_points_on_triangles(P[rows],
+                                                                                 self._triA[flatCandidates],
+                                                                                 self._triAB[flatCandidates],
+                                                                                 self._triAC[flatCandidates])
+                allDist2 = np.full((len(P), self._numCandidates), np.inf)
+                allDist2[rows, cols] = candidateDist2
+                allClosestPts = np.zeros((len(P), self._numCandidates, 3))
+                allClosestPts[rows, cols] = candidatePts
+                iClosest = np.argmin(allDist2, axis=1)
+                iRows = np.arange(len(P))
+                isBetter = allDist2[iRows, iClosest] < dist2[iPts]
+                iBetter = iPts[isBetter]
+                cellIDs[iBetter] = candidates[iRows, iClosest][isBetter]
+                closestPts[iBetter] = allClosestPts[iRows, iClosest][isBetter]
+                dists[iBetter] = np.sqrt(allDist2[iRows, iClosest][isBetter])
+                isConfirmed[iPts] = isComplete
+
+            remaining = np.flatnonzero(~isConfirmed)
+        else:
+            cellIDs = np.full((N,), -1, dtype=np.int64)
+            closestPts = np.full((N, 3), np.nan)
+            dists = np.full((N,), np.inf)
+            remaining = np.arange(N)
+
+        if len(remaining) > 0:
+            self._numLocatorQueries += len(remaining)
+            locator = get_cell_locator(self._dataset)
+            cell = _vtk.vtkGenericCell()
+            closestPoint = [0., 0., 0.]
+            cellID = _vtk.mutable(0)
+            subID = _vtk.mutable(0)
+            dist2 = _vtk.mutable(0.)
+            inside = _vtk.mutable(0)
+            # (passing lists rather than numpy rows to vtk avoids significant per-call conversion overhead)
+            radii = (dists[remaining] * (1 + 1e-6) + 1e-6).tolist()
+            for iPt, point, radius in zip(remaining.tolist(), points[remaining].tolist(), radii):
+                # distance to closest candidate (if any) bounds search radius
+                found = math.isfinite(radius) and bool(locator.FindClosestPointWithinRadius(
+                    point, radius, closestPoint, cell, cellID, subID, dist2, inside))
+                if not found:
+                    locator.FindClosestPoint(point, closestPoint, cell, cellID, subID, dist2)
+                cellIDs[iPt] = int(cellID)
+                closestPts[iPt] = closestPoint
+                dists[iPt] = math.sqrt(float(dist2))
+
+        return cellIDs, closestPts, dists
+
+
+def find_closest_cells(dataset: pv.DataSet, points: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of `find_closest_cell` for many points, also returning distances. See
+    `BatchClosestCellQuery`; to query the same dataset repeatedly, keep a `BatchClosestCellQuery` instead, which
+    reuses its candidate search structures.
+
+    :param points: Nx3 query points
+    :return: (N closest cell IDs, Nx3 closest points, N distances)
+    """
+    return BatchClosestCellQuery(dataset).findClosestCells(points)
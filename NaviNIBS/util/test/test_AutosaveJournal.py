@@ -0,0 +1,223 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from NaviNIBS.util.AutosaveJournal import AutosaveJournal, AutosaveJournalWriter, parseJournalRef, readJournalRef
+
+
+def _append(journal: AutosaveJournal, i: int):
+    blob = json.dumps(dict(i=i, payload=list(range(i * 10)))).encode('utf-8')
+    return journal.append(time=datetime(2024, 1, 1) + timedelta(seconds=i),
+                          sections=dict(section=('.json', blob)),
+                          config=dict(i=i))
+
+
+def _checkCheckpoints(journal: AutosaveJournal | list, expectedCount: int):
+    checkpoints = journal.checkpoints if isinstance(journal, AutosaveJournal) else journal
+    assert len(checkpoints) == expectedCount
+    for i, checkpoint in enumerate(checkpoints):
+        assert checkpoint.time == datetime(2024, 1, 1) + timedelta(seconds=i)
+        config = json.loads(readJournalRef(checkpoint.configRef))
+        assert config['i'] == i
+        sectionRef = os.path.join(os.path.dirname(os.path.dirname(checkpoint.configRef)), config['section'])
+        assert json.loads(readJournalRef(sectionRef))['i'] == i
+
+
+@pytest.fixture
+def unpackedDir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.fixture
+def autosaveDir(unpackedDir):
+    return os.path.join(unpackedDir, 'autosaved')
+
+
+def test_appendAndReopen(unpackedDir, autosaveDir):
+    assert AutosaveJournal.readCheckpoints(autosaveDir) is None
+
+    journal = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    for i in range(3):
+        checkpoint, config = _append(journal, i)
+        assert parseJournalRef(config['section']) is not None
+        assert not os.path.isabs(parseJournalRef(config['section'])[0])
+    _checkCheckpoints(journal, 3)
+    _checkCheckpoints(AutosaveJournal.readCheckpoints(autosaveDir), 3)
+
+    reopened = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    _checkCheckpoints(reopened, 3)
+    _append(reopened, 3)
+    _checkCheckpoints(AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir), 4)
+
+    prevJournalPath = reopened.journalPath
+    reopened.rotate()
+    assert not os.path.exists(prevJournalPath)
+    assert AutosaveJournal.readCheckpoints(autosaveDir) == []
+
+
+def test_recoverFromInterruptedWrite(unpackedDir, autosaveDir):
+    """
+    Simulate the process dying at every point while appending a record: before, during, and after the journal
+    write, and before the index is updated.
+    """
+    journal = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    for i in range(2):
+        _append(journal, i)
+    indexPath = AutosaveJournal.getIndexPath(autosaveDir)
+    with open(indexPath, 'rb') as f:
+        indexBefore = f.read()
+    lengthBefore = os.path.getsize(journal.journalPath)
+    _append(journal, 2)
+    with open(journal.journalPath, 'rb') as f:
+        fullJournal = f.read()
+
+    for length in range(lengthBefore, len(fullJournal) + 1):
+        with open(journal.journalPath, 'wb') as f:
+            f.write(fullJournal[:length])
+        with open(indexPath, 'wb') as f:
+            f.write(indexBefore)
+
+        isComplete = length == len(fullJournal)
+        _checkCheckpoints(AutosaveJournal.readCheckpoints(autosaveDir), 3 if isComplete else 2)
+        reopened = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+        _checkCheckpoints(reopened, 3 if isComplete else 2)
+
+        # torn record should be discarded on next append
+        if not isComplete:
+            _append(reopened, 2)
+        _append(reopened, 3)
+        _checkCheckpoints(AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir), 4)
+
+
+def test_recoverFromCorruptedRecord(unpackedDir, autosaveDir):
+    journal = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    _append(journal, 0)
+    indexPath = AutosaveJournal.getIndexPath(autosaveDir)
+    with open(indexPath, 'rb') as f:
+        indexBefore = f.read()
+    _append(journal, 1)
+    with open(indexPath, 'wb') as f:
+        f.write(indexBefore)
+    with open(journal.journalPath, 'r+b') as f:
+        f.seek(-5, os.SEEK_END)
+        f.write(b'xxxxx')  # complete length, but contents don't match checksum
+
+    _checkCheckpoints(AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir), 1)
+
+
+_killedWriterScript = textwrap.dedent('''
+    import os, sys, time
+    from datetime import datetime, timedelta
+    from NaviNIBS.util.AutosaveJournal import AutosaveJournalWriter
+
+    writer = AutosaveJournalWriter(autosaveDir=sys.argv[1], refRelTo=sys.argv[2], getBaseConfig=dict)
+    blob = os.urandom(200_000)
+    for i in range(100_000):
+        writer.submit(time=datetime(2024, 1, 1) + timedelta(seconds=i),
+                      sections=dict(section=('.bin', lambda i=i: i.to_bytes(8, 'little') + blob)),
+                      configUpdates=dict(i=i))
+        writer.waitUntilIdle()
+        if i == 0:
+            print('started', flush=True)
+''')
+
+
+@pytest.mark.parametrize('delay', [0.01, 0.05, 0.1, 0.2, 0.5])
+def test_writerKilledMidWrite(unpackedDir, autosaveDir, delay):
+    proc = subprocess.Popen([sys.executable, '-c', _killedWriterScript, autosaveDir, unpackedDir],
+                            stdout=subprocess.PIPE,
+                            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    try:
+        assert proc.stdout.readline().strip() == b'started'
+        time.sleep(delay)
+    finally:
+        proc.kill()  # SIGKILL on posix, so no cleanup runs in the writer
+        proc.wait()
+    proc.stdout.close()
+
+    checkpoints = AutosaveJournal.readCheckpoints(autosaveDir)
+    assert len(checkpoints) >= 1
+    for i, checkpoint in enumerate(checkpoints):
+        config = json.loads(readJournalRef(checkpoint.configRef))
+        assert config['i'] == i
+        data = readJournalRef(os.path.join(unpackedDir, config['section']))
+        assert int.from_bytes(data[:8], 'little') == i
+        assert len(data) == 200_008
+
+    # should be able to continue appending after recovery
+    journal = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    assert len(journal.checkpoints) == len(checkpoints)
+    journal.append(time=datetime(2025, 1, 1), sections=dict(), config=dict(i=len(checkpoints)))
+    assert len(AutosaveJournal.readCheckpoints(autosaveDir)) == len(checkpoints) + 1
+
+
+def test_writer(unpackedDir, autosaveDir):
+    writer = AutosaveJournalWriter(autosaveDir=autosaveDir, refRelTo=unpackedDir,
+                                   getBaseConfig=lambda: dict(base=True, removed=1))
+    writer.submit(time=datetime(2024, 1, 1), sections=dict(a=('.json', lambda: b'[1]')),
+                  configUpdates=dict(), configRemovals={'removed'})
+    writer.submit(time=datetime(2024, 1, 2), sections=dict(b=('.json', lambda: b'[2]')),
+                  configUpdates=dict())
+
+    def fail():
+        raise RuntimeError('Simulated encoding failure')
+
+    writer.submit(time=datetime(2024, 1, 3), sections=dict(c=('.json', fail)), configUpdates=dict(),
+                  dirtyKeys={'c'})
+    writer.waitUntilIdle()
+
+    assert writer.popFailedKeys() == {'c'}
+    assert writer.popFailedKeys() == set()
+
+    checkpoints = AutosaveJournal.readCheckpoints(autosaveDir)
+    assert len(checkpoints) == 2
+    config = json.loads(readJournalRef(checkpoints[-1].configRef))
+    assert set(config.keys()) == {'base', 'a', 'b'}
+    assert json.loads(readJournalRef(os.path.join(unpackedDir, config['a']))) == [1]
+    assert json.loads(readJournalRef(os.path.join(unpackedDir, config['b']))) == [2]
+
+    writer.rotate()
+    writer.waitUntilIdle()
+    assert AutosaveJournal.readCheckpoints(autosaveDir) == []
+
+
+def test_rotateWithoutCheckpointsDoesNothing(unpackedDir, autosaveDir):
+    journal = AutosaveJournal(autosaveDir=autosaveDir, refRelTo=unpackedDir)
+    journal.rotate()
+    assert not os.path.exists(autosaveDir)
+
+    _append(journal, 0)
+    journal.rotate()
+    journalPath = journal.journalPath
+    indexMTime = os.stat(AutosaveJournal.getIndexPath(autosaveDir)).st_mtime_ns
+    journal.rotate()  # already empty, so keeps the same journal file
+    assert journal.journalPath == journalPath and os.path.exists(journalPath)
+    assert os.stat(AutosaveJournal.getIndexPath(autosaveDir)).st_mtime_ns == indexMTime
+
+
+def test_writerCloseFinishesQueuedWork(unpackedDir, autosaveDir):
+    writer = AutosaveJournalWriter(autosaveDir=autosaveDir, refRelTo=unpackedDir, getBaseConfig=dict)
+
+    def slowEncode():
+        time.sleep(0.05)
+        return b'[]'
+
+    for i in range(5):
+        writer.submit(time=datetime(2024, 1, 1) + timedelta(seconds=i), sections=dict(a=('.json', slowEncode)),
+                      configUpdates=dict(i=i))
+    thread = writer._thread
+    writer.close()
+    assert not thread.is_alive()
+    assert len(AutosaveJournal.readCheckpoints(autosaveDir)) == 5
+    writer.close()  # no-op when already closed
+
+    # can still be used after closing
+    writer.submit(time=datetime(2024, 1, 2), sections=dict(), configUpdates=dict(i=5))
+    writer.close()
+    assert len(AutosaveJournal.readCheckpoints(autosaveDir)) == 6
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import pyvista as pv
+
+from NaviNIBS.util.pyvista.dataset import BatchClosestCellQuery, find_closest_cell, find_closest_cells
+
+
+def _makeHeadlikeSurf(resolution: int = 100) -> pv.PolyData:
+    """
+    Ellipsoid roughly the size of a scalp (in mm), with bumps so that the closest point is not trivially radial
+    """
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.04 * np.sin(5 * dirs[:, 0]) * np.cos(7 * dirs[:, 1]) + 0.02 * np.sin(11 * dirs[:, 2])
+    surf.points = pts * np.asarray([80., 95., 110.]) * bumps[:, np.newaxis]
+    return surf
+
+
+def _getPointsAroundSurf(surf: pv.PolyData, rng: np.random.Generator, N: int,
+                         minOffset: float, maxOffset: float) -> np.ndarray:
+    iPts = rng.integers(surf.n_points, size=N)
+    return surf.points[iPts] + rng.uniform(minOffset, maxOffset, size=(N, 1)) * surf.point_normals[iPts]
+
+
+def _assertMatchesVTK(surf: pv.DataSet, points: np.ndarray, cellIDs: np.ndarray, closestPts: np.ndarray,
+                      dists: np.ndarray):
+    expectedCellIDs, expectedPts = find_closest_cell(surf, point=points, return_closest_point=True)
+    expectedDists = np.linalg.norm(expectedPts - points, axis=1)
+    # compare distances rather than cell IDs, since multiple cells can share a closest point (e.g. at a vertex)
+    assert dists == pytest.approx(expectedDists, abs=1e-6)
+    assert np.linalg.norm(closestPts - points, axis=1) == pytest.approx(dists, abs=1e-9)
+    isSameCell = cellIDs == expectedCellIDs
+    assert np.all(np.linalg.norm(closestPts[isSameCell] - expectedPts[isSameCell], axis=1) < 1e-6)
+    # closest point should be on the returned cell
+    for iPt in np.flatnonzero(~isSameCell)[:50]:
+        cell = surf.get_cell(cellIDs[iPt])
+        _, closestOnCell = find_closest_cell(cell.cast_to_unstructured_grid(), point=closestPts[iPt],
+                                             return_closest_point=True)
+        assert np.linalg.norm(closestOnCell - closestPts[iPt]) < 1e-6
+
+
+@pytest.mark.parametrize('minOffset,maxOffset', [(0., 0.), (-2., 2.), (5., 30.), (30., 80.), (-40., -10.)])
+def test_matchesVTK(minOffset: float, maxOffset: float):
+    surf = _makeHeadlikeSurf()
+    rng = np.random.default_rng(0)
+    points = _getPointsAroundSurf(surf, rng, 2000, minOffset, maxOffset)
+    query = BatchClosestCellQuery(surf)
+    _assertMatchesVTK(surf, points, *query.findClosestCells(points))
+
+
+def test_matchesVTKForUnevenMesh():
+    # large triangles among small ones should be split into several samples rather than loosening bounds for all
+    surf = pv.Plane(i_size=60., j_size=60., i_resolution=30, j_resolution=30).triangulate()
+    surf = surf.merge(pv.Triangle([[-100., -100., 5.], [100., -100., 5.], [0., 100., 5.]]))
+    surf.points[:, 2] += 3. * np.sin(surf.points[:, 0] / 5.) * (np.abs(surf.points[:, 2] - 5.) > 1e-6)
+    rng = np.random.default_rng(1)
+    points = rng.uniform([-80., -80., -10.], [80., 80., 15.], size=(2000, 3))
+    query = BatchClosestCellQuery(surf)
+    _assertMatchesVTK(surf, points, *query.findClosestCells(points))
+    assert query.numLocatorQueries < len(points)
+
+
+def test_matchesVTKAcrossChunks():
+    surf = _makeHeadlikeSurf()
+    rng = np.random.default_rng(2)
+    points = _getPointsAroundSurf(surf, rng, 3000, -3., 3.)
+    query = BatchClosestCellQuery(surf, chunkSize=256)
+    _assertMatchesVTK(surf, points, *query.findClosestCells(points))
+
+
+def test_nearPointsMostlyAvoidLocator():
+    surf = _makeHeadlikeSurf()
+    rng = np.random.default_rng(3)
+    points = _getPointsAroundSurf(surf, rng, 2000, 0., 0.)
+    query = BatchClosestCellQuery(surf)
+    query.findClosestCells(points)
+    assert query.numLocatorQueries < 0.5 * len(points)
+
+
+def test_nonTriangleSurfUsesLocator():
+    surf = pv.Cube(x_length=40., y_length=40., z_length=40.)  # quads
+    points = np.asarray([[25., 0., 0.], [0., 0., 17.], [24., 24., 0.]])
+    query = BatchClosestCellQuery(surf)
+    cellIDs, closestPts, dists = query.findClosestCells(points)
+    assert query.numLocatorQueries == len(points)
+    assert dists == pytest.approx([5., 3., np.sqrt(2) * 4])
+    _assertMatchesVTK(surf, points, cellIDs, closestPts, dists)
+
+
+def test_invalidInputs():
+    surf = _makeHeadlikeSurf(resolution=20)
+    points = np.asarray([[0., 0., 120.], [np.nan, 0., 0.], [0., np.inf, 0.]])
+    cellIDs, closestPts, dists = find_closest_cells(surf, points)
+    assert cellIDs[0] >= 0 and np.isfinite(dists[0])
+    assert np.all(cellIDs[1:] == -1)
+    assert np.isnan(closestPts[1:]).all() and np.isnan(dists[1:]).all()
+
+    cellIDs, closestPts, dists = find_closest_cells(surf, np.zeros((0, 3)))
+    assert cellIDs.shape == (0,) and closestPts.shape == (0, 3) and dists.shape == (0,)
+
+    cellIDs, closestPts, dists = find_closest_cells(pv.PolyData(), points)
+    assert np.all(cellIDs == -1) and np.isnan(dists).all()
+
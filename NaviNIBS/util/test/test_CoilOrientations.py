@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pyvista as pv
+
+from NaviNIBS.Navigator.Model.Calculations import calculateAngleFromMidlineFromCoilToMRITransf, \
+    calculateAnglesFromMidlineFromCoilToMRITransfs
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.SubjectRegistration import Fiducial
+from NaviNIBS.Navigator.Model.Targets import Target
+from NaviNIBS.util.CoilOrientations import PoseMetricCalculator, BatchPoseMetricCalculator, OnTargetErrorKernel
+from NaviNIBS.util.pyvista.dataset import find_closest_cell
+from NaviNIBS.util.Transforms import applyTransform, invertTransform
+
+
+def _randomCoilToMRITransfs(rng: np.random.Generator, N: int) -> np.ndarray:
+    """
+    Random coil poses roughly above an ellipsoidal head, with coil depth axis pointing generally outward
+    """
+    transfs = np.tile(np.eye(4), (N, 1, 1))
+    for i in range(N):
+        q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        if np.linalg.det(q) < 0:
+            q[:, 0] *= -1
+        transfs[i, :3, :3] = q
+    pos = rng.normal(size=(N, 3))
+    pos[:, 2] = np.abs(pos[:, 2])
+    pos /= np.linalg.norm(pos, axis=1, keepdims=True)
+    transfs[:, :3, 3] = pos * 100
+    return transfs
+
+
+def _makeSession(tmp_path, rng: np.random.Generator, numSamples: int, numTargets: int) -> Session:
+    session = Session.createNew(filepath=str(tmp_path / 'session.navinibs'),
+                                unpackedSessionDir=str(tmp_path / 'unpacked'))
+
+    skinSurf = pv.ParametricEllipsoid(75, 90, 80, u_res=40, v_res=40, w_res=40).triangulate()
+    gmSurf = pv.ParametricEllipsoid(60, 75, 65, u_res=40, v_res=40, w_res=40).triangulate()
+    skinSurf.save(str(tmp_path / 'skin.stl'))
+    gmSurf.save(str(tmp_path / 'gm.stl'))
+    session.headModel.skinSurfFilepath = str(tmp_path / 'skin.stl')
+    session.headModel.gmSurfFilepath = str(tmp_path / 'gm.stl')
+
+    fiducials = session.subjectRegistration.fiducials
+    fiducials['NAS'] = Fiducial(key='NAS', plannedCoord=np.asarray([0., 90., 0.]))
+    fiducials['LPA'] = Fiducial(key='LPA', plannedCoord=np.asarray([-75., 0., -10.]))
+    fiducials['RPA'] = Fiducial(key='RPA', plannedCoord=np.asarray([75., 0., -10.]))
+
+    targetTransfs = _randomCoilToMRITransfs(rng, numTargets)
+    for iTarget in range(numTargets):
+        target = Target(key=f'Target {iTarget}')
+        target.coilToMRITransf = targetTransfs[iTarget]
+        session.targets.addItem(target)
+
+    sampleTransfs = targetTransfs[rng.integers(numTargets, size=numSamples)] @ _randomPerturbations(rng, numSamples)
+    for iSample in range(numSamples):
+        session.samples.addItem(Sample(key=f'Sample {iSample}',
+                                       coilToMRITransf=None if iSample % 10 == 9 else sampleTransfs[iSample],
+                                       targetKey=None if iSample % 7 == 6 else f'Target {iSample % numTargets}',
+                                       timestamp=pd.Timestamp.now()))
+    return session
+
+
+def _randomPerturbations(rng: np.random.Generator, N: int) -> np.ndarray:
+    from scipy.spatial.transform import Rotation
+    perturbs = np.tile(np.eye(4), (N, 1, 1))
+    perturbs[:, :3, :3] = Rotation.from_rotvec(rng.normal(scale=0.2, size=(N, 3))).as_matrix()
+    perturbs[:, :3, 3] = rng.normal(scale=5, size=(N, 3))
+    return perturbs
+
+
+def test_batchMatchesScalar(tmp_path):
+    rng = np.random.default_rng(0)
+    session = _makeSession(tmp_path, rng, numSamples=50, numTargets=5)
+    samples = list(session.samples.values())
+
+    batchCalculator = BatchPoseMetricCalculator(session=session)
+    batchResults = batchCalculator.calculateForSamples(samples)
+
+    scalarCalculator = PoseMetricCalculator(session=session, sample=None)
+    assert set(batchResults.keys()) == {metric.label for metric in scalarCalculator.supportedMetrics}
+    for iSample, sample in enumerate(samples):
+        scalarCalculator.sample = sample
+        for metric in scalarCalculator.supportedMetrics:
+            scalarVal = metric.getter()
+            batchVal = batchResults[metric.label][iSample]
+            if scalarVal is None or np.isnan(scalarVal):
+                assert np.isnan(batchVal), f'{metric.label} for {sample.key}'
+            else:
+                assert batchVal == pytest.approx(scalarVal, abs=1e-6), f'{metric.label} for {sample.key}'
+
+
+def test_batchSubsetOfMetrics(tmp_path):
+    rng = np.random.default_rng(1)
+    session = _makeSession(tmp_path, rng, numSamples=10, numTargets=2)
+    samples = list(session.samples.values())
+
+    batchCalculator = BatchPoseMetricCalculator(session=session)
+    allResults = batchCalculator.calculateForSamples(samples)
+    labels = ['Horiz angle error', 'Target error in brain']
+    results = batchCalculator.calculateForSamples(samples, labels=labels)
+    assert list(results.keys()) == labels
+    for label in labels:
+        assert np.array_equal(results[label], allResults[label], equal_nan=True)
+
+    with pytest.raises(KeyError):
+        batchCalculator.calculateForSamples(samples, labels=['Not a metric'])
+
+
+def test_onTargetErrorKernelMatchesScalar(tmp_path):
+    rng = np.random.default_rng(3)
+    session = _makeSession(tmp_path, rng, numSamples=30, numTargets=1)
+    target = session.targets['Target 0']
+    samples = [sample for sample in session.samples.values() if sample.coilToMRITransf is not None]
+    coilToMRITransfs = np.stack([sample.coilToMRITransf for sample in samples])
+
+    kernel = OnTargetErrorKernel()
+    assert np.isnan(kernel.calculate(coilToMRITransfs[0])).all()
+    kernel.setTarget(target.coilToMRITransf)
+    errors = kernel.calculate(coilToMRITransfs).copy()  # grows buffers from initial capacity
+    assert errors.shape == (len(samples), len(OnTargetErrorKernel.errorLabels))
+
+    scalarCalculator = PoseMetricCalculator(session=session, sample=None)
+    for iSample, sample in enumerate(samples):
+        scalarCalculator.sample = Sample(key='Pose', coilToMRITransf=sample.coilToMRITransf, targetKey=target.key,
+                                         timestamp=sample.timestamp)
+        for iLabel, label in enumerate(OnTargetErrorKernel.errorLabels):
+            assert errors[iSample, iLabel] == pytest.approx(scalarCalculator.getValueForMetric(label), abs=1e-6), \
+                f'{label} for {sample.key}'
+        assert np.array_equal(kernel.calculate(sample.coilToMRITransf)[0], errors[iSample])
+
+
+def test_movingSampleSurfDistsMatchGlobal(tmp_path):
+    rng = np.random.default_rng(4)
+    session = _makeSession(tmp_path, rng, numSamples=1, numTargets=1)
+    target = session.targets['Target 0']
+    sample = Sample(key='CurrentPose', coilToMRITransf=target.coilToMRITransf, targetKey=target.key,
+                    timestamp=pd.Timestamp.now())
+    calculator = PoseMetricCalculator(session=session, sample=sample)
+
+    # coil sliding along its own X axis, as for a current pose updated at tracker rate
+    for offset in np.linspace(-20., 20., 200):
+        step = np.eye(4)
+        step[0, 3] = offset
+        sample.coilToMRITransf = target.coilToMRITransf @ step
+        for surfKey, getter in (('skinSurf', calculator.getSampleCoilToScalpDist),
+                                ('gmSurf', calculator.getSampleCoilToCortexDist)):
+            surf = getattr(session.headModel, surfKey)
+            _, closestPt = find_closest_cell(surf, point=sample.coilToMRITransf[:3, 3], return_closest_point=True)
+            assert calculator.getClosestPointToCoilOnSurf(surfKey) == pytest.approx(closestPt, abs=1e-6)
+            closestPt_coilSpace = applyTransform(invertTransform(sample.coilToMRITransf), closestPt)
+            assert getter() == pytest.approx(-closestPt_coilSpace[2], abs=1e-6)
+
+
+def test_distanceFieldsMatchExact(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))  # keep built distance fields out of user cache
+    rng = np.random.default_rng(5)
+    session = _makeSession(tmp_path, rng, numSamples=50, numTargets=5)
+    samples = list(session.samples.values())
+    labels = ['Coil to scalp dist', 'Coil to cortex dist']
+
+    exactResults = BatchPoseMetricCalculator(session=session).calculateForSamples(samples, labels=labels)
+    fieldCalculator = BatchPoseMetricCalculator(session=session, useDistanceFields=True)
+    fieldResults = fieldCalculator.calculateForSamples(samples, labels=labels)
+    for label in labels:
+        assert np.array_equal(np.isnan(fieldResults[label]), np.isnan(exactResults[label]))
+        assert fieldResults[label] == pytest.approx(exactResults[label], abs=0.5, nan_ok=True), label
+
+    field = session.headModel.getDistanceField('skinSurf')
+    assert field is session.headModel.getDistanceField('skinSurf')
+    assert field.surf is session.headModel.skinSurf
+
+    scalarCalculator = PoseMetricCalculator(session=session, sample=None, useDistanceFields=True)
+    for iSample, sample in enumerate(samples):
+        scalarCalculator.sample = sample
+        for label in labels:
+            scalarVal = scalarCalculator.getValueForMetric(label)
+            assert scalarVal == pytest.approx(fieldResults[label][iSample], abs=1e-6, nan_ok=True)
+
+    # changing surface should invalidate field
+    session.headModel.clearCache('skinSurf')
+    newField = session.headModel.getDistanceField('skinSurf')
+    assert newField is not field
+    assert newField.wasLoadedFromCache
+
+
+def test_anglesFromMidlineMatchScalar(tmp_path):
+    rng = np.random.default_rng(2)
+    session = _makeSession(tmp_path, rng, numSamples=0, numTargets=0)
+    transfs = _randomCoilToMRITransfs(rng, 200)
+    transfs[3] = np.nan
+
+    batchAngles = calculateAnglesFromMidlineFromCoilToMRITransfs(session, transfs)
+    assert batchAngles.shape == (200,)
+    assert np.isnan(batchAngles[3])
+    for i in range(200):
+        if i == 3:
+            continue
+        assert batchAngles[i] == pytest.approx(calculateAngleFromMidlineFromCoilToMRITransf(session, transfs[i]),
+                                               abs=1e-6)
+
+    session.subjectRegistration.fiducials.deleteItem('NAS')
+    assert np.isnan(calculateAnglesFromMidlineFromCoilToMRITransfs(session, transfs)).all()
+
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import pyvista as pv
+
+from NaviNIBS.util.pyvista.dataset import find_closest_cell
+from NaviNIBS.util.pyvista.IncrementalClosestPointQuery import IncrementalClosestPointQuery
+
+
+def _makeHeadlikeSurf(resolution: int = 100) -> pv.PolyData:
+    """
+    Ellipsoid roughly the size of a scalp (in mm), with bumps so that the closest point is not trivially radial
+    """
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.04 * np.sin(5 * dirs[:, 0]) * np.cos(7 * dirs[:, 1]) + 0.02 * np.sin(11 * dirs[:, 2])
+    surf.points = pts * np.asarray([80., 95., 110.]) * bumps[:, np.newaxis]
+    return surf
+
+
+def _makeFoldedSurf() -> pv.PolyData:
+    """
+    Sheet folded back over itself (like adjacent gyri), so that the closest cell can jump between folds without the
+    adjacent cells on the surface getting closer
+    """
+    plane = pv.Plane(i_size=60., j_size=60., i_resolution=60, j_resolution=60).triangulate()
+    pts = plane.points.copy()
+    pts[:, 2] = 8. * np.sin(pts[:, 0] / 4.)
+    plane.points = pts
+    return plane
+
+
+def _getTrajectory(numPoses: int, center: np.ndarray, radius: float, rate: float = 60.) -> np.ndarray:
+    """
+    Coil positions hovering over and sliding across the surface, sampled at tracker rate
+    """
+    t = np.arange(numPoses) / rate
+    theta = 0.3 * t + 0.2 * np.sin(1.3 * t)
+    phi = 0.8 + 0.3 * np.sin(0.5 * t)
+    r = radius + 5. * np.sin(0.7 * t)
+    return center + r[:, np.newaxis] * np.stack([np.sin(phi) * np.cos(theta),
+                                                 np.sin(phi) * np.sin(theta),
+                                                 np.cos(phi)], axis=1)
+
+
+def _assertMatchesGlobal(surf: pv.PolyData, query: IncrementalClosestPointQuery, point: np.ndarray):
+    cell, closestPt = query.findClosestPoint(point)
+    expectedCell, expectedPt = find_closest_cell(surf, point=point, return_closest_point=True)
+    # compare distances rather than cell IDs, since multiple cells can share a closest point (e.g. at a vertex)
+    assert np.linalg.norm(closestPt - point) == pytest.approx(np.linalg.norm(expectedPt - point), abs=1e-6)
+    # closest point returned should be on the returned cell
+    cellPts = surf.get_cell(cell).points
+    assert np.min(np.linalg.norm(cellPts - closestPt, axis=1)) <= np.max(np.linalg.norm(cellPts - cellPts[0], axis=1))
+    assert np.linalg.norm(closestPt - expectedPt) < 1e-4 or \
+        abs(np.linalg.norm(closestPt - point) - np.linalg.norm(expectedPt - point)) < 1e-6
+
+
+def test_matchesGlobalOnTrajectory():
+    surf = _makeHeadlikeSurf()
+    query = IncrementalClosestPointQuery(surf)
+    for point in _getTrajectory(600, center=np.zeros(3), radius=130.):
+        _assertMatchesGlobal(surf, query, point)
+
+    assert query.numQueries == 600
+    # nearly all queries should be answered locally
+    assert query.numFallbacks < 0.05 * query.numQueries
+
+
+def test_matchesGlobalOnFoldedSurf():
+    surf = _makeFoldedSurf()
+    query = IncrementalClosestPointQuery(surf)
+    # sweep sideways across folds, at heights where the closest fold changes abruptly
+    for z in (-2., 2., 12.):
+        for x in np.linspace(-25., 25., 300):
+            _assertMatchesGlobal(surf, query, np.asarray([x, 3., z]))
+
+
+def test_matchesGlobalAfterJumps():
+    surf = _makeHeadlikeSurf(resolution=40)
+    query = IncrementalClosestPointQuery(surf)
+    rng = np.random.default_rng(0)
+    for point in rng.normal(scale=100., size=(100, 3)):
+        _assertMatchesGlobal(surf, query, point)
+    # points inside the surface
+    for point in rng.normal(scale=20., size=(50, 3)):
+        _assertMatchesGlobal(surf, query, point)
+
+    numFallbacks = query.numFallbacks
+    query.reset()
+    _assertMatchesGlobal(surf, query, np.asarray([0., 0., 150.]))
+    assert query.numFallbacks == numFallbacks + 1
+
+
+def test_nonTriangleSurfUsesGlobalLocator():
+    surf = pv.Plane(i_resolution=5, j_resolution=5)  # quads
+    query = IncrementalClosestPointQuery(surf)
+    for point in ([0.1, 0.2, 1.], [0.15, 0.2, 1.]):
+        _assertMatchesGlobal(surf, query, np.asarray(point))
+
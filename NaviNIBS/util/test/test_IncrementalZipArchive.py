@@ -0,0 +1,164 @@
+import os
+import shutil
+import struct
+import zipfile
+
+import pytest
+
+from NaviNIBS.util.IncrementalZipArchive import IncrementalZipArchiveWriter
+
+
+def _writeFile(path, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def _readArchive(archivePath) -> dict[str, bytes]:
+    with zipfile.ZipFile(archivePath) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if not name.endswith('/')}
+
+
+@pytest.fixture
+def rootDir(tmp_path):
+    rootDir = str(tmp_path / 'unpacked')
+    _writeFile(os.path.join(rootDir, 'SessionConfig.json'), b'{"a": 1}')
+    _writeFile(os.path.join(rootDir, 'big.bin'), os.urandom(100_000))
+    _writeFile(os.path.join(rootDir, 'autosaved', 'x.json'), b'[]')
+    return rootDir
+
+
+@pytest.fixture
+def writer(tmp_path, rootDir):
+    return IncrementalZipArchiveWriter(archivePath=str(tmp_path / 'session.navinibs'), rootDir=rootDir,
+                                       doCompactInBackground=False)
+
+
+def _expectedContents(rootDir) -> dict[str, bytes]:
+    contents = {}
+    for dirpath, _, filenames in os.walk(rootDir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                contents[os.path.relpath(path, rootDir).replace(os.sep, '/')] = f.read()
+    return contents
+
+
+def test_incrementalSave(writer, rootDir):
+    assert writer.save().mode == 'full'
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+    assert writer.save().mode == 'unchanged'
+
+    _writeFile(os.path.join(rootDir, 'SessionConfig.json'), b'{"a": 2}')
+    _writeFile(os.path.join(rootDir, 'autosaved', 'y.json'), b'[1]')
+    stats = writer.save()
+    assert stats.mode == 'append'
+    assert stats.numMembersWritten == 2
+    assert stats.numBytesWritten < 10_000  # did not rewrite big.bin
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+    # extracting the archive gives the latest version of each member
+    extractDir = os.path.join(os.path.dirname(rootDir), 'extracted')
+    shutil.unpack_archive(writer.archivePath, extractDir, 'zip')
+    assert _expectedContents(extractDir) == _expectedContents(rootDir)
+
+    os.remove(os.path.join(rootDir, 'autosaved', 'x.json'))
+    assert writer.save().mode == 'full'
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+
+def test_duplicateMembersResolvedByPlainZipfile(writer, rootDir):
+    writer.save()
+    _writeFile(os.path.join(rootDir, 'SessionConfig.json'), b'{"a": 2}')
+    assert writer.save().mode == 'append'
+
+    # appended archive has shadowed duplicates; zipfile (as used by shutil.unpack_archive) resolves to the latest
+    with zipfile.ZipFile(writer.archivePath) as zf:
+        names = [info.filename for info in zf.infolist()]
+        assert names.count('SessionConfig.json') == 2
+        assert zf.read('SessionConfig.json') == b'{"a": 2}'
+        assert zf.getinfo('SessionConfig.json') is zf.infolist()[-1]
+
+    # readers that take the first entry would see stale content until the archive is closed
+    writer.close()
+    with zipfile.ZipFile(writer.archivePath) as zf:
+        names = [info.filename for info in zf.infolist()]
+        assert len(names) == len(set(names))
+        assert zf.read('SessionConfig.json') == b'{"a": 2}'
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+    writer.close()  # no-op if nothing to compact
+    assert writer.getWastedBytes() == 0
+
+
+def test_closeWaitsForBackgroundCompaction(writer, rootDir):
+    writer._doCompactInBackground = True
+    writer._compactWhenWastedBytes = 0
+    writer._compactWhenWastedFraction = 0
+    writer.save()
+    _writeFile(os.path.join(rootDir, 'big.bin'), os.urandom(100_000))
+    writer.save()
+    assert not writer._compactionThread.daemon
+    writer.close()
+    assert not writer._compactionThread.is_alive()
+    assert writer.getWastedBytes() == 0
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+
+def test_primeFromArchive(writer, rootDir, tmp_path):
+    writer.save()
+    extractDir = str(tmp_path / 'extracted')
+    shutil.unpack_archive(writer.archivePath, extractDir, 'zip')
+    writer2 = IncrementalZipArchiveWriter(archivePath=writer.archivePath, rootDir=extractDir)
+    writer2.primeFromArchive()
+    assert writer2.save().mode == 'unchanged'
+
+
+def test_compaction(writer, rootDir):
+    writer.save()
+    origSize = os.path.getsize(writer.archivePath)
+    # rewrite the large file repeatedly so shadowed copies accumulate past the compaction threshold
+    for i in range(3):
+        _writeFile(os.path.join(rootDir, 'big.bin'), os.urandom(100_000))
+        writer._compactWhenWastedBytes = 150_000
+        writer.save()
+    assert writer.getWastedBytes() < 150_000
+    assert os.path.getsize(writer.archivePath) < 2.5 * origSize
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+
+def test_backgroundCompaction(writer, rootDir):
+    writer._doCompactInBackground = True
+    writer._compactWhenWastedBytes = 0
+    writer._compactWhenWastedFraction = 0
+    writer.save()
+    _writeFile(os.path.join(rootDir, 'big.bin'), os.urandom(100_000))
+    writer.save()
+    writer.waitForCompaction()
+    assert writer.getWastedBytes() == 0
+    assert _readArchive(writer.archivePath) == _expectedContents(rootDir)
+
+
+def test_recoverInterruptedAppend(writer, rootDir):
+    writer.save()
+    before = _readArchive(writer.archivePath)
+
+    # simulate a crash partway through an append: journal written, central directory overwritten
+    with zipfile.ZipFile(writer.archivePath) as zf:
+        startDir = zf.start_dir
+    with open(writer.archivePath, 'rb') as f:
+        f.seek(startDir)
+        tail = f.read()
+    with open(writer.journalPath, 'wb') as f:
+        f.write(struct.pack('<Q', startDir) + tail)
+    with open(writer.archivePath, 'r+b') as f:
+        f.seek(startDir)
+        f.write(b'PK\x03\x04 partial garbage' * 100)
+        f.truncate()
+    assert not zipfile.is_zipfile(writer.archivePath)
+
+    assert IncrementalZipArchiveWriter.recoverInterruptedAppend(writer.archivePath)
+    assert not os.path.exists(writer.journalPath)
+    assert _readArchive(writer.archivePath) == before
+    assert not IncrementalZipArchiveWriter.recoverInterruptedAppend(writer.archivePath)
@@ -0,0 +1,159 @@
+import json
+import math
+import time
+import types
+
+import numpy as np
+import pytest
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.util import LatencyTracing as LatencyTracingModule
+from NaviNIBS.util.LatencyTracing import LatencyHistogram, LatencyTracer, getLatencyTracer, stageServerPublish, \
+    stageClientReceive, stageCoordinatorUpdate, stageRedraw
+
+
+@pytest.fixture
+def sharedTracer():
+    tracer = getLatencyTracer()
+    tracer.reset()
+    tracer.isEnabled = True
+    yield tracer
+    tracer.isEnabled = False
+    tracer.reset()
+
+
+def test_histogramPercentiles():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=np.log(5e-3), sigma=1., size=10000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)
+    assert histogram.mean == pytest.approx(values.mean())
+    assert histogram.min == values.min()
+    assert histogram.max == values.max()
+    for p in (1, 50, 90, 99, 99.9):
+        # bins are 20 per decade, so geometric bin centers are within ~6% of any value in the bin
+        assert histogram.percentile(p) == pytest.approx(np.percentile(values, p, method='inverted_cdf'), rel=0.06)
+    assert histogram.percentile(0) == values.min()
+    assert histogram.percentile(100) == values.max()
+
+    # out of range values go to under/overflow bins
+    histogram.reset()
+    assert math.isnan(histogram.percentile(50))
+    histogram.record(0.)
+    histogram.record(1000.)
+    assert histogram.counts[0] == histogram.counts[-1] == 1
+    assert histogram.percentile(50) == 0.
+    assert histogram.percentile(100) == 1000.
+
+
+def test_tracerStages():
+    tracer = LatencyTracer(isEnabled=True)
+    tracer.markStage(stageRedraw, now=1.)  # no trace started yet
+    assert tracer.stageKeys == []
+
+    tracer.startTrace(100., stageTimes=[(stageServerPublish, 100.001)], now=100.003)
+    tracer.markStage(stageCoordinatorUpdate, now=100.004)
+    tracer.markStage(stageRedraw, key='viewA', now=100.010)
+    tracer.markStage(stageRedraw, key='viewA', now=100.020)  # only first redraw of each view per trace
+    tracer.markStage(stageRedraw, key='viewB', now=100.012)
+    # same sample again (e.g. in a keyframe) does not start a new trace
+    tracer.startTrace(100., now=100.030)
+
+    assert tracer.numTraces == 1
+    assert tracer.stageKeys == [stageServerPublish, stageClientReceive, stageCoordinatorUpdate, stageRedraw]
+    assert tracer[stageClientReceive].latency.count == 1
+    assert tracer[stageRedraw].latency.count == 2
+    assert tracer[stageClientReceive].latency.max == pytest.approx(0.003)
+    assert tracer[stageClientReceive].duration.max == pytest.approx(0.002)
+    assert tracer[stageRedraw].latency.max == pytest.approx(0.012)
+    # each view's redraw duration is measured from the coordinator update
+    assert tracer[stageRedraw].duration.min == pytest.approx(0.006)
+    assert tracer[stageRedraw].duration.max == pytest.approx(0.008)
+
+    # stale traces are not extended
+    tracer.markStage(stageRedraw, key='viewC', now=102.)
+    assert tracer[stageRedraw].latency.count == 2
+
+    stats = tracer.getStats(percentiles=(50, 99))
+    assert stats[stageRedraw]['latency']['count'] == 2
+    assert set(stats[stageRedraw]['duration'].keys()) == {'count', 'mean', 'min', 'max', 'p50', 'p99'}
+
+
+def test_disabledTracerRecordsNothing():
+    tracer = LatencyTracer()
+    tracer.startTrace(time.time(), now=time.time())
+    tracer.markStage(stageRedraw)
+    assert tracer.numTraces == 0
+    assert tracer.stageKeys == []
+
+
+def test_dumpToFile(tmp_path):
+    tracer = LatencyTracer(isEnabled=True)
+    for i in range(10):
+        t = 100. + i
+        tracer.startTrace(t, now=t + 0.002)
+        tracer.markStage(stageRedraw, now=t + 0.01)
+
+    filepath = tmp_path / 'latency.json'
+    tracer.dumpToFile(filepath)
+    with open(filepath) as f:
+        d = json.load(f)
+    assert d['numTraces'] == 10
+    assert d['stats'][stageRedraw]['latency']['p50'] == pytest.approx(0.01, rel=0.07)
+    histogram = d['histograms'][stageRedraw]['latency']
+    assert sum(histogram['counts']) == 10
+    assert len(histogram['counts']) == len(histogram['binEdges']) + 1
+
+
+def test_clientAndRedrawInstrumentation(sharedTracer):
+    client = SimulatedToolPositionsClient()
+    t = time.time()
+    client.recordNewPosition_sync('Coil', TimestampedToolPosition(time=t - 0.005, transf=np.eye(4)))
+    sharedTracer.markStage(stageRedraw, key='view')
+
+    assert sharedTracer.numTraces == 1
+    latency = sharedTracer[stageClientReceive].latency
+    assert latency.count == 1
+    assert 0.005 <= latency.max < 0.5
+    assert sharedTracer[stageRedraw].latency.min >= latency.max
+
+    # untracked tools don't start traces
+    client.recordNewPosition_sync('Coil', TimestampedToolPosition(time=t, transf=None))
+    assert sharedTracer.numTraces == 1
+
+
+def test_instrumentationSkipsClockWhenNotNeeded(monkeypatch):
+    """
+    Instrumentation runs on every tracking update and every redraw, so should return early (without even reading
+    the clock) when disabled or when a stage was already marked for the current trace.
+    See scripts/benchmarks/benchmarkLatencyTracing.py for timing.
+    """
+    numClockReads = 0
+
+    def countingTime() -> float:
+        nonlocal numClockReads
+        numClockReads += 1
+        return t
+
+    monkeypatch.setattr(LatencyTracingModule, 'time', types.SimpleNamespace(time=countingTime))
+
+    t = 100.
+    tracer = LatencyTracer(isEnabled=False)
+    tracer.startTrace(t, stageTimes=((stageServerPublish, t),), now=t)
+    for _ in range(10):
+        tracer.markStage(stageRedraw)
+    assert numClockReads == 0
+    assert tracer.numTraces == 0
+
+    tracer.isEnabled = True
+    tracer.startTrace(t, stageTimes=((stageServerPublish, t),), now=t)
+    assert numClockReads == 0
+    tracer.markStage(stageCoordinatorUpdate)
+    for _ in range(10):
+        tracer.markStage(stageRedraw, key='viewA')
+    assert numClockReads == 2
+    assert tracer[stageRedraw].latency.count == 1
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from NaviNIBS.util.OrderedIndex import OrderedIndex
+
+
+def test_mappingBehavior():
+    d = OrderedIndex(dict(a=1, b=2, c=3))
+    assert list(d) == ['a', 'b', 'c']
+    assert list(d.values()) == [1, 2, 3]
+    assert list(d.items()) == [('a', 1), ('b', 2), ('c', 3)]
+    assert d == dict(a=1, b=2, c=3)
+    assert d.get('z') is None
+
+    d['b'] = 20
+    d['d'] = 4
+    assert list(d.items()) == [('a', 1), ('b', 20), ('c', 3), ('d', 4)]
+
+    del d['a']
+    assert list(d.items()) == [('b', 20), ('c', 3), ('d', 4)]
+    assert 'a' not in d
+    assert len(d) == 3
+    with pytest.raises(KeyError):
+        del d['a']
+
+
+def test_renameKeyPreservesOrder():
+    d = OrderedIndex(dict(a=1, b=2, c=3))
+    d.renameKey('b', 'z')
+    assert list(d.items()) == [('a', 1), ('z', 2), ('c', 3)]
+    with pytest.raises(KeyError):
+        d.renameKey('a', 'c')
+    with pytest.raises(KeyError):
+        d.renameKey('b', 'y')
+
+
+def test_positions():
+    d = OrderedIndex((str(i), i) for i in range(100))
+    for i in range(0, 100, 2):
+        del d[str(i)]
+    assert d.positionOf('1') == 0
+    assert d.positionOf('99') == 49
+    assert d.keyAtPosition(1) == '3'
+    assert list(d.values()) == list(range(1, 100, 2))
+
+
+def test_positionsMatchListUnderRandomEdits():
+    rng = random.Random(0)
+    d = OrderedIndex()
+    ref = []
+    nextKey = 0
+    for iOp in range(5000):
+        op = rng.random()
+        if op < 0.4 or not ref:
+            d[nextKey] = nextKey
+            ref.append(nextKey)
+            nextKey += 1
+        elif op < 0.7:
+            key = ref.pop(rng.randrange(len(ref)))
+            del d[key]
+        else:
+            iKey = rng.randrange(len(ref))
+            d.renameKey(ref[iKey], nextKey)
+            ref[iKey] = nextKey
+            nextKey += 1
+        if ref:
+            iPos = rng.randrange(len(ref))
+            assert d.positionOf(ref[iPos]) == iPos
+            assert d.keyAtPosition(iPos) == ref[iPos]
+            assert d.keyAtPosition(-1) == ref[-1]
+    assert list(d) == ref
+    with pytest.raises(IndexError):
+        d.keyAtPosition(len(ref))
+
+
+def test_positionLookupsDoNotCompact(monkeypatch):
+    numCompactions = 0
+    origCompact = OrderedIndex._compact
+
+    def countingCompact(self):
+        nonlocal numCompactions
+        numCompactions += 1
+        origCompact(self)
+
+    monkeypatch.setattr(OrderedIndex, '_compact', countingCompact)
+
+    numItems = 10_000
+    d = OrderedIndex((i, i) for i in range(numItems))
+    # alternate deletes and lookups, as when deleting samples while a table reads rows
+    for i in range(0, numItems // 2, 2):
+        del d[i]
+        assert d.positionOf(i + 1) == i // 2
+        assert d.keyAtPosition(0) == 1
+    assert numCompactions == 0
+
+    # renames never move or rebuild entries
+    slotKeys = d._slotKeys
+    for key in range(1, 1001, 2):
+        d.renameKey(key, -key)
+    assert d._slotKeys is slotKeys and numCompactions == 0
+    assert d.keyAtPosition(0) == -1
+
+    # compaction only once more than half of the slots are tombstones
+    for i in range(numItems // 2, numItems):
+        del d[i]
+    assert numCompactions == 1
+    assert d.positionOf(-999) == 499
@@ -0,0 +1,77 @@
+import pytest
+
+from NaviNIBS.util.Signaler import Signal
+
+
+def test_emitPriorityOrder():
+    sig: Signal[int] = Signal()
+    calls = []
+    sig.connect(lambda x: calls.append(('low', x)), priority=-1)
+    sig.connect(lambda x: calls.append(('high', x)), priority=10)
+    sig.connect(lambda x: calls.append(('mid', x)))
+    sig.emit(1)
+    assert calls == [('high', 1), ('mid', 1), ('low', 1)]
+
+
+def test_dispatchInvalidatedOnConnectDisconnect():
+    sig: Signal[int] = Signal()
+    calls = []
+
+    def fnA(x):
+        calls.append(('a', x))
+
+    def fnB(x):
+        calls.append(('b', x))
+
+    sig.connect(fnA)
+    sig.emit(1)
+    sig.connect(fnB, priority=1)
+    sig.emit(2)
+    sig.disconnect(fnA)
+    sig.emit(3)
+    assert calls == [('a', 1), ('b', 2), ('a', 2), ('b', 3)]
+
+    with pytest.raises(ValueError):
+        sig.disconnect(fnA)
+
+
+def test_disconnectDuringEmit():
+    sig: Signal[()] = Signal()
+    calls = []
+
+    def fnB():
+        calls.append('b')
+
+    def fnA():
+        calls.append('a')
+        if 'a' not in calls[:-1]:
+            sig.disconnect(fnB)
+
+    sig.connect(fnA, priority=1)
+    sig.connect(fnB)
+    sig.emit()
+    sig.emit()
+    assert calls == ['a', 'a']
+
+
+def test_blockedConnectedDisconnected():
+    sig: Signal[()] = Signal()
+    calls = []
+
+    def fn():
+        calls.append(1)
+
+    with sig.connected(fn):
+        sig.emit()
+        with sig.blocked():
+            sig.emit()
+        sig.emit()
+    sig.emit()
+    assert len(calls) == 2
+
+    sig.connect(fn, priority=5)
+    with sig.disconnected(fn):
+        sig.emit()
+    sig.emit()
+    assert len(calls) == 3
+    assert sig.disconnect(fn) == 5
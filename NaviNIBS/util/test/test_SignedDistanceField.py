@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+import pyvista as pv
+
+from NaviNIBS.util.pyvista.SignedDistanceField import SignedDistanceField
+
+
+def _makeBumpySurf(radius: float = 30., resolution: int = 60) -> pv.PolyData:
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.05 * np.sin(3 * dirs[:, 0]) * np.cos(4 * dirs[:, 1]) + 0.03 * np.sin(5 * dirs[:, 2])
+    surf.points = pts * radius * bumps[:, np.newaxis]
+    return surf
+
+
+def _randomPointsNearSurf(rng: np.random.Generator, N: int, minRadius: float, maxRadius: float) -> np.ndarray:
+    dirs = rng.normal(size=(N, 3))
+    dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+    return dirs * rng.uniform(minRadius, maxRadius, size=(N, 1))
+
+
+def test_accuracyImprovesWithResolution():
+    surf = _makeBumpySurf()
+    rng = np.random.default_rng(0)
+    pts = _randomPointsNearSurf(rng, 2000, 25., 40.)
+
+    maxErrors = []
+    for resolution in (6., 3., 1.5):
+        field = SignedDistanceField(surf, resolution=resolution, maxOutsideDist=10., maxInsideDist=3., cacheDir=None)
+        isWithinBand = field.isWithinBand(pts)
+        assert isWithinBand.mean() > 0.5
+        dists = field.getSignedDistances(pts[isWithinBand])
+        exactDists = field.getSignedDistances(pts[isWithinBand], exact=True)
+        maxErrors.append(np.abs(dists - exactDists).max())
+
+    assert maxErrors[0] > maxErrors[1] > maxErrors[2]
+    # interpolation error scales with square of resolution (node values themselves are exact)
+    assert maxErrors[1] < 0.25
+    assert maxErrors[2] < 0.1
+
+
+def test_signs():
+    surf = _makeBumpySurf()
+    field = SignedDistanceField(surf, resolution=2., maxOutsideDist=10., maxInsideDist=5., cacheDir=None)
+
+    # step along normals from surface vertices
+    normals = surf.point_normals
+    for offset in (-3., -0.5, 0.5, 3., 8.):
+        pts = surf.points[::7] + offset * normals[::7]
+        dists = field.getSignedDistances(pts)
+        assert np.all(np.sign(dists) == np.sign(offset))
+        assert dists == pytest.approx(field.getSignedDistances(pts, exact=True), abs=0.15)
+
+    assert field.getSignedDistances(surf.points[::7]) == pytest.approx(0., abs=0.15)
+
+
+def test_gradientsAndClosestPoints():
+    surf = _makeBumpySurf()
+    field = SignedDistanceField(surf, resolution=2., maxOutsideDist=15., maxInsideDist=2., cacheDir=None)
+    rng = np.random.default_rng(1)
+    pts = _randomPointsNearSurf(rng, 500, 33., 40.)
+    assert field.isWithinBand(pts).all()
+
+    gradients = field.getGradients(pts)
+    assert np.linalg.norm(gradients, axis=1) == pytest.approx(1., abs=0.05)
+    exactGradients = field.getGradients(pts, exact=True)
+    assert np.linalg.norm(exactGradients, axis=1) == pytest.approx(1.)
+    cosAngles = np.einsum('ij,ij->i', gradients, exactGradients) / np.linalg.norm(gradients, axis=1)
+    assert np.all(cosAngles > np.cos(np.deg2rad(5.)))
+
+    dists, closestPts = field.getSignedDistancesAndClosestPoints(pts)
+    exactDists, exactClosestPts = field.getSignedDistancesAndClosestPoints(pts, exact=True)
+    assert dists == pytest.approx(exactDists, abs=0.1)
+    assert np.linalg.norm(closestPts - exactClosestPts, axis=1).max() < 0.5
+    assert field.getClosestPoint(pts[0]) == pytest.approx(closestPts[0])
+
+
+def test_exactOutsideBand():
+    surf = _makeBumpySurf()
+    field = SignedDistanceField(surf, resolution=2., maxOutsideDist=5., maxInsideDist=2., cacheDir=None)
+    pts = np.asarray([[0., 0., 0.], [100., 0., 0.], [0., -60., 20.]])
+    assert not field.isWithinBand(pts).any()
+    assert field.getSignedDistances(pts) == pytest.approx(field.getSignedDistances(pts, exact=True))
+    assert field.getSignedDistance(pts[0]) < -20
+    assert field.getSignedDistance(pts[1]) > 60
+    assert field.getClosestPoints(pts) == pytest.approx(field.getClosestPoints(pts, exact=True))
+
+
+def test_nonTriangleSurf():
+    surf = pv.Cube(x_length=40., y_length=40., z_length=40.)
+    assert not surf.is_all_triangles
+    field = SignedDistanceField(surf, resolution=2., maxOutsideDist=10., maxInsideDist=5., cacheDir=None)
+    assert field.surf is surf
+    pts = np.asarray([[25., 0., 0.], [0., 0., 17.], [24., 24., 0.]])
+    assert field.getSignedDistances(pts) == pytest.approx([5., -3., np.sqrt(2) * 4], abs=1e-4)
+
+
+def test_diskCache(tmp_path):
+    surf = _makeBumpySurf()
+    kwargs = dict(resolution=3., maxOutsideDist=10., maxInsideDist=3., cacheDir=str(tmp_path))
+    field = SignedDistanceField(surf, **kwargs)
+    assert not field.wasLoadedFromCache
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+
+    rng = np.random.default_rng(2)
+    pts = _randomPointsNearSurf(rng, 100, 25., 40.)
+    cachedField = SignedDistanceField(surf.copy(), **kwargs)
+    assert cachedField.wasLoadedFromCache
+    assert cachedField.hash == field.hash
+    assert np.array_equal(cachedField.getSignedDistances(pts), field.getSignedDistances(pts))
+
+    # different parameters or mesh should not reuse cached field
+    assert not SignedDistanceField(surf, **(kwargs | dict(resolution=4.))).wasLoadedFromCache
+    movedSurf = surf.translate((1., 0., 0.), inplace=False)
+    assert not SignedDistanceField(movedSurf, **kwargs).wasLoadedFromCache
+    assert len(list(tmp_path.glob('*.npz'))) == 3
+
+    # corrupt cache file should be rebuilt rather than raising
+    cachePath = next(tmp_path.glob(f'{field.hash}.npz'))
+    cachePath.write_bytes(b'not a valid npz file')
+    rebuiltField = SignedDistanceField(surf, **kwargs)
+    assert not rebuiltField.wasLoadedFromCache
+    assert np.array_equal(rebuiltField.getSignedDistances(pts), field.getSignedDistances(pts))
+
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+import pytransform3d.rotations as ptr
+
+from NaviNIBS.util.numpy import array_equalish
+from NaviNIBS.util.TransformGraph import TransformGraph
+from NaviNIBS.util.Transforms import concatenateTransforms, invertTransform
+
+
+def _randomTransf(rng: np.random.Generator) -> np.ndarray:
+    transf = np.eye(4)
+    transf[:3, :3] = ptr.random_matrix(rng)
+    transf[:3, 3] = rng.normal(scale=100, size=3)
+    return transf
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def graph(rng):
+    """
+    Two tools on trackers in world space, with subject tracker registered to MRI
+    """
+    graph = TransformGraph()
+    graph.setTransform('coil', 'coilTracker', _randomTransf(rng))
+    graph.setTransform('pointer', 'pointerTracker', _randomTransf(rng))
+    graph.setTransform('coilTracker', 'world', _randomTransf(rng))
+    graph.setTransform('pointerTracker', 'world', _randomTransf(rng))
+    graph.setTransform('subjectTracker', 'world', _randomTransf(rng))
+    graph.setTransform('subjectTracker', 'MRI', _randomTransf(rng))
+    return graph
+
+
+def _expectedCoilToMRI(graph: TransformGraph) -> np.ndarray:
+    return concatenateTransforms([
+        graph.getTransform('coil', 'coilTracker'),
+        graph.getTransform('coilTracker', 'world'),
+        invertTransform(graph.getTransform('subjectTracker', 'world')),
+        graph.getTransform('subjectTracker', 'MRI'),
+    ])
+
+
+def test_composition(graph):
+    assert array_equalish(graph.getTransform('coil', 'MRI'), _expectedCoilToMRI(graph))
+    assert array_equalish(graph.getTransform('MRI', 'coil'), invertTransform(_expectedCoilToMRI(graph)))
+    assert array_equalish(graph.getTransform('coil', 'coil'), np.eye(4))
+    assert graph.getTransform('coil', 'notAFrame') is None
+    assert graph.getTransform('notAFrame', 'notAFrame') is None
+
+
+def test_cachedUntilUpstreamChange(graph, rng):
+    coilToMRI = graph.getTransform('coil', 'MRI')
+    pointerToMRI = graph.getTransform('pointer', 'MRI')
+    numCompositions = graph.numCompositions
+
+    # repeated queries are served from cache
+    assert graph.getTransform('coil', 'MRI') is coilToMRI
+    assert graph.numCompositions == numCompositions
+
+    # moving an unrelated tool does not invalidate
+    graph.setTransform('pointerTracker', 'world', _randomTransf(rng))
+    assert graph.getTransform('coil', 'MRI') is coilToMRI
+    assert graph.numCompositions == numCompositions
+    assert graph.getTransform('pointer', 'MRI') is not pointerToMRI
+    assert graph.numCompositions == numCompositions + 1
+
+    # setting an equal value (e.g. an unchanged tracker re-reported) does not invalidate
+    graph.setTransform('coilTracker', 'world', graph.getTransform('coilTracker', 'world').copy())
+    assert graph.getTransform('coil', 'MRI') is coilToMRI
+
+    # each upstream edge invalidates, including when traversed in reverse
+    for fromFrame, toFrame in (('coil', 'coilTracker'), ('coilTracker', 'world'), ('subjectTracker', 'world'),
+                               ('subjectTracker', 'MRI')):
+        graph.setTransform(fromFrame, toFrame, _randomTransf(rng))
+        newCoilToMRI = graph.getTransform('coil', 'MRI')
+        assert newCoilToMRI is not coilToMRI
+        assert array_equalish(newCoilToMRI, _expectedCoilToMRI(graph))
+        coilToMRI = newCoilToMRI
+
+
+def test_versions(graph, rng):
+    version = graph.getVersion('coil', 'MRI')
+    graph.setTransform('pointerTracker', 'world', _randomTransf(rng))
+    assert graph.getVersion('coil', 'MRI') == version
+    graph.setTransform('coilTracker', 'world', _randomTransf(rng))
+    newVersion = graph.getVersion('coil', 'MRI')
+    assert newVersion != version
+    graph.removeTransform('pointerTracker', 'world')
+    assert graph.getVersion('coil', 'MRI') != newVersion
+
+
+def test_topologyChanges(graph, rng):
+    coilToMRI = graph.getTransform('coil', 'MRI')
+
+    # losing a tracker disconnects
+    coilTrackerToWorld = graph.getTransform('coilTracker', 'world')
+    graph.setTransform('coilTracker', 'world', None)
+    assert not graph.hasTransform('coilTracker', 'world')
+    assert graph.getTransform('coil', 'MRI') is None
+    assert 'coilTracker' in graph.frames
+
+    # regaining it reconnects
+    graph.setTransform('coilTracker', 'world', coilTrackerToWorld)
+    assert array_equalish(graph.getTransform('coil', 'MRI'), coilToMRI)
+
+    # removing last edge of a frame removes the frame
+    graph.removeTransform('pointer', 'pointerTracker')
+    assert 'pointer' not in graph.frames
+    assert graph.getTransform('pointer', 'MRI') is None
+
+    # a shorter path takes precedence once added
+    coilToMRI_direct = _randomTransf(rng)
+    graph.setTransform('coil', 'MRI', coilToMRI_direct)
+    assert array_equalish(graph.getTransform('coil', 'MRI'), coilToMRI_direct)
+    graph.removeTransform('coil', 'MRI')
+    assert array_equalish(graph.getTransform('coil', 'MRI'), coilToMRI)
+
+
+def test_invalidEdges(graph, rng):
+    with pytest.raises(ValueError):
+        graph.setTransform('world', 'coilTracker', _randomTransf(rng))
+    with pytest.raises(ValueError):
+        graph.setTransform('coil', 'coil', _randomTransf(rng))
+
+
+def test_sigTransformChanged(graph, rng):
+    changes = []
+    graph.sigTransformChanged.connect(lambda fromFrame, toFrame: changes.append((fromFrame, toFrame)))
+    graph.setTransform('coilTracker', 'world', graph.getTransform('coilTracker', 'world'))
+    assert changes == []
+    graph.setTransform('coilTracker', 'world', _randomTransf(rng))
+    graph.removeTransform('pointer', 'pointerTracker')
+    graph.removeTransform('pointer', 'pointerTracker')
+    assert changes == [('coilTracker', 'world'), ('pointer', 'pointerTracker')]
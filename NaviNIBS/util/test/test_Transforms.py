@@ -5,6 +5,8 @@ import pytransform3d.transformations as ptt
 
 from NaviNIBS.util.numpy import array_equalish
 from NaviNIBS.util.Transforms import transformToString, stringToTransform, composeTransform, invertTransform, applyTransform, estimateAligningTransform
+from NaviNIBS.util.Transforms import invertTransforms, concatenateTransforms, concatenateTransformStacks, applyTransforms, \
+    applyDirectionTransform
 
 
 @pytest.fixture
@@ -75,6 +77,74 @@ def test_invertTransform(transf):
     assert array_equalish(transf, invertTransform(invertTransform(transf)))
 
 
+def test_invertTransform_nonRigid(transf):
+    scaled = transf.copy()
+    scaled[:3, :3] *= 2
+    assert array_equalish(np.linalg.pinv(scaled), invertTransform(scaled))
+
+    sheared = transf.copy()
+    sheared[0, 1] += 0.1
+    assert array_equalish(np.linalg.pinv(sheared), invertTransform(sheared))
+
+    projective = transf.copy()
+    projective[3, 0] = 0.01
+    assert array_equalish(np.linalg.pinv(projective), invertTransform(projective))
+
+
+@pytest.fixture
+def transfStack(transf1, transf2):
+    rng = np.random.default_rng(0)
+    transfs = np.tile(np.eye(4), (100, 1, 1))
+    transfs[:, :3, :3] = np.stack([ptr.random_matrix(rng) for _ in range(100)])
+    transfs[:, :3, 3] = rng.normal(scale=100, size=(100, 3))
+    transfs[0] = transf1
+    transfs[1] = transf2
+    transfs[2, :3, :3] *= 1.5  # non-rigid
+    return transfs
+
+
+def test_invertTransforms(transfStack):
+    inverted = invertTransforms(transfStack)
+    assert inverted.shape == transfStack.shape
+    for i in range(transfStack.shape[0]):
+        assert array_equalish(np.linalg.pinv(transfStack[i]), inverted[i])
+
+    transfStack[5, 0, 0] = np.nan
+    inverted = invertTransforms(transfStack)
+    assert np.isnan(inverted[5]).all()
+    assert np.isfinite(np.delete(inverted, 5, axis=0)).all()
+
+    with pytest.raises(ValueError):
+        invertTransforms(transfStack[0])
+
+
+def test_concatenateTransformStacks(transfStack, transf1):
+    otherStack = invertTransforms(transfStack[::-1])
+    combined = concatenateTransformStacks([transfStack, transf1, otherStack])
+    assert combined.shape == transfStack.shape
+    for i in range(transfStack.shape[0]):
+        assert array_equalish(concatenateTransforms([transfStack[i], transf1, otherStack[i]]), combined[i])
+
+
+def test_applyTransforms(transfStack, pts3):
+    pts = np.random.default_rng(1).normal(size=(transfStack.shape[0], 3))
+    transfPts = applyTransforms(transfStack, pts)
+    for i in range(transfStack.shape[0]):
+        assert array_equalish(applyTransform(transfStack[i], pts[i], doCheck=False), transfPts[i])
+
+    transfPts = applyTransforms(transfStack, pts[0])
+    assert transfPts.shape == pts.shape
+    for i in range(transfStack.shape[0]):
+        assert array_equalish(applyTransform(transfStack[i], pts[0], doCheck=False), transfPts[i])
+
+
+def test_applyTransform_noCheck(transf1, transf2, pts):
+    assert array_equalish(applyTransform([transf1, transf2], pts, doCheck=True),
+                          applyTransform([transf1, transf2], pts, doCheck=False))
+    assert array_equalish(applyDirectionTransform(transf1, pts, doCheck=True),
+                          applyDirectionTransform(transf1, pts, doCheck=False))
+
+
 def test_composeTransform(transf):
     assert array_equalish(transf, composeTransform(transf[:3, :3], transf[:3, 3]))
     tmp = transf.copy()
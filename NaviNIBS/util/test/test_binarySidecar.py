@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from NaviNIBS.util.binarySidecar import dumpSidecar, loadSidecar, latestSidecarVersion
+
+
+def _roundTrip(obj, tmp_path, **kwargs):
+    path = str(tmp_path / 'part.npz')
+    dumpSidecar(obj, path, **kwargs)
+    return loadSidecar(path)
+
+
+def test_roundTripMatchesJSON(tmp_path):
+    rng = np.random.default_rng(0)
+    obj = dict(
+        name='test',
+        emptyList=[],
+        emptyDict={},
+        smallList=[1, 2, 3],
+        bools=[True, False, True],
+        strings=['a', 'b'],
+        transf=rng.normal(size=(4, 4)).tolist(),
+        headPoints=rng.normal(size=(100, 3)).tolist(),
+        history=[dict(time=f'{i:06d}', transf=None if i % 3 == 0 else rng.normal(size=(4, 4)).tolist())
+                 for i in range(50)],
+        records=[dict(key=f'Sample {i}', coilToMRITransf=rng.normal(size=(4, 4)).tolist(),
+                      **(dict(targetKey='T1') if i % 2 else {}),
+                      **(dict(metadata=dict(a=i, b=[i, i + 1])) if i % 5 == 0 else {}))
+                 for i in range(100)],
+        nestedHistory=[dict(time=str(i), fiducials=[dict(key=key, plannedCoord=rng.normal(size=3).tolist())
+                                                    for key in ('LPA', 'NAS', 'RPA')[:1 + i % 3]])
+                       for i in range(30)],
+        ragged=[list(range(i)) for i in range(40)],
+        ints=list(range(1000)),
+        mixedNone=[None, 'a', 1.5, [1, None]],
+    )
+    expected = json.loads(json.dumps(obj))
+    assert _roundTrip(obj, tmp_path) == expected
+
+
+def test_reservedKeysEscaped(tmp_path):
+    obj = [{'$array': 'a0', 'x': list(range(100))}, {'$records': 1}]
+    assert _roundTrip(obj, tmp_path) == obj
+
+
+def test_exactFloats(tmp_path):
+    values = np.random.default_rng(1).normal(size=(1000, 4, 4))
+    result = _roundTrip(values.tolist(), tmp_path)
+    assert np.array_equal(np.asarray(result), values)
+
+
+def test_ndarrayInput(tmp_path):
+    arr = np.arange(64, dtype='>f8').reshape(16, 4)
+    assert _roundTrip(dict(arr=arr), tmp_path) == dict(arr=arr.tolist())
+
+
+def test_numericDataStoredAsArrays(tmp_path):
+    samples = [dict(key=f'Sample {i}', coilToMRITransf=np.eye(4).tolist()) for i in range(1000)]
+    path = str(tmp_path / 'part.npz')
+    dumpSidecar(samples, path)
+    with np.load(path) as npz:
+        shapes = [npz[name].shape for name in npz.files if name != 'header']
+    assert shapes == [(1000, 4, 4)]
+
+
+def test_rejectsNewerVersion(tmp_path):
+    path = str(tmp_path / 'part.npz')
+    header = json.dumps(dict(format='NaviNIBSBinarySidecar', version=latestSidecarVersion + 1, body=[])).encode()
+    with open(path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(header, dtype=np.uint8))
+    with pytest.raises(ValueError):
+        loadSidecar(path)
@@ -0,0 +1,125 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from NaviNIBS.util import json as navinibsJSON
+from NaviNIBS.util.json import JSONSerializer
+from NaviNIBS.util.numpy import numpyFieldsAsArrays
+from NaviNIBS.Navigator.Model.Targets import Target
+
+
+def _makeObj():
+    rng = np.random.default_rng(0)
+    return dict(
+        name='test, with "quotes" and ünicode',
+        emptyList=[],
+        emptyDict={},
+        nested=dict(a=dict(b=[1, 2, dict(c=None)])),
+        bools=[True, False],
+        mixed=[None, 'a,b', 1.5, [1, None], 2],
+        ints=list(range(100)),
+        transf=rng.normal(size=(4, 4)).tolist(),
+        history=[dict(time=str(i), transf=None if i % 3 == 0 else rng.normal(size=(4, 4)).tolist())
+                 for i in range(10)],
+        bigInt=2 ** 62,
+        tinyFloat=5e-324,
+    )
+
+
+def _canonical(obj):
+    # NaN != NaN, so compare via stdlib encoding
+    return json.dumps(obj, sort_keys=True)
+
+
+requiresOrjson = pytest.mark.skipif(navinibsJSON.orjson is None,
+                                    reason='orjson not installed (install with the "fast" extra)')
+
+serializerKwargs = [
+    pytest.param(dict(useOrjson=False), id='compact'),
+    pytest.param(dict(pretty=True, useOrjson=False), id='pretty'),
+    pytest.param(dict(pretty=True, indentSize=4, useOrjson=False), id='pretty-indent4'),
+    pytest.param(dict(useOrjson=True), id='compact-orjson', marks=requiresOrjson),
+    pytest.param(dict(pretty=True, useOrjson=True), id='pretty-orjson', marks=requiresOrjson),
+]
+
+
+@pytest.mark.parametrize('kwargs', serializerKwargs)
+def test_matchesStdlib(kwargs: dict):
+    serializer = JSONSerializer(**kwargs)
+    obj = _makeObj()
+    expected = _canonical(obj)
+    assert _canonical(json.loads(serializer.dumps(obj))) == expected
+    assert _canonical(JSONSerializer.loads(serializer.dumps(obj))) == expected
+    assert _canonical(JSONSerializer.loads(serializer.dumpsBytes(obj))) == expected
+
+
+@pytest.mark.parametrize('kwargs', serializerKwargs)
+def test_nonFinite(kwargs: dict):
+    serializer = JSONSerializer(**kwargs)
+    obj = dict(a=[1.0, float('nan')], b=dict(c=[[float('inf'), None]]), d=np.asarray([-np.inf, 1.0]), e=None)
+    loaded = JSONSerializer.loads(serializer.dumps(obj))
+    assert math.isnan(loaded['a'][1])
+    assert loaded['b']['c'][0] == [float('inf'), None]
+    assert loaded['d'] == [-float('inf'), 1.0]
+    assert loaded['e'] is None
+
+
+@pytest.mark.parametrize('kwargs', serializerKwargs)
+def test_numpy(kwargs: dict):
+    serializer = JSONSerializer(**kwargs)
+    rng = np.random.default_rng(0)
+    arrays = dict(
+        float64=rng.normal(size=(4, 4)),
+        float32=rng.normal(size=(10, 3)).astype(np.float32),
+        ints=np.arange(10, dtype=np.int32),
+        nonContiguous=rng.normal(size=(4, 4))[:, ::2],
+        bools=np.asarray([True, False]),
+        empty=np.zeros((0, 3)),
+        scalarArray=np.asarray(1.5),
+        listOfArrays=[np.eye(4), None, np.zeros(3)],
+        npScalars=[np.float64(1.5), np.int64(3), np.float32(0.25)],
+    )
+    expected = json.loads(json.dumps(arrays, default=lambda o: o.tolist()))
+    loaded = JSONSerializer.loads(serializer.dumps(arrays))
+    # float32 values may be written with fewer digits, but should be exact at float32 precision
+    assert np.array_equal(np.asarray(loaded.pop('float32'), dtype=np.float32), arrays['float32'])
+    expected.pop('float32')
+    assert loaded == expected
+
+
+def test_prettyLayout():
+    out = JSONSerializer(pretty=True).dumps(dict(a=[[1, 2], [3, 4]], b=['x', 'y'], c=dict(d=np.eye(2))))
+    assert out == '\n'.join([
+        '{',
+        '  "a": [',
+        '    [1, 2],',
+        '    [3, 4]',
+        '  ],',
+        '  "b": ["x", "y"],',
+        '  "c": {',
+        '    "d": [',
+        '      [1.0, 0.0],',
+        '      [0.0, 1.0]',
+        '    ]',
+        '  }',
+        '}'])
+
+
+@requiresOrjson
+def test_defaultUsesOrjsonWhenInstalled():
+    assert JSONSerializer().useOrjson
+    assert isinstance(JSONSerializer().dumpsBytes(dict(a=1)), bytes)
+
+
+def test_numpyFieldsAsArrays():
+    target = Target(key='T', targetCoord=np.asarray([1., 2., 3.]), coilToMRITransf=np.eye(4))
+    d = target.asDict()
+    assert isinstance(d['coilToMRITransf'], list)
+    with numpyFieldsAsArrays():
+        dArrays = target.asDict()
+    assert isinstance(dArrays['coilToMRITransf'], np.ndarray)
+    assert isinstance(target.asDict()['coilToMRITransf'], list)
+    for serializer in (JSONSerializer(), JSONSerializer(pretty=True)):
+        assert JSONSerializer.loads(serializer.dumps(dArrays)) == json.loads(json.dumps(d))
@@ -0,0 +1,96 @@
+"""
+Benchmark of batch closest cell queries with `BatchClosestCellQuery`, compared to looping over points with
+`find_closest_cell`, for batches of query points at several distances from the surface: on the surface (e.g. ROI
+vertices or points mapped from another surface), just off the surface (e.g. grid points), and at coil distances
+(e.g. batch pose metrics).
+
+By default, uses synthetic scalp and cortex surfaces (bumpy ellipsoids). Alternatively, query an existing surface mesh.
+The loop over points is only timed for up to `numLoopPoints` points, since it is slow for large batches.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkClosestCellBatch.py
+    poetry run python scripts/benchmarks/benchmarkClosestCellBatch.py --numPoints 1000 10000 100000 1000000
+    poetry run python scripts/benchmarks/benchmarkClosestCellBatch.py --surfPath skin.stl
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pyvista as pv
+
+from NaviNIBS.util.pyvista.dataset import BatchClosestCellQuery, find_closest_cell
+
+
+def _makeSurf(radii: tuple[float, float, float], resolution: int) -> pv.PolyData:
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.04 * np.sin(5 * dirs[:, 0]) * np.cos(7 * dirs[:, 1]) + 0.02 * np.sin(11 * dirs[:, 2])
+    surf.points = pts * np.asarray(radii) * bumps[:, np.newaxis]
+    return surf
+
+
+def _getQueryPoints(surf: pv.PolyData, numPoints: int, offsets: tuple[float, float],
+                    rng: np.random.Generator) -> np.ndarray:
+    # offset random surface points along normals
+    iPts = rng.integers(surf.n_points, size=numPoints)
+    return surf.points[iPts] + rng.uniform(*offsets, size=(numPoints, 1)) * surf.point_normals[iPts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numPoints', type=int, nargs='+', default=[1000, 10_000, 100_000],
+                        help='Numbers of points per batch query')
+    parser.add_argument('--numLoopPoints', type=int, default=10_000,
+                        help='Max number of points to time for loop over points')
+    parser.add_argument('--resolution', type=int, default=200, help='Resolution of synthetic surfaces')
+    parser.add_argument('--surfPath', type=str, default=None, help='Mesh to query instead of synthetic surfaces')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.surfPath is not None:
+        surfs = {os.path.basename(args.surfPath): pv.read(args.surfPath).extract_surface().triangulate()}
+    else:
+        surfs = {'scalp': _makeSurf((80., 95., 110.), args.resolution),
+                 'cortex': _makeSurf((65., 80., 90.), args.resolution)}
+
+    workloads = {'on surface': (0., 0.), 'near (+/-2 mm)': (-2., 2.), 'coil (5-30 mm)': (5., 30.)}
+
+    rng = np.random.default_rng(0)
+    print(f'{"surface":>10} {"cells":>8} {"build (s)":>10} {"points":>16} {"N":>8} {"batch (us)":>11} '
+          f'{"loop (us)":>10} {"speedup":>8} {"locator":>8} {"max diff (mm)":>14}')
+    for surfKey, surf in surfs.items():
+        find_closest_cell(surf, point=surf.points[0])  # build locator before timing
+        t0 = time.perf_counter()
+        query = BatchClosestCellQuery(surf)
+        buildDur = time.perf_counter() - t0
+        for workloadKey, offsets in workloads.items():
+            for numPoints in args.numPoints:
+                pts = _getQueryPoints(surf, numPoints, offsets, rng)
+                numLocatorQueriesBefore = query.numLocatorQueries
+                t0 = time.perf_counter()
+                _, closestPts, _ = query.findClosestCells(pts)
+                batchDur = (time.perf_counter() - t0) / numPoints
+                locatorFraction = (query.numLocatorQueries - numLocatorQueriesBefore) / numPoints
+
+                loopPts = pts[:args.numLoopPoints]
+                t0 = time.perf_counter()
+                _, loopClosestPts = find_closest_cell(surf, point=loopPts, return_closest_point=True)
+                loopDur = (time.perf_counter() - t0) / len(loopPts)
+                maxDiff = np.abs(np.linalg.norm(closestPts[:len(loopPts)] - loopPts, axis=1)
+                                 - np.linalg.norm(loopClosestPts - loopPts, axis=1)).max()
+
+                print(f'{surfKey:>10} {surf.n_cells:>8} {buildDur:>10.2f} {workloadKey:>16} {numPoints:>8} '
+                      f'{batchDur * 1e6:>11.2f} {loopDur * 1e6:>10.2f} {loopDur / batchDur:>7.2f}x '
+                      f'{locatorFraction * 100:>7.1f}% {maxDiff:>14.1e}')
+
+
+if __name__ == '__main__':
+    main()
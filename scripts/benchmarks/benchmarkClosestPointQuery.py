@@ -0,0 +1,130 @@
+"""
+Benchmark of closest point queries for a replayed coil trajectory, comparing the warm-started
+`IncrementalClosestPointQuery` against a search from scratch with `find_closest_cell` for every pose (as was done
+previously for sample coil to scalp/cortex distances).
+
+By default, a synthetic trajectory (coil hovering above and sliding across an ellipsoidal head, sampled at tracker
+rate) is written to a tool positions recording and replayed from it, with queries against synthetic scalp and cortex
+surfaces. Alternatively, replay an existing recording and/or query an existing surface mesh. Positions from a
+recording are used as-is, so should be in the same space as the mesh (e.g. a recording of a tool already registered
+to MRI space).
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkClosestPointQuery.py
+    poetry run python scripts/benchmarks/benchmarkClosestPointQuery.py --resolution 400 --numPoses 10000
+    poetry run python scripts/benchmarks/benchmarkClosestPointQuery.py --surfPath skin.stl --recording session.nntr --toolKey Coil
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pyvista as pv
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsRecording import ToolPositionsRecorder, ToolPositionsRecording, RecordedPositions
+from NaviNIBS.util.pyvista.dataset import find_closest_cell
+from NaviNIBS.util.pyvista.IncrementalClosestPointQuery import IncrementalClosestPointQuery
+
+
+def _makeSurf(radii: tuple[float, float, float], resolution: int) -> pv.PolyData:
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.04 * np.sin(5 * dirs[:, 0]) * np.cos(7 * dirs[:, 1]) + 0.02 * np.sin(11 * dirs[:, 2])
+    surf.points = pts * np.asarray(radii) * bumps[:, np.newaxis]
+    return surf
+
+
+def _writeSyntheticRecording(filepath: str, numPoses: int, trackerRate: float, toolKey: str):
+    t = np.arange(numPoses) / trackerRate
+    theta = 0.3 * t + 0.2 * np.sin(1.3 * t)
+    phi = 0.8 + 0.3 * np.sin(0.5 * t)
+    r = 120. + 5. * np.sin(0.7 * t)
+    pts = r[:, np.newaxis] * np.stack([np.sin(phi) * np.cos(theta),
+                                       np.sin(phi) * np.sin(theta),
+                                       np.cos(phi)], axis=1)
+    recorder = ToolPositionsRecorder(filepath=filepath)
+    with recorder:
+        for iPose in range(numPoses):
+            transf = np.eye(4)
+            transf[:3, 3] = pts[iPose]
+            recorder.recordPositions({toolKey: TimestampedToolPosition(time=t[iPose], transf=transf)},
+                                     receiveTime=t[iPose])
+
+
+def _loadTrajectory(filepath: str, toolKey: str) -> np.ndarray:
+    recording = ToolPositionsRecording.load(filepath)
+    pts = []
+    for record in recording.records:
+        if not isinstance(record, RecordedPositions):
+            continue
+        position = record.positions.get(toolKey, None)
+        if position is None or position.transf is None:
+            continue
+        pts.append(position.transf[:3, 3])
+    if len(pts) == 0:
+        raise ValueError(f'No positions for {toolKey} in {filepath}')
+    return np.asarray(pts)
+
+
+def _timeQueries(surf: pv.PolyData, pts: np.ndarray) -> tuple[float, float, float]:
+    def runGlobal():
+        for pt in pts:
+            find_closest_cell(surf, point=pt, return_closest_point=True)
+
+    query = IncrementalClosestPointQuery(surf)
+
+    def runIncremental():
+        query.reset()
+        for pt in pts:
+            query.findClosestPoint(pt)
+
+    runGlobal()  # build locator before timing
+    tGlobal = min(timeit.repeat(runGlobal, number=1, repeat=3)) / len(pts)
+    tIncremental = min(timeit.repeat(runIncremental, number=1, repeat=3)) / len(pts)
+    return tGlobal, tIncremental, query.numFallbacks / query.numQueries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numPoses', type=int, default=3000)
+    parser.add_argument('--trackerRate', type=float, default=60., help='Tracker update rate, in Hz')
+    parser.add_argument('--resolution', type=int, default=200, help='Resolution of synthetic surfaces')
+    parser.add_argument('--surfPath', type=str, default=None, help='Mesh to query instead of synthetic surfaces')
+    parser.add_argument('--recording', type=str, default=None, help='Recording to replay instead of synthetic trajectory')
+    parser.add_argument('--toolKey', type=str, default='Coil')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.surfPath is not None:
+        surfs = {os.path.basename(args.surfPath): pv.read(args.surfPath)}
+    else:
+        surfs = {'scalp': _makeSurf((80., 95., 110.), args.resolution),
+                 'cortex': _makeSurf((65., 80., 90.), args.resolution)}
+
+    if args.recording is not None:
+        pts = _loadTrajectory(args.recording, args.toolKey)
+    else:
+        with tempfile.TemporaryDirectory() as tempDir:
+            recordingPath = os.path.join(tempDir, 'trajectory.nntr')
+            _writeSyntheticRecording(recordingPath, args.numPoses, args.trackerRate, args.toolKey)
+            pts = _loadTrajectory(recordingPath, args.toolKey)
+
+    print(f'{len(pts)} poses, budget at {args.trackerRate:g} Hz: {1e6 / args.trackerRate:.0f} us per pose')
+    print(f'{"surface":>16} {"cells":>8} {"global (us)":>12} {"incremental (us)":>17} {"speedup":>8} {"fallbacks":>10}')
+    for surfKey, surf in surfs.items():
+        tGlobal, tIncremental, fallbackFraction = _timeQueries(surf, pts)
+        print(f'{surfKey:>16} {surf.n_cells:>8} {tGlobal * 1e6:>12.1f} {tIncremental * 1e6:>17.1f} '
+              f'{tGlobal / tIncremental:>7.2f}x {fallbackFraction * 100:>9.1f}%')
+
+
+if __name__ == '__main__':
+    main()
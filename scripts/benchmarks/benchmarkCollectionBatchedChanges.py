@@ -0,0 +1,60 @@
+"""
+Count collection-level signal handler invocations (and wall time) when toggling visibility on many samples,
+with and without ``GenericCollection.batchedChanges``.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkCollectionBatchedChanges.py
+    poetry run python scripts/benchmarks/benchmarkCollectionBatchedChanges.py --numSamples 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import time
+
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample, getSampleTimestampNow
+
+
+def _makeSamples(numSamples: int) -> Samples:
+    timestamp = getSampleTimestampNow()
+    return Samples(items={f'Sample {i}': Sample(key=f'Sample {i}', timestamp=timestamp) for i in range(numSamples)})
+
+
+def _run(samples: Samples, batched: bool) -> tuple[int, float]:
+    counts = dict(n=0)
+
+    def onSignal(keys, attribKeys):
+        counts['n'] += 1
+
+    samples.sigItemsAboutToChange.connect(onSignal)
+    samples.sigItemsChanged.connect(onSignal)
+    try:
+        newVal = not next(iter(samples.values())).isVisible
+        t0 = time.perf_counter()
+        with samples.batchedChanges() if batched else contextlib.nullcontext():
+            for sample in samples.values():
+                sample.isVisible = newVal
+        dt = time.perf_counter() - t0
+    finally:
+        samples.sigItemsAboutToChange.disconnect(onSignal)
+        samples.sigItemsChanged.disconnect(onSignal)
+    return counts['n'], dt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numSamples', type=int, default=10000)
+    args = parser.parse_args()
+
+    samples = _makeSamples(args.numSamples)
+    print(f'Toggling visibility of {args.numSamples} samples')
+    print(f'{"mode":>10} {"handler calls":>14} {"time (ms)":>10}')
+    for batched in (False, True):
+        numCalls, dt = _run(samples, batched=batched)
+        print(f'{"batched" if batched else "per-item":>10} {numCalls:>14d} {dt * 1e3:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Time per-item key renames and list index lookups in large collections, and alternating deletes and position
+lookups in an OrderedIndex (as when deleting samples while a table view reads rows).
+
+Per-operation times should stay roughly flat as the number of items grows.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkCollectionIndexing.py
+    poetry run python scripts/benchmarks/benchmarkCollectionIndexing.py --numItems 1000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import attrs
+import time
+
+from NaviNIBS.Navigator.Model.GenericCollection import GenericList, GenericListItem, listItemAttrSetter
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample, getSampleTimestampNow
+from NaviNIBS.util.OrderedIndex import OrderedIndex
+
+
+@attrs.define(eq=False)
+class _ListItem(GenericListItem):
+    _value: int = 0
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    @listItemAttrSetter()
+    def value(self, newValue: int):
+        pass
+
+
+@attrs.define
+class _List(GenericList[_ListItem]):
+    pass
+
+
+def _timeCollectionRenames(numItems: int, numOps: int) -> float:
+    timestamp = getSampleTimestampNow()
+    samples = Samples(items={f'Sample {i}': Sample(key=f'Sample {i}', timestamp=timestamp) for i in range(numItems)})
+    step = max(1, numItems // numOps)
+    keys = range(0, numItems, step)
+    t0 = time.perf_counter()
+    for i in keys:
+        samples[f'Sample {i}'].key = f'Renamed {i}'
+    return (time.perf_counter() - t0) / len(keys)
+
+
+def _timeListItemChanges(numItems: int, numOps: int) -> float:
+    lst = _List(items=[_ListItem(value=i) for i in range(numItems)])
+    step = max(1, numItems // numOps)
+    indices = range(0, numItems, step)
+    t0 = time.perf_counter()
+    for i in indices:
+        lst[i].value = -i
+        lst.index(lst[i])
+    return (time.perf_counter() - t0) / len(indices)
+
+
+def _timeDeleteThenLookup(numItems: int, numOps: int) -> float:
+    d = OrderedIndex((i, i) for i in range(numItems))
+    step = max(1, numItems // numOps)
+    keys = range(0, numItems - 1, step)
+    t0 = time.perf_counter()
+    for key in keys:
+        del d[key]
+        d.positionOf(key + 1)
+        d.keyAtPosition(len(d) // 2)
+    return (time.perf_counter() - t0) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numItems', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--numOps', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f'{"items":>10} {"rename (us)":>12} {"list change (us)":>17} {"delete+lookup (us)":>19}')
+    for numItems in args.numItems:
+        tRename = _timeCollectionRenames(numItems, args.numOps)
+        tList = _timeListItemChanges(numItems, args.numOps)
+        tDelete = _timeDeleteThenLookup(numItems, args.numOps)
+        print(f'{numItems:>10d} {tRename * 1e6:>12.1f} {tList * 1e6:>17.1f} {tDelete * 1e6:>19.1f}')
+
+
+if __name__ == '__main__':
+    main()
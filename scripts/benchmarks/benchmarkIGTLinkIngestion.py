@@ -0,0 +1,163 @@
+"""
+Compare ingestion of OpenIGTLink TRANSFORM messages by `Devices.IGTLinkReceiver` (waits on socket readiness and
+forwards each message as soon as it is read) versus the previous approach of polling a `pyigtl.OpenIGTLinkClient`
+every 10 ms (as previously done by IGTLinkToolPositionsServer).
+
+A `SimulatedIGTLinkSender` sends frames of transforms at a fixed rate. For each approach this reports:
+- a histogram and percentiles of latency from the sender packing each message to the message being handed off for
+  recording
+- the fraction of sent messages that were handed off (the pyigtl client keeps only the latest message per device)
+- process CPU usage while connected but idle (no messages being sent)
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkIGTLinkIngestion.py
+    poetry run python scripts/benchmarks/benchmarkIGTLinkIngestion.py --rate 60 400 --numTools 8 --duration 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import typing as tp
+
+import numpy as np
+import pyigtl
+
+from NaviNIBS.Devices.IGTLinkReceiver import IGTLinkReceiver
+from NaviNIBS.Devices.SimulatedIGTLinkSender import SimulatedIGTLinkSender
+
+
+_histogramBinEdges_ms = np.asarray([0, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, np.inf])
+
+
+class _ReceiverIngestion:
+    def __init__(self):
+        self._task = None
+
+    async def start(self, port, onMessage):
+        async def onMessageAsync(msg, receiveTime):
+            onMessage(msg, receiveTime)
+
+        receiver = IGTLinkReceiver(onMessage=onMessageAsync, port=port)
+        self._task = asyncio.create_task(receiver.run())
+
+    async def stop(self):
+        self._task.cancel()
+
+
+class _PollingIngestion:
+    pollPeriod = 0.01
+
+    def __init__(self):
+        self._client = None
+        self._task = None
+
+    async def start(self, port, onMessage):
+        self._client = pyigtl.OpenIGTLinkClient(port=port, start_now=True)
+
+        async def poll():
+            while True:
+                msgs = self._client.get_latest_messages()
+                if len(msgs) == 0:
+                    await asyncio.sleep(self.pollPeriod)
+                    continue
+                handoffTime = time.time()
+                for msg in msgs:
+                    onMessage(msg, handoffTime)
+                await asyncio.sleep(0)
+
+        self._task = asyncio.create_task(poll())
+
+    async def stop(self):
+        self._task.cancel()
+        self._client.stop()
+
+
+_ingestions: dict[str, type] = {
+    'IGTLinkReceiver': _ReceiverIngestion,
+    'pyigtl polling (previous)': _PollingIngestion,
+}
+
+
+def _getTransfs(iFrame: int, numTools: int) -> dict[str, np.ndarray]:
+    transfs = dict()
+    for iTool in range(numTools):
+        transf = np.eye(4)
+        transf[:3, 3] = (iTool, iFrame * 0.1, 1.)
+        transfs[f'Tool{iTool}ToTracker'] = transf
+    return transfs
+
+
+async def _runOne(ingestionCls: type, rate: float, numTools: int, duration: float, idleDuration: float) \
+        -> dict[str, tp.Any]:
+    sender = SimulatedIGTLinkSender(port=0)
+    await sender.start()
+
+    latencies = []
+
+    def onMessage(msg: pyigtl.MessageBase, handoffTime: float):
+        latencies.append(handoffTime - msg.timestamp)
+
+    ingestion = ingestionCls()
+    await ingestion.start(sender.port, onMessage)
+    await asyncio.wait_for(sender.waitForClient(), timeout=10.)
+    await asyncio.sleep(0.2)
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    await asyncio.sleep(idleDuration)
+    idleCPU = (time.process_time() - cpu0) / (time.perf_counter() - t0)
+
+    numFrames = int(rate * duration)
+    await sender.sendAtRate(lambda iFrame: _getTransfs(iFrame, numTools), rate=rate, numFrames=numFrames)
+    await asyncio.sleep(0.2)  # let remaining messages arrive
+
+    await ingestion.stop()
+    await sender.stop()
+
+    latencies_ms = np.asarray(latencies) * 1e3
+    return dict(numSent=numFrames * numTools,
+                numReceived=len(latencies),
+                latencies_ms=latencies_ms,
+                idleCPU=idleCPU)
+
+
+def _printResult(name: str, result: dict[str, tp.Any]):
+    latencies_ms = result['latencies_ms']
+    print(f'\n  {name}: received {result["numReceived"]} / {result["numSent"]} messages, '
+          f'idle CPU {result["idleCPU"] * 100:.1f}%')
+    if len(latencies_ms) == 0:
+        return
+    print('    latency (ms): ' + ', '.join(f'p{p} {np.percentile(latencies_ms, p):.3f}' for p in (50, 90, 99)) +
+          f', max {latencies_ms.max():.3f}')
+    counts, _ = np.histogram(latencies_ms, bins=_histogramBinEdges_ms)
+    maxCount = max(counts.max(), 1)
+    for iBin, count in enumerate(counts):
+        lower, upper = _histogramBinEdges_ms[iBin], _histogramBinEdges_ms[iBin + 1]
+        label = f'{lower:g}-{upper:g}' if np.isfinite(upper) else f'>{lower:g}'
+        print(f'    {label:>9} ms {count:>7d} {"#" * int(round(40 * count / maxCount))}')
+
+
+async def _main(args):
+    for rate in args.rate:
+        print(f'\n{args.numTools} tools at {rate} Hz for {args.duration} s:')
+        for name, ingestionCls in _ingestions.items():
+            result = await _runOne(ingestionCls, rate=rate, numTools=args.numTools, duration=args.duration,
+                                   idleDuration=args.idleDuration)
+            _printResult(name, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, nargs='+', default=[60., 250.])
+    parser.add_argument('--numTools', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.)
+    parser.add_argument('--idleDuration', type=float, default=2.)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == '__main__':
+    main()
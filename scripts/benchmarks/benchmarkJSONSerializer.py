@@ -0,0 +1,107 @@
+"""
+Compare throughput of JSON serialization of session sections: previous jsbeautifier-based pretty printing
+(json.dumps + jsbeautifier, as previously written by Session._prettyJSONDumps) versus `util.json.JSONSerializer`
+in compact and pretty modes, with and without orjson, and with numpy fields converted to lists versus passed
+through as arrays (`numpyFieldsAsArrays`).
+
+Times include producing the section contents with asList() and encoding to bytes, but not writing to disk.
+Throughput is reported relative to the size of the compact output.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkJSONSerializer.py
+    poetry run python scripts/benchmarks/benchmarkJSONSerializer.py --numItems 1000 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+
+import jsbeautifier
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample
+from NaviNIBS.Navigator.Model.Targets import Targets, Target
+from NaviNIBS.util import json as navinibsJSON
+from NaviNIBS.util.json import JSONSerializer
+from NaviNIBS.util.numpy import numpyFieldsAsArrays
+
+
+def _makeCollections(numItems: int) -> dict[str, Samples | Targets]:
+    rng = np.random.default_rng(0)
+    t0 = pd.Timestamp.now()
+    samples = Samples()
+    with samples.batchedChanges():
+        for i in range(numItems):
+            samples.addItem(Sample(key=f'Sample {i}', timestamp=t0 + pd.Timedelta(milliseconds=i),
+                                   coilToMRITransf=rng.normal(size=(4, 4)), targetKey='Target 1'))
+    targets = Targets()
+    for i in range(numItems):
+        targets.addItem(Target(key=f'Target {i}', targetCoord=rng.normal(size=3), entryCoord=rng.normal(size=3),
+                               coilToMRITransf=rng.normal(size=(4, 4))))
+    return dict(samples=samples, targets=targets)
+
+
+def _timeIt(fn, numRepeats: int) -> float:
+    times = []
+    for _ in range(numRepeats):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numItems', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--numRepeats', type=int, default=3)
+    args = parser.parse_args()
+
+    opts = jsbeautifier.default_options()
+    opts.indent_size = 2
+    beautifier = jsbeautifier.Beautifier(opts)
+
+    methods: dict[str, tuple[bool, callable]] = {
+        'jsbeautifier (previous)': (False, lambda obj: beautifier.beautify(json.dumps(obj)).encode('utf-8')),
+        'stdlib compact': (False, lambda obj: json.dumps(obj, separators=(',', ':')).encode('utf-8')),
+    }
+    serializers = dict()
+    if navinibsJSON.orjson is not None:
+        serializers['compact'] = JSONSerializer()
+        serializers['pretty'] = JSONSerializer(pretty=True)
+    serializers['compact, no orjson'] = JSONSerializer(useOrjson=False)
+    serializers['pretty, no orjson'] = JSONSerializer(pretty=True, useOrjson=False)
+    for name, serializer in serializers.items():
+        methods[name] = (False, serializer.dumpsBytes)
+        methods[name + ', arrays'] = (True, serializer.dumpsBytes)
+
+    print(f'{"items":>7} {"section":>8} {"method":>28} {"time (ms)":>10} {"MB/s":>8} {"speedup":>8}')
+    for numItems in args.numItems:
+        collections = _makeCollections(numItems)
+        for sectionKey, collection in collections.items():
+            compactSize = len(JSONSerializer(useOrjson=False).dumpsBytes(collection.asList()))
+            baseline = None
+            for methodName, (keepArrays, dumps) in methods.items():
+                def run():
+                    if keepArrays:
+                        with numpyFieldsAsArrays():
+                            toDump = collection.asList()
+                    else:
+                        toDump = collection.asList()
+                    dumps(toDump)
+
+                numRepeats = 1 if methodName.startswith('jsbeautifier') else args.numRepeats
+                t = _timeIt(run, numRepeats=numRepeats)
+                if baseline is None:
+                    baseline = t
+                print(f'{numItems:>7d} {sectionKey:>8} {methodName:>28} {t * 1e3:>10.1f} '
+                      f'{compactSize / 1e6 / t:>8.1f} {baseline / t:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
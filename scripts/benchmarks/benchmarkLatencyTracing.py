@@ -0,0 +1,56 @@
+"""
+Time the overhead of latency tracing instrumentation: a full trace (start, coordinator update, and one redraw per
+view) with tracing enabled, and a single ``markStage`` call with tracing disabled.
+
+Both run on every tracking update, so should be negligible compared to the ~16 ms between 60 Hz tracker samples.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkLatencyTracing.py
+    poetry run python scripts/benchmarks/benchmarkLatencyTracing.py --numViews 1 4 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import timeit
+
+from NaviNIBS.util.LatencyTracing import LatencyTracer, stageServerPublish, stageCoordinatorUpdate, stageRedraw
+
+
+def _timeEnabledTrace(numViews: int, numCalls: int) -> float:
+    tracer = LatencyTracer(isEnabled=True)
+    redrawKeys = [object() for _ in range(numViews)]
+    t = time.time()
+
+    def trace():
+        nonlocal t
+        t += 0.001
+        tracer.startTrace(t, stageTimes=((stageServerPublish, t),), now=t)
+        tracer.markStage(stageCoordinatorUpdate)
+        for key in redrawKeys:
+            tracer.markStage(stageRedraw, key=key)
+
+    return min(timeit.repeat(trace, number=numCalls, repeat=5)) / numCalls
+
+
+def _timeDisabledMark(numCalls: int) -> float:
+    tracer = LatencyTracer(isEnabled=False)
+    return min(timeit.repeat(lambda: tracer.markStage(stageRedraw), number=numCalls, repeat=5)) / numCalls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numViews', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--numCalls', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f'disabled markStage: {_timeDisabledMark(args.numCalls) * 1e6:.3f} us')
+    print(f'{"views":>6} {"enabled trace (us)":>19}')
+    for numViews in args.numViews:
+        print(f'{numViews:>6d} {_timeEnabledTrace(numViews, args.numCalls) * 1e6:>19.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare the per-pose cost of on-target checks with `OnTargetMonitor` against the previous approach of evaluating
+each thresholded metric through the full `PoseMetricCalculator` path for every pose.
+
+Simulates a coil sliding across a target at a fixed tracker rate.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkOnTargetMonitor.py
+    poetry run python scripts/benchmarks/benchmarkOnTargetMonitor.py --duration 30 --trackerRate 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Targets import Target
+from NaviNIBS.Navigator.Model.Tools import CoilTool, SubjectTracker
+from NaviNIBS.Navigator.OnTargetMonitor import OnTargetMonitor
+from NaviNIBS.util.CoilOrientations import PoseMetricCalculator
+
+
+_targetCoilToMRITransf = np.asarray([
+    [0., -1., 0., 10.],
+    [1., 0., 0., 20.],
+    [0., 0., 1., 80.],
+    [0., 0., 0., 1.]])
+
+
+def _getCoilToMRITransf(t: float, speed: float = 2., startOffset: float = 3.) -> np.ndarray:
+    """
+    Coil sliding at constant speed (in mm/s) along target X axis, passing over target
+    """
+    offset = np.eye(4)
+    offset[0, 3] = startOffset - speed * t
+    return _targetCoilToMRITransf @ offset
+
+
+def _makeSession(sessionDir: str) -> Session:
+    session = Session.createNew(filepath=sessionDir + '/session.navinibs', unpackedSessionDir=sessionDir + '/unpacked')
+    session.tools.addItem(SubjectTracker(key='Subject'))
+    session.tools.addItem(CoilTool(key='Coil', toolToTrackerTransf=np.eye(4)))
+    session.subjectRegistration.trackerToMRITransf = np.eye(4)
+    session.targets.addItem(Target(key='Target', coilToMRITransf=_targetCoilToMRITransf))
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=3., help='Duration of simulated trajectory, in s')
+    parser.add_argument('--trackerRate', type=float, default=60., help='Tracker update rate, in Hz')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    frameTimes = np.arange(0., args.duration, 1 / args.trackerRate)
+    coilToMRITransfs = [_getCoilToMRITransf(t) for t in frameTimes]
+
+    monitor = OnTargetMonitor(onTargetBounds=[[-2., -4., -1., -4.], [2., 4., 1., 2.]],
+                              offTargetBounds=[[-3., -6., -1.5, -4.], [3., 6., 1.5, 4.]],
+                              onTargetMinTime=0.5,
+                              offTargetMinTime=0.1)
+    monitor.setTarget(_targetCoilToMRITransf)
+
+    def runMonitor():
+        monitor.reset()
+        for t, transf in zip(frameTimes, coilToMRITransfs):
+            monitor.update(t, transf)
+
+    with tempfile.TemporaryDirectory() as sessionDir:
+        session = _makeSession(sessionDir)
+        calculator = PoseMetricCalculator(session=session, sample=Sample(key='CurrentPose', targetKey='Target',
+                                                                         timestamp=pd.Timestamp.now()))
+
+        def runCalculator():
+            for transf in coilToMRITransfs:
+                calculator.sample.coilToMRITransf = transf
+                calculator.getDepthAngleError()
+                calculator.getHorizAngleError()
+                calculator.getTargetErrorAtCoil()
+                calculator.getDepthOffsetError()
+
+        N = len(frameTimes)
+        tMonitor = min(timeit.repeat(runMonitor, number=1, repeat=5)) / N
+        tCalculator = min(timeit.repeat(runCalculator, number=1, repeat=5)) / N
+
+    print(f'{N} poses, budget at {args.trackerRate:g} Hz: {1e6 / args.trackerRate:.0f} us per pose')
+    print(f'{"monitor (us)":>13} {"calculator (us)":>16} {"speedup":>8}')
+    print(f'{tMonitor * 1e6:>13.1f} {tCalculator * 1e6:>16.1f} {tCalculator / tMonitor:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare computing pose metrics for many coil poses at once with `BatchPoseMetricCalculator` against computing them
+one sample at a time with `PoseMetricCalculator`.
+
+Uses a synthetic head model (ellipsoidal skin and gray matter surfaces) with a few targets, and random coil poses
+near those targets. Surface-distance metrics are excluded by default, since those are dominated by closest point
+queries (see benchmarkClosestPointQuery.py and benchmarkSignedDistanceField.py).
+
+Scalar times are measured on a subset of poses and extrapolated.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkPoseMetrics.py
+    poetry run python scripts/benchmarks/benchmarkPoseMetrics.py --numPoses 1000 100000 --numScalar 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyvista as pv
+from scipy.spatial.transform import Rotation
+
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.SubjectRegistration import Fiducial
+from NaviNIBS.Navigator.Model.Targets import Target
+from NaviNIBS.util.CoilOrientations import PoseMetricCalculator, BatchPoseMetricCalculator
+
+
+_surfaceMetricLabels = ('Target error in brain', 'Angle from normal', 'Coil to cortex dist', 'Coil to scalp dist',
+                        'Normal coil X angle error', 'Normal coil Y angle error')
+
+
+def _makeSession(tempDir: str, rng: np.random.Generator, numTargets: int) -> Session:
+    session = Session.createNew(filepath=os.path.join(tempDir, 'session.navinibs'),
+                                unpackedSessionDir=os.path.join(tempDir, 'unpacked'))
+
+    skinSurf = pv.ParametricEllipsoid(75, 90, 80, u_res=40, v_res=40, w_res=40).triangulate()
+    gmSurf = pv.ParametricEllipsoid(60, 75, 65, u_res=40, v_res=40, w_res=40).triangulate()
+    skinSurf.save(os.path.join(tempDir, 'skin.stl'))
+    gmSurf.save(os.path.join(tempDir, 'gm.stl'))
+    session.headModel.skinSurfFilepath = os.path.join(tempDir, 'skin.stl')
+    session.headModel.gmSurfFilepath = os.path.join(tempDir, 'gm.stl')
+
+    fiducials = session.subjectRegistration.fiducials
+    fiducials['NAS'] = Fiducial(key='NAS', plannedCoord=np.asarray([0., 90., 0.]))
+    fiducials['LPA'] = Fiducial(key='LPA', plannedCoord=np.asarray([-75., 0., -10.]))
+    fiducials['RPA'] = Fiducial(key='RPA', plannedCoord=np.asarray([75., 0., -10.]))
+
+    # targets above the head, with coil depth axis pointing generally outward
+    pos = rng.normal(size=(numTargets, 3))
+    pos[:, 2] = np.abs(pos[:, 2])
+    pos /= np.linalg.norm(pos, axis=1, keepdims=True)
+    for iTarget in range(numTargets):
+        transf = np.eye(4)
+        transf[:3, :3] = Rotation.random(random_state=rng).as_matrix()
+        transf[:3, 3] = pos[iTarget] * 100
+        session.targets.addItem(Target(key=f'Target {iTarget}', coilToMRITransf=transf))
+    return session
+
+
+def _randomPerturbations(rng: np.random.Generator, N: int) -> np.ndarray:
+    perturbs = np.tile(np.eye(4), (N, 1, 1))
+    perturbs[:, :3, :3] = Rotation.from_rotvec(rng.normal(scale=0.2, size=(N, 3))).as_matrix()
+    perturbs[:, :3, 3] = rng.normal(scale=5, size=(N, 3))
+    return perturbs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numPoses', type=int, nargs='+', default=[1000, 10_000, 100_000])
+    parser.add_argument('--numScalar', type=int, default=200, help='Number of poses to time scalar calculation on')
+    parser.add_argument('--numTargets', type=int, default=10)
+    parser.add_argument('--includeSurfaceMetrics', action='store_true')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tempDir:
+        session = _makeSession(tempDir, rng, numTargets=args.numTargets)
+        targetTransfs = np.stack([target.coilToMRITransf for target in session.targets.values()])
+
+        batchCalculator = BatchPoseMetricCalculator(session=session)
+        labels = [label for label in batchCalculator.supportedMetricLabels
+                  if args.includeSurfaceMetrics or label not in _surfaceMetricLabels]
+
+        iTargets = rng.integers(len(targetTransfs), size=args.numScalar)
+        coilToMRITransfs = targetTransfs[iTargets] @ _randomPerturbations(rng, args.numScalar)
+        scalarCalculator = PoseMetricCalculator(session=session, sample=None)
+        t0 = time.perf_counter()
+        for i in range(args.numScalar):
+            scalarCalculator.sample = Sample(key=f'Sample {i}', coilToMRITransf=coilToMRITransfs[i],
+                                             targetKey=f'Target {iTargets[i]}', timestamp=pd.Timestamp.now())
+            for label in labels:
+                scalarCalculator.getValueForMetric(label)
+        tScalar = (time.perf_counter() - t0) / args.numScalar
+
+        print(f'{len(labels)} metrics, scalar: {tScalar * 1e6:.1f} us per pose')
+        print(f'{"poses":>8} {"batch (s)":>10} {"scalar, extrapolated (s)":>25} {"speedup":>8}')
+        for numPoses in args.numPoses:
+            iTargets = rng.integers(len(targetTransfs), size=numPoses)
+            coilToMRITransfs = targetTransfs[iTargets] @ _randomPerturbations(rng, numPoses)
+            t0 = time.perf_counter()
+            batchCalculator.calculate(coilToMRITransfs, targetTransfs[iTargets], labels=labels)
+            tBatch = time.perf_counter() - t0
+            print(f'{numPoses:>8d} {tBatch:>10.3f} {tScalar * numPoses:>25.1f} {tScalar * numPoses / tBatch:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
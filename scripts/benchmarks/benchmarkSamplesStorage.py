@@ -0,0 +1,99 @@
+"""
+Compare memory use and bulk access time of store-backed Samples against the previous object-per-sample layout
+(a plain GenericCollection of Sample objects, each holding its own transform, timestamp and metadata).
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSamplesStorage.py
+    poetry run python scripts/benchmarks/benchmarkSamplesStorage.py --numSamples 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.GenericCollection import GenericCollection
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample
+
+
+@attrs.define
+class _ObjectPerSampleSamples(GenericCollection[str, Sample]):
+    pass
+
+
+def _makeSampleList(numSamples: int) -> list[Sample]:
+    rng = np.random.default_rng(0)
+    t0 = pd.Timestamp.now()
+    samples = []
+    for i in range(numSamples):
+        transf = np.eye(4)
+        transf[:3, 3] = rng.normal(size=3)
+        samples.append(Sample(key=f'Sample {i}',
+                              timestamp=t0 + pd.Timedelta(milliseconds=i),
+                              coilToMRITransf=transf,
+                              targetKey='Target 1',
+                              coilKey='Coil',
+                              metadata=dict(source='LSL', pulseIndex=i)))
+    return samples
+
+
+def _measureAllocated(fn):
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numSamples', type=int, default=50000)
+    args = parser.parse_args()
+
+    objSamples, listBytes = _measureAllocated(
+        lambda: _ObjectPerSampleSamples(items={s.key: s for s in _makeSampleList(args.numSamples)}))
+    sampleList = list(objSamples.values())
+    samples, storeBytes = _measureAllocated(lambda: Samples(items={s.key: s for s in _makeSampleList(args.numSamples)}))
+
+    print(f'{args.numSamples} samples')
+    print(f'{"":>28} {"object-per-sample":>18} {"columnar":>12}')
+    print(f'{"memory (MB)":>28} {listBytes / 1e6:>18.1f} {storeBytes / 1e6:>12.1f}')
+
+    t0 = time.perf_counter()
+    transfs_a = np.stack([s.coilToMRITransf for s in sampleList])
+    t1 = time.perf_counter()
+    transfs_b = samples.getCoilToMRITransfs()
+    t2 = time.perf_counter()
+    assert np.array_equal(transfs_a, transfs_b)
+    print(f'{"all transforms (ms)":>28} {(t1 - t0) * 1e3:>18.1f} {(t2 - t1) * 1e3:>12.1f}')
+
+    t0 = time.perf_counter()
+    visible_a = [s.key for s in sampleList if s.isVisible and s.coilToMRITransf is not None]
+    t1 = time.perf_counter()
+    keys = np.asarray(list(samples.keys()), dtype=object)
+    visible_b = keys[samples.getIsVisible() & samples.getHasTransfs()]
+    t2 = time.perf_counter()
+    assert list(visible_a) == list(visible_b)
+    print(f'{"filter visible (ms)":>28} {(t1 - t0) * 1e3:>18.1f} {(t2 - t1) * 1e3:>12.1f}')
+
+    t0 = time.perf_counter()
+    for s in sampleList:
+        s.timestamp
+    t1 = time.perf_counter()
+    for s in samples.values():
+        s.timestamp
+    t2 = time.perf_counter()
+    print(f'{"per-sample iteration (ms)":>28} {(t1 - t0) * 1e3:>18.1f} {(t2 - t1) * 1e3:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
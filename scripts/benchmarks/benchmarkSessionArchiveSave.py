@@ -0,0 +1,85 @@
+"""
+Compare latency of saving a compressed session file after a small change, using a full rewrite with
+shutil.make_archive (previous behavior) versus IncrementalZipArchiveWriter, across session sizes.
+
+Each synthetic session directory contains a few JSON config sections, a number of autosave files, and
+large embedded files (e.g. images/meshes). After an initial save, a single small JSON section is changed
+and the archive is saved again.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSessionArchiveSave.py
+    poetry run python scripts/benchmarks/benchmarkSessionArchiveSave.py --embeddedMB 10 100 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from NaviNIBS.util.IncrementalZipArchive import IncrementalZipArchiveWriter
+
+
+def _makeSessionDir(rootDir: str, embeddedMB: int, numAutosaves: int):
+    rng = np.random.default_rng(0)
+    os.makedirs(os.path.join(rootDir, 'autosaved'))
+    with open(os.path.join(rootDir, 'SessionConfig.json'), 'w') as f:
+        json.dump(dict(formatVersion='0.0.2', subjectID='bench'), f)
+    # semi-compressible binary data, roughly like image volumes
+    embedded = (rng.normal(size=embeddedMB * 2 ** 17) * 100).astype(np.int16)
+    embedded.tofile(os.path.join(rootDir, 'embedded.bin'))
+    samples = [dict(key=f'Sample {i}', coilToMRITransf=np.eye(4).tolist()) for i in range(1000)]
+    for i in range(numAutosaves):
+        with open(os.path.join(rootDir, 'autosaved', f'autosaved-{i:06d}_SessionConfig_Samples.json'), 'w') as f:
+            json.dump(samples, f)
+
+
+def _touchSection(rootDir: str, i: int):
+    with open(os.path.join(rootDir, 'SessionConfig.json'), 'w') as f:
+        json.dump(dict(formatVersion='0.0.2', subjectID=f'bench{i}'), f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--embeddedMB', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--numAutosaves', type=int, default=20)
+    parser.add_argument('--numSaves', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"embedded MB":>12} {"make_archive (ms)":>18} {"incremental (ms)":>17} {"archive MB":>11}')
+    for embeddedMB in args.embeddedMB:
+        with tempfile.TemporaryDirectory() as tempDir:
+            rootDir = os.path.join(tempDir, 'unpacked')
+            _makeSessionDir(rootDir, embeddedMB=embeddedMB, numAutosaves=args.numAutosaves)
+
+            archivePath_full = os.path.join(tempDir, 'full.navinibs')
+            times_full = []
+            for i in range(args.numSaves):
+                _touchSection(rootDir, i)
+                t0 = time.perf_counter()
+                shutil.make_archive(base_name=archivePath_full, format='zip', root_dir=rootDir, base_dir='.')
+                shutil.move(archivePath_full + '.zip', archivePath_full)
+                times_full.append(time.perf_counter() - t0)
+
+            writer = IncrementalZipArchiveWriter(archivePath=os.path.join(tempDir, 'incr.navinibs'), rootDir=rootDir)
+            writer.save()  # initial full write
+            times_incr = []
+            for i in range(args.numSaves):
+                _touchSection(rootDir, i + args.numSaves)
+                t0 = time.perf_counter()
+                writer.save()
+                times_incr.append(time.perf_counter() - t0)
+            writer.waitForCompaction()
+
+            print(f'{embeddedMB:>12d} {np.median(times_full) * 1e3:>18.1f} {np.median(times_incr) * 1e3:>17.1f} '
+                  f'{os.path.getsize(writer.archivePath) / 1e6:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure how long an autosave blocks the calling (GUI) thread, and how long the background journal write takes,
+for a large session where one section changes between autosaves.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSessionAutosave.py
+    poetry run python scripts/benchmarks/benchmarkSessionAutosave.py --numSamples 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Samples import Sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numSamples', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--numAutosaves', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f'{"samples":>8} {"changed":>8} {"caller (ms)":>12} {"background (ms)":>16} {"findAutosaves (ms)":>19}')
+    for numSamples in args.numSamples:
+        with tempfile.TemporaryDirectory() as tempDir:
+            session = Session.createNew(filepath=os.path.join(tempDir, 'session.navinibs'),
+                                        unpackedSessionDir=os.path.join(tempDir, 'unpacked'))
+            rng = np.random.default_rng(0)
+            t0 = pd.Timestamp.now()
+            with session.samples.batchedChanges():
+                for i in range(numSamples):
+                    session.samples.addItem(Sample(key=f'Sample {i}', timestamp=t0 + pd.Timedelta(milliseconds=i),
+                                                   coilToMRITransf=rng.normal(size=(4, 4))))
+            session.saveToUnpackedDir(saveDirtyOnly=False)
+
+            for changedKey in ('targets', 'samples'):
+                callerTimes = []
+                backgroundTimes = []
+                for iAutosave in range(args.numAutosaves):
+                    if changedKey == 'samples':
+                        session.samples[f'Sample {iAutosave}'].isVisible = False
+                    else:
+                        session.flagKeyAsDirty(changedKey)
+                    tStart = time.perf_counter()
+                    session.saveToUnpackedDir(asAutosave=True)
+                    tQueued = time.perf_counter()
+                    session.autosaveWriter.waitUntilIdle()
+                    tDone = time.perf_counter()
+                    callerTimes.append(tQueued - tStart)
+                    backgroundTimes.append(tDone - tQueued)
+
+                tStart = time.perf_counter()
+                Session.findAutosaves(session.unpackedSessionDir)
+                tFind = time.perf_counter() - tStart
+
+                print(f'{numSamples:>8d} {changedKey:>8} {np.median(callerTimes) * 1e3:>12.1f} '
+                      f'{np.median(backgroundTimes) * 1e3:>16.1f} {tFind * 1e3:>19.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Benchmark suite for session save / load operations on synthetic sessions (see syntheticSession.py), reporting wall
+time, peak Python memory (tracemalloc, including numpy allocations), and bytes written for each operation.
+
+Operations measured, for each combination of size parameters:
+- saveToUnpackedDir (full): write all sections of a newly generated session
+- saveToFile (full): write all sections and the compressed session file
+- saveToFile (1 sample changed): typical incremental save
+- autosave (1 sample changed): caller time plus time for the background writer to finish
+- findAutosaves
+- restore autosave: loadFromUnpackedDir from the newest autosave
+- loadFromFile (eager) / loadFromFile (lazy)
+- mergeFromFile: merge a JSON file of targets and tools into a loaded session
+
+Results are printed and written to a JSON file (including software version and git commit) so that runs can be
+compared between versions, e.g. with `--compareTo previousResults.json`.
+
+Bytes written are measured from the OS per-process write counter where available (/proc/self/io on Linux),
+otherwise estimated from new and changed files in the session directories.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSessionSaveLoad.py
+    poetry run python scripts/benchmarks/benchmarkSessionSaveLoad.py --numSamples 1000 10000 100000 --numAutosaves 20
+    poetry run python scripts/benchmarks/benchmarkSessionSaveLoad.py --output new.json --compareTo old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing as tp
+
+import attrs
+import numpy as np
+
+import NaviNIBS
+from NaviNIBS.Navigator.Model.Session import Session
+
+from syntheticSession import SyntheticSessionParams, makeSyntheticSession, makeMergeFile
+
+
+@attrs.define
+class _BytesWrittenCounter:
+    """
+    Counts bytes written by this process (including background threads) between `start` and `stop`.
+    """
+    _watchDirs: list[str]
+    _startCount: int | None = attrs.field(init=False, default=None)
+    _startFiles: dict[str, tuple[int, int]] | None = attrs.field(init=False, default=None)
+
+    @property
+    def method(self) -> str:
+        return 'procIO' if self._canUseProcIO() else 'fileSizes'
+
+    @staticmethod
+    def _canUseProcIO() -> bool:
+        return os.path.exists('/proc/self/io')
+
+    @staticmethod
+    def _readProcIO() -> int:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                key, val = line.split(':')
+                if key == 'wchar':
+                    return int(val)
+        raise KeyError('wchar')
+
+    def _scanFiles(self) -> dict[str, tuple[int, int]]:
+        files = dict()
+        for watchDir in self._watchDirs:
+            for dirpath, _, filenames in os.walk(watchDir):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files[path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def start(self):
+        if self._canUseProcIO():
+            self._startCount = self._readProcIO()
+        else:
+            self._startFiles = self._scanFiles()
+
+    def stop(self) -> int:
+        if self._canUseProcIO():
+            return self._readProcIO() - self._startCount
+        numBytes = 0
+        for path, (size, mtime) in self._scanFiles().items():
+            prevSize, prevMtime = self._startFiles.get(path, (0, None))
+            if prevMtime is None or mtime != prevMtime:
+                # assume files that grew were appended to (e.g. incremental archive) and others were rewritten
+                numBytes += size - prevSize if size > prevSize and prevMtime is not None else size
+        return numBytes
+
+
+@attrs.define
+class _Operation:
+    name: str
+    run: tp.Callable[[], tp.Any]
+    setup: tp.Callable[[], tp.Any] | None = None
+
+
+def _measure(op: _Operation, counter: _BytesWrittenCounter, numRepeats: int, measureMemory: bool) \
+        -> dict[str, tp.Any]:
+    wallTimes = []
+    bytesWritten = []
+    for _ in range(numRepeats):
+        if op.setup is not None:
+            op.setup()
+        gc.collect()
+        counter.start()
+        t0 = time.perf_counter()
+        op.run()
+        wallTimes.append(time.perf_counter() - t0)
+        bytesWritten.append(counter.stop())
+
+    result = dict(operation=op.name,
+                  wallTime_s=float(np.median(wallTimes)),
+                  wallTimeMin_s=float(np.min(wallTimes)),
+                  bytesWritten=int(np.median(bytesWritten)),
+                  numRepeats=numRepeats)
+
+    if measureMemory:
+        # separate run, since tracing allocations slows execution
+        if op.setup is not None:
+            op.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            op.run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['peakMemory_MB'] = peak / 1e6
+
+    return result
+
+
+def _runForParams(params: SyntheticSessionParams, tempDir: str, numRepeats: int, measureMemory: bool) \
+        -> list[dict[str, tp.Any]]:
+    filepath = os.path.join(tempDir, 'session.navinibs')
+    unpackedDir = os.path.join(tempDir, 'unpacked')
+    session = makeSyntheticSession(filepath=filepath, unpackedSessionDir=unpackedDir, params=params)
+    mergeFilepath = os.path.join(tempDir, 'toMerge.json')
+    makeMergeFile(mergeFilepath, params)
+
+    counter = _BytesWrittenCounter(watchDirs=[tempDir])
+
+    iChange = itertools.count()
+
+    def changeOneSample():
+        if len(session.samples) > 0:
+            sample = session.samples[f'Sample {next(iChange) % len(session.samples)}']
+            sample.isVisible = not sample.isVisible
+        else:
+            session.flagKeyAsDirty('targets')
+
+    def autosave():
+        session.saveToUnpackedDir(asAutosave=True)
+        session.autosaveWriter.waitUntilIdle()
+
+    iLoad = itertools.count()
+
+    def loadFromFile(lazy: bool):
+        loaded = Session.loadFromFile(filepath, unpackedSessionDir=os.path.join(tempDir, f'loaded{next(iLoad)}'),
+                                      lazy=lazy)
+        # access sections needed for a typical first view
+        loaded.subjectRegistration
+        loaded.tools
+        loaded.targets
+        return loaded
+
+    autosaves = []
+
+    def prepareRestore():
+        autosaves[:] = Session.findAutosaves(unpackedDir)
+
+    def restoreAutosave():
+        return Session.loadFromUnpackedDir(unpackedDir, filepath=filepath, configPath=autosaves[0][1])
+
+    toMergeInto: list[Session] = []
+
+    def prepareMerge():
+        toMergeInto[:] = [Session.loadFromFile(filepath,
+                                               unpackedSessionDir=os.path.join(tempDir, f'merge{next(iLoad)}'))]
+
+    operations = [
+        _Operation('saveToUnpackedDir (full)', lambda: session.saveToUnpackedDir(saveDirtyOnly=False)),
+        _Operation('saveToFile (full)', lambda: session.saveToFile(updateDirtyOnly=False)),
+        _Operation('saveToFile (1 sample changed)', session.saveToFile, setup=changeOneSample),
+        _Operation('autosave (1 sample changed)', autosave, setup=changeOneSample),
+        _Operation('findAutosaves', lambda: Session.findAutosaves(unpackedDir)),
+        _Operation('restore autosave', restoreAutosave, setup=prepareRestore),
+        _Operation('loadFromFile (eager)', lambda: loadFromFile(lazy=False)),
+        _Operation('loadFromFile (lazy)', lambda: loadFromFile(lazy=True)),
+        _Operation('mergeFromFile', lambda: toMergeInto[0].mergeFromFile(mergeFilepath), setup=prepareMerge),
+    ]
+
+    results = []
+    for op in operations:
+        result = params.asDict() | _measure(op, counter=counter, numRepeats=numRepeats, measureMemory=measureMemory)
+        result['bytesWrittenMethod'] = counter.method
+        results.append(result)
+        _printResult(result)
+    return results
+
+
+_paramKeys = ('numSamples', 'numTargets', 'numHeadPoints', 'numROIs', 'numTools', 'numAutosaves')
+
+
+def _printHeader():
+    print(' '.join(f'{key[3:]:>10}' for key in _paramKeys) +
+          f' {"operation":>30} {"time (ms)":>10} {"peak MB":>8} {"written MB":>11}')
+
+
+def _printResult(result: dict[str, tp.Any], compareTo: dict[str, tp.Any] | None = None):
+    line = ' '.join(f'{result[key]:>10d}' for key in _paramKeys) + \
+           f' {result["operation"]:>30} {result["wallTime_s"] * 1e3:>10.1f} ' \
+           f'{result.get("peakMemory_MB", float("nan")):>8.1f} {result["bytesWritten"] / 1e6:>11.2f}'
+    if compareTo is not None:
+        line += f'   (time x{result["wallTime_s"] / compareTo["wallTime_s"]:.2f}'
+        if 'peakMemory_MB' in result and 'peakMemory_MB' in compareTo:
+            line += f', peak memory x{result["peakMemory_MB"] / max(compareTo["peakMemory_MB"], 1e-6):.2f}'
+        line += f', written x{result["bytesWritten"] / max(compareTo["bytesWritten"], 1):.2f} vs previous)'
+    print(line)
+
+
+def _getGitCommit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: list[dict[str, tp.Any]], previousPath: str):
+    with open(previousPath, 'r') as f:
+        previous = json.load(f)
+    print(f'\nComparison to {previousPath} (version {previous.get("softwareVersion")}, '
+          f'commit {previous.get("gitCommit")}):')
+    _printHeader()
+
+    def resultKey(result):
+        return tuple(result[key] for key in _paramKeys) + (result['operation'],)
+
+    previousByKey = {resultKey(result): result for result in previous['results']}
+    for result in results:
+        prevResult = previousByKey.get(resultKey(result), None)
+        if prevResult is not None:
+            _printResult(result, compareTo=prevResult)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = SyntheticSessionParams()
+    parser.add_argument('--numSamples', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--numTargets', type=int, nargs='+', default=[defaults.numTargets])
+    parser.add_argument('--numHeadPoints', type=int, nargs='+', default=[defaults.numHeadPoints])
+    parser.add_argument('--numROIs', type=int, nargs='+', default=[defaults.numROIs])
+    parser.add_argument('--numTools', type=int, nargs='+', default=[defaults.numTools])
+    parser.add_argument('--numAutosaves', type=int, nargs='+', default=[10])
+    parser.add_argument('--numRepeats', type=int, default=3)
+    parser.add_argument('--noMemory', action='store_true', help='Skip peak memory measurement')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Path to write JSON results. Defaults to a timestamped file in the working directory.')
+    parser.add_argument('--compareTo', type=str, default=None, help='Previous JSON results to compare to')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    runInfo = dict(
+        benchmark='sessionSaveLoad',
+        softwareVersion=NaviNIBS.__version__,
+        gitCommit=_getGitCommit(),
+        python=sys.version,
+        platform=platform.platform(),
+        time=datetime.now().isoformat(),
+        numRepeats=args.numRepeats,
+    )
+
+    results = []
+    _printHeader()
+    for counts in itertools.product(*(getattr(args, key) for key in _paramKeys)):
+        params = SyntheticSessionParams(**dict(zip(_paramKeys, counts)))
+        with tempfile.TemporaryDirectory(prefix='NaviNIBSBenchmark_') as tempDir:
+            results.extend(_runForParams(params, tempDir=tempDir, numRepeats=args.numRepeats,
+                                         measureMemory=not args.noMemory))
+
+    outputPath = args.output
+    if outputPath is None:
+        outputPath = f'sessionSaveLoadBenchmark_{datetime.now().strftime("%y%m%d%H%M%S")}.json'
+    with open(outputPath, 'w') as f:
+        json.dump(runInfo | dict(results=results), f, indent=2)
+    print(f'\nWrote results to {outputPath}')
+
+    if args.compareTo is not None:
+        _compare(results, args.compareTo)
+
+
+if __name__ == '__main__':
+    main()
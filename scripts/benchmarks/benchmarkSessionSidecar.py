@@ -0,0 +1,118 @@
+"""
+Compare file size and write/read time of numeric-heavy session sections saved as pretty-printed JSON (previous
+format, as written by Session._prettyJSONDumps) versus binary sidecar files (util/binarySidecar.py).
+
+Sections are generated from model objects (Samples, SubjectRegistration with head points and histories, Tools with
+transform histories) so that the dumped content matches what Session writes.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSessionSidecar.py
+    poetry run python scripts/benchmarks/benchmarkSessionSidecar.py --numSamples 1000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+
+import jsbeautifier
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Samples import Samples, Sample
+from NaviNIBS.Navigator.Model.SubjectRegistration import SubjectRegistration, Fiducial
+from NaviNIBS.Navigator.Model.Tools import Tools, CoilTool
+from NaviNIBS.util.binarySidecar import dumpSidecar, loadSidecar
+
+
+def _makeSections(numSamples: int) -> dict[str, object]:
+    rng = np.random.default_rng(0)
+    t0 = pd.Timestamp.now()
+
+    samples = Samples()
+    with samples.batchedChanges():
+        for i in range(numSamples):
+            transf = np.eye(4)
+            transf[:3, 3] = rng.normal(size=3)
+            samples.addItem(Sample(key=f'Sample {i}', timestamp=t0 + pd.Timedelta(milliseconds=i),
+                                   coilToMRITransf=transf, targetKey='Target 1'))
+
+    # histories grow roughly with session length
+    numHistory = max(numSamples // 100, 10)
+
+    reg = SubjectRegistration()
+    reg.sampledHeadPoints.extend(rng.normal(size=(max(numSamples // 10, 100), 3)))
+    regDict = reg.asDict()
+    regDict['fiducials'] = [Fiducial(key=key, plannedCoord=rng.normal(size=3),
+                                     sampledCoords=rng.normal(size=(5, 3))).asDict()
+                            for key in ('LPA', 'NAS', 'RPA')]
+    regDict['fiducialsHistory'] = [dict(time=f'{i:012d}.000000', fiducials=regDict['fiducials'])
+                                   for i in range(numHistory)]
+    regDict['trackerToMRITransfHistory'] = [dict(time=f'{i:012d}.000000',
+                                                 trackerToMRITransf=rng.normal(size=(4, 4)).tolist())
+                                            for i in range(numHistory)]
+
+    tools = Tools()
+    for iTool in range(4):
+        tool = CoilTool(key=f'Coil{iTool}')
+        for i in range(numHistory):
+            tool.toolToTrackerTransf = rng.normal(size=(4, 4))
+        tools.addItem(tool)
+
+    return dict(samples=samples.asList(), subjectRegistration=regDict, tools=tools.asList())
+
+
+def _timeIt(fn, numRepeats: int = 3) -> float:
+    times = []
+    for _ in range(numRepeats):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numSamples', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    opts = jsbeautifier.default_options()
+    opts.indent_size = 2
+    beautifier = jsbeautifier.Beautifier(opts)
+
+    print(f'{"samples":>8} {"section":>20} {"json MB":>8} {"npz MB":>7} {"json write (ms)":>16} '
+          f'{"npz write (ms)":>15} {"json read (ms)":>15} {"npz read (ms)":>14}')
+    for numSamples in args.numSamples:
+        sections = _makeSections(numSamples)
+        with tempfile.TemporaryDirectory() as tempDir:
+            for key, toDump in sections.items():
+                jsonPath = os.path.join(tempDir, key + '.json')
+                npzPath = os.path.join(tempDir, key + '.npz')
+
+                def writeJSON():
+                    toWrite = beautifier.beautify(json.dumps(toDump))
+                    with open(jsonPath, 'w') as f:
+                        f.write(toWrite)
+
+                def readJSON():
+                    with open(jsonPath, 'r') as f:
+                        json.load(f)
+
+                t_jsonWrite = _timeIt(writeJSON, numRepeats=1)  # slow enough that one repeat is representative
+                t_npzWrite = _timeIt(lambda: dumpSidecar(toDump, npzPath))
+                t_jsonRead = _timeIt(readJSON)
+                t_npzRead = _timeIt(lambda: loadSidecar(npzPath))
+
+                print(f'{numSamples:>8d} {key:>20} {os.path.getsize(jsonPath) / 1e6:>8.2f} '
+                      f'{os.path.getsize(npzPath) / 1e6:>7.2f} {t_jsonWrite * 1e3:>16.1f} {t_npzWrite * 1e3:>15.1f} '
+                      f'{t_jsonRead * 1e3:>15.1f} {t_npzRead * 1e3:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
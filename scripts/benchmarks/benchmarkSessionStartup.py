@@ -0,0 +1,93 @@
+"""
+Measure time-to-first-interactive when opening a large session, with eager versus lazy section loading
+(`Session.loadFromFile(..., lazy=True)`).
+
+A synthetic session is generated with many samples, a registration with head points and history, and a few tools,
+then saved to a compressed session file. "First interactive" is taken as loading the session plus accessing the
+sections needed by a typical first view (registration, tools, targets). The time of first access to the samples
+section in lazy mode is reported separately.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSessionStartup.py
+    poetry run python scripts/benchmarks/benchmarkSessionStartup.py --numSamples 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.SubjectRegistration import Fiducial
+from NaviNIBS.Navigator.Model.Tools import CoilTool
+
+
+def _makeSessionFile(tempDir: str, numSamples: int) -> str:
+    rng = np.random.default_rng(0)
+    session = Session.createNew(filepath=os.path.join(tempDir, 'session.navinibs'),
+                                unpackedSessionDir=os.path.join(tempDir, 'source'))
+    t0 = pd.Timestamp.now()
+    with session.samples.batchedChanges():
+        for i in range(numSamples):
+            transf = np.eye(4)
+            transf[:3, 3] = rng.normal(size=3)
+            session.samples.addItem(Sample(key=f'Sample {i}', timestamp=t0 + pd.Timedelta(milliseconds=i),
+                                           coilToMRITransf=transf, targetKey='Target 1'))
+    for key in ('LPA', 'NAS', 'RPA'):
+        session.subjectRegistration.fiducials[key] = Fiducial(key=key, plannedCoord=rng.normal(size=3))
+    session.subjectRegistration.sampledHeadPoints.extend(rng.normal(size=(1000, 3)))
+    for i in range(20):
+        session.subjectRegistration.trackerToMRITransf = rng.normal(size=(4, 4))
+    for iTool in range(4):
+        session.tools.addItem(CoilTool(key=f'Coil{iTool}', toolToTrackerTransf=rng.normal(size=(4, 4))))
+    session.saveToFile()
+    return session.filepath
+
+
+def _timeStartup(filepath: str, unpackedSessionDir: str, lazy: bool) -> tuple[float, float, float]:
+    gc.collect()
+    t0 = time.perf_counter()
+    session = Session.loadFromFile(filepath, unpackedSessionDir=unpackedSessionDir, lazy=lazy)
+    t_loaded = time.perf_counter()
+    session.subjectRegistration
+    session.tools
+    session.targets
+    t_interactive = time.perf_counter()
+    session.samples
+    t_samples = time.perf_counter()
+    return t_loaded - t0, t_interactive - t0, t_samples - t_interactive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numSamples', type=int, nargs='+', default=[100000])
+    parser.add_argument('--numRepeats', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f'{"samples":>8} {"mode":>6} {"load (ms)":>10} {"first interactive (ms)":>23} '
+          f'{"then samples (ms)":>18}')
+    for numSamples in args.numSamples:
+        with tempfile.TemporaryDirectory() as tempDir:
+            filepath = _makeSessionFile(tempDir, numSamples)
+            for lazy in (False, True):
+                results = np.asarray([
+                    _timeStartup(filepath, os.path.join(tempDir, f'unpacked_{lazy}_{iRepeat}'), lazy=lazy)
+                    for iRepeat in range(args.numRepeats)])
+                t_load, t_interactive, t_samples = np.median(results, axis=0) * 1e3
+                print(f'{numSamples:>8d} {"lazy" if lazy else "eager":>6} {t_load:>10.1f} {t_interactive:>23.1f} '
+                      f'{t_samples:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of `SignedDistanceField` at several resolutions: build and disk cache load times, memory, accuracy relative
+to exact queries, and per-query time for batches of points compared to exact queries.
+
+By default, uses synthetic scalp and cortex surfaces (bumpy ellipsoids) with query points scattered between the
+surface and `maxQueryDist` outside of it (like coil positions). Alternatively, query an existing surface mesh, with
+query points scattered around it.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkSignedDistanceField.py
+    poetry run python scripts/benchmarks/benchmarkSignedDistanceField.py --resolutions 1 2 3 4 --numPoints 1000000
+    poetry run python scripts/benchmarks/benchmarkSignedDistanceField.py --surfPath skin.stl
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyvista as pv
+
+from NaviNIBS.util.pyvista.SignedDistanceField import SignedDistanceField
+
+
+def _makeSurf(radii: tuple[float, float, float], resolution: int) -> pv.PolyData:
+    surf = pv.Sphere(radius=1., theta_resolution=resolution, phi_resolution=resolution).triangulate()
+    pts = surf.points.copy()
+    dirs = pts / np.linalg.norm(pts, axis=1, keepdims=True)
+    bumps = 1 + 0.04 * np.sin(5 * dirs[:, 0]) * np.cos(7 * dirs[:, 1]) + 0.02 * np.sin(11 * dirs[:, 2])
+    surf.points = pts * np.asarray(radii) * bumps[:, np.newaxis]
+    return surf
+
+
+def _getQueryPoints(surf: pv.PolyData, numPoints: int, maxQueryDist: float, rng: np.random.Generator) -> np.ndarray:
+    # offset random surface points along normals, so that queries are spread over the band
+    iPts = rng.integers(surf.n_points, size=numPoints)
+    offsets = rng.uniform(0., maxQueryDist, size=(numPoints, 1))
+    return surf.points[iPts] + offsets * surf.point_normals[iPts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', type=float, nargs='+', default=[2., 3., 4.], help='Field resolutions, in mm')
+    parser.add_argument('--numPoints', type=int, default=100_000, help='Number of points per batch query')
+    parser.add_argument('--numExact', type=int, default=2000, help='Number of points for exact queries')
+    parser.add_argument('--maxQueryDist', type=float, default=25., help='Max distance of query points from surface')
+    parser.add_argument('--maxOutsideDist', type=float, default=30.)
+    parser.add_argument('--maxInsideDist', type=float, default=5.)
+    parser.add_argument('--resolution', type=int, default=200, help='Resolution of synthetic surfaces')
+    parser.add_argument('--surfPath', type=str, default=None, help='Mesh to query instead of synthetic surfaces')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.surfPath is not None:
+        surfs = {os.path.basename(args.surfPath): pv.read(args.surfPath).extract_surface().triangulate()}
+    else:
+        surfs = {'scalp': _makeSurf((80., 95., 110.), args.resolution),
+                 'cortex': _makeSurf((65., 80., 90.), args.resolution)}
+
+    rng = np.random.default_rng(0)
+    print(f'{"surface":>10} {"cells":>8} {"res (mm)":>9} {"build (s)":>10} {"load (s)":>9} {"MB":>6} '
+          f'{"max err (mm)":>13} {"p99 err (mm)":>13} {"field (us)":>11} {"exact (us)":>11} {"speedup":>8}')
+    for surfKey, surf in surfs.items():
+        pts = _getQueryPoints(surf, args.numPoints, args.maxQueryDist, rng)
+        exactPts = pts[:args.numExact]
+        for resolution in args.resolutions:
+            with tempfile.TemporaryDirectory() as cacheDir:
+                kwargs = dict(resolution=resolution, maxOutsideDist=args.maxOutsideDist,
+                              maxInsideDist=args.maxInsideDist, cacheDir=cacheDir)
+                t0 = time.perf_counter()
+                field = SignedDistanceField(surf, **kwargs)
+                buildDur = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                cachedField = SignedDistanceField(surf, **kwargs)
+                loadDur = time.perf_counter() - t0
+                assert cachedField.wasLoadedFromCache
+
+            t0 = time.perf_counter()
+            field.getSignedDistances(pts)
+            fieldDur = (time.perf_counter() - t0) / len(pts)
+
+            t0 = time.perf_counter()
+            exactDists = field.getSignedDistances(exactPts, exact=True)
+            exactDur = (time.perf_counter() - t0) / len(exactPts)
+
+            errors = np.abs(field.getSignedDistances(exactPts) - exactDists)
+            print(f'{surfKey:>10} {surf.n_cells:>8} {resolution:>9g} {buildDur:>10.2f} {loadDur:>9.3f} '
+                  f'{field.nbytes / 1e6:>6.1f} {errors.max():>13.3f} {np.percentile(errors, 99):>13.3f} '
+                  f'{fieldDur * 1e6:>11.2f} {exactDur * 1e6:>11.1f} {exactDur / fieldDur:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the per-tool pose ring buffer (`Devices.ToolPositionsHistory`) used to get tool positions at a past time
+(e.g. the coil pose when a TMS pulse was triggered).
+
+Measures, for each buffer capacity:
+- append: cost of recording one pose, as done for every received position
+- query: cost of one interpolated pose lookup at a random time within the buffered span
+- batch query: cost per lookup when querying many times at once
+- client query: cost of `ToolPositionsClientBase.getTransfAtTime` for a tool positioned relative to another tool,
+  compared to `getLatestTransf`
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkToolPositionsHistory.py
+    poetry run python scripts/benchmarks/benchmarkToolPositionsHistory.py --capacity 256 8192 --batchSize 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import time
+import typing as tp
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient, logger as logger_client
+from NaviNIBS.Devices.ToolPositionsHistory import ToolPoseRingBuffer
+
+
+def _timePerCall(fn: tp.Callable[[], tp.Any], minDuration: float = 0.2) -> float:
+    gc.collect()
+    numCalls = 0
+    t0 = time.perf_counter()
+    while True:
+        for _ in range(100):
+            fn()
+        numCalls += 100
+        elapsed = time.perf_counter() - t0
+        if elapsed > minDuration:
+            return elapsed / numCalls
+
+
+def _makeTransfs(num: int, rng: np.random.Generator) -> np.ndarray:
+    transfs = np.tile(np.eye(4), (num, 1, 1))
+    transfs[:, :3, :3] = Rotation.random(num, random_state=rng).as_matrix()
+    transfs[:, :3, 3] = rng.normal(scale=100, size=(num, 3))
+    return transfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capacity', type=int, nargs='+', default=[256, 1024, 8192])
+    parser.add_argument('--batchSize', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=400., help='Tracker rate of simulated samples, in Hz')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    print(f'{"capacity":>9} {"append (us)":>12} {"query (us)":>11} {"batch query (us/query)":>23}')
+    for capacity in args.capacity:
+        transfs = _makeTransfs(capacity, rng)
+        times = np.arange(capacity) / args.rate
+
+        buffer = ToolPoseRingBuffer(capacity=capacity)
+        for t, transf in zip(times, transfs):
+            buffer.append(t, transf)
+
+        iAppend = 0
+
+        def append():
+            nonlocal iAppend
+            iAppend += 1
+            buffer.append(times[-1] + iAppend / args.rate, transfs[iAppend % capacity])
+
+        appendTime = _timePerCall(append)
+
+        queryTimes = rng.uniform(buffer.oldestTime, buffer.newestTime, size=args.batchSize)
+        iQuery = 0
+
+        def query():
+            nonlocal iQuery
+            iQuery = (iQuery + 1) % len(queryTimes)
+            buffer.getTransfAtTime(queryTimes[iQuery])
+
+        queryTime = _timePerCall(query)
+        batchQueryTime = _timePerCall(lambda: buffer.getTransfsAtTimes(queryTimes), minDuration=1.) / len(queryTimes)
+
+        print(f'{capacity:>9d} {appendTime * 1e6:>12.2f} {queryTime * 1e6:>11.2f} {batchQueryTime * 1e6:>23.3f}')
+
+    # client-level lookup, including a relative position
+    logger_client.setLevel(logging.INFO)
+    client = SimulatedToolPositionsClient(positionsHistoryCapacity=1024)
+    transfs = _makeTransfs(1024, rng)
+    t0 = time.time()
+    for i, transf in enumerate(transfs):
+        t = t0 + i / args.rate
+        client.recordNewPosition_sync('Subject', TimestampedToolPosition(time=t, transf=transfs[0]))
+        client.recordNewPosition_sync('Coil', TimestampedToolPosition(time=t, transf=transf, relativeTo='Subject'))
+    queryTime = t0 + 500.5 / args.rate
+    latestTime = _timePerCall(lambda: client.getLatestTransf('Coil'))
+    atTime = _timePerCall(lambda: client.getTransfAtTime('Coil', queryTime))
+    print(f'\nClient lookup of tool relative to another tool: getLatestTransf {latestTime * 1e6:.2f} us, '
+          f'getTransfAtTime {atTime * 1e6:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Compare JSON and binary (`Devices.ToolPositionsWireFormat`) formats for publishing tool positions from
+ToolPositionsServer to ToolPositionsClient.
+
+Measures, for each number of tools:
+- codec: server-side encode and client-side decode time per message, where JSON decoding includes
+  `TimestampedToolPosition.fromDict` for every tool (as done by ToolPositionsClient) and binary decoding includes
+  conversion of the decoded arrays to TimestampedToolPositions
+- loopback throughput: messages per second received and decoded by a subscriber when a publisher on another thread
+  sends as fast as possible over tcp on localhost
+- loopback latency: time from encoding on the publisher to finishing decoding on the subscriber, at a fixed
+  publishing rate
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkToolPositionsWireFormat.py
+    poetry run python scripts/benchmarks/benchmarkToolPositionsWireFormat.py --numTools 6 12 --rate 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import socket
+import threading
+import time
+import typing as tp
+
+import numpy as np
+import zmq
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.ToolPositionsWireFormat import encodeToolPositions, decodeToolPositions
+
+
+def _makePositions(numTools: int, rng: np.random.Generator) -> dict[str, TimestampedToolPosition]:
+    positions = dict()
+    for i in range(numTools):
+        transf = np.eye(4)
+        transf[:3, :3], _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        transf[:3, 3] = rng.normal(scale=100, size=3)
+        positions[f'Tool{i}'] = TimestampedToolPosition(time=time.time(), transf=transf,
+                                                        relativeTo='world' if i < 2 else 'Tool0')
+    return positions
+
+
+def _encodeJSON(positions: dict[str, TimestampedToolPosition], seq: int) -> bytes:
+    # equivalent to ToolPositionsServer publishing with send_json; publish time is added only for latency measurement
+    msg = {key: (val.asDict() if val is not None else None) for key, val in positions.items()}
+    msg['__publishTime'] = time.time()
+    return json.dumps(msg).encode('utf-8')
+
+
+def _decodeJSON(buf: bytes) -> tuple[dict[str, TimestampedToolPosition | None], float]:
+    msg = json.loads(buf)
+    publishTime = msg.pop('__publishTime', float('nan'))
+    return {key: (TimestampedToolPosition.fromDict(val) if val is not None else None)
+            for key, val in msg.items()}, publishTime
+
+
+def _encodeBinary(positions: dict[str, TimestampedToolPosition], seq: int) -> bytes:
+    return encodeToolPositions(positions, seq=seq)
+
+
+def _decodeBinary(buf: bytes) -> tuple[dict[str, TimestampedToolPosition | None], float]:
+    decoded = decodeToolPositions(buf)
+    return decoded.toTimestampedToolPositions(), decoded.publishTime
+
+
+_formats: dict[str, tuple[tp.Callable, tp.Callable]] = {
+    'json': (_encodeJSON, _decodeJSON),
+    'binary-v1': (_encodeBinary, _decodeBinary),
+}
+
+
+def _timePerCall(fn: tp.Callable[[], tp.Any], minDuration: float = 0.2) -> float:
+    gc.collect()
+    numCalls = 0
+    t0 = time.perf_counter()
+    while True:
+        for _ in range(100):
+            fn()
+        numCalls += 100
+        elapsed = time.perf_counter() - t0
+        if elapsed > minDuration:
+            return elapsed / numCalls
+
+
+def _getFreePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _runLoopback(encode: tp.Callable, decode: tp.Callable, positions: dict[str, TimestampedToolPosition],
+                 numMessages: int, rate: float | None) -> tuple[float, np.ndarray]:
+    """
+    Returns (received messages per second, latencies in seconds).
+
+    If `rate` is None, publish as fast as possible. Subscriber does not use CONFLATE here, so that throughput of
+    decoding can be measured without messages being dropped.
+    """
+    ctx = zmq.Context()
+    port = _getFreePort()
+    pubSocket = ctx.socket(zmq.PUB)
+    pubSocket.setsockopt(zmq.SNDHWM, 0)
+    pubSocket.bind(f'tcp://127.0.0.1:{port}')
+    subSocket = ctx.socket(zmq.SUB)
+    subSocket.setsockopt(zmq.RCVHWM, 0)
+    subSocket.connect(f'tcp://127.0.0.1:{port}')
+    subSocket.setsockopt(zmq.SUBSCRIBE, b'')
+
+    # wait for subscription to propagate
+    while True:
+        pubSocket.send(b'sync')
+        if subSocket.poll(10):
+            while subSocket.poll(0):
+                subSocket.recv()
+            break
+
+    def publish():
+        period = 1 / rate if rate is not None else 0.
+        tNext = time.perf_counter()
+        for seq in range(numMessages):
+            if rate is not None:
+                while time.perf_counter() < tNext:
+                    pass
+                tNext += period
+            pubSocket.send(encode(positions, seq))
+        pubSocket.send(b'done')
+
+    thread = threading.Thread(target=publish, daemon=True)
+    latencies = []
+    t0 = time.perf_counter()
+    thread.start()
+    numReceived = 0
+    while True:
+        buf = subSocket.recv()
+        if buf == b'done':
+            break
+        _, publishTime = decode(buf)
+        latencies.append(time.time() - publishTime)
+        numReceived += 1
+    elapsed = time.perf_counter() - t0
+    thread.join()
+    pubSocket.close(linger=0)
+    subSocket.close(linger=0)
+    ctx.term()
+    return numReceived / elapsed, np.asarray(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numTools', type=int, nargs='+', default=[2, 6, 12, 24])
+    parser.add_argument('--numMessages', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=200., help='Publish rate (Hz) for latency measurement')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    print(f'{"tools":>5} {"format":>10} {"bytes":>7} {"encode (us)":>12} {"decode (us)":>12} '
+          f'{"throughput (msg/s)":>19} {"latency p50 (us)":>17} {"p99 (us)":>9}')
+    for numTools in args.numTools:
+        positions = _makePositions(numTools, rng)
+        for formatName, (encode, decode) in _formats.items():
+            buf = encode(positions, 0)
+            encodeTime = _timePerCall(lambda: encode(positions, 0))
+            decodeTime = _timePerCall(lambda: decode(buf))
+            throughput, _ = _runLoopback(encode, decode, positions, numMessages=args.numMessages, rate=None)
+            _, latencies = _runLoopback(encode, decode, positions,
+                                        numMessages=min(args.numMessages, int(args.rate * 5)), rate=args.rate)
+            print(f'{numTools:>5} {formatName:>10} {len(buf):>7} {encodeTime * 1e6:>12.1f} {decodeTime * 1e6:>12.1f} '
+                  f'{throughput:>19.0f} {np.median(latencies) * 1e6:>17.0f} '
+                  f'{np.percentile(latencies, 99) * 1e6:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark of the per-update cost of tool transforms in `TargetingCoordinator`, comparing the cached transform graph
+against recomposing every transform from scratch on every update (as was done previously).
+
+Simulates a session with 8 tools (subject tracker, coil, pointer, and other tracked tools) receiving tracker updates.
+For each update, the queries made by the navigate views are run: coil to MRI, MRI to world, and each tool's transform
+to MRI (for tool mesh layers). Scenarios:
+- all moving: every tracker reports a new pose on each update
+- coil moving: only the coil tracker moves, e.g. while the subject's head is stationary
+- pointer moving: only a tool unrelated to targeting moves
+- none moving: trackers report unchanged poses
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkTransformGraph.py
+    poetry run python scripts/benchmarks/benchmarkTransformGraph.py --numUpdates 10000 --trackerRate 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from NaviNIBS.Devices import TimestampedToolPosition
+from NaviNIBS.Devices.SimulatedToolPositionsClient import SimulatedToolPositionsClient
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Tools import CoilTool, Pointer, SubjectTracker, Tool
+from NaviNIBS.Navigator.TargetingCoordinator import TargetingCoordinator, MRIFrame, toolFrame
+from NaviNIBS.util.Transforms import concatenateTransforms
+
+
+numTools = 8
+
+
+def _randomTransf(rng: np.random.Generator) -> np.ndarray:
+    transf = np.eye(4)
+    q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    transf[:3, :3] = q
+    transf[:3, 3] = rng.normal(scale=100, size=3)
+    return transf
+
+
+def _makeCoordinator(sessionDir: str, rng: np.random.Generator) -> TargetingCoordinator:
+    session = Session.createNew(filepath=sessionDir + '/session.navinibs', unpackedSessionDir=sessionDir + '/unpacked')
+    session.tools.addItem(SubjectTracker(key='Subject'))
+    session.tools.addItem(CoilTool(key='Coil', toolToTrackerTransf=_randomTransf(rng)))
+    session.tools.addItem(Pointer(key='Pointer', toolToTrackerTransf=_randomTransf(rng)))
+    for iTool in range(numTools - 3):
+        session.tools.addItem(Tool(key=f'Tool{iTool}', usedFor='visualization', toolToTrackerTransf=_randomTransf(rng)))
+    session.subjectRegistration.trackerToMRITransf = _randomTransf(rng)
+
+    client = SimulatedToolPositionsClient()
+    return TargetingCoordinator(session=session, positionsClient=client)
+
+
+def _legacyQueries(coordinator: TargetingCoordinator):
+    # equivalent to previous implementations of currentCoilToMRITransform, currentMRIToWorldTransform, and
+    #  ToolMeshSurfaceLayer transform updates, which recomposed (and inverted with pinv) on every update
+    session = coordinator.session
+    client = coordinator.positionsClient
+    subjectTrackerToMRITransf = session.subjectRegistration.trackerToMRITransf
+    subjectTrackerKey = session.tools.subjectTracker.trackerKey
+
+    coil = coordinator.activeCoilTool
+    concatenateTransforms([coil.toolToTrackerTransf,
+                           client.getLatestTransf(coil.trackerKey, None),
+                           np.linalg.pinv(client.getLatestTransf(subjectTrackerKey, None)),
+                           subjectTrackerToMRITransf])
+
+    concatenateTransforms([np.linalg.pinv(subjectTrackerToMRITransf),
+                           client.getLatestTransf(session.tools.subjectTracker.trackerKey, None)])
+
+    for tool in session.tools.values():
+        concatenateTransforms([tool.toolToTrackerTransf @ tool.toolStlToToolTransf,
+                               client.getLatestTransf(tool.trackerKey, None),
+                               np.linalg.pinv(client.getLatestTransf(subjectTrackerKey, None)),
+                               subjectTrackerToMRITransf])
+
+
+def _graphQueries(coordinator: TargetingCoordinator):
+    coordinator._updateTrackerTransforms()  # as done on each positions update
+
+    coordinator.currentCoilToMRITransform
+    coordinator.currentMRIToWorldTransform
+
+    transformGraph = coordinator.transformGraph
+    for toolKey, tool in coordinator.session.tools.items():
+        transformGraph.getTransform(toolFrame(toolKey), MRIFrame) @ tool.toolStlToToolTransf
+
+
+def _makeUpdates(coordinator: TargetingCoordinator, scenario: str, numUpdates: int,
+                 rng: np.random.Generator) -> list[dict[str, TimestampedToolPosition]]:
+    trackerKeys = [tool.trackerKey for tool in coordinator.session.tools.values()]
+    positions = {key: TimestampedToolPosition(time=time.time(), transf=_randomTransf(rng)) for key in trackerKeys}
+    match scenario:
+        case 'all moving':
+            movingKeys = trackerKeys
+        case 'coil moving':
+            movingKeys = [coordinator.activeCoilTool.trackerKey]
+        case 'pointer moving':
+            movingKeys = [coordinator.session.tools['Pointer'].trackerKey]
+        case 'none moving':
+            movingKeys = []
+        case _:
+            raise NotImplementedError
+
+    updates = []
+    for _ in range(numUpdates):
+        positions = positions | {key: TimestampedToolPosition(time=time.time(), transf=_randomTransf(rng))
+                                 for key in movingKeys}
+        updates.append(positions)
+    return updates
+
+
+def _timeUpdates(coordinator: TargetingCoordinator, updates: list[dict[str, TimestampedToolPosition]],
+                 queries) -> float:
+    iUpdate = 0
+
+    def runUpdate():
+        nonlocal iUpdate
+        coordinator.positionsClient._latestPositions = updates[iUpdate]
+        iUpdate += 1
+        queries(coordinator)
+
+    return timeit.timeit(runUpdate, number=len(updates)) / len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numUpdates', type=int, default=5000)
+    parser.add_argument('--trackerRate', type=float, default=60., help='Tracker update rate, in Hz')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as sessionDir:
+        coordinator = _makeCoordinator(sessionDir, rng)
+
+        print(f'{numTools} tools, {args.numUpdates} updates, budget at {args.trackerRate:g} Hz: '
+              f'{1e6 / args.trackerRate:.0f} us per update')
+        print(f'{"scenario":>16} {"legacy (us)":>12} {"graph (us)":>12} {"speedup":>8} {"graph % budget":>15}')
+        for scenario in ('all moving', 'coil moving', 'pointer moving', 'none moving'):
+            updates = _makeUpdates(coordinator, scenario, args.numUpdates, rng)
+            tLegacy = _timeUpdates(coordinator, updates, _legacyQueries)
+            tGraph = _timeUpdates(coordinator, updates, _graphQueries)
+            print(f'{scenario:>16} {tLegacy * 1e6:>12.1f} {tGraph * 1e6:>12.1f} {tLegacy / tGraph:>7.2f}x '
+                  f'{tGraph * args.trackerRate * 100:>14.2f}%')
+
+
+if __name__ == '__main__':
+    main()
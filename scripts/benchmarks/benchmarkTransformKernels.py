@@ -0,0 +1,75 @@
+"""
+Compare the closed-form and stacked transform kernels in `NaviNIBS.util.Transforms` against the general-purpose
+or per-transform equivalents they replace:
+- invertTransform vs. np.linalg.pinv, for a single rigid transform
+- invertTransforms vs. a loop of pinv, for a stack of rigid transforms
+- applyTransform with vs. without input checks, for a single point
+- concatenateTransformStacks + applyTransforms vs. a loop of applyTransform, for a stack of transforms and points
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkTransformKernels.py
+    poetry run python scripts/benchmarks/benchmarkTransformKernels.py --stackSizes 10 1000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+import numpy as np
+import pytransform3d.transformations as ptt
+
+from NaviNIBS.util.Transforms import invertTransform, invertTransforms, applyTransform, applyTransforms, \
+    concatenateTransformStacks
+
+
+def _timePerCall(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def _randomRigidTransforms(rng: np.random.Generator, n: int) -> np.ndarray:
+    transfs = np.stack([ptt.random_transform(rng) for _ in range(n)])
+    transfs[:, :3, 3] *= 100
+    return transfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stackSizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--numCalls', type=int, default=2000, help='Number of calls when timing single transforms')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    transf1, transf2 = _randomRigidTransforms(rng, 2)
+    pt = np.asarray([1., 2., 3.])
+
+    tFast = _timePerCall(lambda: invertTransform(transf1), number=args.numCalls)
+    tPinv = _timePerCall(lambda: np.linalg.pinv(transf1), number=args.numCalls)
+    print(f'invertTransform: {tFast * 1e6:.1f} us, pinv: {tPinv * 1e6:.1f} us, speedup {tPinv / tFast:.1f}x')
+
+    tApply = _timePerCall(lambda: applyTransform([transf1, transf2], pt, doCheck=False), number=args.numCalls)
+    tApplyChecked = _timePerCall(lambda: applyTransform([transf1, transf2], pt), number=args.numCalls)
+    print(f'applyTransform: {tApply * 1e6:.1f} us unchecked, {tApplyChecked * 1e6:.1f} us checked')
+
+    print(f'{"stack size":>10} {"invert (ms)":>12} {"pinv loop (ms)":>15} {"speedup":>8} '
+          f'{"apply (ms)":>11} {"apply loop (ms)":>16} {"speedup":>8}')
+    for stackSize in args.stackSizes:
+        transfs = _randomRigidTransforms(rng, stackSize)
+        pts = rng.normal(size=(stackSize, 3))
+        numBatchCalls = max(1, 1000 // stackSize)
+
+        tInvert = _timePerCall(lambda: invertTransforms(transfs), number=numBatchCalls)
+        tInvertLoop = _timePerCall(lambda: [np.linalg.pinv(transf) for transf in transfs], number=1)
+
+        tApply = _timePerCall(lambda: applyTransforms(concatenateTransformStacks([transfs, transf1]), pts),
+                              number=numBatchCalls)
+        tApplyLoop = _timePerCall(lambda: [applyTransform([transf, transf1], p, doCheck=False)
+                                           for transf, p in zip(transfs, pts)], number=1)
+
+        print(f'{stackSize:>10d} {tInvert * 1e3:>12.3f} {tInvertLoop * 1e3:>15.3f} {tInvertLoop / tInvert:>7.1f}x '
+              f'{tApply * 1e3:>11.3f} {tApplyLoop * 1e3:>16.3f} {tApplyLoop / tApply:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Benchmark of ZMQConnector request paths, comparing one REQ/REP round trip per operation with batched and pipelined
+requests.
+
+Each measurement runs a sequence of operations (cycling through get, set, and call) against a ZMQConnectorServer
+running in a separate process, as e.g. the tool positions server does. With a nonzero call delay, the calls are
+instead to an async server method that sleeps before returning, to simulate slow remote operations. Request paths:
+- REQ/REP sync: ``client.get(...)`` etc., one at a time
+- REQ/REP async: ``await client.get_async(...)`` etc., one at a time
+- REQ/REP async gathered: all operations started at once, but serialized by the client's REQ socket lock
+- pipelined async gathered: all operations started at once on a DEALER socket
+- batch sync / batch async: all operations in a single `ZMQConnectorBatch`
+
+Results are printed and written to a JSON file (including software version and git commit) so that runs can be
+compared between versions, e.g. with `--compareTo previousResults.json`.
+
+Examples
+--------
+    poetry run python scripts/benchmarks/benchmarkZMQConnector.py
+    poetry run python scripts/benchmarks/benchmarkZMQConnector.py --numOps 1 10 100 1000 --callDelay 0 0.01 --numRepeats 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime
+import json
+import logging
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import time
+import typing as tp
+
+import attrs
+import numpy as np
+
+import NaviNIBS
+from NaviNIBS.util.ZMQConnector import ZMQConnectorServer, ZMQConnectorClient, ZMQConnectorBatch, getNewPort
+
+
+@attrs.define
+class _ServedState:
+    a: int = 1
+    b: str = 'two'
+    c: list[float] = attrs.field(factory=lambda: [0., 1., 2.])
+
+    def add(self, x, y):
+        return x + y
+
+    async def addAfterDelay(self, x, y, delay: float):
+        await asyncio.sleep(delay)
+        return x + y
+
+
+async def _serve(port: int):
+    server = ZMQConnectorServer(obj=_ServedState(), reqRepPort=port)
+    await asyncio.Event().wait()  # serve until process is terminated
+
+
+def _runServer(port: int):
+    logging.disable(logging.WARNING)
+    asyncio.run(_serve(port))
+
+
+def _opArgs(iOp: int, callDelay: float) -> tuple[str, tuple, dict]:
+    match iOp % 3:
+        case 0:
+            return 'get', ('c',), dict()
+        case 1:
+            return 'set', ('a', iOp), dict()
+        case 2:
+            if callDelay > 0:
+                return 'callAsync', ('addAfterDelay', iOp, 1), dict(delay=callDelay)
+            else:
+                return 'call', ('add', iOp, 1), dict()
+
+
+def _runSync(client: ZMQConnectorClient, numOps: int, callDelay: float):
+    for iOp in range(numOps):
+        which, args, kwargs = _opArgs(iOp, callDelay)
+        getattr(client, which)(*args, **kwargs)
+
+
+async def _runAsync(client: ZMQConnectorClient, numOps: int, callDelay: float):
+    for iOp in range(numOps):
+        which, args, kwargs = _opArgs(iOp, callDelay)
+        await getattr(client, which + '_async')(*args, **kwargs)
+
+
+async def _runGathered(client: ZMQConnectorClient, numOps: int, callDelay: float):
+    coros = []
+    for iOp in range(numOps):
+        which, args, kwargs = _opArgs(iOp, callDelay)
+        coros.append(getattr(client, which + '_async')(*args, **kwargs))
+    await asyncio.gather(*coros)
+
+
+def _makeBatch(client: ZMQConnectorClient, numOps: int, callDelay: float) -> ZMQConnectorBatch:
+    batch = client.batch()
+    for iOp in range(numOps):
+        which, args, kwargs = _opArgs(iOp, callDelay)
+        getattr(batch, which)(*args, **kwargs)
+    return batch
+
+
+async def _measure(run: tp.Callable[[], tp.Any], numRepeats: int) -> list[float]:
+    await _maybeAwait(run())  # warm up
+    wallTimes = []
+    for _ in range(numRepeats):
+        t0 = time.perf_counter()
+        await _maybeAwait(run())
+        wallTimes.append(time.perf_counter() - t0)
+    return wallTimes
+
+
+async def _maybeAwait(result):
+    if asyncio.iscoroutine(result):
+        return await result
+    return result
+
+
+async def _runForNumOps(numOps: int, callDelay: float, reqClient: ZMQConnectorClient,
+                        pipelinedClient: ZMQConnectorClient, numRepeats: int) -> list[dict[str, tp.Any]]:
+    paths = {
+        'REQ/REP sync': lambda: _runSync(reqClient, numOps, callDelay),
+        'REQ/REP async': lambda: _runAsync(reqClient, numOps, callDelay),
+        'REQ/REP async gathered': lambda: _runGathered(reqClient, numOps, callDelay),
+        'pipelined async gathered': lambda: _runGathered(pipelinedClient, numOps, callDelay),
+        'batch sync': lambda: _makeBatch(reqClient, numOps, callDelay).execute(),
+        'batch async': lambda: _makeBatch(reqClient, numOps, callDelay).execute_async(),
+    }
+
+    results = []
+    for path, run in paths.items():
+        wallTimes = await _measure(run, numRepeats=numRepeats)
+        result = dict(numOps=numOps,
+                      callDelay_s=callDelay,
+                      path=path,
+                      wallTime_s=float(np.median(wallTimes)),
+                      wallTimeMin_s=float(np.min(wallTimes)),
+                      numRepeats=numRepeats)
+        result['timePerOp_us'] = result['wallTime_s'] / numOps * 1e6
+        results.append(result)
+
+    baseline = results[0]['wallTime_s']
+    for result in results:
+        result['speedupVsReqRepSync'] = baseline / result['wallTime_s']
+        _printResult(result)
+    return results
+
+
+def _printHeader():
+    print(f'{"numOps":>8} {"delay (ms)":>10} {"path":>26} {"time (ms)":>10} {"per op (us)":>12} {"speedup":>8}')
+
+
+def _printResult(result: dict[str, tp.Any], compareTo: dict[str, tp.Any] | None = None):
+    line = f'{result["numOps"]:>8d} {result["callDelay_s"] * 1e3:>10.1f} {result["path"]:>26} {result["wallTime_s"] * 1e3:>10.2f} ' \
+           f'{result["timePerOp_us"]:>12.1f} {result["speedupVsReqRepSync"]:>7.1f}x'
+    if compareTo is not None:
+        line += f'   (time x{result["wallTime_s"] / compareTo["wallTime_s"]:.2f} vs previous)'
+    print(line)
+
+
+def _getGitCommit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: list[dict[str, tp.Any]], previousPath: str):
+    with open(previousPath, 'r') as f:
+        previous = json.load(f)
+    print(f'\nComparison to {previousPath} (version {previous.get("softwareVersion")}, '
+          f'commit {previous.get("gitCommit")}):')
+    _printHeader()
+    def resultKey(result):
+        return result['numOps'], result['callDelay_s'], result['path']
+
+    previousByKey = {resultKey(result): result for result in previous['results']}
+    for result in results:
+        prevResult = previousByKey.get(resultKey(result), None)
+        if prevResult is not None:
+            _printResult(result, compareTo=prevResult)
+
+
+async def _runAll(numOpsList: list[int], callDelays: list[float], numRepeats: int) -> list[dict[str, tp.Any]]:
+    port = getNewPort()
+    server = mp.Process(target=_runServer, args=(port,), daemon=True)
+    server.start()
+    reqClient = ZMQConnectorClient(reqRepPort=port, allowAsyncCalls=True)
+    pipelinedClient = ZMQConnectorClient(reqRepPort=port, allowAsyncCalls=True, pipelineAsyncCalls=True,
+                                         allowSyncCalls=False)
+    await asyncio.sleep(2.)  # give time for server to start and connections to be made
+
+    results = []
+    _printHeader()
+    try:
+        for callDelay in callDelays:
+            for numOps in numOpsList:
+                results.extend(await _runForNumOps(numOps, callDelay=callDelay, reqClient=reqClient,
+                                                   pipelinedClient=pipelinedClient, numRepeats=numRepeats))
+    finally:
+        reqClient.close()
+        pipelinedClient.close()
+        server.terminate()
+        server.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numOps', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--callDelay', type=float, nargs='+', default=[0., 0.001],
+                        help='If > 0, calls are to an async server method that sleeps for this many seconds')
+    parser.add_argument('--numRepeats', type=int, default=10)
+    parser.add_argument('--output', type=str, default=None,
+                        help='Path to write JSON results. Defaults to a timestamped file in the working directory.')
+    parser.add_argument('--compareTo', type=str, default=None, help='Previous JSON results to compare to')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    runInfo = dict(
+        benchmark='zmqConnector',
+        softwareVersion=NaviNIBS.__version__,
+        gitCommit=_getGitCommit(),
+        python=sys.version,
+        platform=platform.platform(),
+        time=datetime.now().isoformat(),
+        numRepeats=args.numRepeats,
+    )
+
+    results = asyncio.run(_runAll(args.numOps, callDelays=args.callDelay, numRepeats=args.numRepeats))
+
+    outputPath = args.output
+    if outputPath is None:
+        outputPath = f'zmqConnectorBenchmark_{datetime.now().strftime("%y%m%d%H%M%S")}.json'
+    with open(outputPath, 'w') as f:
+        json.dump(runInfo | dict(results=results), f, indent=2)
+    print(f'\nWrote results to {outputPath}')
+
+    if args.compareTo is not None:
+        _compare(results, args.compareTo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Generate synthetic sessions of configurable size for benchmarks, without requiring MRI or head model files.
+
+Examples
+--------
+    from syntheticSession import SyntheticSessionParams, makeSyntheticSession
+    session = makeSyntheticSession(filepath, unpackedSessionDir, SyntheticSessionParams(numSamples=10000))
+"""
+
+from __future__ import annotations
+
+import attrs
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from NaviNIBS.Navigator.Model.Session import Session
+from NaviNIBS.Navigator.Model.Samples import Sample
+from NaviNIBS.Navigator.Model.SubjectRegistration import Fiducial
+from NaviNIBS.Navigator.Model.Targets import Target
+from NaviNIBS.Navigator.Model.Tools import CoilTool, Pointer, SubjectTracker
+from NaviNIBS.Navigator.Model.ROIs import SurfaceMeshROI
+
+
+@attrs.define(frozen=True)
+class SyntheticSessionParams:
+    numSamples: int = 1000
+    numTargets: int = 50
+    numHeadPoints: int = 1000
+    numROIs: int = 10
+    numROIVertices: int = 500
+    numTools: int = 4
+    numTransformHistory: int = 10
+    """
+    Number of entries in registration and tool transform histories
+    """
+    numAutosaves: int = 0
+    """
+    Number of autosaves made (each after changing one sample) after the initial full save
+    """
+    seed: int = 0
+
+    def asDict(self) -> dict[str, int]:
+        return attrs.asdict(self)
+
+
+def _randomTransf(rng: np.random.Generator) -> np.ndarray:
+    transf = np.eye(4)
+    q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    transf[:3, :3] = q
+    transf[:3, 3] = rng.normal(scale=50, size=3)
+    return transf
+
+
+def makeTargets(params: SyntheticSessionParams, keyPrefix: str = 'Target') -> list[Target]:
+    rng = np.random.default_rng(params.seed + 1)
+    return [Target(key=f'{keyPrefix} {i}', targetCoord=rng.normal(scale=50, size=3),
+                   entryCoord=rng.normal(scale=50, size=3), angle=float(rng.uniform(-180, 180)),
+                   coilToMRITransf=_randomTransf(rng))
+            for i in range(params.numTargets)]
+
+
+def makeTools(params: SyntheticSessionParams, keyPrefix: str = '') -> list[CoilTool | Pointer | SubjectTracker]:
+    rng = np.random.default_rng(params.seed + 2)
+    tools = []
+    for i in range(params.numTools):
+        if i == 0:
+            tool = SubjectTracker(key=f'{keyPrefix}Subject')
+        elif i == 1:
+            tool = Pointer(key=f'{keyPrefix}Pointer')
+        else:
+            tool = CoilTool(key=f'{keyPrefix}Coil{i - 1}')
+            for _ in range(params.numTransformHistory):
+                tool.toolToTrackerTransf = _randomTransf(rng)
+        tools.append(tool)
+    return tools
+
+
+def makeSyntheticSession(filepath: str, unpackedSessionDir: str, params: SyntheticSessionParams) -> Session:
+    """
+    Create a session with the given counts of items, and save it to `filepath`.
+    """
+    rng = np.random.default_rng(params.seed)
+    session = Session.createNew(filepath=filepath, unpackedSessionDir=unpackedSessionDir)
+    session.subjectID = 'synthetic'
+
+    targets = makeTargets(params)
+    with session.targets.batchedChanges():
+        for target in targets:
+            session.targets.addItem(target)
+
+    t0 = pd.Timestamp.now()
+    with session.samples.batchedChanges():
+        for i in range(params.numSamples):
+            session.samples.addItem(Sample(
+                key=f'Sample {i}',
+                timestamp=t0 + pd.Timedelta(milliseconds=i),
+                coilToMRITransf=_randomTransf(rng),
+                targetKey=targets[i % len(targets)].key if len(targets) > 0 else None))
+
+    reg = session.subjectRegistration
+    for key in ('LPA', 'NAS', 'RPA'):
+        reg.fiducials[key] = Fiducial(key=key, plannedCoord=rng.normal(scale=50, size=3))
+        reg.fiducials[key].sampledCoords = rng.normal(scale=50, size=(5, 3))
+    if params.numHeadPoints > 0:
+        reg.sampledHeadPoints.extend(rng.normal(scale=80, size=(params.numHeadPoints, 3)))
+    for _ in range(params.numTransformHistory):
+        reg.trackerToMRITransf = _randomTransf(rng)
+
+    with session.tools.batchedChanges():
+        for tool in makeTools(params):
+            session.tools.addItem(tool)
+
+    with session.ROIs.batchedChanges():
+        for i in range(params.numROIs):
+            session.ROIs.addItem(SurfaceMeshROI(
+                key=f'ROI {i}', meshKey='gmSurf',
+                meshVertexIndices=np.sort(rng.choice(100_000, size=params.numROIVertices, replace=False)),
+                seedCoord=rng.normal(scale=50, size=3)))
+
+    session.saveToFile()
+
+    for i in range(params.numAutosaves):
+        sample = session.samples[f'Sample {i % max(params.numSamples, 1)}'] if params.numSamples > 0 else None
+        if sample is not None:
+            sample.isVisible = not sample.isVisible
+        else:
+            session.flagKeyAsDirty('targets')
+        session.saveToUnpackedDir(asAutosave=True)
+    if params.numAutosaves > 0:
+        session.autosaveWriter.waitUntilIdle()
+
+    return session
+
+
+def makeMergeFile(path: str, params: SyntheticSessionParams):
+    """
+    Write a JSON file of targets and tools (with keys distinct from those in `makeSyntheticSession`) for use with
+    `Session.mergeFromFile`.
+    """
+    d = dict(targets=[target.asDict() for target in makeTargets(params, keyPrefix='Merged target')],
+             targetGrids=[],
+             tools=[tool.asDict() for tool in makeTools(params, keyPrefix='Merged')])
+    with open(path, 'w') as f:
+        json.dump(d, f)